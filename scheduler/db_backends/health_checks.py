@@ -0,0 +1,39 @@
+"""
+Health checks for persistent database connections.
+
+With CONN_MAX_AGE set, Django 1.10 keeps reusing a connection across requests
+and only tests it after a query on it has failed. A connection dropped by the
+database server in the meantime, by a restart or an idle timeout, therefore
+fails the first query of the next request that uses it.
+"""
+
+
+
+class HealthCheckMixin(object):
+    """Ping a reused connection once per request before running queries on it.
+
+    Enabled by setting 'CONN_HEALTH_CHECKS' to True in the database's settings.
+    Connections found unusable are closed and transparently reopened.
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        super(HealthCheckMixin, self).connect()
+        # A connection that was just established needs no check
+        self.health_check_done = True
+
+
+    def close_if_unusable_or_obsolete(self):
+        # Called by Django when every request starts and finishes
+        super(HealthCheckMixin, self).close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done and
+                self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            self.health_check_done = True
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+        super(HealthCheckMixin, self).ensure_connection()
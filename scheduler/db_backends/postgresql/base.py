@@ -0,0 +1,87 @@
+"""
+PostgreSQL database backend with connection health checks and optional pooling.
+
+Setting 'POOL' in the database's settings to a dict such as
+{'MIN_SIZE': 2, 'MAX_SIZE': 20, 'TIMEOUT': 10} shares a pool of connections
+between the threads of a process, similar to running pgbouncer in transaction
+pooling mode next to every application server. Django's closing of a
+connection then returns it to the pool instead of disconnecting, so pooling is
+meant to be combined with CONN_MAX_AGE = 0: each request borrows a connection
+for as long as it runs. When every connection is in use a request waits up to
+TIMEOUT seconds for one to be returned.
+
+Selected by settings.py when SCHEDULER_DB_BACKEND is set to 'postgres'.
+Requires the optional psycopg2 dependency, see requirements-postgres.txt.
+"""
+
+import threading
+import time
+from django.db.backends.postgresql import base
+from psycopg2 import pool as psycopg2_pool
+from ..health_checks import HealthCheckMixin
+
+
+# Pools are shared by all threads, keyed by database alias
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        pool_settings = self.settings_dict.get('POOL')
+        if not pool_settings:
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        pool = self._get_pool(pool_settings, conn_params)
+        deadline = time.time() + pool_settings.get('TIMEOUT', 10)
+        while True:
+            try:
+                connection = pool.getconn()
+            except psycopg2_pool.PoolError:
+                if time.time() >= deadline:
+                    raise
+                time.sleep(0.01)
+                continue
+            # Pooled connections may have been dropped by the server while idle
+            if self.settings_dict.get('CONN_HEALTH_CHECKS') and not _ping(connection):
+                pool.putconn(connection, close=True)
+                continue
+            break
+
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level', connection.isolation_level)
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+
+    def _close(self):
+        if self.connection is not None and self.settings_dict.get('POOL'):
+            # The pool rolls back any open transaction before reusing it
+            with self.wrap_database_errors:
+                return _pools[self.alias].putconn(self.connection,
+                                                  close=bool(self.connection.closed))
+        return super(DatabaseWrapper, self)._close()
+
+
+    def _get_pool(self, pool_settings, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = psycopg2_pool.ThreadedConnectionPool(
+                    pool_settings.get('MIN_SIZE', 1), pool_settings.get('MAX_SIZE', 10),
+                    **conn_params)
+            return _pools[self.alias]
+
+
+def _ping(connection):
+    """Return True if the psycopg2 connection is able to run a query."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if not connection.autocommit:
+            connection.rollback()
+        return True
+    except base.Database.Error:
+        return False
@@ -0,0 +1,43 @@
+"""
+SQLite database backend tuned for single node production deployments.
+
+Every new connection is configured with the PRAGMAs of the database's 'PRAGMAS'
+setting, by default write-ahead logging so that readers of live calendars are
+not blocked while push_changes_live bulk inserts live schedules. Before a
+connection is closed 'PRAGMA optimize' is run so SQLite can refresh the query
+planner statistics of tables whose usage has changed.
+
+Selected by settings.py when SCHEDULER_DB_PROFILE is set to 'production'.
+"""
+
+from django.db.backends.sqlite3 import base
+from ..health_checks import HealthCheckMixin
+
+
+DEFAULT_PRAGMAS = [
+    ('busy_timeout', 5000),     # Milliseconds to wait on a locked database
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),  # Safe with WAL, only fsyncs at checkpoints
+    ('mmap_size', 268435456),   # 256 MB of memory mapped reads
+    ('cache_size', -64000),     # Negative values are in KiB, so 64 MB
+]
+
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for pragma, value in self.settings_dict.get('PRAGMAS', DEFAULT_PRAGMAS):
+            conn.execute('PRAGMA %s = %s' % (pragma, value))
+        return conn
+
+
+    def _close(self):
+        if self.connection is not None and self.settings_dict.get('OPTIMIZE_ON_CLOSE', True):
+            # Failing to optimize must never prevent the connection closing
+            try:
+                self.connection.execute('PRAGMA optimize')
+            except base.Database.Error:
+                pass
+        return super(DatabaseWrapper, self)._close()
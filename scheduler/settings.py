@@ -79,13 +79,127 @@ WSGI_APPLICATION = 'scheduler.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/1.10/ref/settings/#databases
-
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+#
+# SQLite is used by default for development. Set SCHEDULER_DB_BACKEND=postgres
+# to run against PostgreSQL, configured through the SCHEDULER_DB_* variables.
+# PostgreSQL additionally stores indexed time ranges for schedules, vacations
+# and absences that overlap queries use (See business_logic/overlap_logic.py)
+#
+# Deployments that stay on SQLite should set SCHEDULER_DB_PROFILE=production,
+# which opens connections with WAL journaling and tuned PRAGMAs so live
+# calendar reads are not blocked by publishing. Override the PRAGMAs with a
+# 'PRAGMAS' list of (name, value) pairs, see scheduler/db_backends/sqlite3.
+#
+# The production profile also keeps connections open between requests for
+# SCHEDULER_DB_CONN_MAX_AGE seconds, checking they still work before reuse.
+# On PostgreSQL, SCHEDULER_DB_POOL_SIZE instead shares a pool of at most that
+# many connections between the threads of a process, with connections only
+# borrowed for the duration of a request, see scheduler/db_backends/postgresql.
+
+DB_BACKEND = os.environ.get('SCHEDULER_DB_BACKEND', 'sqlite')
+DB_PROFILE = os.environ.get('SCHEDULER_DB_PROFILE', 'development')
+DB_POOL_SIZE = int(os.environ.get('SCHEDULER_DB_POOL_SIZE', 0))
+DB_CONN_MAX_AGE = int(os.environ.get('SCHEDULER_DB_CONN_MAX_AGE',
+                                     60 if DB_PROFILE == 'production' and not DB_POOL_SIZE else 0))
+
+if DB_BACKEND == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'scheduler.db_backends.postgresql',
+            'NAME': os.environ.get('SCHEDULER_DB_NAME', 'scheduler'),
+            'USER': os.environ.get('SCHEDULER_DB_USER', ''),
+            'PASSWORD': os.environ.get('SCHEDULER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('SCHEDULER_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('SCHEDULER_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
+    if DB_POOL_SIZE:
+        DATABASES['default']['POOL'] = {'MIN_SIZE': 1, 'MAX_SIZE': DB_POOL_SIZE,
+                                        'TIMEOUT': 10}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        }
+    }
+    if DB_PROFILE == 'production':
+        DATABASES['default'].update({'ENGINE': 'scheduler.db_backends.sqlite3',
+                                     'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+                                     'CONN_HEALTH_CHECKS': True})
+
+
+# Concurrent reads
+#
+# Read heavy views, like the live calendars, run their independent queries
+# concurrently on a pool of at most SCHEDULER_QUERY_WORKERS threads per
+# process, each query on a connection of its own thread, see
+# business_logic/concurrency_logic.py. With SCHEDULER_DB_POOL_SIZE set, the
+# connection pool needs room for these threads on top of the request threads.
+# Worker threads close their connections after each query unless connections
+# are pooled or kept open, so without SCHEDULER_DB_POOL_SIZE or a
+# SCHEDULER_DB_CONN_MAX_AGE above 0 every concurrent query would open a new
+# connection, and a month of the calendar about ten. Queries run one after
+# another by default in that case, like with SCHEDULER_QUERY_WORKERS=0, and on
+# SQLite, which gains little from threads.
+
+QUERY_WORKERS = int(os.environ.get('SCHEDULER_QUERY_WORKERS',
+                                   4 if DB_BACKEND == 'postgres' and
+                                        (DB_POOL_SIZE or DB_CONN_MAX_AGE > 0) else 0))
+
+
+# Calendar events
+#
+# Open calendars poll for changes made by other tabs and managers every few
+# seconds, each poll returning right away. Deployments running asynchronous
+# workers, like gevent, can set SCHEDULER_CALENDAR_EVENT_WAIT_SECONDS to have
+# polls wait that long for new changes instead. Waiting polls hold on to
+# their worker, so synchronous workers should keep the default of 0, see
+# poll_calendar_events in business_logic/event_logic.py
+
+CALENDAR_EVENT_WAIT_SECONDS = int(os.environ.get('SCHEDULER_CALENDAR_EVENT_WAIT_SECONDS', 0))
+
+
+# Cache
+# https://docs.djangoproject.com/en/1.10/topics/cache/
+#
+# Holds the version of each manager's data that cached calculations, such as
+# eligible employees of proto schedules, are keyed by. Deployments running
+# more than one process should set SCHEDULER_CACHE_LOCATION to a memcached
+# server so all processes see the same versions.
+
+if os.environ.get('SCHEDULER_CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['SCHEDULER_CACHE_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'scheduler',
+        }
+    }
+
+
+# Cost burden
+#
+# Costs of employees on top of their wage that calendar costs include. Each
+# component has a 'type' of 'percent_of_wage', 'rate_per_hour' or
+# 'fixed_monthly', and either the 'field' of the Employee model holding its
+# amount or a constant 'value'. Fixed monthly costs are allocated to
+# departments by the hours employees work in them, see get_burden_components
+# in business_logic/cost_projection_logic.py
+
+COST_BURDEN_COMPONENTS = [
+    {'name': 'Social Security', 'type': 'percent_of_wage', 'field': 'social_security'},
+    {'name': 'Workmans Comp', 'type': 'percent_of_wage', 'field': 'workmans_comp'},
+    {'name': 'Medical', 'type': 'fixed_monthly', 'field': 'monthly_medical'},
+]
 
 
 # Password validation
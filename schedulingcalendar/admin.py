@@ -4,7 +4,8 @@ from .models import (Employee, Department, Schedule, Vacation,
                      RepeatUnavailability, DesiredTime, MonthlyRevenue,
                      DepartmentMembership, BusinessData, LiveSchedule,
                      LiveCalendar, LiveCalendarVersionTimestamp, DayNoteHeader, 
-                     DayNoteBody, ScheduleSwapPetition, UserProfile, VacationApplication)
+                     DayNoteBody, ScheduleSwapPetition, UserProfile, VacationApplication,
+                     StaffingRule)
 
 admin.site.register(Employee)
 admin.site.register(Department)
@@ -23,4 +24,4 @@ admin.site.register(DayNoteBody)
 admin.site.register(ScheduleSwapPetition)
 admin.site.register(UserProfile)
 admin.site.register(VacationApplication)
-
+admin.site.register(StaffingRule)
@@ -5,3 +5,6 @@ from django.apps import AppConfig
 
 class SchedulingcalendarConfig(AppConfig):
     name = 'schedulingcalendar'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,17 @@
+"""
+Benchmarks of the calendar's hot paths, run with the run_benchmarks command.
+
+Benchmark modules register their functions with the harness's benchmark
+decorator when imported below.
+"""
+
+from harness import BENCHMARKS
+import calendar_costs
+import calendar_range
+import concurrent_reads
+import consolidated_calendar
+import cost_rollup
+import coverage
+import live_calendar
+import pending_approvals
+import request_latency
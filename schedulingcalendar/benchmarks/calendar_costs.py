@@ -0,0 +1,44 @@
+"""
+Benchmark of calculating the hours and costs of a calendar month.
+"""
+
+from collections import OrderedDict
+from ..business_logic import all_calendar_hours_and_costs, get_start_end_of_calendar
+from ..models import Schedule, Department, Employee, BusinessData
+from .fixtures import create_tenant, create_month_of_schedules
+from .harness import benchmark, summarize, time_call
+
+
+YEAR = 2018
+MONTH = 7
+REPEATS = 10
+
+
+
+@benchmark('calendar_costs')
+def calendar_costs():
+    """Hours and costs of a month of schedules, including the workweeks
+    shared with the months before and after."""
+
+    tenant = create_tenant(YEAR, MONTH)
+    manager = tenant['manager']
+    for month in (MONTH - 1, MONTH + 1):
+        create_month_of_schedules(manager, tenant['departments'], tenant['members'],
+                                  YEAR, month)
+
+    departments = list(Department.objects.filter(user=manager).order_by('name'))
+    employees = list(Employee.objects.filter(user=manager))
+    business_data = BusinessData.objects.get(user=manager)
+    lower_bound_dt, upper_bound_dt = get_start_end_of_calendar(YEAR, MONTH)
+    schedules = list(Schedule.objects.select_related('employee', 'department')
+                                     .filter(user=manager,
+                                             start_datetime__gte=lower_bound_dt,
+                                             end_datetime__lte=upper_bound_dt)
+                                     .order_by('start_datetime', 'end_datetime'))
+
+    latencies = [time_call(all_calendar_hours_and_costs, manager, departments, schedules,
+                           employees, MONTH, YEAR, business_data)
+                 for i in range(REPEATS)]
+    row = OrderedDict([('schedules', len(schedules))])
+    row.update(summarize(latencies))
+    return [row]
@@ -0,0 +1,42 @@
+"""
+Benchmark of loading a month, a workweek and a day of a department's calendar.
+"""
+
+from collections import OrderedDict
+from django.test import Client
+from django.urls import reverse
+from .fixtures import create_tenant
+from .harness import benchmark, summarize, time_request
+
+
+YEAR = 2018
+MONTH = 7
+DAY = 18
+REPEATS = 10
+
+
+
+@benchmark('calendar_range')
+def calendar_range():
+    """Time and payload size of a month of the calendar, whose costs are
+    cached, versus a workweek and a day, which are costed on every load."""
+
+    tenant = create_tenant(YEAR, MONTH)
+    client = Client()
+    client.force_login(tenant['manager'])
+    department = tenant['departments'][0].id
+    date = '%d-%02d-%02d' % (YEAR, MONTH, DAY)
+    loads = [('month', reverse('schedulingcalendar:get_schedules'),
+              {'department': department, 'year': YEAR, 'month': MONTH}),
+             ('week', reverse('schedulingcalendar:get_schedules_range'),
+              {'department': department, 'range': 'week', 'date': date}),
+             ('day', reverse('schedulingcalendar:get_schedules_range'),
+              {'department': department, 'range': 'day', 'date': date})]
+
+    rows = []
+    for name, url, params in loads:
+        response = client.get(url, params) # Creates the month's cost snapshot
+        row = OrderedDict([('range', name), ('payload_kb', len(response.content) / 1024.0)])
+        row.update(summarize([time_request(client.get, url, params) for i in range(REPEATS)]))
+        rows.append(row)
+    return rows
@@ -0,0 +1,112 @@
+"""
+Benchmarks of calendar reads running their queries concurrently.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+from .fixtures import create_tenant
+from .harness import benchmark, run_threads, summarize, time_request
+
+
+YEAR = 2018
+MONTH = 7
+READERS = [1, 4, 8, 16]
+DURATION = 5 # Seconds each phase runs for
+QUERY_WORKERS = 4
+MONTH_LOADS = 20
+
+
+
+@benchmark('concurrent_reads')
+def concurrent_reads():
+    """Employee live calendar throughput with its queries run one after
+    another and concurrently (See run_concurrently), for growing numbers of
+    employees reading at the same time."""
+
+    tenant = create_tenant(YEAR, MONTH)
+    query_workers = settings.QUERY_WORKERS
+    rows = []
+    try:
+        for readers in READERS:
+            for mode, workers in [('sequential', 0), ('concurrent', QUERY_WORKERS)]:
+                settings.QUERY_WORKERS = workers
+                rows.append(_run_phase(mode, readers, tenant))
+    finally:
+        settings.QUERY_WORKERS = query_workers
+    return rows
+
+
+def _run_phase(mode, readers, tenant):
+    """Run readers of the employee live calendar for DURATION seconds."""
+    latencies = []
+    errors = []
+    department = tenant['departments'][0]
+    url = reverse('schedulingcalendar:employee_get_live_schedules')
+    params = {'department': department.id, 'year': YEAR, 'month': MONTH}
+    end = time.time() + DURATION
+
+    def reader(client):
+        while time.time() < end:
+            try:
+                latencies.append(time_request(client.get, url, params))
+            except Exception as e:
+                errors.append(e)
+
+    # Log in up front, so only the requests themselves run concurrently
+    targets = []
+    for employee_user in tenant['employee_users'][:readers]:
+        client = Client()
+        client.force_login(employee_user)
+        targets.append(lambda client=client: reader(client))
+
+    start = time.time()
+    run_threads(targets)
+    elapsed = time.time() - start
+
+    row = OrderedDict([('mode', mode), ('readers', readers),
+                       ('reads_per_s', len(latencies) / elapsed)])
+    summary = summarize(latencies)
+    for key in ('p50_ms', 'p95_ms', 'max_ms'):
+        row[key] = summary.get(key)
+    row['errors'] = len(errors)
+    return row
+
+
+@benchmark('month_load')
+def month_load():
+    """Time for a manager to load a month of the calendar with its queries
+    run one after another and concurrently (See get_schedules), and the
+    database connections opened per load. Concurrent queries only pay off if
+    worker threads keep their connections, so on PostgreSQL run it with the
+    production profile or SCHEDULER_DB_POOL_SIZE set as well as without."""
+
+    tenant = create_tenant(YEAR, MONTH)
+    client = Client()
+    client.force_login(tenant['manager'])
+    url = reverse('schedulingcalendar:get_schedules')
+    params = {'department': tenant['departments'][0].id, 'year': YEAR, 'month': MONTH}
+    query_workers = settings.QUERY_WORKERS
+    connections = []
+    def count_connection(sender, **kwargs):
+        connections.append(sender)
+    connection_created.connect(count_connection)
+    rows = []
+    try:
+        for mode, workers in [('sequential', 0), ('concurrent', QUERY_WORKERS)]:
+            settings.QUERY_WORKERS = workers
+            time_request(client.get, url, params) # Warm up caches and connections
+            del connections[:]
+            row = OrderedDict([('mode', mode)])
+            row.update(summarize([time_request(client.get, url, params)
+                                  for i in range(MONTH_LOADS)]))
+            row['connections_per_load'] = float(len(connections)) / MONTH_LOADS
+            rows.append(row)
+    finally:
+        settings.QUERY_WORKERS = query_workers
+        connection_created.disconnect(count_connection)
+    return rows
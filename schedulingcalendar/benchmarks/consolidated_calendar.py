@@ -0,0 +1,43 @@
+"""
+Benchmark of loading the calendars of every department of a store.
+"""
+
+from collections import OrderedDict
+from django.test import Client
+from django.urls import reverse
+from .fixtures import create_tenant
+from .harness import benchmark, summarize, time_request
+
+
+YEAR = 2018
+MONTH = 7
+NUM_DEPARTMENTS = 8
+REPEATS = 10
+
+
+
+@benchmark('consolidated_calendar')
+def consolidated_calendar():
+    """Time to load a month of every department's calendar, one request per
+    department versus one consolidated request."""
+
+    tenant = create_tenant(YEAR, MONTH, num_departments=NUM_DEPARTMENTS, num_employees=120)
+    client = Client()
+    client.force_login(tenant['manager'])
+    params = {'year': YEAR, 'month': MONTH}
+
+    def per_department():
+        url = reverse('schedulingcalendar:get_schedules')
+        for department in tenant['departments']:
+            client.get(url, dict(params, department=department.id))
+
+    def consolidated():
+        client.get(reverse('schedulingcalendar:get_consolidated_schedules'), params)
+
+    per_department() # Create the cost snapshot
+    rows = []
+    for name, func in [('per department', per_department), ('consolidated', consolidated)]:
+        row = OrderedDict([('method', name)])
+        row.update(summarize([time_request(func) for i in range(REPEATS)]))
+        rows.append(row)
+    return rows
@@ -0,0 +1,59 @@
+"""
+Benchmark of projecting costs over a range of months.
+"""
+
+from collections import OrderedDict
+from datetime import date
+from ..business_logic import (all_calendar_hours_and_costs, get_avg_monthly_revenue,
+                              get_cost_rollups, get_start_end_of_calendar)
+from ..models import Schedule, Department, Employee, BusinessData
+from .fixtures import create_tenant, create_month_of_schedules
+from .harness import benchmark, summarize, time_call
+
+
+YEAR = 2018
+REPEATS = 5
+
+
+
+@benchmark('cost_rollup')
+def cost_rollup():
+    """Hours and costs of a whole year, computed month by month like the
+    calendar does versus served from cached month rollups."""
+
+    tenant = create_tenant(YEAR, 1)
+    manager = tenant['manager']
+    for month in range(2, 13):
+        create_month_of_schedules(manager, tenant['departments'], tenant['members'],
+                                  YEAR, month)
+
+    def month_by_month():
+        departments = Department.objects.filter(user=manager).order_by('name')
+        employees = Employee.objects.filter(user=manager)
+        business_data = BusinessData.objects.get(user=manager)
+        for month in range(1, 13):
+            lower_bound_dt, upper_bound_dt = get_start_end_of_calendar(YEAR, month)
+            schedules = (Schedule.objects.select_related('employee')
+                                         .filter(user=manager,
+                                                 start_datetime__gte=lower_bound_dt,
+                                                 end_datetime__lte=upper_bound_dt)
+                                         .order_by('start_datetime', 'end_datetime'))
+            all_calendar_hours_and_costs(manager, departments, schedules, employees,
+                                         month, YEAR, business_data)
+            get_avg_monthly_revenue(manager, month)
+
+    def rollups():
+        get_cost_rollups(manager, date(YEAR, 1, 1), date(YEAR, 12, 1))
+
+    def rollups_one_dirty_month():
+        Schedule.objects.filter(user=manager, start_datetime__month=6).first().save()
+        get_cost_rollups(manager, date(YEAR, 1, 1), date(YEAR, 12, 1))
+
+    rows = []
+    rollups() # Fill the rollups
+    for name, func in [('month by month', month_by_month), ('cached rollups', rollups),
+                       ('one dirty month', rollups_one_dirty_month)]:
+        row = OrderedDict([('method', name)])
+        row.update(summarize([time_call(func) for i in range(REPEATS)]))
+        rows.append(row)
+    return rows
@@ -0,0 +1,60 @@
+"""
+Benchmark of calculating a department's headcount per time slot of a month.
+"""
+
+from collections import OrderedDict
+from datetime import date, time
+from ..business_logic import (get_department_coverage, calculate_coverage,
+                              get_month_day_starts, compile_requirements,
+                              get_understaffed_windows, get_interval_seconds)
+from ..models import Schedule
+from .fixtures import create_tenant
+from .harness import BenchmarkFailed, benchmark, summarize, time_call
+
+
+YEAR = 2018
+MONTH = 7
+SHIFTS_PER_DAY = 162 # About 5,000 schedules in the month
+REPEATS = 10
+TARGET_MS = 50 # Mean for about 5,000 schedules, including the query
+
+
+
+@benchmark('coverage')
+def coverage():
+    """Headcount of a department with a month of schedules, in 15 minute
+    slots against a staffing target, with and without fetching schedules.
+
+    Each row states whether its mean is within TARGET_MS, the run_benchmarks
+    command fails if the row including the query is not.
+    """
+
+    tenant = create_tenant(YEAR, MONTH, num_departments=1, shifts_per_day=SHIFTS_PER_DAY)
+    manager = tenant['manager']
+    department = tenant['departments'][0]
+    requirements = [{'weekdays': range(5), 'start': time(11), 'end': time(14), 'headcount': 3}]
+    num_schedules = Schedule.objects.filter(user=manager).count()
+
+    month_year = date(YEAR, MONTH, 1)
+    intervals = get_interval_seconds(Schedule.objects.filter(user=manager, department=department))
+
+    def sweep():
+        days, day_starts, dst_changes = get_month_day_starts(month_year)
+        headcount = calculate_coverage(intervals, day_starts, 15, dst_changes)
+        target = compile_requirements(requirements, days, 15)
+        get_understaffed_windows(headcount, target, days, 15)
+
+    rows = []
+    for name, func, args in (('with query', get_department_coverage,
+                              (manager, department.id, month_year, 15, requirements)),
+                             ('sweep only', sweep, ())):
+        latencies = [time_call(func, *args) for i in range(REPEATS)]
+        row = OrderedDict([('coverage', name), ('schedules', num_schedules)])
+        row.update(summarize(latencies))
+        row['target_ms'] = TARGET_MS
+        row['within_target'] = row['mean_ms'] <= TARGET_MS
+        rows.append(row)
+    if not rows[0]['within_target']:
+        raise BenchmarkFailed('Coverage of %d schedules took %.2f ms, target is %d ms'
+                              % (num_schedules, rows[0]['mean_ms'], TARGET_MS), rows)
+    return rows
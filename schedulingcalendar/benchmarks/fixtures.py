@@ -0,0 +1,119 @@
+"""
+Synthetic tenant data for benchmarks, sized like a busy retail store.
+"""
+
+import random
+from datetime import datetime, date, time, timedelta
+from django.contrib.auth.models import User, Group
+from django.utils import timezone
+from ..models import (Employee, Department, DepartmentMembership, Schedule,
+                      BusinessData, LiveCalendar, Vacation, Absence)
+from ..business_logic import create_live_schedules, create_live_cal_timestamp
+
+
+PASSWORD = 'benchmark-password'
+SHIFTS = [(time(7, 0), time(15, 0)), (time(9, 0), time(17, 30)),
+          (time(11, 0), time(19, 0)), (time(14, 0), time(22, 0))]
+
+
+
+def create_tenant(year, month, num_departments=3, num_employees=45,
+                  shifts_per_day=12, seed=0):
+    """Create a manager user with departments, employees and a month of schedules.
+
+    Employees are evenly split across departments, each employee has a user
+    account so that employee views can be benchmarked. Every day of the month
+    gets shifts_per_day schedules per department assigned to random members
+    of the department, and every department's calendar is published live.
+
+    Args:
+        year: Integer year of month to create schedules for.
+        month: Integer month to create schedules for.
+        num_departments: Number of departments to create.
+        num_employees: Number of employees to create.
+        shifts_per_day: Number of schedules per department per day.
+        seed: Seed of random number generator, for repeatable data.
+    Returns:
+        Dict containing the manager user, departments, employees, the
+        employee users and the live calendars.
+    """
+
+    rand = random.Random(seed)
+    manager_group, created = Group.objects.get_or_create(name="Managers")
+    manager = User.objects.create_user('bench-manager', password=PASSWORD)
+    manager.groups.add(manager_group)
+    BusinessData.objects.create(user=manager, last_cal_date_loaded=date(year, month, 1))
+
+    departments = [Department.objects.create(user=manager, name='Department %s' % i)
+                   for i in range(num_departments)]
+    employees = []
+    employee_users = []
+    members = dict((dep.id, []) for dep in departments)
+    for i in range(num_employees):
+        employee_user = User.objects.create_user('bench-employee-%s' % i, password=PASSWORD)
+        employee = Employee.objects.create(user=manager, employee_user=employee_user,
+                                           first_name='Employee', last_name=str(i),
+                                           wage=rand.choice([10, 12.5, 15, 20]),
+                                           desired_hours=rand.choice([20, 30, 40]))
+        department = departments[i % num_departments]
+        DepartmentMembership.objects.create(user=manager, employee=employee,
+                                            department=department, priority=0)
+        members[department.id].append(employee)
+        employees.append(employee)
+        employee_users.append(employee_user)
+
+    # Schedules for every day of the month, plus a few vacations and absences
+    tz = timezone.get_default_timezone()
+    create_month_of_schedules(manager, departments, members, year, month,
+                              shifts_per_day, rand)
+    for employee in rand.sample(employees, num_employees // 5):
+        start = tz.localize(datetime(year, month, rand.randint(1, 25)))
+        Vacation.objects.create(user=manager, employee=employee, start_datetime=start,
+                                end_datetime=start + timedelta(days=3))
+        Absence.objects.create(user=manager, employee=employee,
+                               start_datetime=start + timedelta(days=4, hours=8),
+                               end_datetime=start + timedelta(days=4, hours=17))
+
+    live_calendars = []
+    for department in departments:
+        live_calendar = LiveCalendar.objects.create(user=manager, date=date(year, month, 1),
+                                                    department=department,
+                                                    all_employee_view=True)
+        create_live_cal_timestamp(manager, live_calendar)
+        create_live_schedules(manager, live_calendar)
+        live_calendars.append(live_calendar)
+
+    return {'manager': manager, 'departments': departments, 'employees': employees,
+            'employee_users': employee_users, 'live_calendars': live_calendars,
+            'members': members}
+
+
+def create_month_of_schedules(manager, departments, members, year, month,
+                              shifts_per_day=12, rand=None):
+    """Create shifts_per_day schedules per department for every day of month.
+
+    Args:
+        manager: Manager user owning the schedules.
+        departments: List of departments to create schedules for.
+        members: Dict mapping department ids to lists of member employees,
+            schedules are assigned to random members.
+        year: Integer year of month to create schedules for.
+        month: Integer month to create schedules for.
+        shifts_per_day: Number of schedules per department per day.
+        rand: Random number generator, for repeatable data.
+    """
+
+    rand = rand or random.Random(0)
+    tz = timezone.get_default_timezone()
+    schedules = []
+    day = date(year, month, 1)
+    while day.month == month:
+        for department in departments:
+            for j in range(shifts_per_day):
+                start, end = SHIFTS[j % len(SHIFTS)]
+                schedules.append(Schedule(user=manager, department=department,
+                                          employee=rand.choice(members[department.id]),
+                                          start_datetime=tz.localize(datetime.combine(day, start)),
+                                          end_datetime=tz.localize(datetime.combine(day, end))))
+        day += timedelta(days=1)
+    Schedule.objects.bulk_create(schedules)
@@ -0,0 +1,161 @@
+"""
+Infrastructure shared by the benchmarks of the run_benchmarks command.
+
+Benchmarks never touch the configured database. They run against a throwaway
+copy created the same way as the test database, except that SQLite databases
+are kept in a file instead of memory so that concurrent benchmarks see real
+locking behaviour.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection, connections, close_old_connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+BENCHMARKS = OrderedDict()
+
+
+class BenchmarkFailed(Exception):
+    """Raised by a benchmark whose results miss its target, with the result
+    rows so they are reported anyway."""
+
+    def __init__(self, message, rows):
+        super(BenchmarkFailed, self).__init__(message)
+        self.rows = rows
+
+
+
+def benchmark(name):
+    """Register decorated function as a benchmark run by run_benchmarks.
+
+    A benchmark function takes no arguments and returns a list of result
+    rows, each row is an OrderedDict mapping column names to values. Benchmarks
+    with a target raise BenchmarkFailed if they miss it.
+    """
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def benchmark_database():
+    """Create and afterwards destroy a database for benchmarks to run against."""
+    setup_test_environment()
+    debug = settings.DEBUG
+    settings.DEBUG = False # No query logging or debug toolbar overhead
+
+    temp_dir = None
+    old_name = connection.settings_dict['NAME']
+    if connection.vendor == 'sqlite':
+        temp_dir = tempfile.mkdtemp(prefix='scheduler-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(temp_dir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        settings.DEBUG = debug
+        teardown_test_environment()
+
+
+def close_thread_connections():
+    """Close database connections opened by the current thread."""
+    for conn in connections.all():
+        conn.close()
+
+
+def time_call(func, *args, **kwargs):
+    """Call func with arguments and return how long it took in milliseconds."""
+    start = time.time()
+    func(*args, **kwargs)
+    return (time.time() - start) * 1000
+
+
+def time_request(func, *args, **kwargs):
+    """Make a test client request and return how long it took in milliseconds.
+
+    Django's test client skips the connection housekeeping done at the start
+    and end of a real request, which is repeated here so that CONN_MAX_AGE
+    has the same effect on the timings as it has when serving requests.
+    """
+    start = time.time()
+    close_old_connections()
+    func(*args, **kwargs)
+    close_old_connections()
+    return (time.time() - start) * 1000
+
+
+def summarize(latencies):
+    """Return count, mean and percentiles of a list of latencies in ms."""
+    latencies = sorted(latencies)
+    count = len(latencies)
+    if not count:
+        return OrderedDict([('count', 0)])
+
+    def percentile(p):
+        return latencies[min(count - 1, int(p * count))]
+
+    return OrderedDict([('count', count),
+                        ('mean_ms', sum(latencies) / count),
+                        ('p50_ms', percentile(0.50)),
+                        ('p95_ms', percentile(0.95)),
+                        ('max_ms', latencies[-1])])
+
+
+def run_threads(targets):
+    """Run each callable on its own thread and wait for all to finish.
+
+    Each thread closes its database connections when its callable returns,
+    otherwise connections opened by the threads leak until garbage collection.
+    """
+    errors = []
+
+    def run(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_thread_connections()
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def format_results(name, rows):
+    """Render result rows of a benchmark as a plain text table."""
+    lines = [name, '=' * len(name)]
+    if not rows:
+        return '\n'.join(lines + ['(no results)', ''])
+
+    columns = list(rows[0].keys())
+    cells = [[_format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *[len(row[i]) for row in cells])
+              for i, column in enumerate(columns)]
+    lines.append('  '.join(column.ljust(widths[i]) for i, column in enumerate(columns)).rstrip())
+    lines.append('  '.join('-' * width for width in widths))
+    for row in cells:
+        lines.append('  '.join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip())
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return '%.2f' % value
+    return '%s' % (value,)
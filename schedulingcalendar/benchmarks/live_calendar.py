@@ -0,0 +1,106 @@
+"""
+Benchmark of employees reading live calendars while a manager publishes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.test import Client
+from django.urls import reverse
+from scheduler.db_backends.sqlite3.base import (DatabaseWrapper as TunedSQLiteWrapper,
+                                                DEFAULT_PRAGMAS)
+from .fixtures import create_tenant
+from .harness import benchmark, run_threads, summarize, time_call
+
+
+YEAR = 2018
+MONTH = 7
+READERS = 8
+DURATION = 10 # Seconds each phase runs for
+
+# SQLite defaults, what an untuned deployment runs with
+ROLLBACK_JOURNAL_PRAGMAS = [('busy_timeout', 5000), ('journal_mode', 'DELETE'),
+                            ('synchronous', 'FULL')]
+
+
+
+@benchmark('live_calendar_concurrency')
+def live_calendar_concurrency():
+    """Employee live calendar throughput while push_changes_live runs nonstop.
+
+    On the tuned SQLite backend the benchmark is run twice, once with SQLite's
+    default rollback journal and once with the PRAGMAs of the production
+    profile. Other backends are benchmarked as configured.
+    """
+
+    tenant = create_tenant(YEAR, MONTH)
+    if isinstance(connections[DEFAULT_DB_ALIAS], TunedSQLiteWrapper):
+        phases = [('rollback journal', ROLLBACK_JOURNAL_PRAGMAS),
+                  ('wal (production)', DEFAULT_PRAGMAS)]
+    else:
+        phases = [(connection.vendor, None)]
+
+    rows = []
+    for phase, pragmas in phases:
+        if pragmas is not None:
+            # New connections, opened by each thread, pick up the PRAGMAs
+            connection.close()
+            connection.settings_dict['PRAGMAS'] = pragmas
+        rows.append(_run_phase(phase, tenant))
+    connection.settings_dict.pop('PRAGMAS', None)
+    return rows
+
+
+def _run_phase(phase, tenant):
+    """Run readers and a publishing manager concurrently for DURATION seconds."""
+    stop = threading.Event()
+    read_latencies = []
+    publish_latencies = []
+    errors = []
+    department = tenant['departments'][0]
+    read_url = reverse('schedulingcalendar:employee_get_live_schedules')
+    publish_url = reverse('schedulingcalendar:push_changes_live')
+
+    def reader(client):
+        params = {'department': department.id, 'year': YEAR, 'month': MONTH}
+        while not stop.is_set():
+            try:
+                read_latencies.append(time_call(client.get, read_url, params))
+            except Exception as e:
+                errors.append(e)
+
+    def publisher(client):
+        data = {'date': '%s-%02d-01' % (YEAR, MONTH), 'department': department.id,
+                'all_employee_view': True}
+        end = time.time() + DURATION
+        while time.time() < end:
+            try:
+                publish_latencies.append(time_call(client.post, publish_url, data))
+            except Exception as e:
+                errors.append(e)
+        stop.set()
+
+    # Log in up front, so only the requests themselves run concurrently
+    targets = []
+    for employee_user in tenant['employee_users'][:READERS]:
+        client = Client()
+        client.force_login(employee_user)
+        targets.append(lambda client=client: reader(client))
+    client = Client()
+    client.force_login(tenant['manager'])
+    targets.append(lambda client=client: publisher(client))
+
+    start = time.time()
+    run_threads(targets)
+    elapsed = time.time() - start
+
+    reads = summarize(read_latencies)
+    row = OrderedDict([('phase', phase), ('readers', READERS),
+                       ('reads_per_s', len(read_latencies) / elapsed),
+                       ('read_p50_ms', reads.get('p50_ms')),
+                       ('read_p95_ms', reads.get('p95_ms')),
+                       ('read_max_ms', reads.get('max_ms')),
+                       ('publishes', len(publish_latencies)),
+                       ('errors', len(errors))])
+    return row
@@ -0,0 +1,59 @@
+"""
+Benchmark of the conflict preview of the pending approvals page.
+"""
+
+import random
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ..business_logic import filter_overlapping, get_application_conflicts
+from ..models import Schedule, VacationApplication
+from .fixtures import create_tenant
+from .harness import benchmark, summarize, time_request
+
+
+YEAR = 2018
+MONTH = 7
+NUM_APPLICATIONS = [10, 25, 100]
+REPEATS = 10
+
+
+
+@benchmark('pending_approvals')
+def pending_approvals():
+    """Time to find the schedules pending vacation applications conflict
+    with, one query per application versus one batched query (See
+    get_application_conflicts)."""
+
+    tenant = create_tenant(YEAR, MONTH)
+    manager = tenant['manager']
+    rand = random.Random(0)
+    tz = timezone.get_default_timezone()
+    applications = []
+    for i in range(max(NUM_APPLICATIONS)):
+        start = tz.localize(datetime(YEAR, MONTH, rand.randint(1, 25)))
+        applications.append(VacationApplication.objects.create(
+            user=manager, employee=rand.choice(tenant['employees']),
+            start_datetime=start, end_datetime=start + timedelta(days=3)))
+
+    def per_application(apps):
+        for app in apps:
+            list(filter_overlapping(Schedule.objects.filter(user=manager, employee=app.employee_id),
+                                    app.start_datetime, app.end_datetime))
+
+    def batched(apps):
+        get_application_conflicts(manager, [('vacation', app) for app in apps])
+
+    rows = []
+    for num_applications in NUM_APPLICATIONS:
+        apps = applications[:num_applications]
+        for name, func in [('per application', per_application), ('batched', batched)]:
+            with CaptureQueriesContext(connection) as queries:
+                func(apps)
+            row = OrderedDict([('applications', num_applications), ('method', name),
+                               ('queries', len(queries))])
+            row.update(summarize([time_request(func, apps) for i in range(REPEATS)]))
+            rows.append(row)
+    return rows
@@ -2,4 +2,16 @@ from availability_logic import *
 from time_logic import *
 from cost_projection_logic import *
 from notification_logic import *
-from schedule_text_rendering import *
\ No newline at end of file
+from schedule_text_rendering import *
+from overlap_logic import *
+from cache_logic import *
+from day_availability_logic import *
+from cost_rollup_logic import *
+from cost_snapshot_logic import *
+from forecast_logic import *
+from coverage_logic import *
+from fatigue_logic import *
+from event_logic import *
+from concurrency_logic import *
+from pagination_logic import *
+from approval_logic import *
\ No newline at end of file
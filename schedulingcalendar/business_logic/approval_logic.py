@@ -0,0 +1,278 @@
+from collections import defaultdict
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from .availability_logic import get_overlapping_repeat_times
+from .cache_logic import bump_data_version
+from .cost_projection_logic import single_employee_costs
+from .time_logic import get_workweeks_of_ranges
+from .overlap_logic import filter_overlapping_any
+from ..models import (BusinessData, Schedule, Vacation, Absence, RepeatUnavailability,
+                      VacationApplication, AbsenceApplication,
+                      RepeatUnavailabilityApplication)
+
+
+PENDING_COUNTS_KEY = 'pending_application_counts:%s'
+# Seconds counts stay cached, bounding how stale they are in processes that
+# do not share a cache backend with the process that invalidated them
+PENDING_COUNTS_TIMEOUT = 5 * 60
+# Kinds of applications employees submit for approval
+APPLICATION_MODELS = (('vacation', VacationApplication),
+                      ('absence', AbsenceApplication),
+                      ('repeat_unav', RepeatUnavailabilityApplication))
+# Availability model created by approving each kind of application and the
+# fields copied from the application
+APPROVAL_MODELS = {'vacation': (Vacation, ('start_datetime', 'end_datetime')),
+                   'absence': (Absence, ('start_datetime', 'end_datetime')),
+                   'repeat_unav': (RepeatUnavailability, ('start_time', 'end_time', 'weekday'))}
+
+
+
+def get_pending_application_counts(user_id):
+    """Return counts of a manager's applications waiting for a decision.
+
+    The navigation bar of every page asks for the counts, so they are cached
+    until an application is created, decided or deleted (See signals.py), or
+    the business data of the manager is saved. All kinds are counted with
+    one query.
+
+    Args:
+        user_id: Integer id of the managing user.
+    Returns:
+        Dict with the counts of pending applications by kind, like
+        'vacation', and whether employees of the manager have the right to
+        submit applications, by 'right_to_submit_availability'.
+    """
+
+    key = PENDING_COUNTS_KEY % user_id
+    counts = cache.get(key)
+    if counts is None:
+        counts = _count_pending_applications(user_id)
+        counts['right_to_submit_availability'] = (BusinessData.objects.filter(user=user_id)
+                                                  .values_list('right_to_submit_availability',
+                                                               flat=True)
+                                                  .first()) or False
+        cache.set(key, counts, PENDING_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_pending_application_counts(user_id):
+    """Remove the cached counts of pending applications of a manager."""
+    cache.delete(PENDING_COUNTS_KEY % user_id)
+
+
+def _count_pending_applications(user_id):
+    """Return dict of counts of pending applications by kind, counted with
+    one UNION ALL query over the tables of all kinds."""
+    selects = ["SELECT %%s, COUNT(*) FROM %s WHERE user_id = %%s AND approved IS NULL"
+               % connection.ops.quote_name(model._meta.db_table)
+               for kind, model in APPLICATION_MODELS]
+    params = []
+    for kind, model in APPLICATION_MODELS:
+        params.extend([kind, user_id])
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(selects), params)
+        return dict(cursor.fetchall())
+
+
+def decide_applications(user, decisions):
+    """Approve or disapprove many pending applications in one transaction.
+
+    Applications of a kind are marked with one update per decision and the
+    vacations, absences and repeating unavailabilities of the approved ones
+    are created with one bulk_create per kind. Neither sends signals, so the
+    caches they would have invalidated are invalidated here once.
+
+    Args:
+        user: Django authenticated manager user.
+        decisions: List of tuples of the kind of application, like
+            'vacation', its integer id and the boolean decision.
+    Returns:
+        A list of (kind, application, approved) tuples in the order of
+        decisions. Applications are fetched with their employees.
+    Raises:
+        ValueError if an application is not pending or is not the user's,
+        in which case no decisions are saved.
+    """
+
+    now = timezone.now()
+    pks_by_kind = defaultdict(list)
+    for kind, pk, approved in decisions:
+        pks_by_kind[kind].append(pk)
+
+    with transaction.atomic():
+        applications = {}
+        for kind, model in APPLICATION_MODELS:
+            if not pks_by_kind[kind]:
+                continue
+            pending = (model.objects.select_related('employee').select_for_update()
+                                    .filter(user=user, approved=None, pk__in=pks_by_kind[kind]))
+            for application in pending:
+                applications[(kind, application.id)] = application
+        for kind, pk, approved in decisions:
+            if (kind, pk) not in applications:
+                raise ValueError('Application %s %d is not pending' % (kind, pk))
+
+        decided = []
+        approved_by_kind = defaultdict(list)
+        for kind, pk, approved in decisions:
+            application = applications[(kind, pk)]
+            application.approved = approved
+            application.datetime_of_approval = now
+            decided.append((kind, application, approved))
+            if approved:
+                approved_by_kind[kind].append(application)
+
+        for kind, model in APPLICATION_MODELS:
+            for approved in (True, False):
+                pks = [a.id for k, a, a_approved in decided if k == kind and a_approved == approved]
+                if pks:
+                    model.objects.filter(pk__in=pks).update(approved=approved,
+                                                            datetime_of_approval=now)
+        for kind, approved_apps in approved_by_kind.items():
+            model, fields = APPROVAL_MODELS[kind]
+            model.objects.bulk_create([model(user=user, employee=a.employee,
+                                             **dict((f, getattr(a, f)) for f in fields))
+                                       for a in approved_apps])
+
+    if approved_by_kind:
+        bump_data_version(user.id)
+    invalidate_pending_application_counts(user.id)
+    return decided
+
+
+def get_application_conflicts(user, applications, now=None):
+    """Return assigned schedules each application would make unavailable.
+
+    Schedules overlapping vacations and absences are found with one query
+    for all applications (See filter_overlapping_any). Repeating
+    unavailabilities apply from now on, so upcoming schedules of their
+    employees are fetched with a second query and compared on their weekday
+    (See get_overlapping_repeat_times).
+
+    Args:
+        user: Django authenticated manager user.
+        applications: List of (kind, application) tuples.
+        now: Timezone aware datetime repeating unavailabilities start at,
+            the current time if None.
+    Returns:
+        Dict of (kind, application id) tuples to lists of Schedules with
+        employees, ordered by start. Applications without conflicts are
+        missing.
+    """
+
+    if now is None:
+        now = timezone.now()
+    schedules = Schedule.objects.filter(user=user, employee__isnull=False)
+    ranges = [(a.employee_id, a.start_datetime, a.end_datetime)
+              for kind, a in applications if kind != 'repeat_unav']
+    repeat_employees = set(a.employee_id for kind, a in applications if kind == 'repeat_unav')
+
+    schedules_by_employee = defaultdict(list)
+    if ranges:
+        for schedule in filter_overlapping_any(schedules, ranges).order_by('start_datetime'):
+            schedules_by_employee[schedule.employee_id].append(schedule)
+    repeat_schedules_by_employee = defaultdict(list)
+    if repeat_employees:
+        upcoming = (schedules.filter(employee__in=repeat_employees, end_datetime__gt=now)
+                             .order_by('start_datetime'))
+        for schedule in upcoming:
+            repeat_schedules_by_employee[schedule.employee_id].append(schedule)
+
+    conflicts = {}
+    for kind, application in applications:
+        if kind == 'repeat_unav':
+            overlapping = [s for s in repeat_schedules_by_employee[application.employee_id]
+                           if s.start_datetime.weekday() == application.weekday and
+                           get_overlapping_repeat_times([application], s)]
+        else:
+            overlapping = [s for s in schedules_by_employee[application.employee_id]
+                           if s.start_datetime < application.end_datetime and
+                           s.end_datetime > application.start_datetime]
+        if overlapping:
+            conflicts[(kind, application.id)] = overlapping
+    return conflicts
+
+
+def get_application_impacts(user, applications, departments, business_data):
+    """Return schedules each application conflicts with and the cost of
+    unassigning them.
+
+    Conflicts of all applications are found at once (See
+    get_application_conflicts), then the schedules of every workweek of their
+    employees that a conflict overlaps are fetched with one more query. The
+    cost change of an application is the change of its employee's workweek
+    costs with its conflicting schedules unassigned, summed over every
+    workweek they overlap, which can be less than their own cost if they
+    would have been paid overtime.
+
+    Args:
+        user: Django authenticated manager user.
+        applications: List of (kind, application) tuples. Applications must
+            be fetched with their employees.
+        departments: List of all departments of the user.
+        business_data: BusinessData model object of the user.
+    Returns:
+        Dict of (kind, application id) tuples to dicts of the conflicting
+        'schedules', and the change of 'hours' and 'cost' of unassigning
+        them. Applications without conflicts are missing.
+    """
+
+    conflicts = get_application_conflicts(user, applications)
+    if not conflicts:
+        return {}
+
+    # Workweeks overlapped by the conflicts of each application, and by
+    # employee the workweeks of all their applications by start
+    application_workweeks = {}
+    employee_workweeks = defaultdict(dict)
+    for kind, application in applications:
+        schedules = conflicts.get((kind, application.id))
+        if not schedules:
+            continue
+        workweeks = get_workweeks_of_ranges([(s.start_datetime, s.end_datetime)
+                                             for s in schedules], business_data)
+        application_workweeks[(kind, application.id)] = workweeks
+        for workweek in workweeks:
+            employee_workweeks[application.employee_id][workweek['start']] = workweek
+    ranges = [(employee_id, workweek['start'], workweek['end'])
+              for employee_id, workweeks in employee_workweeks.items()
+              for workweek in workweeks.values()]
+    workweek_schedules = defaultdict(list)
+    all_schedules = (filter_overlapping_any(Schedule.objects.select_related('department')
+                                                            .filter(user=user), ranges)
+                     .order_by('start_datetime', 'end_datetime'))
+    for schedule in all_schedules:
+        for start, workweek in employee_workweeks[schedule.employee_id].items():
+            if schedule.start_datetime < workweek['end'] and schedule.end_datetime > start:
+                workweek_schedules[(schedule.employee_id, start)].append(schedule)
+
+    impacts = {}
+    for kind, application in applications:
+        schedules = conflicts.get((kind, application.id))
+        if not schedules:
+            continue
+        conflict_ids = set(s.id for s in schedules)
+        hours = cost = 0
+        for workweek in application_workweeks[(kind, application.id)]:
+            key = (application.employee_id, workweek['start'])
+            old_total = _get_workweek_total(workweek, application.employee,
+                                            workweek_schedules[key], departments, business_data)
+            new_total = _get_workweek_total(workweek, application.employee,
+                                            [s for s in workweek_schedules[key]
+                                             if s.id not in conflict_ids],
+                                            departments, business_data)
+            hours += (new_total['hours'] + new_total['overtime_hours'] -
+                      old_total['hours'] - old_total['overtime_hours'])
+            cost += new_total['cost'] - old_total['cost']
+        impacts[(kind, application.id)] = {'schedules': schedules, 'hours': hours, 'cost': cost}
+    return impacts
+
+
+def _get_workweek_total(workweek, employee, schedules, departments, business_data):
+    """Return dict of the hours, overtime hours and cost of an employee's
+    schedules in a workweek, over all departments."""
+    start = workweek['start']
+    hours_and_costs = single_employee_costs(start, workweek['end'], employee, schedules,
+                                            departments, business_data, start.month, start.year)
+    return hours_and_costs['workweek_hours_costs'][0]['hours_cost']['total']
@@ -8,6 +8,8 @@ from django.contrib.auth.models import User
 from .time_logic import (check_for_overtime, calculate_weekly_hours_with_sch, 
                          calculate_weekly_hours, time_dur_in_hours, 
                          get_start_end_of_calendar)
+from .overlap_logic import filter_overlapping
+from .fatigue_logic import get_fatigue_window, get_fatigue_conflicts
 from ..models import (Schedule, Department, DepartmentMembership, MonthlyRevenue,
                      Employee, Vacation, RepeatUnavailability, BusinessData,
                      Absence, DesiredTime, LiveSchedule, LiveCalendar,
@@ -57,10 +59,11 @@ def get_eligibles(user, schedule):
     
     eligables = []
     
+    business_data = BusinessData.objects.get(user=user)
     dep_membership = DepartmentMembership.objects.filter(user=user, department=schedule.department)
     for dep_mem in dep_membership:
         employee = dep_mem.employee
-        availability = get_availability(user, employee, schedule)
+        availability = get_availability(user, employee, schedule, business_data)
         # Get the multiple-criterion tuple for sorting an employee
         availability_score = _calculate_availability_score(availability)
         dep_priority_score = _calculate_dep_priority_score(dep_mem)
@@ -82,7 +85,7 @@ def get_eligibles(user, schedule):
 def _calculate_availability_score(availability):
     """Calculate availability of employee given conflicts.
         
-    S = 16, V = 8, A = 4, U = 2, O = 1
+    S = 64, V = 32, A = 16, U = 8, R = 4, C = 2, O = 1
         
     The score for each availability tier is greater than the sum of all
     lesser conflicts combined. This ensures that a combination of lesser
@@ -100,10 +103,12 @@ def _calculate_availability_score(availability):
     
     score = 0
     
-    if availability['(S)']: score += 16
-    if availability['(V)']: score += 8
-    if availability['(A)']: score += 4
-    if availability['(U)']: score += 2
+    if availability['(S)']: score += 64
+    if availability['(V)']: score += 32
+    if availability['(A)']: score += 16
+    if availability['(U)']: score += 8
+    if availability['(R)']: score += 4
+    if availability['(C)']: score += 2
     if availability['(O)']: score += 1
     
     return score
@@ -204,7 +209,7 @@ def _calculate_desired_hours_score(hours_scheduled, employee):
     return hours_scheduled - employee.desired_hours
     
     
-def get_availability(user, employee, schedule):
+def get_availability(user, employee, schedule, business_data=None):
     """Create the availability dictionary for employee given a schedule.
     
     Availability is a dictionary containing information about conflicts an
@@ -234,6 +239,11 @@ def get_availability(user, employee, schedule):
              with the schedule employee may be assigned to.
       '(U)': A collection of repeating unavailability model objects that have 
              any time overlap with the schedule employee may be assigned to. 
+      '(R)': A collection of schedule model objects the employee would not
+             have the business' minimum rest between (See
+             get_fatigue_conflicts).
+      '(C)': The number of consecutive days the employee would work if that
+             is more than the business' maximum, otherwise 0.
       'Desired Times': A collection of desired time model objects that have 
              any time overlap with the schedule employee may be assigned to. 
       'Hours Scheduled': A numerical representation of how many hour the 
@@ -246,6 +256,7 @@ def get_availability(user, employee, schedule):
         user: django authenticated manager user.
         employee: Employee model object.
         schedule: Schedule model object.
+        business_data: Business settings the user has, queried if not given.
     Returns:
         availability: A dictionary containing keys that map to potential 
         conflicts the employee may have with the given schedule. Also,
@@ -256,23 +267,20 @@ def get_availability(user, employee, schedule):
     availability = {}
     
     # Get schedules employee is assigned to that overlap with schedule
-    schedules = (Schedule.objects.filter(user=user, employee=employee.id,
-                                         start_datetime__lt=schedule.end_datetime,
-                                         end_datetime__gt=schedule.start_datetime)
-                                 .exclude(pk=schedule.pk))
+    schedules = filter_overlapping(Schedule.objects.filter(user=user, employee=employee.id),
+                                   schedule.start_datetime, schedule.end_datetime)
+    schedules = schedules.exclude(pk=schedule.pk)
     availability['(S)'] = schedules
     
     # Get vacations employee is assigned to that overlap with schedule
-    vacations = (Vacation.objects.filter(user=user, employee=employee.id,
-                                         start_datetime__lt=schedule.end_datetime,
-                                         end_datetime__gt=schedule.start_datetime)) 
+    vacations = filter_overlapping(Vacation.objects.filter(user=user, employee=employee.id),
+                                   schedule.start_datetime, schedule.end_datetime)
                             
     availability['(V)'] = vacations
     
     # Get absences employee is assigned to that overlap with schedule
-    absences = (Absence.objects.filter(user=user, employee=employee.id,
-                                       start_datetime__lt=schedule.end_datetime,
-                                       end_datetime__gt=schedule.start_datetime)) 
+    absences = filter_overlapping(Absence.objects.filter(user=user, employee=employee.id),
+                                  schedule.start_datetime, schedule.end_datetime)
     availability['(A)'] = absences
            
     # Get repeat unavailabilities employee is assigned overlapping with schedule
@@ -282,57 +290,87 @@ def get_availability(user, employee, schedule):
     unav_repeat_naive = RepeatUnavailability.objects.filter(user=user, 
                                                             employee=employee.id,
                                                             weekday=sch_weekday)
-    unav_repeat_aware = []
-    for un_av in unav_repeat_naive:
-        start_dt = schedule.start_datetime.replace(hour=un_av.start_time.hour, 
-                                                   minute=un_av.start_time.minute)
-        end_dt = schedule.end_datetime.replace(hour=un_av.end_time.hour, 
-                                               minute=un_av.end_time.minute)                                 
-        if start_dt < schedule.end_datetime and end_dt > schedule.start_datetime:
-            unav_repeat_aware.append(un_av)         
-    availability['(U)'] = unav_repeat_aware
+    availability['(U)'] = get_overlapping_repeat_times(unav_repeat_naive, schedule)
+    
+    # Get schedules employee is assigned to that break fatigue rules
+    if business_data is None:
+        business_data = BusinessData.objects.get(user=user)
+    availability['(R)'], availability['(C)'] = [], 0
+    window = get_fatigue_window(business_data)
+    if window is not None:
+        nearby_schedules = filter_overlapping(Schedule.objects.filter(user=user, 
+                                                                      employee=employee.id),
+                                              schedule.start_datetime - window,
+                                              schedule.end_datetime + window)
+        availability['(R)'], availability['(C)'] = get_fatigue_conflicts(nearby_schedules,
+                                                                         schedule,
+                                                                         business_data)
 
     # Get desired times employee is assigned overlapping with schedule
     desired_times_naive = DesiredTime.objects.filter(user=user, 
                                                      employee=employee.id,
                                                      weekday=sch_weekday)
-    desired_times_aware = []
-    for desired_time in desired_times_naive:
-        start_dt = schedule.start_datetime.replace(hour=desired_time.start_time.hour, 
-                                                   minute=desired_time.start_time.minute)
-        end_dt = schedule.end_datetime.replace(hour=desired_time.end_time.hour, 
-                                               minute=desired_time.end_time.minute)                                 
-        if start_dt < schedule.end_datetime and end_dt > schedule.start_datetime:
-            desired_times_aware.append(desired_time)
-    availability['Desired Times'] = desired_times_aware
+    availability['Desired Times'] = get_overlapping_repeat_times(desired_times_naive, 
+                                                                 schedule)
 
     # Check current hours worked for later evaluation of overtime       
     curr_hours, total_workweek_hours = calculate_weekly_hours_with_sch(user, employee, schedule)
     availability['Hours Scheduled'] = total_workweek_hours
     availability['curr_hours'] = curr_hours
-    availability['(O)'] = check_for_overtime(total_workweek_hours, user)
+    availability['(O)'] = total_workweek_hours > business_data.overtime
             
     return availability
     
     
+def get_overlapping_repeat_times(repeat_times, schedule):
+    """Return repeating times that overlap with the schedule's times.
+    
+    Repeating times, that is repeat unavailabilities and desired times, only
+    have a meaningful time, so they are placed on the date of the schedule to
+    be compared (See note in get_availability).
+    
+    Args:
+        repeat_times: Iterable of RepeatUnavailability or DesiredTime model 
+            objects that fall on the same weekday as the schedule.
+        schedule: Schedule model object.
+    Returns:
+        List of the repeating times that overlap with the schedule.
+    """
+    
+    overlapping = []
+    for repeat_time in repeat_times:
+        start_dt = schedule.start_datetime.replace(hour=repeat_time.start_time.hour, 
+                                                   minute=repeat_time.start_time.minute)
+        end_dt = schedule.end_datetime.replace(hour=repeat_time.end_time.hour, 
+                                               minute=repeat_time.end_time.minute)                                 
+        if start_dt < schedule.end_datetime and end_dt > schedule.start_datetime:
+            overlapping.append(repeat_time)
+            
+    return overlapping
+    
+    
 def get_tro_dates(user, department, lower_bound_dt, upper_bound_dt):
     """Create a dict mapping dates to employees of department with time 
     requested off for that date.
+    
+    The department can also be a list of department ids, or None for all of
+    the user's departments, to get time requested off of their employees at
+    once.
     """
-    dep_memberships = (DepartmentMembership.objects.filter(user=user, department=department))
-    employee_pks = []
-    for dep_mem in dep_memberships:
-        employee_pks.append(dep_mem.employee.id)
+    memberships = DepartmentMembership.objects.filter(user=user)
+    if isinstance(department, (list, tuple)):
+        memberships = memberships.filter(department__in=department)
+    elif department is not None:
+        memberships = memberships.filter(department=department)
+    employee_pks = list(memberships.values_list('employee', flat=True).distinct())
         
-    dep_vacations = Vacation.objects.filter(user=user,
-                                            start_datetime__lt=upper_bound_dt,
-                                            end_datetime__gt=lower_bound_dt,
-                                            employee__in=employee_pks)
+    dep_vacations = filter_overlapping(Vacation.objects.filter(user=user,
+                                                               employee__in=employee_pks),
+                                       lower_bound_dt, upper_bound_dt)
                                             
-    unavailabilities = Absence.objects.filter(user=user,
-                                              start_datetime__lt=upper_bound_dt,
-                                              end_datetime__gt=lower_bound_dt,
-                                              employee__in=employee_pks)
+    unavailabilities = filter_overlapping(Absence.objects.filter(user=user,
+                                                                 employee__in=employee_pks),
+                                          lower_bound_dt, upper_bound_dt)
                                             
     return {'vacations': dep_vacations, 'unavailabilities': unavailabilities}
 
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+
+
+
+DATA_VERSION_KEY = 'data_version:%s'
+
+
+def get_data_version(user_id):
+    """Return the current version of the scheduling data of a managing user.
+
+    The data version changes every time something that affects employee
+    availability or costs is saved or deleted (See signals.py), so it can be
+    part of cache keys: bumping the version makes all entries computed from
+    older data unreachable, without having to find and delete them.
+
+    The version lives in Django's cache so that it is shared by every process
+    if a shared cache backend, like memcached, is configured. If the version
+    is evicted it restarts from the current time in milliseconds, which is
+    always newer than any version handed out before.
+
+    Args:
+        user_id: Integer id of the managing user.
+    Returns:
+        Integer version of the user's data.
+    """
+
+    key = DATA_VERSION_KEY % user_id
+    version = cache.get(key)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_data_version(user_id):
+    """Change the version of the scheduling data of a managing user."""
+    key = DATA_VERSION_KEY % user_id
+    try:
+        cache.incr(key)
+    except ValueError: # Version is not in the cache
+        cache.set(key, int(time.time() * 1000), None)
+
+
+class LRUCache(object):
+    """Thread safe cache of limited size kept in the memory of the process.
+
+    When full, the least recently used entry is evicted. Entries also expire
+    ttl seconds after they were set, which bounds how stale an entry can be
+    when the data version used in its key is bumped by another process that
+    does not share a cache backend with this one.
+
+    Meant for results that are only worth caching for a short while and are
+    too large, or too frequent, to go through Django's cache backend.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key, default=None):
+        """Return value cached for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] <= time.time():
+                return default
+            self._entries[key] = entry # Now the most recently used
+            return entry[0]
+
+
+    def set(self, key, value):
+        """Cache value for key, evicting the least recently used if full."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.time() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
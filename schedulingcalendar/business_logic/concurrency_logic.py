@@ -0,0 +1,77 @@
+import threading
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.db import connection, close_old_connections
+
+
+# Threads running queries, created when first needed (See run_concurrently)
+_query_pool = None
+_query_pool_lock = threading.Lock()
+_query_thread = threading.local()
+
+
+
+def run_concurrently(calls):
+    """Call independent functions reading the database concurrently.
+
+    Each call runs on a thread of a pool of settings.QUERY_WORKERS threads,
+    so a view waits for its slowest query instead of the sum of all of them.
+    Worker threads do the same connection housekeeping as a request before
+    and after each call, so CONN_MAX_AGE and connection pooling apply to
+    their connections like to those of request threads.
+
+    The calls run one after another on the calling thread when there are no
+    workers, inside a transaction, whose uncommitted changes other threads'
+    connections cannot see, on an in-memory SQLite database other threads
+    cannot open, or when already running on a worker thread.
+
+    Args:
+        calls: List of functions taking no arguments, or dict of names to
+            such functions. Functions returning querysets must evaluate them,
+            like with list(), for the queries to run concurrently.
+    Returns:
+        List of the results of calls, in the same order, or dict of the names
+        to the results if calls is a dict. An exception raised by a call is
+        raised again on the calling thread.
+    """
+
+    if isinstance(calls, dict):
+        names = list(calls)
+        return dict(zip(names, run_concurrently([calls[name] for name in names])))
+
+    workers = getattr(settings, 'QUERY_WORKERS', 0)
+    if (workers <= 0 or len(calls) < 2 or connection.in_atomic_block or
+            getattr(_query_thread, 'is_worker', False) or not _is_shared_database()):
+        return [call() for call in calls]
+    return _get_query_pool(workers).map(_run_query_call, calls, chunksize=1)
+
+
+def _is_shared_database():
+    """Return False if other threads cannot open the database, like the
+    in-memory SQLite databases of tests on Python 2."""
+    if connection.vendor != 'sqlite':
+        return True
+    return (not connection.is_in_memory_db(connection.settings_dict['NAME']) or
+            connection.features.can_share_in_memory_db)
+
+
+def _get_query_pool(workers):
+    """Return the pool of query threads, creating it the first time."""
+    global _query_pool
+    with _query_pool_lock:
+        if _query_pool is None:
+            _query_pool = ThreadPool(workers, initializer=_init_query_thread)
+        return _query_pool
+
+
+def _init_query_thread():
+    _query_thread.is_worker = True
+
+
+def _run_query_call(call):
+    """Run call like a request of its own would run it."""
+    close_old_connections()
+    try:
+        return call()
+    finally:
+        close_old_connections()
@@ -1,15 +1,30 @@
+import copy
 import json
 import bisect
 import calendar
 from datetime import date, datetime, timedelta, time
 from operator import itemgetter
+from django.conf import settings
+from django.db.models import Avg
+from django.db.models.functions import ExtractMonth
 from django.utils import timezone
 from django.contrib.auth.models import User
-from .time_logic import calculate_weekly_hours, time_dur_in_hours, get_start_end_of_weekday
+from .time_logic import (calculate_weekly_hours, time_dur_in_hours, get_start_end_of_weekday,
+                         get_workweeks_of_month, get_workweeks_of_range, get_workweeks_of_ranges,
+                         get_workweek_days, epoch_seconds)
 from ..models import (Schedule, Department, DepartmentMembership, MonthlyRevenue,
                      Employee, Vacation, RepeatUnavailability, BusinessData,
                      Absence, DesiredTime, LiveSchedule, LiveCalendar,
                      LiveCalendarDepartmentViewRights, LiveCalendarEmployeeViewRights)
+
+
+# Costs of employees on top of their wage, see COST_BURDEN_COMPONENTS in settings
+DEFAULT_BURDEN_COMPONENTS = [
+    {'name': 'Social Security', 'type': 'percent_of_wage', 'field': 'social_security'},
+    {'name': 'Workmans Comp', 'type': 'percent_of_wage', 'field': 'workmans_comp'},
+    {'name': 'Medical', 'type': 'fixed_monthly', 'field': 'monthly_medical'},
+]
+BURDEN_COMPONENT_TYPES = ('percent_of_wage', 'rate_per_hour', 'fixed_monthly')
                      
  
 
@@ -24,27 +39,68 @@ def get_avg_monthly_revenue(user, month):
         entered by a user, or -1 if the user has no monthly revenue data points
         for the given month.
     """
-    monthly_revenues = MonthlyRevenue.objects.filter(user=user,
-                                                     month_year__month=month)
-    num_of_data_points = len(monthly_revenues)
-    
-    if num_of_data_points > 0:
-        sum = 0 
-        for month_rev in monthly_revenues:
-            sum += month_rev.monthly_total
-        
-        return sum / num_of_data_points
+    avg_revenue = (MonthlyRevenue.objects.filter(user=user, month_year__month=month)
+                                         .aggregate(avg=Avg('monthly_total'))['avg'])
+    
+    if avg_revenue is not None:
+        # Revenues are whole dollars, averages are rounded down like before
+        return int(avg_revenue)
     else:
         return -1
+        
+        
+def get_avg_monthly_revenues(user):
+    """Calculate average revenue of every month of the year at once.
+    
+    Args:
+        user: django authenticated user
+    Returns:
+        A dict mapping integer values of months to the average revenue of that
+        month (See get_avg_monthly_revenue). Months without monthly revenue
+        data points are missing.
+    """
+    avg_revenues = (MonthlyRevenue.objects.filter(user=user)
+                                          .annotate(month=ExtractMonth('month_year'))
+                                          .values('month')
+                                          .annotate(avg=Avg('monthly_total'))
+                                          .order_by('month'))
+    
+    return dict((r['month'], int(r['avg'])) for r in avg_revenues)
      
 
+def get_month_cost_schedules(user, year, month, business_data):
+    """Return schedules the hours and costs of a month are calculated from.
+    
+    Overtime depends on every schedule of a workweek, so the schedules of
+    all workweeks overlapping the month are returned, which may start before
+    or end after the days displayed by the calendar of the month.
+    
+    Args:
+        user: Django authenticated user.
+        year: Integer value of year.
+        month: Integer value of month.
+        business_data: Business settings the user has.
+    Returns:
+        A queryset of schedules sorted by start and end datetime.
+    """
+    
+    workweeks = get_workweeks_of_month(year, month, business_data)
+    return (Schedule.objects.select_related('employee', 'department')
+                            .filter(user=user,
+                                    end_datetime__gt=workweeks[0]['start'],
+                                    start_datetime__lte=workweeks[-1]['end'])
+                            .order_by('start_datetime', 'end_datetime'))
+                            
+                            
 def all_calendar_hours_and_costs(user, departments, schedules, employees, 
                                  month, year, business_data, single_workweek=None):
     """Calculate hours cost of given month of schedules, including benefits.
     
     This function keeps track of the regular hours, overtime hours, benefits
     cost that depend on hours worked and monthly recurring benefits cost for 
-    schedules, days, workweeks, and months.
+    schedules, days, workweeks, and months. Monthly recurring benefits are
+    only part of month costs, allocated to departments by the hours each
+    employee works in them (See allocate_fixed_monthly_costs).
     
     Args:
         user: Django authenticated user.
@@ -66,36 +122,37 @@ def all_calendar_hours_and_costs(user, departments, schedules, employees,
     hours_and_costs = {'schedule_hours_costs': {}, 'day_hours_costs': {}, 
                        'workweek_hours_costs': [], 'month_costs': {}}
     workweeks = []
+    employee_month_hours = {}
    
     if single_workweek:
         single_workweek['schedules'] = schedules
         workweeks.append(single_workweek)
     else:
         # Get all workweeks with any intersection with month
-        beginning_of_month = timezone.make_aware(datetime(year, month, 1, 1))
-        first_workweek = get_start_end_of_weekday(beginning_of_month, user)
-        first_workweek['schedules'] = []
-        workweeks.append(first_workweek)
-        for i in range(1, 6):
-            ith_day = first_workweek['start'] + timedelta((i * 7) + 1)
-            ith_workweek = get_start_end_of_weekday(ith_day, user)
-            ith_workweek['schedules'] = []
-            # If start of workweek is contained in month, add workweek
-            if ith_workweek['start'].month == month:
-                workweeks.append(ith_workweek)
+        workweeks = get_workweeks_of_month(year, month, business_data)
+        for workweek in workweeks:
+            workweek['schedules'] = []
             
-        # Filter out employeeless schedules then append schedules to the workweek they belong to
-        schedules = [sch for sch in schedules if sch.employee]
+        # Filter out employeeless schedules then append schedules to every
+        # workweek they overlap, schedules are split at workweek boundaries
+        workweek_starts = [epoch_seconds(workweek['start']) for workweek in workweeks]
+        last_workweek_end = epoch_seconds(workweeks[-1]['end'])
         for sch in schedules:
-            for workweek in workweeks:
-                if sch.start_datetime >= workweek['start'] and sch.start_datetime <= workweek['end']:
-                    workweek['schedules'].append(sch)
-                    break
+            start = epoch_seconds(sch.start_datetime)
+            if not sch.employee_id or start > last_workweek_end:
+                continue
+            end = epoch_seconds(sch.end_datetime)
+            i = max(bisect.bisect_right(workweek_starts, start) - 1, 0)
+            while i < len(workweeks) and workweek_starts[i] < end:
+                workweeks[i]['schedules'].append(sch)
+                i += 1
                 
     # Create department dicts for monthly costs
     for department in departments:
-        hours_and_costs['month_costs'][department.id] = {'name': department.name, 'cost': 0}
-    hours_and_costs['month_costs']['total'] = {'name': 'Total', 'cost': 0}
+        hours_and_costs['month_costs'][department.id] = {'name': department.name, 'cost': 0,
+                                                         'hours': 0, 'overtime_hours': 0}
+    hours_and_costs['month_costs']['total'] = {'name': 'Total', 'cost': 0,
+                                               'hours': 0, 'overtime_hours': 0}
             
     # Sum up costs for each workweek and add to department costs
     for workweek in workweeks:
@@ -103,12 +160,18 @@ def all_calendar_hours_and_costs(user, departments, schedules, employees,
                                             workweek['schedules'], departments, business_data, 
                                             month, year)
         # Calculate schedule costs
-        # Disabled for speed, will enable if user wants schedule hour info functionality.
-        #calculate_schedule_costs(employee_hours, hours_and_costs['schedule_hours_costs'], business_data)
+        calculate_schedule_costs(employee_hours, hours_and_costs['schedule_hours_costs'])
         
         # Calculate day costs
+        # Days split between two workweeks add up the hours and costs of both
         day_costs = calculate_day_costs(employee_hours, departments, business_data)
-        hours_and_costs['day_hours_costs'].update(day_costs)
+        for date, dep_costs in day_costs.items():
+            if date in hours_and_costs['day_hours_costs']:
+                for dep_id, costs in dep_costs.items():
+                    for key in costs:
+                        hours_and_costs['day_hours_costs'][date][dep_id][key] += costs[key]
+            else:
+                hours_and_costs['day_hours_costs'][date] = dep_costs
         
         # Calculate workweek costs
         workweek_costs = calculate_workweek_costs(employee_hours, departments, business_data, False)
@@ -118,25 +181,82 @@ def all_calendar_hours_and_costs(user, departments, schedules, employees,
         # Calculate month costs
         workweek_costs_month = calculate_workweek_costs(employee_hours, departments, business_data, True)
         for dep_id in workweek_costs_month:
-            hours_and_costs['month_costs'][dep_id]['cost'] += workweek_costs_month[dep_id]['cost']
+            month_costs = hours_and_costs['month_costs'][dep_id]
+            month_costs['cost'] += workweek_costs_month[dep_id]['cost']
+            month_costs['hours'] += workweek_costs_month[dep_id]['hours']
+            month_costs['overtime_hours'] += workweek_costs_month[dep_id]['overtime_hours']
             
+        # Keep hours of each employee in month for allocating fixed monthly costs
+        for employee, hours in employee_hours.items():
+            dep_hours = employee_month_hours.setdefault(employee.id, {})
+            for dep_id, week_hours in hours['week_hours'].items():
+                dep_hours[dep_id] = (dep_hours.get(dep_id, 0) + week_hours['hours_in_month']
+                                     + week_hours['ovr_t_in_month'])
                 
-    # Calculate month costs
-    total_monthly_benefits = 0 # Get monthly benefits cost
-    monthly_benefits_per_dep = 0
-    for employee in employees:
-        total_monthly_benefits += employee.monthly_medical
-    monthly_benefits_per_dep = total_monthly_benefits / (len(hours_and_costs['month_costs']) - 1)
-    
-    for dep_id in hours_and_costs['month_costs']:
-        if dep_id == 'total':
-            hours_and_costs['month_costs'][dep_id]['cost'] += total_monthly_benefits
-        else:
-            hours_and_costs['month_costs'][dep_id]['cost'] += monthly_benefits_per_dep
+    # Add fixed monthly costs, such as medical, to month costs
+    allocate_fixed_monthly_costs(hours_and_costs['month_costs'], employees, employee_month_hours)
 
     return hours_and_costs
     
  
+def range_hours_and_costs(user, departments, employees, start_dt, end_dt,
+                          business_data):
+    """Calculate hours and costs of a range of time, like a day or a week.
+    
+    Overtime depends on every schedule of a workweek, so the workweeks
+    overlapping the range are calculated, each by itself like for a single
+    workweek (See all_calendar_hours_and_costs), instead of all workweeks of
+    the month. Month costs are left out since a range is not a month.
+    
+    Args:
+        user: Django authenticated user.
+        departments: All departments for user.
+        employees: All employees belonging to user.
+        start_dt: Timezone aware datetime of start of range.
+        end_dt: Timezone aware datetime of end of range, exclusive.
+        business_data: Business settings the user has.
+    Returns:
+        A dict containing the hours and costs of schedules overlapping the
+        range, of days in the range and of workweeks overlapping the range,
+        for every department the user has.
+    """
+    
+    workweeks = get_workweeks_of_range(start_dt, end_dt, business_data)
+    schedules = list(Schedule.objects.select_related('employee', 'department')
+                                     .filter(user=user, employee__isnull=False,
+                                             end_datetime__gt=workweeks[0]['start'],
+                                             start_datetime__lte=workweeks[-1]['end'])
+                                     .order_by('start_datetime', 'end_datetime'))
+    workweek_costs = []
+    for workweek in workweeks:
+        workweek_schedules = [sch for sch in schedules 
+                              if sch.end_datetime > workweek['start'] and 
+                                 sch.start_datetime <= workweek['end']]
+        local_start = timezone.localtime(max(workweek['start'], start_dt))
+        workweek_costs.append(all_calendar_hours_and_costs(user, departments, workweek_schedules, 
+                                                           employees, local_start.month,
+                                                           local_start.year, business_data,
+                                                           single_workweek=workweek))
+    hours_and_costs = merge_cost_deltas(workweek_costs)
+    del hours_and_costs['month_costs']
+    
+    # Workweeks have days and schedules outside of the range
+    first_day = timezone.localtime(start_dt).date().isoformat()
+    last_day = timezone.localtime(end_dt - timedelta(seconds=1)).date().isoformat()
+    day_costs = hours_and_costs['day_hours_costs']
+    for day in list(day_costs):
+        if not first_day <= day <= last_day:
+            del day_costs[day]
+    in_range = set(sch.id for sch in schedules 
+                   if sch.end_datetime > start_dt and sch.start_datetime < end_dt)
+    schedule_costs = hours_and_costs['schedule_hours_costs']
+    for schedule_id in list(schedule_costs):
+        if schedule_id not in in_range:
+            del schedule_costs[schedule_id]
+            
+    return hours_and_costs
+    
+    
 def all_employee_hours(user, week_start, week_end, schedules, departments, business_data, 
                        month=None, year=None):
     """Return a dict containing working hours of all employees in a workweek.
@@ -172,16 +292,19 @@ def all_employee_hours(user, week_start, week_end, schedules, departments, busin
     employee_hours = {}
                                             
     # Sort schedules by employee        
+    employees = {}
     for schedule in schedules:
-        if schedule.employee not in employee_hours:
+        if schedule.employee_id not in employees:
+            employees[schedule.employee_id] = schedule.employee
             employee_hours[schedule.employee] = []
-        employee_hours[schedule.employee].append(schedule)
+        employee_hours[employees[schedule.employee_id]].append(schedule)
     
     # For each employee, get hours for each schedule, day, and week
+    workweek_days = get_workweek_days({'start': week_start, 'end': week_end})
     for employee in employee_hours:
         hours = employee_hours_detailed(week_start, week_end, employee, departments,
                                         business_data, employee_hours[employee],
-                                        month, year)
+                                        month, year, workweek_days)
         employee_hours[employee] = hours
         
     return employee_hours
@@ -189,34 +312,28 @@ def all_employee_hours(user, week_start, week_end, schedules, departments, busin
     
 def employee_hours_detailed(workweek_start_dt, workweek_end_dt, employee, 
                             departments, business_data, schedules, 
-                            month=None, year=None):
+                            month=None, year=None, workweek_days=None):
     """Calculate the number of hours and overtime hours for given schedules
     as they occur chronologically and according to which department those 
     hours and overtime hours occur.
     
-    This function works similarly to calculate_weekly_hours in that it does
-    not count time overlapping between multiple schedules for one employee as
-    different times. So we ensure we do not count time where employee is 
-    present at work for a day in 2 different departments twice. The first
-    occuring schedule is the department whose hours are counted in the case of
-    an overlap.
+    Schedules are clipped to the workweek and split at each local midnight,
+    so a schedule crossing midnight, the end of a month or the start of the
+    next workweek has its hours counted for the day, month and workweek they
+    actually occur in. Break time is spread over the pieces of a schedule
+    in proportion to their length. The pieces are then walked in
+    chronological order, so overtime starts at the exact hour the employee
+    reaches the overtime threshold, in whichever department and day that is.
     
     Then we count the number of hours the employee is working both in that 
     department and overall all departments for that workweek. Furthermore, 
     since we are interested in the ratio of employment costs to average monthly 
-    revenue, we keep a running sum of the regular and overtime hours of schedules
-    that strictly belong to a given month and year. This is because workweeks 
-    at the start and end of a month contain schedules that fall outside that
-    month. This running sum allows us to calculate costs of scheduling that 
-    strictly belong to a given month, giving us an accurate ratio of employment 
-    cost to average monthly revenue.
-    
-    Note that for monthly hours, schedules that start and end in 2 different
-    months may or may not be counted. This inaccuracy is deliberate in order
-    to keep the code both readable and response times for the user as fast as
-    possible. This potential error is considered tolerable due to the purpose
-    of scheduling cost / average revenue as a loose guideline for managers to
-    create schedules.
+    revenue, we keep a running sum of the regular and overtime hours that
+    occur in a given month and year. This is because workweeks at the start
+    and end of a month contain days that fall outside that month. This running
+    sum allows us to calculate costs of scheduling that strictly belong to a
+    given month, giving us an accurate ratio of employment cost to average
+    monthly revenue.
     
     Also: Calculating the hours is a convoluted mess because calculating the 
     cost of a schedule is dependent on 2 different variables: overtime caused 
@@ -241,14 +358,18 @@ def employee_hours_detailed(workweek_start_dt, workweek_end_dt, employee,
             schedules for an employee that have any intersection with a 
             particular workweek.
         month: integer value of month. If value present, this function
-            calculates schedules that only have overlapping time in the month.
+            calculates hours that occur in the month separately.
             (Since often workweeks at start/end of month have days that are
             outside that month.)
         year: integer value of year. Optional value similar to month.
+        workweek_days: Optional result of get_workweek_days for the workweek,
+            so it is only calculated once for all employees.
     Returns:
         A dict containing the number of non-overtime hours and overtime hours
         for individual schedules, each day in the workweek, and the overall
-        workweek itself. Also, for the weekly hours, there is a hours only 
+        workweek itself. Individual schedules also have their cost, summed
+        up in the same pass, and the hourly rates of employee are included
+        for calculating the costs of days and weeks. Also, for the weekly hours, there is a hours only 
         in month for calculating strictly month costs as well.
     """
                      
@@ -256,111 +377,188 @@ def employee_hours_detailed(workweek_start_dt, workweek_end_dt, employee,
     overtime = business_data.overtime
     min_time_for_break = employee.min_time_for_break
     break_time_min = employee.break_time_in_min
+    hourly_rates = get_hourly_rates(employee, business_data)
+    regular_rate = hourly_rates['regular']
+    overtime_rate = hourly_rates['overtime']
+    if workweek_days is None:
+        workweek_days = get_workweek_days({'start': workweek_start_dt, 'end': workweek_end_dt})
+    boundaries, dates = workweek_days
     
     schedule_hours = {}
     day_hours = {}
     week_hours = {}
     
-    # Get all dates within workweek
-    for i in range(0, 7):
-        date = workweek_start_dt.date() + timedelta(i)
-        day_hours[date] = {}
-    
     # Create dicts containing hour information for each week and individual day
+    for date in dates:
+        day_hours[date] = {'total': {'hours': 0, 'overtime_hours': 0}}
+        for dep in departments:
+            day_hours[date][dep.id] = {'hours': 0, 'overtime_hours': 0}
     for dep in departments:
         week_hours[dep.id] = {'hours': 0, 'overtime_hours': 0, 'hours_in_month': 0, 'ovr_t_in_month': 0}
-        for date in day_hours:
-            day_hours[date][dep.id] = {'hours': 0, 'overtime_hours': 0}  
-    # Also create dicts containing hour information for total sum across departments
     week_hours['total'] = {'hours': 0, 'overtime_hours': 0, 'hours_in_month': 0, 'ovr_t_in_month': 0}
-    for date in day_hours:
-            day_hours[date]['total'] = {'hours': 0, 'overtime_hours': 0}
     
-    # For each schedule calculate hours and overtime hours
+    # Split schedules into pieces of (start, hours, day index, schedule) that
+    # lie within a single day of the workweek.
+    pieces = []
+    week_start = boundaries[0]
+    week_stop = boundaries[-1]
     for schedule in schedules:
-        schedule_duration = time_dur_in_hours(schedule.start_datetime, 
-                                              schedule.end_datetime,
-                                              None, None, min_time_for_break, 
-                                              break_time_min)
-
-        # Calculate hours in the workweek, first checking if adding the next
-        # schedule's duration will put that employee's total workweek hours
-        # into overtime, if so, calculate overtime hours as well.
-        overall_non_overtime_hours = week_hours['total']['hours'] + schedule_duration
-        if overall_non_overtime_hours > overtime:
-            overtime_hours = overall_non_overtime_hours - overtime
-            regular_hours = schedule_duration - overtime_hours
-            
-            # Save hour information for each individual schedule
-            schedule_hours[schedule.id] = {'hours':regular_hours, 
-                                           'overtime_hours': overtime_hours,
-                                           'duration': schedule_duration}
-            
-            # Save hour information for each day
-            day_hours[schedule.start_datetime.date()]['total']['hours'] += regular_hours
-            day_hours[schedule.start_datetime.date()][schedule.department.id]['hours'] += regular_hours
-            day_hours[schedule.start_datetime.date()]['total']['overtime_hours'] += overtime_hours
-            day_hours[schedule.start_datetime.date()][schedule.department.id]['overtime_hours'] += overtime_hours
-            
-            # Save hour information for week
-            week_hours['total']['hours'] += regular_hours
-            week_hours[schedule.department.id]['hours'] += regular_hours
-            week_hours['total']['overtime_hours'] += overtime_hours
-            week_hours[schedule.department.id]['overtime_hours'] += overtime_hours
-            
-            # Save hour information for week only if schedule is strictly in month
-            sch_month = schedule.start_datetime.month
-            sch_year = schedule.start_datetime.year
-            if sch_month == month and sch_year == year:
-                week_hours['total']['hours_in_month'] += regular_hours
-                week_hours[schedule.department.id]['hours_in_month'] += regular_hours
-                week_hours['total']['ovr_t_in_month'] += overtime_hours
-                week_hours[schedule.department.id]['ovr_t_in_month'] += overtime_hours
-        else:
-            # Save hour information for each individual schedule
-            schedule_hours[schedule.id] = {'hours': schedule_duration, 
-                                           'overtime_hours': 0,
-                                           'duration': schedule_duration}
-            
-            # Save hour information for each day
-            day_hours[schedule.start_datetime.date()]['total']['hours'] += schedule_duration
-            day_hours[schedule.start_datetime.date()][schedule.department.id]['hours'] += schedule_duration
+        start = epoch_seconds(schedule.start_datetime)
+        end = epoch_seconds(schedule.end_datetime)
+        schedule_hours[schedule.id] = {'hours': 0, 'overtime_hours': 0, 'duration': 0, 'cost': 0}
+        if end <= start:
+            continue
+        # Hours after the break is subtracted, per second of the schedule
+        hours_per_second = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
+                                             None, None, min_time_for_break, 
+                                             break_time_min) / (end - start)
+        start = max(start, week_start)
+        end = min(end, week_stop)
+        day = bisect.bisect_right(boundaries, start) - 1
+        while start < end:
+            piece_end = min(end, boundaries[day + 1])
+            pieces.append((start, (piece_end - start) * hours_per_second, day, schedule))
+            start = piece_end
+            day += 1
+    pieces.sort(key=itemgetter(0))
+    
+    # Walk pieces chronologically, hours past the overtime threshold are 
+    # overtime hours of the department and day they occur in.
+    week_total = week_hours['total']
+    for start, hours, day, schedule in pieces:
+        regular_hours = min(hours, max(overtime - week_total['hours'], 0))
+        overtime_hours = hours - regular_hours
+        dep_id = schedule.department_id
+        
+        # Save hour information for each individual schedule
+        sch_hours = schedule_hours[schedule.id]
+        sch_hours['hours'] += regular_hours
+        sch_hours['overtime_hours'] += overtime_hours
+        sch_hours['duration'] += hours
+        sch_hours['cost'] += regular_hours * regular_rate + overtime_hours * overtime_rate
+        
+        # Save hour information for each day
+        date = dates[day]
+        for hours_dict in (day_hours[date]['total'], day_hours[date][dep_id]):
+            hours_dict['hours'] += regular_hours
+            hours_dict['overtime_hours'] += overtime_hours
             
-            # Save hour information for week
-            week_hours['total']['hours'] += schedule_duration
-            week_hours[schedule.department.id]['hours'] += schedule_duration
-                
-            # Save hour information for week only if schedule is strictly in month
-            sch_month = schedule.start_datetime.month
-            sch_year = schedule.start_datetime.year
-            if sch_month == month and sch_year == year:
-                week_hours['total']['hours_in_month'] += schedule_duration
-                week_hours[schedule.department.id]['hours_in_month'] += schedule_duration
+        # Save hour information for week, and for month if day is in month
+        in_month = date.month == month and date.year == year
+        for hours_dict in (week_total, week_hours[dep_id]):
+            hours_dict['hours'] += regular_hours
+            hours_dict['overtime_hours'] += overtime_hours
+            if in_month:
+                hours_dict['hours_in_month'] += regular_hours
+                hours_dict['ovr_t_in_month'] += overtime_hours
 
-    return {'schedule_hours': schedule_hours, 'day_hours': day_hours, 'week_hours': week_hours}
+    return {'schedule_hours': schedule_hours, 'day_hours': day_hours, 'week_hours': week_hours,
+            'hourly_rates': hourly_rates}
+    
     
+def get_burden_components():
+    """Return cost burden components of employees from settings.
     
-def calculate_cost(regular_hours, overtime_hours, wage, 
-                   overtime_multiplier, social_security):
+    Each component is a dict with a 'type' and either the 'field' of the 
+    Employee model holding its amount or a constant 'value' for all employees:
+    
+        percent_of_wage: Percentage of pay, including overtime pay.
+        rate_per_hour: Dollars per hour worked, overtime or not.
+        fixed_monthly: Dollars per month, allocated to departments by hours
+            worked in them (See allocate_fixed_monthly_costs).
+    """
+    
+    components = getattr(settings, 'COST_BURDEN_COMPONENTS', DEFAULT_BURDEN_COMPONENTS)
+    for component in components:
+        if component['type'] not in BURDEN_COMPONENT_TYPES:
+            raise ValueError('Unknown cost burden component type: %s' % component['type'])
+    return components
+    
+    
+def _burden_amount(component, employee):
+    """Return amount of a cost burden component for employee."""
+    if 'field' in component:
+        return getattr(employee, component['field']) or 0
+    return component['value']
+    
+    
+def get_hourly_rates(employee, business_data):
+    """Calculate the cost of a regular and an overtime hour of employee.
+    
+    The wage and every hourly cost burden component are combined into two
+    rates once per employee, so the cost engine only multiplies hours by them
+    no matter how many components there are.
+    
+    Args:
+        employee: Employee model object.
+        business_data: Django model of business data for managing user.
+    Returns:
+        A dict of the float cost of a 'regular' and an 'overtime' hour.
+    """
+    
+    percent_of_wage = 0
+    per_hour = 0
+    for component in get_burden_components():
+        if component['type'] == 'percent_of_wage':
+            percent_of_wage += _burden_amount(component, employee)
+        elif component['type'] == 'rate_per_hour':
+            per_hour += _burden_amount(component, employee)
+    
+    wage_multiplier = 1 + percent_of_wage / 100.0
+    return {'regular': employee.wage * wage_multiplier + per_hour,
+            'overtime': employee.wage * business_data.overtime_multiplier * wage_multiplier + per_hour}
+            
+            
+def get_fixed_monthly_cost(employee):
+    """Return sum of the fixed monthly cost burden components of employee."""
+    return sum(_burden_amount(component, employee) for component in get_burden_components()
+               if component['type'] == 'fixed_monthly')
+               
+               
+def calculate_cost(regular_hours, overtime_hours, hourly_rates):
     """Calculate the cost of the given hours and overtime.
     
     Args:
         regular_hours: Float value of regular, non-overtime hours.
         overtime_hours: Float value of overtime hours.
-        wage: Float value to multiply hours by.
-        overtime_multiplier: amount overtime multiplies by.
-        social_security: Percentage of cost added to employer.
+        hourly_rates: Dict of cost of a regular and overtime hour (See
+            get_hourly_rates).
         
     Returns:
         A float representing total value of all costs.
     """
     
-    regular_cost = regular_hours * wage
-    over_t_cost = overtime_hours * wage * overtime_multiplier
-    total_pre_ss = regular_cost + over_t_cost
-    total = total_pre_ss + (total_pre_ss * (social_security / 100))
+    return regular_hours * hourly_rates['regular'] + overtime_hours * hourly_rates['overtime']
     
-    return total
+    
+def allocate_fixed_monthly_costs(month_costs, employees, employee_month_hours):
+    """Add fixed monthly costs of employees to month costs in place.
+    
+    The fixed monthly cost of an employee is allocated to departments in
+    proportion to the hours the employee works in each of them during the
+    month. Costs of employees without hours in the month are split evenly
+    across departments.
+    
+    Args:
+        month_costs: Dict of department ids, and 'total', to their month costs.
+        employees: All employees belonging to user.
+        employee_month_hours: Dict of employee ids to dicts of department ids,
+            and 'total', to hours the employee works in the month.
+    """
+    
+    dep_ids = [dep_id for dep_id in month_costs if dep_id != 'total']
+    for employee in employees:
+        fixed_cost = get_fixed_monthly_cost(employee)
+        if not fixed_cost:
+            continue
+        month_costs['total']['cost'] += fixed_cost
+        dep_hours = employee_month_hours.get(employee.id, {})
+        total_hours = dep_hours.get('total', 0)
+        for dep_id in dep_ids:
+            if total_hours:
+                month_costs[dep_id]['cost'] += fixed_cost * dep_hours.get(dep_id, 0) / total_hours
+            else:
+                month_costs[dep_id]['cost'] += fixed_cost / len(dep_ids)
     
     
 def calculate_workweek_costs(hours, departments, business_data, month_only=False):
@@ -376,8 +574,6 @@ def calculate_workweek_costs(hours, departments, business_data, month_only=False
         A dict of key values mapping department to float number costs in
         dollars and total regular and overtime hours for that department.
     """
-    # TODO: Add hourly associated benefits cost like social security, workmans comp
-    ovr_t_multiplier = business_data.overtime_multiplier
     workweek_costs = {}
     
     for department in departments:
@@ -386,17 +582,16 @@ def calculate_workweek_costs(hours, departments, business_data, month_only=False
     
     for employee in hours:
         week_hours = hours[employee]['week_hours']
+        hourly_rates = hours[employee]['hourly_rates']
         for department in week_hours:
             if month_only:
                 regular_hours = week_hours[department]['hours_in_month']
                 overtime_hours = week_hours[department]['ovr_t_in_month']
-                cost = calculate_cost(regular_hours, overtime_hours, employee.wage, 
-                                      ovr_t_multiplier, employee.social_security)
+                cost = calculate_cost(regular_hours, overtime_hours, hourly_rates)
             else:
                 regular_hours = week_hours[department]['hours']
                 overtime_hours = week_hours[department]['overtime_hours']
-                cost = calculate_cost(regular_hours, overtime_hours, employee.wage, 
-                                      ovr_t_multiplier, employee.social_security)
+                cost = calculate_cost(regular_hours, overtime_hours, hourly_rates)
                 
             workweek_costs[department]['hours'] += regular_hours
             workweek_costs[department]['overtime_hours'] += overtime_hours
@@ -416,20 +611,18 @@ def calculate_day_costs(hours, departments, business_data):
         A dict of dates in iso formatm mapping to the hours and 
         costs for that day.
     """
-    # TODO: Add hourly associated benefits cost like social security, workmans comp
-    ovr_t_multiplier = business_data.overtime_multiplier
     day_costs_for_week = {}
     
     for employee in hours:
         day_hours_for_week = hours[employee]['day_hours']
+        hourly_rates = hours[employee]['hourly_rates']
         for date in day_hours_for_week:
             # If we have not seen the date before, set day_cost[date] = day_hours_for_week[date]
             if not date.isoformat() in day_costs_for_week:
                 for dep in day_hours_for_week[date]:
                     regular_hours = day_hours_for_week[date][dep]['hours']
                     overtime_hours = day_hours_for_week[date][dep]['overtime_hours']
-                    cost = calculate_cost(regular_hours, overtime_hours, employee.wage, 
-                                      ovr_t_multiplier, employee.social_security)
+                    cost = calculate_cost(regular_hours, overtime_hours, hourly_rates)
                     day_hours_for_week[date][dep]['cost'] = cost
                 day_costs_for_week[date.isoformat()] = day_hours_for_week[date]
             else:
@@ -437,8 +630,7 @@ def calculate_day_costs(hours, departments, business_data):
                 for dep in day_cost:
                   regular_hours = day_hours_for_week[date][dep]['hours']
                   overtime_hours = day_hours_for_week[date][dep]['overtime_hours']
-                  cost = calculate_cost(regular_hours, overtime_hours, employee.wage, 
-                                      ovr_t_multiplier, employee.social_security)
+                  cost = calculate_cost(regular_hours, overtime_hours, hourly_rates)
                         
                   day_cost[dep]['hours'] += regular_hours
                   day_cost[dep]['overtime_hours'] += overtime_hours
@@ -447,28 +639,27 @@ def calculate_day_costs(hours, departments, business_data):
     return day_costs_for_week
           
 
-def calculate_schedule_costs(hours, all_schedule_hours_dicts, business_data): 
-    """Calculate the costs of each schedule.
+def calculate_schedule_costs(hours, all_schedule_hours_dicts): 
+    """Add the hours and costs of each schedule to all_schedule_hours_dicts.
+    
+    The cost of each schedule is calculated along with its hours (See
+    employee_hours_detailed), so this only collects them. Schedules crossing
+    workweeks have the hours and costs of each workweek added up.
     
     Args:
         hours: Dict of employees and their hours in that workweek.
         all_schedule_hours_dicts: Final dict product containing all hours
           and cost information for the particular calendar.
-        business_data: Django model of business data for managing user
     """
 
-    # TODO: Add hourly associated benefits cost like social security, workmans comp
-    ovr_t_multiplier = business_data.overtime_multiplier
-
     for employee in hours:
-        schedule_hours = hours[employee]['schedule_hours']
-        for schedule_id in schedule_hours:
-            cost = calculate_cost(regular_hours, overtime_hours, employee.wage, 
-                                      ovr_t_multiplier, employee.social_security)
-            schedule_hours[schedule_id]['cost'] = cost
-        # Update master dict containing all schedule hours and costs
-        all_schedule_hours_dicts.update(hours[employee]['schedule_hours'])
-    return
+        for schedule_id, sch_hours in hours[employee]['schedule_hours'].items():
+            if schedule_id in all_schedule_hours_dicts:
+                sch_hours_costs = all_schedule_hours_dicts[schedule_id]
+                for key in sch_hours:
+                    sch_hours_costs[key] += sch_hours[key]
+            else:
+                all_schedule_hours_dicts[schedule_id] = sch_hours
     
 
 def remove_schedule_cost_change(user, schedule, departments, business_data,
@@ -479,7 +670,8 @@ def remove_schedule_cost_change(user, schedule, departments, business_data,
     to the schedule being deleted. This is because the cost of schedules is
     sequential and not independent, thus we must recalculate the cost of the
     workweek for the employee with and without the schedule that will be
-    deleted.
+    deleted. A schedule crossing the start of a workweek changes the costs
+    of both workweeks (See employee_cost_change).
     
     Args:
         user: django authenticated user
@@ -493,32 +685,10 @@ def remove_schedule_cost_change(user, schedule, departments, business_data,
         various departments. 
     """
     
-    # Get the workweek that the schedule intersects with and workweek schedules
-    workweek = get_start_end_of_weekday(schedule.start_datetime, user)
-    workweek_schedules = (Schedule.objects.select_related('department', 'employee')
-                                  .filter(user=user,
-                                          end_datetime__gt=workweek['start'],
-                                          start_datetime__lt=workweek['end'],
-                                          employee=schedule.employee)
-                                  .order_by('start_datetime', 'end_datetime')) 
-
-    # Get old week hours and costs                   
-    old_hours_cost = single_employee_costs(workweek['start'], workweek['end'],
-                                           schedule.employee, workweek_schedules, 
-                                           departments, business_data, 
-                                           calendar_date.month, calendar_date.year)
-                                                                                                 
-    # Get new week (Old week minus schedule) hours and costs
-    new_workweek_schedules = workweek_schedules.exclude(pk=schedule.id)
-    new_hours_cost = single_employee_costs(workweek['start'], workweek['end'],
-                                           schedule.employee, new_workweek_schedules, 
-                                           departments, business_data, 
-                                           calendar_date.month, calendar_date.year)
-
-    # Calculate difference between old and new day hours/costs
-    hours_cost_delta = calculate_cost_delta(old_hours_cost, new_hours_cost, 'subtract')
-    
-    return hours_cost_delta
+    ranges = [(schedule.start_datetime, schedule.end_datetime)]
+    return employee_cost_change(user, schedule.employee, ranges,
+                                lambda schedules: [sch for sch in schedules if sch.id != schedule.id],
+                                departments, business_data, calendar_date)
     
     
 def add_employee_cost_change(user, schedule, new_employee, departments, 
@@ -543,61 +713,17 @@ def add_employee_cost_change(user, schedule, new_employee, departments,
         various departments. 
     """
      
-    employees = [new_employee] # Employee list used for query
-    if schedule.employee:
-        employees.append(schedule.employee)
-    workweek = get_start_end_of_weekday(schedule.start_datetime, user)
-    workweek_schedules = (Schedule.objects.select_related('department', 'employee')
-                                  .filter(user=user,
-                                          end_datetime__gt=workweek['start'],
-                                          start_datetime__lt=workweek['end'],
-                                          employee__in=employees)
-                                  .order_by('start_datetime', 'end_datetime')) 
-     
-    # Get old workweek costs before employee assignment
-    new_employee_schedules = [sch for sch in workweek_schedules if sch.employee == new_employee]
-    old_hours_cost = single_employee_costs(workweek['start'], 
-                                     workweek['end'],
-                                     new_employee, new_employee_schedules, 
-                                     departments, business_data, 
-                                     calendar_date.month,
-                                     calendar_date.year)
-    # Get new workweek costs after employee assignment  
-    bisect.insort_left(new_employee_schedules, schedule)
-    new_hours_cost = single_employee_costs(workweek['start'], 
-                                     workweek['end'],
-                                     new_employee, new_employee_schedules, 
-                                     departments, business_data, 
-                                     calendar_date.month,
-                                     calendar_date.year)
-                                     
-    # Calculate difference between old and new day hours/costs for new employee
-    hours_cost_delta = calculate_cost_delta(old_hours_cost, new_hours_cost, 'subtract')
+    ranges = [(schedule.start_datetime, schedule.end_datetime)]
+    hours_cost_delta = employee_cost_change(user, new_employee, ranges,
+                                            lambda schedules: schedules + [schedule],
+                                            departments, business_data, calendar_date)
                          
     # if another employee was already assigned to schedule previously, calculate cost diff                                 
     if schedule.employee:
-        prev_employee_schedules = [sch for sch in workweek_schedules if sch.employee == schedule.employee]
-        prev_emp_old_cost = single_employee_costs(workweek['start'], 
-                                                  workweek['end'],
-                                                  schedule.employee, 
-                                                  prev_employee_schedules, 
-                                                  departments, business_data, 
-                                                  calendar_date.month, 
-                                                  calendar_date.year)
-
-        prev_employee_schedules.remove(schedule)
-        prev_emp_new_cost = single_employee_costs(workweek['start'], 
-                                                  workweek['end'],
-                                                  schedule.employee, 
-                                                  prev_employee_schedules, 
-                                                  departments, business_data, 
-                                                  calendar_date.month, 
-                                                  calendar_date.year)
-        # Calculate difference in hours and cost
-        prev_emp_hours_cost_delta = calculate_cost_delta(prev_emp_old_cost, prev_emp_new_cost, 'subtract')
-        
+        prev_emp_hours_cost_delta = remove_schedule_cost_change(user, schedule, departments,
+                                                                business_data, calendar_date)
         # Add difference in cost for previous employee to overall cost/hour delta
-        hours_cost_delta = calculate_cost_delta(hours_cost_delta, prev_emp_hours_cost_delta, 'add')                                       
+        hours_cost_delta = merge_cost_deltas([hours_cost_delta, prev_emp_hours_cost_delta])
 
     return hours_cost_delta
     
@@ -605,11 +731,16 @@ def add_employee_cost_change(user, schedule, new_employee, departments,
 def edit_schedule_cost_change(user, schedule, new_start_dt, new_end_dt, departments, 
                               business_data, calendar_date):
     """Calculate cost differential to editing schedule with assigned employee.
+    
+    The costs of every workweek the schedule overlaps before or after the
+    edit are recalculated, so moving a schedule into another workweek
+    changes the costs of both.
 
     Args:
         user: django authenticated user
         schedule: The schedule that will be deleted from the database.
-        
+        new_start_dt: Python datetime of the new start of the schedule.
+        new_end_dt: Python datetime of the new end of the schedule.
         departments: Queryset of all departments for user.
         business_data: Django model of business data for user
         calendar_date: Datetime date containing month and year of calendar
@@ -618,39 +749,110 @@ def edit_schedule_cost_change(user, schedule, new_start_dt, new_end_dt, departme
         A dictionary of departments that map to the change in cost to the 
         various departments. 
     """
-     
-    # Get the workweek that the schedule intersects with and workweek schedules
-    workweek = get_start_end_of_weekday(schedule.start_datetime, user)
-    workweek_schedules = (Schedule.objects.select_related('department', 'employee')
-                                  .filter(user=user,
-                                          end_datetime__gt=workweek['start'],
-                                          start_datetime__lt=workweek['end'],
-                                          employee=schedule.employee)
-                                  .order_by('start_datetime', 'end_datetime')) 
-    workweek_schedules = [sch for sch in workweek_schedules]
-
-    # Get old week hours and costs                   
-    old_hours_cost = single_employee_costs(workweek['start'], workweek['end'],
-                                           schedule.employee, workweek_schedules, 
-                                           departments, business_data, 
-                                           calendar_date.month, calendar_date.year)
-                                                                                                 
-    # Get new week hours and costs with edited schedule
-    for sch in workweek_schedules:
-        if sch.id == schedule.id:
-            # Do stuff:
-            sch.start_datetime = new_start_dt
-            sch.end_datetime = new_end_dt
-            break
-    new_hours_cost = single_employee_costs(workweek['start'], workweek['end'],
-                                           schedule.employee, workweek_schedules, 
-                                           departments, business_data, 
-                                           calendar_date.month, calendar_date.year)
-
-    # Calculate difference between old and new day hours/costs
-    hours_cost_delta = calculate_cost_delta(old_hours_cost, new_hours_cost, 'subtract')
     
-    return hours_cost_delta
+    edited_schedule = copy.copy(schedule)
+    edited_schedule.start_datetime = new_start_dt
+    edited_schedule.end_datetime = new_end_dt
+    ranges = [(schedule.start_datetime, schedule.end_datetime), (new_start_dt, new_end_dt)]
+    return employee_cost_change(user, schedule.employee, ranges,
+                                lambda schedules: [edited_schedule if sch.id == schedule.id else sch
+                                                   for sch in schedules],
+                                departments, business_data, calendar_date)
+    
+    
+def employee_cost_change(user, employee, ranges, change, departments, 
+                         business_data, calendar_date):
+    """Calculate cost differential of changing schedules of an employee.
+    
+    Schedules crossing the start of a workweek are counted in every workweek
+    they overlap (See all_calendar_hours_and_costs), so the costs of the
+    employee are recalculated for every workweek the changed schedules
+    overlap before or after the change, with the employee's schedules of all
+    of them fetched in a single query.
+    
+    Fixed monthly costs of the employee are split across departments by the
+    hours the employee works in each of them during the whole month (See
+    allocate_fixed_monthly_costs), so for employees with fixed monthly costs
+    the hours of every workweek of the month are counted as well, and the
+    change of the split is part of the month costs of the delta.
+    
+    Args:
+        user: django authenticated user
+        employee: django employee model of employee whose schedules change.
+        ranges: List of tuples of the start and end datetimes of the changed
+          schedules, both before and after the change.
+        change: Function taking the list of schedules of the employee in the
+          workweeks and returning the list after the change. The schedules
+          of the given list must not be modified.
+        departments: Queryset of all departments for user.
+        business_data: Django model of business data for user
+        calendar_date: Datetime date containing month and year of calendar
+            that the user has changed schedules in.
+    Returns:
+        A hours and costs delta with an item in workweek_hours_costs for each
+        changed workweek (See merge_cost_deltas).
+    """
+    
+    changed_workweeks = get_workweeks_of_ranges(ranges, business_data)
+    changed_starts = set(workweek['start'] for workweek in changed_workweeks)
+    fixed_cost = get_fixed_monthly_cost(employee)
+    workweeks = changed_workweeks
+    if fixed_cost:
+        month_workweeks = get_workweeks_of_month(calendar_date.year, calendar_date.month, 
+                                                 business_data)
+        workweeks = dict((workweek['start'], workweek) 
+                         for workweek in changed_workweeks + month_workweeks)
+        workweeks = [workweeks[start] for start in sorted(workweeks)]
+    schedules = list(Schedule.objects.select_related('department', 'employee')
+                                     .filter(user=user, employee=employee,
+                                             end_datetime__gt=workweeks[0]['start'],
+                                             start_datetime__lte=workweeks[-1]['end'])
+                                     .order_by('start_datetime', 'end_datetime'))
+    new_schedules = sorted(change(schedules), key=lambda sch: (sch.start_datetime, sch.end_datetime))
+    
+    cost_deltas = []
+    old_month_hours = {}
+    new_month_hours = {}
+    for workweek in workweeks:
+        old_hours_cost = single_employee_costs(workweek['start'], workweek['end'], employee,
+                                               _get_workweek_schedules(schedules, workweek),
+                                               departments, business_data, 
+                                               calendar_date.month, calendar_date.year)
+        new_hours_cost = old_hours_cost
+        if workweek['start'] in changed_starts:
+            new_hours_cost = single_employee_costs(workweek['start'], workweek['end'], employee,
+                                                   _get_workweek_schedules(new_schedules, workweek),
+                                                   departments, business_data, 
+                                                   calendar_date.month, calendar_date.year)
+        _add_month_hours(old_month_hours, old_hours_cost['month_costs'])
+        _add_month_hours(new_month_hours, new_hours_cost['month_costs'])
+        if workweek['start'] in changed_starts:
+            cost_deltas.append(calculate_cost_delta(old_hours_cost, new_hours_cost, 'subtract'))
+    cost_delta = merge_cost_deltas(cost_deltas)
+    
+    # Move the fixed monthly costs from the old to the new split
+    if fixed_cost:
+        for month_hours, sign in ((old_month_hours, -1), (new_month_hours, 1)):
+            split = dict((dep, {'cost': 0}) for dep in cost_delta['month_costs'])
+            allocate_fixed_monthly_costs(split, [employee], {employee.id: month_hours})
+            for dep in split:
+                cost_delta['month_costs'][dep]['cost'] += sign * split[dep]['cost']
+        
+    return cost_delta
+    
+    
+def _add_month_hours(month_hours, month_costs):
+    """Add hours and overtime hours of departments in month_costs to the
+    dict of department ids, and 'total', to hours month_hours in place."""
+    for dep, dep_costs in month_costs.items():
+        month_hours[dep] = (month_hours.get(dep, 0) + dep_costs['hours'] 
+                            + dep_costs['overtime_hours'])
+    
+    
+def _get_workweek_schedules(schedules, workweek):
+    """Return schedules of a list overlapping workweek."""
+    return [sch for sch in schedules 
+            if sch.end_datetime > workweek['start'] and sch.start_datetime <= workweek['end']]
     
     
 def copy_schedules_cost_delta(user, schedules, departments, 
@@ -685,6 +887,23 @@ def calculate_cost_delta(old_hours_cost, new_hours_cost, operator):
         dictionary data structure.
     """
 
+    # Calculate difference between old and new schedule hours/costs, schedules
+    # only in old hours cost were removed or moved to another workweek
+    new_schedule_hours_cost = new_hours_cost['schedule_hours_costs']
+    old_schedule_hours_cost = old_hours_cost['schedule_hours_costs']
+    for schedule_id in old_schedule_hours_cost:
+        if schedule_id not in new_schedule_hours_cost:
+            new_schedule_hours_cost[schedule_id] = dict((key, 0) for key in 
+                                                        old_schedule_hours_cost[schedule_id])
+    for schedule_id in new_schedule_hours_cost:
+        if schedule_id not in old_schedule_hours_cost:
+            continue
+        for key, old_value in old_schedule_hours_cost[schedule_id].items():
+            if operator == 'subtract':
+                new_schedule_hours_cost[schedule_id][key] -= old_value
+            else:
+                new_schedule_hours_cost[schedule_id][key] += old_value
+                
     # Calculate difference between old and new day hours/costs
     new_day_hours_cost = new_hours_cost['day_hours_costs']
     old_day_hours_cost = old_hours_cost['day_hours_costs']
@@ -732,17 +951,72 @@ def calculate_cost_delta(old_hours_cost, new_hours_cost, operator):
     new_month_cost = new_hours_cost['month_costs']
     old_month_cost = old_hours_cost['month_costs']
     for dep in new_month_cost:
-        old_dep_cost = old_month_cost[dep]['cost']
-        new_dep_cost = new_month_cost[dep]['cost']
-        
-        if operator == 'subtract':
-            new_hours_cost['month_costs'][dep]['cost'] = new_dep_cost - old_dep_cost
-        else:
-            new_hours_cost['month_costs'][dep]['cost'] = new_dep_cost + old_dep_cost
+        for key in ('cost', 'hours', 'overtime_hours'):
+            old_dep_value = old_month_cost[dep][key]
+            new_dep_value = new_month_cost[dep][key]
+            
+            if operator == 'subtract':
+                new_hours_cost['month_costs'][dep][key] = new_dep_value - old_dep_value
+            else:
+                new_hours_cost['month_costs'][dep][key] = new_dep_value + old_dep_value
             
     return new_hours_cost
       
     
+def merge_cost_deltas(cost_deltas):
+    """Combine cost deltas of several schedule changes into one delta.
+    
+    Unlike calculate_cost_delta, the deltas may be of different workweeks,
+    the combined delta has an item in workweek_hours_costs for each of them.
+    
+    Args:
+        cost_deltas: Non empty list of hours and costs deltas as returned by
+          calculate_cost_delta, all calculated for the same calendar month.
+    Returns:
+        A hours and costs delta containing the sum of the deltas, which are
+        left unchanged.
+    """
+    
+    merged = copy.deepcopy(cost_deltas[0])
+    for cost_delta in cost_deltas[1:]:
+        schedule_costs = merged['schedule_hours_costs']
+        for schedule_id, schedule_delta in cost_delta['schedule_hours_costs'].items():
+            if schedule_id not in schedule_costs:
+                schedule_costs[schedule_id] = dict(schedule_delta)
+            else:
+                for key in schedule_delta:
+                    schedule_costs[schedule_id][key] += schedule_delta[key]
+                    
+        day_costs = merged['day_hours_costs']
+        for day, day_delta in cost_delta['day_hours_costs'].items():
+            if day not in day_costs:
+                day_costs[day] = copy.deepcopy(day_delta)
+            else:
+                _add_dep_hours_costs(day_costs[day], day_delta)
+                
+        for week_delta in cost_delta['workweek_hours_costs']:
+            for week_costs in merged['workweek_hours_costs']:
+                if week_costs['date_range']['start'] == week_delta['date_range']['start']:
+                    _add_dep_hours_costs(week_costs['hours_cost'], week_delta['hours_cost'])
+                    break
+            else:
+                merged['workweek_hours_costs'].append(copy.deepcopy(week_delta))
+                
+        _add_dep_hours_costs(merged['month_costs'], cost_delta['month_costs'])
+        
+    return merged
+    
+    
+def _add_dep_hours_costs(hours_costs, delta):
+    """Add department hours and costs of delta to hours_costs in place."""
+    for dep, dep_delta in delta.items():
+        if dep not in hours_costs:
+            hours_costs[dep] = dict(dep_delta)
+        else:
+            for key in ('hours', 'overtime_hours', 'cost'):
+                hours_costs[dep][key] += dep_delta[key]
+      
+    
 def single_employee_costs(workweek_start, workweek_end, employee, schedules, 
                           departments, business_data, month, year):
     """Calculate costs of employee given workweek and schedules.
@@ -772,8 +1046,7 @@ def single_employee_costs(workweek_start, workweek_end, employee, schedules,
     employee_hours = {employee: single_employee_hours}
     
     # Calculate schedule costs
-    # Disabled for speed, will add if user wants specific functionality.
-    #calculate_schedule_costs(employee_hours, hours_and_costs['schedule_hours_costs'], business_data)
+    calculate_schedule_costs(employee_hours, hours_and_costs['schedule_hours_costs'])
         
     # Calculate day costs
     day_costs = calculate_day_costs(employee_hours, departments, business_data)
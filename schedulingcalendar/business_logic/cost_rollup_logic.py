@@ -0,0 +1,197 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import F
+from .cost_projection_logic import all_calendar_hours_and_costs, get_avg_monthly_revenues
+from .time_logic import get_workweeks_of_month
+from ..models import Schedule, Department, Employee, BusinessData, MonthlyCostRollup
+
+
+
+def get_cost_rollups(user, start_month, end_month):
+    """Return hours and costs of each department for a range of months.
+
+    Hours and costs of months are kept in MonthlyCostRollup rows, so a range
+    like a whole year is answered by summing up the cached rows of its
+    months. Only months without rows, or whose rows were marked dirty since
+    they were computed (See mark_cost_rollups_dirty), are computed again,
+    with all of their schedules fetched in a single query.
+
+    Args:
+        user: django authenticated manager user.
+        start_month: Python date of the first month of the range.
+        end_month: Python date of the last month of the range, inclusive.
+    Returns:
+        A dict containing a list of months, each with its average monthly
+        revenue and the hours and costs of every department and the total of
+        all departments, along with the sums of hours, costs and average
+        revenues over the range. Average revenues are -1 for months without
+        monthly revenue data points (See get_avg_monthly_revenue), those
+        months are left out of the summed average revenue.
+    """
+
+    months = get_months_in_range(start_month, end_month)
+    departments = Department.objects.filter(user=user).order_by('name')
+    rollups = _get_month_rollups(user, months, departments)
+    avg_revenues = get_avg_monthly_revenues(user)
+
+    names = dict((dep.id, dep.name) for dep in departments)
+    names['total'] = 'Total'
+    totals = dict((dep_id, _hours_costs(name)) for dep_id, name in names.items())
+    total_avg_revenue = -1
+    month_list = []
+    for month in months:
+        month_costs = {}
+        for dep_id, rollup in rollups[month].items():
+            month_costs[dep_id] = _hours_costs(names[dep_id], rollup.hours,
+                                               rollup.overtime_hours, rollup.cost)
+            for key in ('hours', 'overtime_hours', 'cost'):
+                totals[dep_id][key] += month_costs[dep_id][key]
+
+        avg_revenue = avg_revenues.get(month.month, -1)
+        if avg_revenue != -1:
+            total_avg_revenue = max(total_avg_revenue, 0) + avg_revenue
+        month_list.append({'month_year': month, 'avg_monthly_revenue': avg_revenue,
+                           'month_costs': month_costs})
+
+    return {'months': month_list, 'total_costs': totals,
+            'total_avg_revenue': total_avg_revenue}
+
+
+def mark_cost_rollups_dirty(user_id, months=None):
+    """Mark cached hours and costs of a user's months to be computed again.
+
+    Args:
+        user_id: Integer id of the managing user.
+        months: Iterable of Python dates of the first day of months. If None,
+            every month of the user is marked.
+    """
+
+    # Dirty rows are bumped as well, they may be being computed right now
+    rollups = MonthlyCostRollup.objects.filter(user=user_id)
+    if months is not None:
+        rollups = rollups.filter(month_year__in=list(months))
+    rollups.update(is_dirty=True, version=F('version') + 1)
+
+
+def get_rollup_months(start_dt, end_dt):
+    """Return months whose costs may depend on a schedule with given times.
+
+    The cost of a schedule depends on the other schedules of its workweek,
+    which may belong to the month before or after it, so every month within
+    a week of the schedule is returned.
+
+    Args:
+        start_dt: Python datetime of start of schedule.
+        end_dt: Python datetime of end of schedule.
+    Returns:
+        A set of Python dates of the first day of the months.
+    """
+
+    first = (start_dt - timedelta(7)).date()
+    last = (end_dt + timedelta(7)).date()
+    return set(get_months_in_range(first, last))
+
+
+def get_months_in_range(start_date, end_date):
+    """Return first days of all months from start_date's to end_date's."""
+    months = []
+    month = date(start_date.year, start_date.month, 1)
+    while month <= end_date:
+        months.append(month)
+        month = _next_month(month)
+    return months
+
+
+def _get_month_rollups(user, months, departments):
+    """Return a dict mapping months to dicts of department ids, or 'total',
+    to their clean MonthlyCostRollup, computing dirty or missing months.
+
+    Computed months are only saved if their rows are the same rows, with the
+    same versions, as when they were read. Rows marked dirty meanwhile stay
+    dirty, and months without rows get a dirty placeholder row before they
+    are computed, so that there is a row for schedules saved meanwhile to mark.
+    """
+
+    rollups = dict((month, {}) for month in months)
+    read_versions = defaultdict(set)
+    stale_months = set()
+    dep_ids = set(dep.id for dep in departments)
+    for rollup in MonthlyCostRollup.objects.filter(user=user, month_year__in=months):
+        if rollup.is_dirty:
+            stale_months.add(rollup.month_year)
+        rollups[rollup.month_year][rollup.department_id or 'total'] = rollup
+        read_versions[rollup.month_year].add((rollup.id, rollup.version))
+    for month in months:
+        if set(rollups[month]) != dep_ids | set(['total']):
+            stale_months.add(month)
+
+    if stale_months and departments:
+        for month in stale_months:
+            if not read_versions[month]:
+                placeholder = MonthlyCostRollup.objects.create(user=user, month_year=month,
+                                                               is_dirty=True)
+                read_versions[month].add((placeholder.id, placeholder.version))
+        computed = _compute_month_rollups(user, sorted(stale_months), departments)
+        with transaction.atomic():
+            current_versions = defaultdict(set)
+            current_rows = (MonthlyCostRollup.objects.select_for_update()
+                                                     .filter(user=user, month_year__in=stale_months)
+                                                     .values_list('id', 'version', 'month_year'))
+            for rollup_id, version, month in current_rows:
+                current_versions[month].add((rollup_id, version))
+            unchanged = [month for month in stale_months
+                         if current_versions[month] == read_versions[month]]
+            if unchanged:
+                MonthlyCostRollup.objects.filter(user=user, month_year__in=unchanged).delete()
+                MonthlyCostRollup.objects.bulk_create([rollup for rollup in computed
+                                                       if rollup.month_year in unchanged])
+        for rollup in computed:
+            rollups[rollup.month_year][rollup.department_id or 'total'] = rollup
+
+    return rollups
+
+
+def _compute_month_rollups(user, months, departments):
+    """Return unsaved MonthlyCostRollup objects for the months, with the
+    same hours and costs as the calendar of each month displays, with the
+    schedules of all months fetched in a single query."""
+
+    business_data = BusinessData.objects.get(user=user)
+    employees = list(Employee.objects.filter(user=user))
+    workweek_bounds = []
+    for m in months:
+        workweeks = get_workweeks_of_month(m.year, m.month, business_data)
+        workweek_bounds.append((workweeks[0]['start'], workweeks[-1]['end']))
+    schedules = list(Schedule.objects.select_related('department', 'employee')
+                                     .filter(user=user,
+                                             end_datetime__gt=workweek_bounds[0][0],
+                                             start_datetime__lte=workweek_bounds[-1][1])
+                                     .order_by('start_datetime', 'end_datetime'))
+
+    rollups = []
+    for month, (lower_bound_dt, upper_bound_dt) in zip(months, workweek_bounds):
+        month_schedules = [s for s in schedules if s.end_datetime > lower_bound_dt
+                                                and s.start_datetime <= upper_bound_dt]
+        hours_and_costs = all_calendar_hours_and_costs(user, departments, month_schedules,
+                                                       employees, month.month, month.year,
+                                                       business_data)
+        for dep_id, month_costs in hours_and_costs['month_costs'].items():
+            rollups.append(MonthlyCostRollup(user=user, month_year=month,
+                                             department_id=None if dep_id == 'total' else dep_id,
+                                             hours=month_costs['hours'],
+                                             overtime_hours=month_costs['overtime_hours'],
+                                             cost=month_costs['cost']))
+    return rollups
+
+
+def _hours_costs(name, hours=0, overtime_hours=0, cost=0):
+    """Return hours and costs dict in the format of month_costs."""
+    return {'name': name, 'hours': hours, 'overtime_hours': overtime_hours, 'cost': cost}
+
+
+def _next_month(month):
+    """Return first day of the month after the given first day of month."""
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
@@ -0,0 +1,175 @@
+import json
+from datetime import date
+from django.db.models import F
+from .cost_projection_logic import all_calendar_hours_and_costs, get_month_cost_schedules
+from ..models import CalendarCostSnapshot
+
+
+
+def get_calendar_hours_and_costs(user, departments, employees, month, year,
+                                 business_data):
+    """Return hours and costs of a calendar month, from its snapshot if fresh.
+
+    Same as all_calendar_hours_and_costs, except that the result is stored in
+    a CalendarCostSnapshot of the month. Views editing schedules keep the
+    snapshot up to date with the cost deltas they calculate anyway (See
+    apply_cost_delta), so the month only has to be recalculated when the
+    snapshot is missing or was marked stale by other changes, in which case
+    its schedules are fetched (See get_month_cost_schedules).
+
+    Args:
+        user: Django authenticated user.
+        departments: All departments for user.
+        employees: All employees belonging to user.
+        month: Integer value of month.
+        year: Integer value of year.
+        business_data: Business settings the user has.
+    Returns:
+        A dict containing the hours and costs of schedules, days, workweeks,
+        and month for every department the user has, with keys as strings
+        like after a round trip through json.
+    """
+
+    month_year = date(year, month, 1)
+    snapshot = CalendarCostSnapshot.objects.filter(user=user, month_year=month_year).first()
+    if snapshot and not snapshot.is_stale:
+        return json.loads(snapshot.hours_and_costs)
+    if snapshot is None:
+        # Created stale before calculating, so there is a version for
+        # schedules edited meanwhile to bump
+        snapshot, created = CalendarCostSnapshot.objects.get_or_create(
+            user=user, month_year=month_year, defaults={'is_stale': True})
+
+    schedules = get_month_cost_schedules(user, year, month, business_data)
+    hours_and_costs = all_calendar_hours_and_costs(user, departments, schedules, employees,
+                                                   month, year, business_data)
+    hours_and_costs_json = json.dumps(hours_and_costs)
+    # Schedules edited while calculating bump the version, leaving it stale
+    (CalendarCostSnapshot.objects.filter(pk=snapshot.pk, version=snapshot.version)
+                                 .update(hours_and_costs=hours_and_costs_json,
+                                         version=F('version') + 1, is_stale=False))
+
+    return json.loads(hours_and_costs_json)
+
+
+def begin_cost_delta(user, cal_date, schedules):
+    """Prepare to apply the cost delta of changing schedules to the snapshot
+    of the calendar month, before the changes are saved.
+
+    If the month has a fresh snapshot, the schedules are marked so that
+    saving or deleting them does not mark it stale (See signals.py), while
+    snapshots of other months they affect still are. Otherwise saving them
+    bumps the version of a stale snapshot, so a recalculation of the month
+    that started before the save is not stored as fresh. The version of the
+    snapshot is read before saving so that a snapshot recalculated in
+    between, already containing the changes, does not get them applied
+    twice.
+
+    Args:
+        user: Django authenticated user.
+        cal_date: Python date in month of calendar the delta is calculated for.
+        schedules: Schedule model objects that will be changed.
+    Returns:
+        Integer version to pass on to apply_cost_delta, or None if there is
+        no fresh snapshot.
+    """
+
+    month_year = date(cal_date.year, cal_date.month, 1)
+    version = (CalendarCostSnapshot.objects.filter(user=user, month_year=month_year,
+                                                   is_stale=False)
+                                           .values_list('version', flat=True).first())
+    if version is not None:
+        for schedule in schedules:
+            schedule._cost_delta_month = month_year
+    return version
+
+
+def apply_cost_delta(user, cal_date, version, cost_delta):
+    """Add cost delta of a schedule change to the calendar month's snapshot.
+
+    The delta is added the same way the calendar adds it to the hours and
+    costs it displays. If the snapshot changed since version was read it is
+    marked stale instead.
+
+    Args:
+        user: Django authenticated user.
+        cal_date: Python date in month of calendar the delta was calculated for.
+        version: Version of the snapshot before the change was saved (See
+            begin_cost_delta), or None if it had no fresh snapshot.
+        cost_delta: Hours and costs delta as returned by calculate_cost_delta.
+    """
+
+    if version is None:
+        return
+    month_year = date(cal_date.year, cal_date.month, 1)
+    snapshots = CalendarCostSnapshot.objects.filter(user=user, month_year=month_year)
+    snapshot = snapshots.filter(version=version, is_stale=False).first()
+    if snapshot:
+        hours_and_costs = json.loads(snapshot.hours_and_costs)
+        # Keys of the delta become strings, same as the snapshot's
+        add_cost_delta(hours_and_costs, json.loads(json.dumps(cost_delta)))
+        updated = snapshots.filter(version=version).update(
+            hours_and_costs=json.dumps(hours_and_costs), version=version + 1)
+        if updated:
+            return
+    mark_cost_snapshots_stale(user.id, [month_year])
+
+
+def add_cost_delta(hours_and_costs, cost_delta):
+    """Add hours and costs of cost_delta to hours_and_costs in place.
+
+    Mirrors updateHoursAndCost of the calendar's javascript.
+    """
+
+    schedule_costs = hours_and_costs['schedule_hours_costs']
+    for schedule_id, schedule_delta in cost_delta['schedule_hours_costs'].items():
+        if schedule_id not in schedule_costs:
+            schedule_costs[schedule_id] = schedule_delta
+            continue
+        for key in schedule_delta:
+            schedule_costs[schedule_id][key] += schedule_delta[key]
+        # Removed schedules, or ones moved out of the month's workweeks
+        if abs(schedule_costs[schedule_id]['duration']) < 1e-9:
+            del schedule_costs[schedule_id]
+
+    day_costs = hours_and_costs['day_hours_costs']
+    for day, day_delta in cost_delta['day_hours_costs'].items():
+        if day not in day_costs:
+            day_costs[day] = day_delta
+        else:
+            _add_hours_costs(day_costs[day], day_delta)
+
+    # Deltas combined by merge_cost_deltas have several workweeks
+    for week_delta in cost_delta['workweek_hours_costs']:
+        for week_costs in hours_and_costs['workweek_hours_costs']:
+            if week_costs['date_range']['start'] == week_delta['date_range']['start']:
+                _add_hours_costs(week_costs['hours_cost'], week_delta['hours_cost'])
+                break
+
+    month_costs = hours_and_costs['month_costs']
+    for dep, dep_delta in cost_delta['month_costs'].items():
+        month_costs[dep]['cost'] += dep_delta['cost']
+        month_costs[dep]['hours'] += dep_delta['hours']
+        month_costs[dep]['overtime_hours'] += dep_delta['overtime_hours']
+
+
+def mark_cost_snapshots_stale(user_id, months=None):
+    """Mark cost snapshots of a user's calendar months to be recalculated.
+
+    Args:
+        user_id: Integer id of the managing user.
+        months: Iterable of Python dates of the first day of months. If None,
+            every month of the user is marked.
+    """
+
+    snapshots = CalendarCostSnapshot.objects.filter(user=user_id)
+    if months is not None:
+        snapshots = snapshots.filter(month_year__in=list(months))
+    snapshots.update(is_stale=True, version=F('version') + 1)
+
+
+def _add_hours_costs(hours_costs, delta):
+    """Add department hours and costs of delta to hours_costs in place."""
+    for dep, dep_delta in delta.items():
+        for key in ('hours', 'overtime_hours', 'cost'):
+            hours_costs[dep][key] += dep_delta[key]
@@ -0,0 +1,334 @@
+import bisect
+import pytz
+from datetime import date, datetime, time, timedelta
+from django.db import connection
+from django.db.models import FloatField, Func
+from django.utils import timezone
+from .time_logic import epoch_seconds
+from ..models import Schedule, StaffingRule
+
+
+DEFAULT_SLOT_MINUTES = 15
+SLOT_MINUTES_CHOICES = (5, 10, 15, 20, 30, 60)
+# Database vendors that convert datetimes to seconds (See EpochSeconds)
+EPOCH_SECONDS_VENDORS = ('sqlite', 'postgresql')
+
+
+class EpochSeconds(Func):
+    """Seconds since the epoch of a datetime column as a float, computed by
+    the database. Supported on SQLite and PostgreSQL."""
+    arity = 1
+
+
+    def __init__(self, expression):
+        super(EpochSeconds, self).__init__(expression, output_field=FloatField())
+
+
+    def as_sqlite(self, compiler, connection):
+        # Rounded to milliseconds so whole seconds stay exact
+        template = 'ROUND((julianday(%(expressions)s) - 2440587.5) * 86400.0, 3)'
+        return self.as_sql(compiler, connection, template=template)
+
+
+    def as_postgresql(self, compiler, connection):
+        # Newer versions extract a numeric, which would be fetched as Decimal
+        template = 'CAST(EXTRACT(EPOCH FROM %(expressions)s) AS double precision)'
+        return self.as_sql(compiler, connection, template=template)
+
+
+
+def get_department_coverage(user, department_id, month_year,
+                            slot_minutes=DEFAULT_SLOT_MINUTES, requirements=()):
+    """Return headcount of a department for every time slot of a month.
+
+    Args:
+        user: Django authenticated manager user.
+        department_id: Integer id of department.
+        month_year: Python date of the first day of the month.
+        slot_minutes: Integer length of time slots, dividing a day evenly.
+        requirements: Iterable of staffing requirements, each a dict of the
+            'weekdays' (0 is monday) it applies to, the 'start' and 'end'
+            times it applies between and the minimum 'headcount'. An end
+            time not after the start time means the end of the day.
+    Returns:
+        A dict containing the dates of the month, the start times of slots,
+        a slots x days matrix of headcounts, the matching matrix of target
+        headcounts (None if there are no requirements) and the list of
+        understaffed windows (See get_understaffed_windows).
+    """
+
+    days, day_starts, dst_changes = get_month_day_starts(month_year)
+    schedules = (Schedule.objects.filter(user=user, department=department_id,
+                                         employee__isnull=False,
+                                         end_datetime__gt=day_start_dt(days[0]),
+                                         start_datetime__lt=day_start_dt(days[-1] + timedelta(1))))
+    headcount = calculate_coverage(get_interval_seconds(schedules), day_starts,
+                                   slot_minutes, dst_changes)
+    target = None
+    windows = []
+    if requirements:
+        target = compile_requirements(requirements, days, slot_minutes)
+        windows = get_understaffed_windows(headcount, target, days, slot_minutes)
+
+    slots_per_day = 1440 // slot_minutes
+    return {'month_year': month_year, 'department': department_id,
+            'slot_minutes': slot_minutes, 'days': days,
+            'slots': [_slot_time(i, slot_minutes) for i in range(slots_per_day)],
+            'headcount': _slots_by_days(headcount, slots_per_day),
+            'target': _slots_by_days(target, slots_per_day) if target else None,
+            'understaffed': windows}
+
+
+def get_staffing_violations(user, department_id, month_year,
+                            slot_minutes=DEFAULT_SLOT_MINUTES):
+    """Return windows of a month where a department breaks its staffing rules.
+
+    The rules are compiled into requirements for every slot of the month and
+    checked against the month's coverage in a single sweep, so the cost does
+    not grow with the number of schedules in a slot or of rules overlapping.
+    If the department has no rules nothing else is queried.
+
+    Args:
+        user: Django authenticated manager user.
+        department_id: Integer id of department.
+        month_year: Python date of the first day of the month.
+        slot_minutes: Integer length of time slots, dividing a day evenly.
+    Returns:
+        A list of understaffed windows (See get_understaffed_windows).
+    """
+
+    requirements = get_staffing_requirements(user, department_id)
+    if not requirements:
+        return []
+    coverage = get_department_coverage(user, department_id, month_year,
+                                       slot_minutes, requirements)
+    return coverage['understaffed']
+
+
+def get_staffing_requirements(user, department_id):
+    """Return staffing rules of a department as requirements for coverage.
+
+    Args:
+        user: Django authenticated manager user.
+        department_id: Integer id of department.
+    Returns:
+        A list of requirement dicts (See get_department_coverage).
+    """
+
+    rules = StaffingRule.objects.filter(user=user, department=department_id)
+    return [{'weekdays': rule.get_weekdays(), 'start': rule.start_time,
+             'end': rule.end_time, 'headcount': rule.headcount} for rule in rules]
+
+
+def get_interval_seconds(schedules):
+    """Return start and end times of schedules as seconds since the epoch.
+
+    Parsing thousands of datetimes fetched from the database, and making
+    them timezone aware, takes far longer than the coverage sweep itself, so
+    where supported the database converts them to seconds instead.
+
+    Args:
+        schedules: Queryset of schedules.
+    Returns:
+        A list of (start, end) tuples of float seconds since the epoch.
+    """
+
+    if connection.vendor in EPOCH_SECONDS_VENDORS:
+        return list(schedules.annotate(start_seconds=EpochSeconds('start_datetime'),
+                                       end_seconds=EpochSeconds('end_datetime'))
+                             .values_list('start_seconds', 'end_seconds'))
+    return [(epoch_seconds(start), epoch_seconds(end))
+            for start, end in schedules.values_list('start_datetime', 'end_datetime')]
+
+
+def calculate_coverage(intervals, day_starts, slot_minutes, dst_changes=None):
+    """Calculate how many intervals overlap each time slot of consecutive days.
+
+    Each interval adds 1 at its first slot and subtracts 1 after its last
+    slot of a difference array, whose running sum is the headcount, so the
+    cost is one step per interval plus one per slot no matter how long the
+    intervals are. A slot counts an interval overlapping any part of it.
+    Days are split into slots of local time, so on days where daylight
+    saving time starts the slots of the skipped hour stay empty, and on days
+    it ends the repeated hour is counted in the same slots.
+
+    Args:
+        intervals: Iterable of (start, end) tuples of seconds since the
+            epoch (See get_interval_seconds).
+        day_starts: Sorted list of the starts of days as seconds since the
+            epoch, with the start of the day after the last day at the end
+            (See get_month_day_starts).
+        slot_minutes: Integer length of time slots, dividing a day evenly.
+        dst_changes: Optional dict of indexes of days where daylight saving
+            time changes to the time of the change and the seconds local time
+            moves by (See get_month_day_starts).
+    Returns:
+        A list of headcounts for every slot of every day, day by day.
+    """
+
+    slots_per_day = 1440 // slot_minutes
+    slot_seconds = slot_minutes * 60
+    num_slots = (len(day_starts) - 1) * slots_per_day
+    first_start = day_starts[0]
+    last_end = day_starts[-1]
+    dst_changes = dst_changes or {}
+    diff = [0] * (num_slots + 1)
+
+    def seconds_into_day(day, t):
+        """Return local seconds from start of day to t."""
+        seconds = t - day_starts[day]
+        if day in dst_changes and t >= dst_changes[day][0]:
+            seconds += dst_changes[day][1]
+        return seconds
+
+    for start, end in intervals:
+        start = max(start, first_start)
+        end = min(end, last_end)
+        if start >= end:
+            continue
+        day = bisect.bisect_right(day_starts, start) - 1
+        slot = int(seconds_into_day(day, start) // slot_seconds)
+        diff[day * slots_per_day + min(slot, slots_per_day - 1)] += 1
+        day = bisect.bisect_left(day_starts, end) - 1
+        slot = int(-(-seconds_into_day(day, end) // slot_seconds))
+        diff[day * slots_per_day + min(slot, slots_per_day)] -= 1
+
+    headcount = [0] * num_slots
+    running = 0
+    for i in xrange(num_slots):
+        running += diff[i]
+        headcount[i] = running
+    return headcount
+
+
+def compile_requirements(requirements, days, slot_minutes):
+    """Return minimum headcount required for every slot of days, day by day.
+
+    Where requirements overlap the highest headcount is required.
+
+    Args:
+        requirements: Iterable of staffing requirements (See
+            get_department_coverage).
+        days: List of consecutive Python dates.
+        slot_minutes: Integer length of time slots, dividing a day evenly.
+    Returns:
+        A list of required headcounts for every slot of every day.
+    """
+
+    slots_per_day = 1440 // slot_minutes
+    target = [0] * (len(days) * slots_per_day)
+    for requirement in requirements:
+        first_slot = _time_slot(requirement['start'], slot_minutes)
+        last_slot = _time_slot(requirement['end'], slot_minutes, ceil=True)
+        if last_slot <= first_slot:
+            last_slot = slots_per_day
+        weekdays = set(requirement['weekdays'])
+        headcount = requirement['headcount']
+        for i, day in enumerate(days):
+            if day.weekday() not in weekdays:
+                continue
+            start = i * slots_per_day + first_slot
+            end = i * slots_per_day + last_slot
+            target[start:end] = [max(x, headcount) for x in target[start:end]]
+    return target
+
+
+def get_understaffed_windows(headcount, target, days, slot_minutes):
+    """Return windows of consecutive slots with fewer people than required.
+
+    Args:
+        headcount: List of headcounts of every slot (See calculate_coverage).
+        target: List of required headcounts of every slot (See
+            compile_requirements).
+        days: List of the consecutive Python dates of the slots.
+        slot_minutes: Integer length of time slots, dividing a day evenly.
+    Returns:
+        A list of dicts with the date, start and end time strings, lowest
+        headcount and required headcount of each window. A window ends where
+        the required headcount changes or the day ends.
+    """
+
+    slots_per_day = 1440 // slot_minutes
+    windows = []
+    window = None
+    for i in xrange(len(headcount)):
+        slot = i % slots_per_day
+        if slot == 0 or (window and target[i] != window['target']):
+            window = None
+        if headcount[i] >= target[i]:
+            window = None
+            continue
+        if window is None:
+            window = {'date': days[i // slots_per_day],
+                      'start': _slot_time(slot, slot_minutes),
+                      'min_headcount': headcount[i], 'target': target[i]}
+            windows.append(window)
+        window['end'] = _slot_time(slot + 1, slot_minutes)
+        window['min_headcount'] = min(window['min_headcount'], headcount[i])
+    return windows
+
+
+def get_month_day_starts(month_year):
+    """Return days of a month and when they start in seconds since the epoch.
+
+    Returns:
+        A tuple of the list of dates of the days of the month, the list of
+        the starts of those days and of the day after, and a dict of indexes
+        of days where daylight saving time changes to a tuple of the time of
+        the change and the seconds local time moves by at the change.
+    """
+    days = []
+    day = month_year.replace(day=1)
+    while day.month == month_year.month:
+        days.append(day)
+        day += timedelta(1)
+    day_start_dts = [day_start_dt(d) for d in days + [day]]
+    day_starts = [epoch_seconds(dt) for dt in day_start_dts]
+
+    dst_changes = {}
+    for i in range(len(days)):
+        before = day_start_dts[i].utcoffset()
+        after = day_start_dts[i + 1].utcoffset()
+        if before != after:
+            dst_changes[i] = (_find_utcoffset_change(day_starts[i], day_starts[i + 1]),
+                              (after - before).total_seconds())
+    return days, day_starts, dst_changes
+
+
+def _find_utcoffset_change(start, end):
+    """Return first second between start and end, in seconds since the
+    epoch, with the local UTC offset of end."""
+    tz = timezone.get_current_timezone()
+    def utcoffset(t):
+        return datetime.fromtimestamp(t, pytz.utc).astimezone(tz).utcoffset()
+    offset_after = utcoffset(end)
+    while end - start > 1:
+        middle = (start + end) // 2
+        if utcoffset(middle) == offset_after:
+            end = middle
+        else:
+            start = middle
+    return end
+
+
+def day_start_dt(day):
+    """Return aware datetime of the local start of a day."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _time_slot(t, slot_minutes, ceil=False):
+    """Return index of slot starting at or, if ceil, ending at or after t."""
+    minutes = t.hour * 60 + t.minute
+    if ceil:
+        return -(-minutes // slot_minutes)
+    return minutes // slot_minutes
+
+
+def _slot_time(slot, slot_minutes):
+    """Return 'HH:MM' string of start of slot, '24:00' for end of the day."""
+    return '%02d:%02d' % divmod(slot * slot_minutes, 60)
+
+
+def _slots_by_days(values, slots_per_day):
+    """Turn a day by day list of slot values into a slots x days matrix."""
+    return [list(values[slot::slots_per_day]) for slot in range(slots_per_day)]
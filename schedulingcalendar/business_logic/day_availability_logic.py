@@ -0,0 +1,342 @@
+from datetime import datetime, timedelta, time
+from django.db.models import Q
+from django.utils import timezone
+from .availability_logic import (get_overlapping_repeat_times, _calculate_availability_score,
+                                 _calculate_dep_priority_score, _calculate_desired_times_score,
+                                 _calculate_desired_hours_score)
+from .cache_logic import LRUCache
+from .fatigue_logic import get_fatigue_window, get_fatigue_conflicts
+from .overlap_logic import filter_overlapping
+from .time_logic import get_start_end_of_workweek, time_dur_in_hours
+from ..models import (Schedule, DepartmentMembership, Vacation, Absence,
+                      RepeatUnavailability, DesiredTime, BusinessData)
+
+
+# Snapshots are keyed by data version, so the TTL only bounds staleness when
+# processes do not share the cache holding the data versions.
+day_snapshot_cache = LRUCache(max_size=128, ttl=30)
+
+
+
+def get_day_availability_snapshot(user, department, date):
+    """Collect everything needed to rank the department's employees for any
+    schedule on the given date.
+
+    Instead of get_availability querying the conflicts of one employee for one
+    schedule, the snapshot fetches the schedules, vacations, absences, repeat
+    unavailabilities and desired times of every member of the department that
+    could possibly conflict with a schedule on the date in one query each.
+    Schedules of the workweeks containing the date are included as well so
+    that the hours each employee works that workweek can be summed up without
+    further queries, and so are schedules near enough to the date to break
+    fatigue rules with a schedule on it (See get_fatigue_window). A schedule on the date is then ranked in memory by
+    get_eligibles_from_snapshot, which gives the same results as get_eligibles.
+
+    Args:
+        user: django authenticated manager user.
+        department: Department model object.
+        date: Python date of the day.
+    Returns:
+        A dict containing the date, business data and a list of members. Each
+        member is a dict containing the department membership, the employee
+        and lists of the employee's model objects that may conflict.
+    """
+
+    business_data = BusinessData.objects.get(user=user)
+    time_zone = timezone.get_default_timezone()
+    day_start = time_zone.localize(datetime.combine(date, time.min))
+    day_end = time_zone.localize(datetime.combine(date + timedelta(1), time.min))
+    # A schedule's workweek is that of its start, which may be any time of day
+    first_workweek = get_start_end_of_workweek(day_start, business_data)
+    last_workweek = get_start_end_of_workweek(day_end - timedelta(seconds=1), business_data)
+    # Schedules starting on the date may end the day after
+    window = get_fatigue_window(business_data)
+    window = window + timedelta(1) if window is not None else timedelta(0)
+
+    dep_memberships = (DepartmentMembership.objects.select_related('employee')
+                                                   .filter(user=user, department=department)
+                                                   .order_by('id'))
+    members = []
+    members_by_employee = {}
+    for dep_mem in dep_memberships:
+        member = {'dep_membership': dep_mem, 'employee': dep_mem.employee,
+                  'schedules': [], 'vacations': [], 'absences': [],
+                  'repeat_unavailabilities': [], 'desired_times': []}
+        members.append(member)
+        members_by_employee[dep_mem.employee_id] = member
+    employee_ids = list(members_by_employee)
+
+    schedules = (Schedule.objects.filter(user=user, employee__in=employee_ids)
+                                 .filter(Q(start_datetime__gte=first_workweek['start'],
+                                           start_datetime__lte=last_workweek['end']) |
+                                         Q(start_datetime__lt=day_end + window,
+                                           end_datetime__gt=day_start - window))
+                                 .order_by('start_datetime', 'end_datetime'))
+    vacations = filter_overlapping(Vacation.objects.filter(user=user, employee__in=employee_ids),
+                                   day_start, day_end)
+    absences = filter_overlapping(Absence.objects.filter(user=user, employee__in=employee_ids),
+                                  day_start, day_end)
+    repeat_unavailabilities = RepeatUnavailability.objects.filter(user=user,
+                                                                  employee__in=employee_ids,
+                                                                  weekday=date.weekday())
+    desired_times = DesiredTime.objects.filter(user=user, employee__in=employee_ids,
+                                               weekday=date.weekday())
+
+    for key, objects in [('schedules', schedules), ('vacations', vacations.order_by('id')),
+                         ('absences', absences.order_by('id')),
+                         ('repeat_unavailabilities', repeat_unavailabilities.order_by('id')),
+                         ('desired_times', desired_times.order_by('id'))]:
+        for obj in objects:
+            members_by_employee[obj.employee_id][key].append(obj)
+
+    return {'date': date, 'department': department, 'business_data': business_data,
+            'members': members, 'workweek_hours': {}}
+
+
+def get_cached_day_availability_snapshot(user, department, date, data_version):
+    """Return day availability snapshot, reusing one computed for the same
+    version of the user's data if available.
+
+    Args:
+        user: django authenticated manager user.
+        department: Department model object.
+        date: Python date of the day.
+        data_version: Integer version of user's data (See get_data_version).
+    Returns:
+        Day availability snapshot (See get_day_availability_snapshot).
+    """
+
+    key = (user.id, department.id, date, data_version)
+    snapshot = day_snapshot_cache.get(key)
+    if snapshot is None:
+        snapshot = get_day_availability_snapshot(user, department, date)
+        day_snapshot_cache.set(key, snapshot)
+    return snapshot
+
+
+def get_eligibles_from_snapshot(snapshot, schedule):
+    """Return a sorted list of eligible employees along with info.
+
+    Equivalent to get_eligibles, except that availability is computed in
+    memory from the day availability snapshot of the schedule's department
+    and date, so no queries are made.
+
+    Args:
+        snapshot: Day availability snapshot of the schedule's department and
+            date (See get_day_availability_snapshot).
+        schedule: schedule to calculate employee eligability for assignment.
+    Returns:
+        A dict containing the schedule and eligible list, see get_eligibles.
+    """
+
+    eligables = []
+
+    for member in snapshot['members']:
+        employee = member['employee']
+        availability = get_availability_from_snapshot(snapshot, member, schedule)
+        # Get the multiple-criterion tuple for sorting an employee
+        availability_score = _calculate_availability_score(availability)
+        dep_priority_score = _calculate_dep_priority_score(member['dep_membership'])
+        desired_times_score = _calculate_desired_times_score(availability['Desired Times'],
+                                                             schedule)
+        desired_hours_score = _calculate_desired_hours_score(availability['Hours Scheduled'],
+                                                             employee)
+        sorting_score = (availability_score, dep_priority_score,
+                         desired_times_score, desired_hours_score)
+
+        eligables.append({'employee': employee,
+                          'availability': availability,
+                          'sorting_score': sorting_score})
+
+    eligables.sort(key=lambda e: e['sorting_score'])
+    return {'schedule': schedule, 'eligables': eligables}
+
+
+def get_availability_from_snapshot(snapshot, member, schedule):
+    """Create the availability dictionary for member of snapshot given a schedule.
+
+    Args:
+        snapshot: Day availability snapshot of the schedule's department and
+            date (See get_day_availability_snapshot).
+        member: Member dict of the snapshot for the employee.
+        schedule: Schedule model object.
+    Returns:
+        Availability dict with the same keys and values as get_availability,
+        except that conflicts are lists instead of querysets.
+    """
+
+    employee = member['employee']
+    start_dt = schedule.start_datetime
+    end_dt = schedule.end_datetime
+    availability = {}
+
+    availability['(S)'] = [s for s in member['schedules']
+                           if s.start_datetime < end_dt and s.end_datetime > start_dt
+                           and (schedule.pk is None or s.pk != schedule.pk)]
+    availability['(V)'] = [v for v in member['vacations']
+                           if v.start_datetime < end_dt and v.end_datetime > start_dt]
+    availability['(A)'] = [a for a in member['absences']
+                           if a.start_datetime < end_dt and a.end_datetime > start_dt]
+    availability['(U)'] = get_overlapping_repeat_times(member['repeat_unavailabilities'],
+                                                       schedule)
+    availability['(R)'], availability['(C)'] = [], 0
+    if get_fatigue_window(snapshot['business_data']) is not None:
+        availability['(R)'], availability['(C)'] = get_fatigue_conflicts(member['schedules'],
+                                                                         schedule,
+                                                                         snapshot['business_data'])
+    availability['Desired Times'] = get_overlapping_repeat_times(member['desired_times'],
+                                                                 schedule)
+
+    curr_hours = _get_workweek_hours(snapshot, member, start_dt)
+    if schedule.employee_id == employee.id:
+        total_workweek_hours = curr_hours
+    else:
+        total_workweek_hours = curr_hours + time_dur_in_hours(start_dt, end_dt, None, None,
+                                                              employee.min_time_for_break,
+                                                              employee.break_time_in_min)
+    availability['Hours Scheduled'] = total_workweek_hours
+    availability['curr_hours'] = curr_hours
+    availability['(O)'] = total_workweek_hours > snapshot['business_data'].overtime
+
+    return availability
+
+
+def _get_workweek_hours(snapshot, member, dt):
+    """Return hours member works in the workweek containing dt, summed once
+    per workweek and employee and then remembered by the snapshot."""
+    workweek = get_start_end_of_workweek(dt, snapshot['business_data'])
+    key = (member['employee'].id, workweek['start'])
+    if key not in snapshot['workweek_hours']:
+        employee = member['employee']
+        hours = 0
+        for schedule in member['schedules']:
+            if workweek['start'] <= schedule.start_datetime <= workweek['end']:
+                hours += time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
+                                           None, None, employee.min_time_for_break,
+                                           employee.break_time_in_min)
+        snapshot['workweek_hours'][key] = hours
+    return snapshot['workweek_hours'][key]
+
+
+def get_day_availability_matrix(snapshot):
+    """Condense day availability snapshot into a compact matrix for the calendar.
+
+    Every conflict is given as a [start, end, pk] interval in minutes since the
+    start of the day, clipped to the day, so the browser can rank the
+    department's employees for any schedule that day the same way
+    get_eligibles does without another request:
+    
+    an employee is in conflict with a schedule for each kind of conflict with
+    an interval overlapping the schedule, desired times are scored by their
+    overlap with the schedule, and the schedule's hours are added to the
+    hours of the workweek containing the schedule's start, given by the
+    workweek whose start minute is the last one not after it.
+
+    For fatigue rules, a schedule lacks rest with the schedule of each '(R)'
+    interval it overlaps, unless it overlaps the schedule itself, and the
+    employee would work the consecutive days before and after the date plus
+    the date itself (See get_fatigue_conflicts).
+
+    Args:
+        snapshot: Day availability snapshot (See get_day_availability_snapshot).
+    Returns:
+        A dict containing the date, the length of the day in minutes, the
+        overtime threshold, the fatigue rules, the workweeks overlapping the
+        day and a list of employees with their conflicts, desired times,
+        hours already worked and hours remaining before overtime in each
+        workweek.
+    """
+
+    business_data = snapshot['business_data']
+    rest = timedelta(hours=business_data.min_rest_hours)
+    time_zone = timezone.get_default_timezone()
+    day_start = time_zone.localize(datetime.combine(snapshot['date'], time.min))
+    day_end = time_zone.localize(datetime.combine(snapshot['date'] + timedelta(1), time.min))
+    day_length = _minutes_between(day_start, day_end)
+
+    # The day belongs to one workweek, or two if a workweek starts during it
+    workweek_starts = [day_start]
+    next_workweek_start = get_start_end_of_workweek(day_start, business_data)['end']
+    next_workweek_start += timedelta(seconds=1)
+    if next_workweek_start < day_end:
+        workweek_starts.append(next_workweek_start)
+
+    employees = []
+    for member in snapshot['members']:
+        employee = member['employee']
+        dep_membership = member['dep_membership']
+        day_schedules = [s for s in member['schedules']
+                         if s.start_datetime < day_end and s.end_datetime > day_start]
+        workweek_hours = [_get_workweek_hours(snapshot, member, dt) for dt in workweek_starts]
+        rest_intervals = []
+        if rest:
+            rest_intervals = [[max(_minutes_between(day_start, s.start_datetime - rest), 0),
+                               min(_minutes_between(day_start, s.end_datetime + rest), day_length),
+                               s.id]
+                              for s in member['schedules']
+                              if s.start_datetime - rest < day_end
+                              and s.end_datetime + rest > day_start]
+
+        employees.append({
+            'id': employee.id,
+            'first_name': employee.first_name,
+            'last_name': employee.last_name,
+            'desired_hours': employee.desired_hours,
+            'min_time_for_break': employee.min_time_for_break,
+            'break_time_in_min': employee.break_time_in_min,
+            'priority': dep_membership.priority,
+            'seniority': dep_membership.seniority,
+            '(S)': _intervals(day_schedules, day_start, day_length),
+            '(V)': _intervals(member['vacations'], day_start, day_length),
+            '(A)': _intervals(member['absences'], day_start, day_length),
+            '(U)': _repeat_intervals(member['repeat_unavailabilities']),
+            '(R)': rest_intervals,
+            'consecutive_days': _consecutive_days(member['schedules'], snapshot['date'],
+                                                  business_data.max_consecutive_days),
+            'Desired Times': _repeat_intervals(member['desired_times']),
+            'workweek_hours': workweek_hours,
+            'remaining_hours': [business_data.overtime - hours for hours in workweek_hours],
+        })
+
+    return {'date': snapshot['date'], 'department': snapshot['department'].id,
+            'day_length': day_length, 'overtime': business_data.overtime,
+            'min_rest_hours': business_data.min_rest_hours,
+            'max_consecutive_days': business_data.max_consecutive_days,
+            'workweeks': [_minutes_between(day_start, dt) for dt in workweek_starts],
+            'employees': employees}
+
+
+def _consecutive_days(schedules, date, max_days):
+    """Return [before, after] numbers of consecutive days worked right before
+    and after date, counting at most max_days each way."""
+    days_worked = set(timezone.localtime(s.start_datetime).date() for s in schedules)
+    counts = []
+    for step in (timedelta(-1), timedelta(1)):
+        count = 0
+        while count < max_days and date + step * (count + 1) in days_worked:
+            count += 1
+        counts.append(count)
+    return counts
+
+
+def _minutes_between(start_dt, end_dt):
+    """Return whole minutes from start_dt to end_dt."""
+    return int((end_dt - start_dt).total_seconds() // 60)
+
+
+def _intervals(objects, day_start, day_length):
+    """Return [start, end, pk] minute intervals of objects clipped to the day."""
+    return [[max(_minutes_between(day_start, obj.start_datetime), 0),
+             min(_minutes_between(day_start, obj.end_datetime), day_length), obj.id]
+            for obj in objects]
+
+
+def _repeat_intervals(repeat_times):
+    """Return [start, end, pk] minute intervals of repeating times.
+
+    Only the time of a repeating time is meaningful, so it is placed on the
+    day the same way get_overlapping_repeat_times does.
+    """
+    return [[r.start_time.hour * 60 + r.start_time.minute,
+             r.end_time.hour * 60 + r.end_time.minute, r.id]
+            for r in repeat_times]
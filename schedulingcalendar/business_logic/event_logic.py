@@ -0,0 +1,137 @@
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from ..models import CalendarEvent
+
+
+SCHEDULES_SAVED = 'schedules_saved'
+SCHEDULES_REMOVED = 'schedules_removed'
+DAY_NOTE_HEADER_SAVED = 'day_note_header_saved'
+DAY_NOTE_BODY_SAVED = 'day_note_body_saved'
+CALENDAR_PUBLISHED = 'calendar_published'
+
+# Seconds between checks of the cached latest event id while a request waits
+# for new events (See settings.CALENDAR_EVENT_WAIT_SECONDS)
+CALENDAR_EVENT_POLL_SECONDS = 1
+LATEST_EVENT_KEY = 'latest_calendar_event:%s'
+# Seconds the latest event id stays cached, bounding how long processes that
+# do not share a cache backend miss events recorded by other processes
+LATEST_EVENT_TIMEOUT = 60
+# Events older than this are deleted, clients gone longer reload the calendar
+CALENDAR_EVENT_RETENTION = timedelta(hours=1)
+CALENDAR_EVENT_PRUNE_INTERVAL = 100
+CALENDAR_EVENT_BATCH_SIZE = 100
+
+
+
+def record_calendar_event(user, kind, data, client_id=''):
+    """Save a change to the user's calendars for clients to apply.
+
+    Views that change calendars record the change with the data they already
+    computed for their own response, like the cost delta, so clients showing
+    the same calendars can patch their state instead of reloading it. Every
+    CALENDAR_EVENT_PRUNE_INTERVAL events, events older than
+    CALENDAR_EVENT_RETENTION are deleted. The id of the event is cached as
+    the latest of the user, so polls for new events can be answered without
+    a query (See poll_calendar_events).
+
+    Args:
+        user: Django authenticated manager user.
+        kind: String kind of change, like SCHEDULES_SAVED.
+        data: Dict of the change, serializable by DjangoJSONEncoder.
+        client_id: String id of the client that made the change, sent by the
+            calendar in the X-Calendar-Client header.
+    Returns:
+        The saved CalendarEvent.
+    """
+
+    event = CalendarEvent.objects.create(user=user, kind=kind, client_id=client_id[:40],
+                                         data=json.dumps(data, cls=DjangoJSONEncoder))
+    cache.set(LATEST_EVENT_KEY % user.id, event.id, LATEST_EVENT_TIMEOUT)
+    if event.id % CALENDAR_EVENT_PRUNE_INTERVAL == 0:
+        oldest = timezone.now() - CALENDAR_EVENT_RETENTION
+        CalendarEvent.objects.filter(timestamp__lt=oldest).delete()
+    return event
+
+
+def get_calendar_events(user, last_event_id, kinds=None):
+    """Return the user's events after last_event_id, oldest first.
+
+    Args:
+        user: Django authenticated manager user.
+        last_event_id: Integer id of the last event the client received.
+        kinds: Optional list of kinds of events to return.
+    Returns:
+        A list of at most CALENDAR_EVENT_BATCH_SIZE CalendarEvents.
+    """
+
+    events = CalendarEvent.objects.filter(user=user, id__gt=last_event_id)
+    if kinds is not None:
+        events = events.filter(kind__in=kinds)
+    return list(events.order_by('id')[:CALENDAR_EVENT_BATCH_SIZE])
+
+
+def poll_calendar_events(user, last_event_id=None, kinds=None):
+    """Return the user's events after last_event_id.
+
+    Calendars poll for events every few seconds. Most polls find nothing new,
+    so the latest event id of the user is read from Django's cache first and
+    events are only queried if it is after last_event_id, or not cached.
+    Without a last event id no events are returned, the client just loaded
+    its calendar and only needs the id to continue from.
+
+    The request returns right away unless CALENDAR_EVENT_WAIT_SECONDS is set,
+    in which case it waits that long for new events, checking the cached id
+    every CALENDAR_EVENT_POLL_SECONDS with the database connection closed.
+    A waiting request holds on to its worker, so the setting is meant for
+    deployments with asynchronous workers, like gevent.
+
+    Args:
+        user: Django authenticated manager user.
+        last_event_id: Integer id of the last event the client received, or
+            None.
+        kinds: Optional list of kinds of events to return.
+    Returns:
+        A tuple of the list of CalendarEvents, oldest first, and the integer
+        id of the last event for the client to send with its next request.
+    """
+
+    latest_event_id = _get_latest_event_id(user)
+    if last_event_id is None:
+        return [], latest_event_id
+
+    events = []
+    if latest_event_id > last_event_id:
+        events = get_calendar_events(user, last_event_id, kinds)
+    deadline = time.time() + getattr(settings, 'CALENDAR_EVENT_WAIT_SECONDS', 0)
+    while not events and time.time() < deadline:
+        if not connection.in_atomic_block:
+            connection.close()
+        time.sleep(min(CALENDAR_EVENT_POLL_SECONDS, max(deadline - time.time(), 0)))
+        new_latest_event_id = _get_latest_event_id(user)
+        if new_latest_event_id != latest_event_id:
+            latest_event_id = new_latest_event_id
+            events = get_calendar_events(user, last_event_id, kinds)
+
+    if events:
+        last_event_id = events[-1].id
+    return events, last_event_id
+
+
+def _get_latest_event_id(user):
+    """Return integer id of the user's latest event, 0 if there are none,
+    caching it if it was not cached. The id is only added, so an event
+    recorded meanwhile is not overwritten by an older id."""
+    key = LATEST_EVENT_KEY % user.id
+    latest_event_id = cache.get(key)
+    if latest_event_id is None:
+        latest_event_id = (CalendarEvent.objects.filter(user=user)
+                                                .order_by('-id')
+                                                .values_list('id', flat=True).first()) or 0
+        cache.add(key, latest_event_id, LATEST_EVENT_TIMEOUT)
+    return latest_event_id
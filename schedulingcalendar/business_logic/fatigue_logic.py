@@ -0,0 +1,177 @@
+from datetime import timedelta
+from itertools import groupby
+from django.utils import timezone
+from .coverage_logic import day_start_dt
+from .overlap_logic import filter_overlapping
+from ..models import Schedule, BusinessData
+
+
+
+def get_fatigue_window(business_data):
+    """Return how far from a schedule other schedules can break fatigue rules.
+
+    A schedule breaks the rest rule with schedules ending or starting less
+    than min_rest_hours from it, and the consecutive days worked around it
+    are known from the schedules of max_consecutive_days days before and
+    after its day.
+
+    Args:
+        business_data: Business settings the user has.
+    Returns:
+        A timedelta, or None if the user has no fatigue rules.
+    """
+
+    if not (business_data.min_rest_hours or business_data.max_consecutive_days):
+        return None
+    return max(timedelta(hours=business_data.min_rest_hours),
+               timedelta(days=business_data.max_consecutive_days + 1))
+
+
+def get_fatigue_conflicts(schedules, schedule, business_data):
+    """Return fatigue rules an employee breaks if assigned to schedule.
+
+    Args:
+        schedules: Iterable of the employee's schedules overlapping the
+            fatigue window around schedule (See get_fatigue_window), may
+            include schedule itself.
+        schedule: Schedule model object.
+        business_data: Business settings the user has.
+    Returns:
+        A tuple of the list of schedules ending less than min_rest_hours
+        before schedule starts or starting less than min_rest_hours after it
+        ends, and the number of consecutive days the employee would work, or
+        0 if that is not more than max_consecutive_days. Days are counted up
+        to max_consecutive_days days before and after the schedule's day, the
+        days the window is sure to contain. Schedules overlapping schedule
+        are schedule conflicts, not rest conflicts.
+    """
+
+    start_dt = schedule.start_datetime
+    end_dt = schedule.end_datetime
+    rest = timedelta(hours=business_data.min_rest_hours)
+    too_close = []
+    days_worked = set()
+    for s in schedules:
+        if schedule.pk is not None and s.pk == schedule.pk:
+            continue
+        if rest and (start_dt - rest < s.end_datetime <= start_dt or
+                     end_dt <= s.start_datetime < end_dt + rest):
+            too_close.append(s)
+        days_worked.add(_local_date(s.start_datetime))
+
+    consecutive_days = 0
+    max_days = business_data.max_consecutive_days
+    if max_days:
+        day = _local_date(start_dt)
+        consecutive_days = 1
+        for step in (timedelta(-1), timedelta(1)):
+            next_day = day + step
+            while next_day in days_worked and abs((next_day - day).days) <= max_days:
+                consecutive_days += 1
+                next_day += step
+        if consecutive_days <= max_days:
+            consecutive_days = 0
+
+    return too_close, consecutive_days
+
+
+def find_fatigue_violations(schedules, business_data):
+    """Return fatigue rules broken by the schedules of an employee.
+
+    The schedules are checked in a single pass: each schedule only has to be
+    compared with the schedule ending last before it for the rest rule, and
+    with the day of the schedule before it for consecutive days.
+
+    Args:
+        schedules: List of the employee's schedules sorted by start.
+        business_data: Business settings the user has.
+    Returns:
+        A tuple of the list of (earlier, later) schedule pairs with less than
+        min_rest_hours between them, and the list of (first, last) dates of
+        runs of more than max_consecutive_days consecutive days worked.
+    """
+
+    rest = timedelta(hours=business_data.min_rest_hours)
+    max_days = business_data.max_consecutive_days
+    too_close = []
+    runs = []
+    latest = None
+    run = None
+    for schedule in schedules:
+        if (rest and latest is not None and
+                latest.end_datetime <= schedule.start_datetime < latest.end_datetime + rest):
+            too_close.append((latest, schedule))
+        if latest is None or schedule.end_datetime > latest.end_datetime:
+            latest = schedule
+
+        day = _local_date(schedule.start_datetime)
+        if run and day - run[1] <= timedelta(1):
+            run[1] = day
+        else:
+            if run and max_days and (run[1] - run[0]).days + 1 > max_days:
+                runs.append(tuple(run))
+            run = [day, day]
+    if run and max_days and (run[1] - run[0]).days + 1 > max_days:
+        runs.append(tuple(run))
+
+    return too_close, runs
+
+
+def get_fatigue_report(user, month_year):
+    """Return every fatigue rule broken by the schedules of a month.
+
+    Schedules of all employees are fetched in one query, sorted by employee
+    and start, so each employee is checked in a single pass over their
+    schedules (See find_fatigue_violations).
+
+    Args:
+        user: Django authenticated manager user.
+        month_year: Python date of the first day of the month.
+    Returns:
+        A dict containing the fatigue rules and a list of employees breaking
+        them, sorted by name. Each employee has a list of the schedules
+        starting in the month with too little rest before them, and a list
+        of the runs of too many consecutive days overlapping the month.
+    """
+
+    business_data = BusinessData.objects.get(user=user)
+    first_day = month_year.replace(day=1)
+    next_month = (first_day + timedelta(31)).replace(day=1)
+    report = {'month_year': first_day, 'min_rest_hours': business_data.min_rest_hours,
+              'max_consecutive_days': business_data.max_consecutive_days,
+              'employees': []}
+    window = get_fatigue_window(business_data)
+    if window is None:
+        return report
+
+    month_start = day_start_dt(first_day)
+    month_end = day_start_dt(next_month)
+    schedules = (filter_overlapping(Schedule.objects.select_related('employee')
+                                                    .filter(user=user, employee__isnull=False),
+                                    month_start - window, month_end + window)
+                 .order_by('employee', 'start_datetime', 'end_datetime'))
+
+    for employee_id, employee_schedules in groupby(schedules, lambda s: s.employee_id):
+        employee_schedules = list(employee_schedules)
+        too_close, runs = find_fatigue_violations(employee_schedules, business_data)
+        rest = [{'schedule': later.id, 'previous_schedule': earlier.id,
+                 'start': later.start_datetime, 'previous_end': earlier.end_datetime,
+                 'rest_hours': (later.start_datetime - earlier.end_datetime).total_seconds() / 3600.0}
+                for earlier, later in too_close
+                if month_start <= later.start_datetime < month_end]
+        consecutive_days = [{'start': first, 'end': last, 'days': (last - first).days + 1}
+                            for first, last in runs
+                            if first < next_month and last >= first_day]
+        if rest or consecutive_days:
+            employee = employee_schedules[0].employee
+            report['employees'].append({'id': employee.id, 'first_name': employee.first_name,
+                                        'last_name': employee.last_name, 'rest': rest,
+                                        'consecutive_days': consecutive_days})
+
+    report['employees'].sort(key=lambda e: (e['last_name'], e['first_name']))
+    return report
+
+
+def _local_date(dt):
+    """Return local date of an aware datetime."""
+    return timezone.localtime(dt).date()
@@ -0,0 +1,240 @@
+import math
+from datetime import date, datetime, time, timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from .cost_projection_logic import (get_avg_monthly_revenue, get_hourly_rates,
+                                    get_fixed_monthly_cost)
+from .time_logic import time_dur_in_hours
+from ..models import Schedule, Department, Employee, BusinessData
+
+
+# Months of schedules before the forecast month that demand is learned from
+FORECAST_HISTORY_MONTHS = 36
+# Schedules fetched per query while aggregating the history
+FORECAST_CHUNK_SIZE = 2000
+# Seconds the aggregated history of a tenant is cached for
+FORECAST_CACHE_TIMEOUT = 6 * 60 * 60
+FORECAST_CACHE_KEY = 'labor_history:%s:%s'
+HOURS_IN_WEEK = 7 * 24
+
+
+
+def get_labor_forecast(user, month_year):
+    """Project hours and costs of a month from the user's past schedules.
+
+    Past schedules of every department are aggregated into a demand curve,
+    the average number of hours worked during each hour of each weekday, and
+    into the hours and costs of each past month (See get_labor_history), each
+    department averaged over the months it has schedules. The expected
+    hours of the forecast month are the demand curves summed over the
+    weekdays of the month. How much the hours per day of past months
+    varied gives the low and high ends of the range, and the average cost per
+    hour of the past gives the costs of the range, with the fixed monthly
+    costs of current employees added like the calendar does.
+
+    The history only contains schedules before the current month, so editing
+    the calendars of this month or later ones does not change forecasts.
+
+    Args:
+        user: Django authenticated manager user.
+        month_year: Python date of the first day of the forecast month.
+    Returns:
+        A dict containing the hours and costs ranges of every department and
+        of all departments, along with the month's average monthly revenue
+        and the range of costs as a percentage of it. The percentage is None
+        if there is no revenue data for the month (See get_avg_monthly_revenue).
+    """
+
+    current_month = timezone.localtime(timezone.now()).date().replace(day=1)
+    history = get_labor_history(user, min(month_year, current_month))
+    departments = Department.objects.filter(user=user).order_by('name')
+
+    # Number of each weekday in the forecast month
+    month_days = _days_in_month(month_year)
+    month_weekdays = _weekday_counts(month_year, month_days)
+
+    forecast = {}
+    total = _hours_costs_range('Total')
+    for department in departments:
+        dep_history = history['departments'].get(department.id)
+        dep_forecast = _hours_costs_range(department.name)
+        dep_forecast['demand_curve'] = [[0] * 24 for weekday in range(7)]
+        if dep_history:
+            # Departments newer than the tenant only have their own months
+            history_weekdays = _history_weekday_counts(dep_history['months'])
+            curve = dep_forecast['demand_curve']
+            for bucket, hours in enumerate(dep_history['histogram']):
+                weekday, hour = divmod(bucket, 24)
+                if history_weekdays[weekday]:
+                    curve[weekday][hour] = hours / history_weekdays[weekday]
+            expected = sum(sum(curve[weekday]) * month_weekdays[weekday] for weekday in range(7))
+            variation = _coefficient_of_variation(dep_history['months'])
+            cost_per_hour = _cost_per_hour(dep_history['months'])
+            for key, hours in (('low', expected * max(1 - variation, 0)),
+                               ('expected', expected),
+                               ('high', expected * (1 + variation))):
+                dep_forecast['hours'][key] = hours
+                dep_forecast['cost'][key] = hours * cost_per_hour
+                total['hours'][key] += hours
+                total['cost'][key] += hours * cost_per_hour
+        forecast[department.id] = dep_forecast
+
+    # Fixed monthly costs are allocated by expected hours, evenly if none
+    fixed_cost = sum(get_fixed_monthly_cost(e) for e in Employee.objects.filter(user=user))
+    for dep_id, dep_forecast in forecast.items():
+        if total['hours']['expected']:
+            share = dep_forecast['hours']['expected'] / total['hours']['expected']
+        else:
+            share = 1.0 / len(forecast)
+        for key in dep_forecast['cost']:
+            dep_forecast['cost'][key] += fixed_cost * share
+    for key in total['cost']:
+        total['cost'][key] += fixed_cost
+    forecast['total'] = total
+
+    avg_revenue = get_avg_monthly_revenue(user, month_year.month)
+    cost_percentage = None
+    if avg_revenue > 0:
+        cost_percentage = dict((key, cost * 100.0 / avg_revenue)
+                               for key, cost in total['cost'].items())
+
+    return {'month_year': month_year, 'history_months': len(history['months']),
+            'departments': forecast, 'avg_monthly_revenue': avg_revenue,
+            'cost_percentage': cost_percentage}
+
+
+def get_labor_history(user, history_end):
+    """Return aggregated schedules of the months before history_end.
+
+    Schedules are aggregated in a single streaming pass over chunks of at
+    most FORECAST_CHUNK_SIZE rows, fetched by primary key, so years of
+    schedules are never held in memory at once. The result is cached per
+    tenant and end of history for FORECAST_CACHE_TIMEOUT seconds.
+
+    Args:
+        user: Django authenticated manager user.
+        history_end: Python date of the first day of the month after the
+            last month of history.
+    Returns:
+        A dict with the set of (year, month) tuples of months that have
+        schedules, and for each department id a histogram of hours worked,
+        after breaks, during each hour of the week, indexed by weekday * 24 + hour in local
+        time, and a dict of (year, month) tuples to the hours and costs of
+        the department that month.
+    """
+
+    key = FORECAST_CACHE_KEY % (user.id, history_end.isoformat())
+    history = cache.get(key)
+    if history is not None:
+        return history
+
+    business_data = BusinessData.objects.get(user=user)
+    employees = {}
+    for employee in Employee.objects.filter(user=user):
+        employees[employee.id] = (employee.min_time_for_break, employee.break_time_in_min,
+                                  get_hourly_rates(employee, business_data)['regular'])
+
+    history_start = history_end
+    for i in range(FORECAST_HISTORY_MONTHS):
+        history_start = (history_start - timedelta(1)).replace(day=1)
+    schedules = (Schedule.objects.filter(user=user, employee__isnull=False,
+                                         start_datetime__gte=_month_start_dt(history_start),
+                                         start_datetime__lt=_month_start_dt(history_end))
+                                 .values_list('pk', 'start_datetime', 'end_datetime',
+                                              'department_id', 'employee_id'))
+
+    history = {'months': set(), 'departments': {}}
+    last_pk = 0
+    while True:
+        chunk = list(schedules.filter(pk__gt=last_pk).order_by('pk')[:FORECAST_CHUNK_SIZE])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        for pk, start, end, department_id, employee_id in chunk:
+            if employee_id not in employees or end <= start:
+                continue
+            min_time_for_break, break_time_min, hourly_rate = employees[employee_id]
+            dep_history = history['departments'].get(department_id)
+            if dep_history is None:
+                dep_history = {'histogram': [0] * HOURS_IN_WEEK, 'months': {}}
+                history['departments'][department_id] = dep_history
+
+            local_start = timezone.localtime(start)
+            hours = time_dur_in_hours(start, end, None, None, min_time_for_break, break_time_min)
+            _add_to_histogram(dep_history['histogram'], local_start,
+                              (end - start).total_seconds() / 3600.0, hours)
+            month = (local_start.year, local_start.month)
+            history['months'].add(month)
+            month_hours_costs = dep_history['months'].setdefault(month, [0, 0])
+            month_hours_costs[0] += hours
+            month_hours_costs[1] += hours * hourly_rate
+
+    cache.set(key, history, FORECAST_CACHE_TIMEOUT)
+    return history
+
+
+def _add_to_histogram(histogram, local_start, duration, hours):
+    """Add hours of a schedule to the hour of week histogram, spread evenly
+    over the hours of its duration starting at local_start."""
+    scale = hours / duration
+    bucket = local_start.weekday() * 24 + local_start.hour
+    part = min(duration, 1 - (local_start.minute * 60 + local_start.second) / 3600.0)
+    while duration > 0:
+        histogram[bucket] += part * scale
+        duration -= part
+        bucket = (bucket + 1) % HOURS_IN_WEEK
+        part = min(duration, 1)
+
+
+def _history_weekday_counts(months):
+    """Return list of the number of each weekday, Monday first, in months
+    of (year, month) tuples."""
+    history_weekdays = [0] * 7
+    for (year, month) in months:
+        first_day = date(year, month, 1)
+        counts = _weekday_counts(first_day, _days_in_month(first_day))
+        history_weekdays = [a + b for a, b in zip(history_weekdays, counts)]
+    return history_weekdays
+
+
+def _coefficient_of_variation(months):
+    """Return relative standard deviation of hours per day of months."""
+    per_day = [hours_costs[0] / _days_in_month(date(year, month, 1))
+               for (year, month), hours_costs in months.items()]
+    mean = sum(per_day) / len(per_day)
+    if not mean:
+        return 0
+    variance = sum((x - mean) ** 2 for x in per_day) / len(per_day)
+    return math.sqrt(variance) / mean
+
+
+def _cost_per_hour(months):
+    """Return average cost of an hour over all months."""
+    hours = sum(hours_costs[0] for hours_costs in months.values())
+    cost = sum(hours_costs[1] for hours_costs in months.values())
+    return cost / hours if hours else 0
+
+
+def _hours_costs_range(name):
+    """Return empty hours and costs range dict of a department."""
+    return {'name': name, 'hours': {'low': 0, 'expected': 0, 'high': 0},
+            'cost': {'low': 0, 'expected': 0, 'high': 0}}
+
+
+def _month_start_dt(month_year):
+    """Return aware datetime of the start of the month."""
+    return timezone.make_aware(datetime.combine(month_year, time.min))
+
+
+def _days_in_month(month_year):
+    """Return number of days in the month of month_year."""
+    next_month = (month_year.replace(day=28) + timedelta(4)).replace(day=1)
+    return (next_month - month_year.replace(day=1)).days
+
+
+def _weekday_counts(first_day, days):
+    """Return list of how many of each weekday the days from first_day have."""
+    counts = [0] * 7
+    for i in range(days):
+        counts[(first_day.weekday() + i) % 7] += 1
+    return counts
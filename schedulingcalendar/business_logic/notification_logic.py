@@ -1,11 +1,15 @@
 import json
 import bisect
 import calendar
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
 from datetime import date, datetime, timedelta, time
 from operator import itemgetter
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.mail import send_mail
+from django.db import transaction
 from ..models import (Schedule, Department, DepartmentMembership, MonthlyRevenue,
                      Employee, Vacation, RepeatUnavailability, BusinessData,
                      Absence, DesiredTime, LiveSchedule, LiveCalendar,
@@ -17,6 +21,13 @@ from twilio.rest import Client
 account_sid = ''
 auth_token = ''
 
+logger = logging.getLogger(__name__)
+
+# Thread sending queued notifications, created when first needed (See
+# enqueue_employee_notifications)
+_notification_pool = None
+_notification_pool_lock = threading.Lock()
+
 
 def notify_employee_with_msg(employee, msg_title, msg):
     """Email and text employee message."""
@@ -31,6 +42,40 @@ def notify_employee_with_msg(employee, msg_title, msg):
         send_mail(msg_title, msg, 'info@schedulehours.com', [employee.email])
     
 
+def enqueue_employee_notifications(notifications):
+    """Email and text employees messages after the current transaction commits.
+
+    Messages are sent one after another on a background thread, so views
+    deciding many applications do not wait on an SMS and an email per
+    employee. Messages of a transaction that rolls back are not sent, and a
+    message that fails to send is logged without stopping the others.
+
+    Args:
+        notifications: List of tuples of an employee, the title of the
+            message and the message.
+    """
+    if notifications:
+        transaction.on_commit(lambda: _get_notification_pool().apply_async(
+            _send_employee_notifications, (notifications,)))
+
+
+def _get_notification_pool():
+    """Return the pool of the notification thread, creating it the first time."""
+    global _notification_pool
+    with _notification_pool_lock:
+        if _notification_pool is None:
+            _notification_pool = ThreadPool(1)
+        return _notification_pool
+
+
+def _send_employee_notifications(notifications):
+    for employee, msg_title, msg in notifications:
+        try:
+            notify_employee_with_msg(employee, msg_title, msg)
+        except Exception:
+            logger.exception('Could not notify employee %s', employee.id)
+
+
 def set_view_rights(user, live_calendar, department_view, employee_view):
     """Create/edit view rights for departments/employees for live calendar."""
 
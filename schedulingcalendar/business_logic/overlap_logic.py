@@ -0,0 +1,99 @@
+"""
+Overlap queries for models that occupy a start_datetime/end_datetime range.
+
+On PostgreSQL the schedule, vacation and absence tables carry a generated
+tstzrange column, time_range, backed by a GiST index (See migration 0081). An
+overlap check can then be answered by the && operator as a single index scan
+instead of two independent comparisons on the datetime columns. Every other
+database backend falls back to the equivalent pair of comparisons.
+"""
+
+from django.db import connections
+from django.db.models import Q
+from ..models import Schedule, Vacation, Absence
+
+
+TIME_RANGE_MODELS = (Schedule, Vacation, Absence)
+TIME_RANGE_COLUMN = 'time_range'
+
+
+
+def has_time_range_column(model, using):
+    """Return True if the model's table has an indexed time_range column.
+
+    Args:
+        model: Django model class.
+        using: String alias of the database the query will be executed on.
+    Returns:
+        Boolean that is True for range aware models on a PostgreSQL database.
+    """
+
+    return (model in TIME_RANGE_MODELS and
+            connections[using].vendor == 'postgresql')
+
+
+def filter_overlapping(queryset, start_dt, end_dt):
+    """Filter queryset to objects whose time overlaps with start_dt to end_dt.
+
+    An object overlaps if it starts before end_dt and ends after start_dt,
+    that is, the end points of the ranges are exclusive so that back to back
+    schedules are not considered to be in conflict.
+
+    Args:
+        queryset: Queryset of a model with start_datetime and end_datetime
+            fields.
+        start_dt: Timezone aware datetime of start of range to check.
+        end_dt: Timezone aware datetime of end of range to check.
+    Returns:
+        Queryset filtered to objects overlapping with the given range.
+    """
+
+    model = queryset.model
+    if has_time_range_column(model, queryset.db):
+        connection = connections[queryset.db]
+        column = '%s.%s' % (connection.ops.quote_name(model._meta.db_table),
+                            connection.ops.quote_name(TIME_RANGE_COLUMN))
+        # Mirror the generated column, which orders its bounds, so that a
+        # malformed range is still a valid tstzrange.
+        where = ("%s && tstzrange(LEAST(%%s, %%s), GREATEST(%%s, %%s), '[)')"
+                 % column)
+        return queryset.extra(where=[where],
+                              params=[start_dt, end_dt, start_dt, end_dt])
+    else:
+        return queryset.filter(start_datetime__lt=end_dt,
+                               end_datetime__gt=start_dt)
+
+
+def filter_overlapping_any(queryset, ranges):
+    """Filter queryset to objects overlapping any of several employees' ranges.
+
+    Same as filter_overlapping, for many ranges at once, so that checking a
+    batch of ranges takes one query instead of one per range.
+
+    Args:
+        queryset: Queryset of a model with employee, start_datetime and
+            end_datetime fields.
+        ranges: Non empty list of tuples of the integer id of an employee and
+            the timezone aware start and end datetimes of a range of theirs.
+    Returns:
+        Queryset filtered to objects of an employee of ranges overlapping
+        with one of the employee's ranges.
+    """
+
+    model = queryset.model
+    if has_time_range_column(model, queryset.db):
+        connection = connections[queryset.db]
+        table = connection.ops.quote_name(model._meta.db_table)
+        where = ("(%s.%s = %%s AND %s.%s && tstzrange(LEAST(%%s, %%s), GREATEST(%%s, %%s), '[)'))"
+                 % (table, connection.ops.quote_name('employee_id'),
+                    table, connection.ops.quote_name(TIME_RANGE_COLUMN)))
+        params = []
+        for employee_id, start_dt, end_dt in ranges:
+            params.extend([employee_id, start_dt, end_dt, start_dt, end_dt])
+        return queryset.extra(where=[' OR '.join([where] * len(ranges))], params=params)
+    else:
+        overlapping = Q()
+        for employee_id, start_dt, end_dt in ranges:
+            overlapping |= Q(employee=employee_id, start_datetime__lt=end_dt,
+                             end_datetime__gt=start_dt)
+        return queryset.filter(overlapping)
@@ -0,0 +1,85 @@
+from django.core import signing
+from django.db.models import Q
+
+
+EMPLOYEE_PAGE_SIZE = 50
+PENDING_APPS_PAGE_SIZE = 25
+# Past vacations and absences of an employee shown before loading more
+HISTORY_PAGE_SIZE = 10
+
+CURSOR_SALT = 'schedulingcalendar.pagination_logic'
+
+
+
+def get_keyset_page(queryset, ordering, cursor=None, page_size=EMPLOYEE_PAGE_SIZE):
+    """Return page of queryset after the item cursor points at.
+
+    Unlike offsets, which make the database count past every earlier row,
+    the next page starts with a filter on the ordering fields of the last
+    item of the page before, so every page costs the same and items added or
+    deleted meanwhile do not shift later pages. The id is added as the last
+    ordering field so the ordering is stable when other fields are equal.
+
+    Args:
+        queryset: Django queryset of the items to page through.
+        ordering: List of names of fields to order by, names starting with
+            '-' for descending order, like arguments of order_by.
+        cursor: Cursor of the last item of the page before, or None for the
+            first page (See decode_cursor).
+        page_size: Integer maximum number of items of the page.
+    Returns:
+        A tuple of the list of items of the page and the string cursor of the
+        page after it, or None if there are no more items.
+    """
+
+    ordering = list(ordering) + ['id']
+    queryset = queryset.order_by(*ordering)
+    if cursor is not None:
+        queryset = queryset.filter(_get_after_filter(ordering, cursor))
+
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    return items, _encode_cursor(items[-1], ordering)
+
+
+def decode_cursor(cursor):
+    """Return list of the ordering values of a cursor, or None if cursor was
+    not made by get_keyset_page."""
+    try:
+        values = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _encode_cursor(item, ordering):
+    """Return signed string of the ordering values of item.
+
+    Datetimes are kept as iso format strings, which querysets accept in
+    filters of datetime fields.
+    """
+    values = []
+    for field in ordering:
+        value = item
+        for attr in field.lstrip('-').split('__'):
+            value = getattr(value, attr)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return signing.dumps(values, salt=CURSOR_SALT)
+
+
+def _get_after_filter(ordering, values):
+    """Return Q of the rows after values in ordering.
+
+    A row is after the cursor if it is after it in the first ordering field,
+    or equal in the first field and after it in the second, and so on.
+    """
+    after_filter = Q()
+    equal_kwargs = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = '__lt' if field.startswith('-') else '__gt'
+        after_filter |= Q(**dict(equal_kwargs, **{name + lookup: value}))
+        equal_kwargs[name] = value
+    return after_filter
@@ -12,6 +12,9 @@ from ..models import (Schedule, Department, DepartmentMembership, MonthlyRevenue
                      LiveCalendarDepartmentViewRights, LiveCalendarEmployeeViewRights)
 
 
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
 def check_for_overtime(hours, user):
     """Calculate if number of hours is in overtime or not."""
     business_data = BusinessData.objects.get(user=user)
@@ -91,8 +94,27 @@ def get_start_end_of_weekday(dt, user):
     """
     
     business_data = BusinessData.objects.get(user=user)
+    return get_start_end_of_workweek(dt, business_data)
+    
+    
+def get_start_end_of_workweek(dt, business_data):
+    """Return start and end datetimes of workweek that contain datetime inside.
+    
+    Same as get_start_end_of_weekday, for callers that already have the
+    business data of the user and need to avoid querying it again.
+    
+    Args:
+        dt: datetime that is contained within the start, end datetimes of workweek.
+        business_data: BusinessData model object of the managing user.
+    Returns:
+        A dict with the 'start' and 'end' datetimes of the workweek.
+    """
+    
     start_day_of_week = business_data.workweek_weekday_start
     start_time_of_week = business_data.workweek_time_start
+    if timezone.is_aware(dt):
+        # Datetimes from the database are in UTC, workweeks are local
+        dt = timezone.localtime(dt)
     dt_weekday = dt.weekday()
     
     if start_day_of_week < dt_weekday:
@@ -112,11 +134,109 @@ def get_start_end_of_weekday(dt, user):
     start_date_of_week = dt.date() - timedelta(day_difference)
     start_dt = datetime.combine(start_date_of_week, start_time_of_week)
     start_datetime_of_week = timezone.make_aware(start_dt)
-    end_datetime_of_week = start_datetime_of_week + timedelta(7) - timedelta(seconds=1)
+    # The next workweek starts at the same local time, even across DST changes
+    next_start_dt = datetime.combine(start_date_of_week + timedelta(7), start_time_of_week)
+    end_datetime_of_week = timezone.make_aware(next_start_dt) - timedelta(seconds=1)
     
     return {'start': start_datetime_of_week, 'end': end_datetime_of_week}
     
     
+def get_workweeks_of_month(year, month, business_data):
+    """Return start and end datetimes of every workweek overlapping month.
+    
+    Args:
+        year: Integer value of year.
+        month: Integer value of month.
+        business_data: BusinessData model object of the managing user.
+    Returns:
+        A chronological list of dicts with the 'start' and 'end' datetimes
+        of each workweek (See get_start_end_of_workweek).
+    """
+    
+    month_start = timezone.make_aware(datetime(year, month, 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    month_end = timezone.make_aware(datetime.combine(next_month, time.min))
+    return get_workweeks_of_range(month_start, month_end, business_data)
+    
+    
+def get_workweeks_of_range(start_dt, end_dt, business_data):
+    """Return start and end datetimes of every workweek overlapping a range.
+    
+    Args:
+        start_dt: Timezone aware datetime of start of range.
+        end_dt: Timezone aware datetime of end of range, exclusive.
+        business_data: BusinessData model object of the managing user.
+    Returns:
+        A chronological list of dicts with the 'start' and 'end' datetimes
+        of each workweek (See get_start_end_of_workweek).
+    """
+    
+    workweeks = []
+    workweek = get_start_end_of_workweek(start_dt, business_data)
+    if workweek['end'] < start_dt:
+        workweek = get_start_end_of_workweek(workweek['end'] + timedelta(hours=12), business_data)
+    while workweek['start'] < end_dt:
+        workweeks.append(workweek)
+        workweek = get_start_end_of_workweek(workweek['end'] + timedelta(hours=12), business_data)
+    return workweeks
+    
+    
+def get_workweeks_of_ranges(ranges, business_data):
+    """Return start and end datetimes of every workweek overlapping any of
+    several ranges, like the times of a schedule before and after an edit.
+    
+    Args:
+        ranges: Iterable of tuples of timezone aware start and end datetimes,
+            ends exclusive.
+        business_data: BusinessData model object of the managing user.
+    Returns:
+        A chronological list of dicts with the 'start' and 'end' datetimes
+        of each workweek, without duplicates (See get_start_end_of_workweek).
+    """
+    
+    workweeks = {}
+    for start_dt, end_dt in ranges:
+        for workweek in get_workweeks_of_range(start_dt, end_dt, business_data):
+            workweeks[workweek['start']] = workweek
+    return [workweeks[start] for start in sorted(workweeks)]
+    
+    
+def get_workweek_days(workweek):
+    """Return boundaries and dates of the local days in a workweek.
+    
+    A workweek that does not start at midnight touches 8 days, with the first
+    and last only partially in the workweek.
+    
+    Args:
+        workweek: Dict with the 'start' and 'end' datetimes of a workweek.
+    Returns:
+        A tuple of a list of boundaries, as seconds since the epoch, and a
+        list of the dates of the days between consecutive boundaries. The
+        first boundary is the start of the workweek, the last one is the
+        start of the next workweek.
+    """
+    
+    workweek_start = timezone.localtime(workweek['start'])
+    workweek_stop = workweek['end'] + timedelta(seconds=1)
+    boundaries = [epoch_seconds(workweek_start)]
+    dates = [workweek_start.date()]
+    day = workweek_start.date() + timedelta(1)
+    while True:
+        midnight = timezone.make_aware(datetime.combine(day, time.min))
+        if midnight >= workweek_stop:
+            break
+        boundaries.append(epoch_seconds(midnight))
+        dates.append(day)
+        day += timedelta(1)
+    boundaries.append(epoch_seconds(workweek_stop))
+    return boundaries, dates
+    
+    
+def epoch_seconds(dt):
+    """Return aware datetime as float seconds since the epoch."""
+    return (dt - EPOCH).total_seconds()
+    
+    
 def time_dur_in_hours(start_datetime, end_datetime, 
                       start_lowerb=None, end_upperb=None, 
                       min_time_for_break=None,
@@ -151,7 +271,7 @@ def time_dur_in_hours(start_datetime, end_datetime,
             end = end_upperb
     
     time_delta = end - start
-    hours = time_delta.seconds / 3600.0
+    hours = time_delta.total_seconds() / 3600.0
     
     if min_time_for_break and min_time_for_break <= hours:
         hours -= break_time_in_min / 60.0
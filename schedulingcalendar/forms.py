@@ -1,3 +1,4 @@
+import json
 from django import forms
 from datetime import datetime
 from django.contrib.auth.forms import UserCreationForm
@@ -6,6 +7,8 @@ from .models import (Employee, Department, DepartmentMembership,
                      Vacation, Absence, RepeatUnavailability, DesiredTime,
                      MonthlyRevenue, BusinessData, DayNoteHeader, DayNoteBody,
                      VacationApplication, AbsenceApplication, RepeatUnavailabilityApplication)
+from .business_logic.coverage_logic import SLOT_MINUTES_CHOICES, DEFAULT_SLOT_MINUTES
+from .business_logic.pagination_logic import decode_cursor
 from custom_formfields import TzAwareTimeField, MultipleIntField
 
 
@@ -36,6 +39,74 @@ class PkForm(forms.Form):
     pk = forms.IntegerField(label='id')
 
 
+class KeysetPageForm(forms.Form):
+    """Form for the cursor of the next page of a list (See get_keyset_page)."""
+    cursor = forms.CharField(required=False)
+
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        values = decode_cursor(cursor)
+        if values is None:
+            raise forms.ValidationError('Invalid page cursor')
+        return values
+
+
+class EmployeeHistoryPageForm(KeysetPageForm):
+    """Form for the next page of past vacations or absences of an employee."""
+    KIND_CHOICES = (('vacation', 'Vacations'), ('absence', 'Absences'))
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES)
+
+
+class PendingApplicationsPageForm(KeysetPageForm):
+    """Form for the next page of pending applications of a kind."""
+    KIND_CHOICES = (('vacation', 'Vacation applications'),
+                    ('absence', 'Absence applications'),
+                    ('repeat_unav', 'Repeating unavailability applications'))
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES)
+
+
+class BulkApplicationDecisionForm(forms.Form):
+    """Form for user to approve or disapprove many pending applications.
+    
+    Decisions are a json list of objects, each with the kind of application,
+    its pk and whether it is approved.
+    """
+    KIND_CHOICES = PendingApplicationsPageForm.KIND_CHOICES
+    MAX_DECISIONS = 200
+    
+    decisions = forms.CharField()
+    
+    
+    def clean_decisions(self):
+        """Return list of (kind, pk, approved) tuples of the decisions."""
+        try:
+            decisions = json.loads(self.cleaned_data['decisions'])
+        except ValueError:
+            raise forms.ValidationError('Decisions are not valid json')
+        if not isinstance(decisions, list) or not decisions:
+            raise forms.ValidationError('Decisions must be a non empty list')
+        if len(decisions) > self.MAX_DECISIONS:
+            raise forms.ValidationError('At most %d decisions can be made at once' % 
+                                        self.MAX_DECISIONS)
+            
+        kinds = dict(self.KIND_CHOICES)
+        cleaned_decisions = []
+        for i, decision in enumerate(decisions):
+            if (not isinstance(decision, dict) or decision.get('kind') not in kinds or
+                    type(decision.get('pk')) is not int or 
+                    not isinstance(decision.get('approved'), bool)):
+                raise forms.ValidationError('Decision %d has invalid data' % i)
+            cleaned_decisions.append((decision['kind'], decision['pk'], decision['approved']))
+        if len(set((kind, pk) for kind, pk, approved in cleaned_decisions)) < len(cleaned_decisions):
+            raise forms.ValidationError('Applications can only be decided once')
+        return cleaned_decisions
+
+
 class CalendarForm(forms.Form):
     """Form for user to select a calendar given year, month, & department."""
 
@@ -69,6 +140,97 @@ class CalendarForm(forms.Form):
                               min_value=1900, max_value=9999)
 
 
+class CostRollupForm(forms.Form):
+    """Form for user to select a range of months to get hours and costs of."""
+    MAX_MONTHS = 36
+
+    start_month = forms.IntegerField(min_value=1, max_value=12)
+    start_year = forms.IntegerField(min_value=1900, max_value=9999)
+    end_month = forms.IntegerField(min_value=1, max_value=12)
+    end_year = forms.IntegerField(min_value=1900, max_value=9999)
+
+
+    def clean(self):
+        cleaned_data = super(CostRollupForm, self).clean()
+        if self.errors:
+            return cleaned_data
+        start = cleaned_data['start_year'] * 12 + cleaned_data['start_month']
+        end = cleaned_data['end_year'] * 12 + cleaned_data['end_month']
+        if not 0 <= end - start < self.MAX_MONTHS:
+            raise forms.ValidationError('Range must be between 1 and %s months' % self.MAX_MONTHS)
+        return cleaned_data
+
+
+class ConsolidatedCalendarForm(forms.Form):
+    """Form for user to select a month of the calendars of several departments,
+    selecting no departments selects all of them."""
+    month = forms.IntegerField(min_value=1, max_value=12)
+    year = forms.IntegerField(min_value=1900, max_value=9999)
+    departments = MultipleIntField(required=False)
+
+
+class CalendarRangeForm(forms.Form):
+    """Form for user to select a day, the workweek of a day or a window of
+    days of a department's calendar."""
+    RANGE_CHOICES = (('day', 'Day'), ('week', 'Workweek'), ('window', 'Window'))
+    MAX_WINDOW_DAYS = 42
+
+    department = forms.IntegerField(min_value=0)
+    range = forms.ChoiceField(choices=RANGE_CHOICES)
+    date = forms.DateField()
+    end_date = forms.DateField(required=False)
+
+
+    def clean(self):
+        cleaned_data = super(CalendarRangeForm, self).clean()
+        if self.errors or cleaned_data['range'] != 'window':
+            return cleaned_data
+        end_date = cleaned_data['end_date']
+        if end_date is None or not 0 <= (end_date - cleaned_data['date']).days < self.MAX_WINDOW_DAYS:
+            raise forms.ValidationError('Window must be between 1 and %s days' % self.MAX_WINDOW_DAYS)
+        return cleaned_data
+
+
+class LaborForecastForm(forms.Form):
+    """Form for user to select a month to forecast hours and costs of."""
+    month = forms.IntegerField(min_value=1, max_value=12)
+    year = forms.IntegerField(min_value=1900, max_value=9999)
+
+
+class FatigueReportForm(forms.Form):
+    """Form for user to select a month to check fatigue rules of."""
+    month = forms.IntegerField(min_value=1, max_value=12)
+    year = forms.IntegerField(min_value=1900, max_value=9999)
+
+
+class CoverageForm(forms.Form):
+    """Form for getting headcount of a department for every time slot of a month."""
+    SLOT_CHOICES = [(minutes, minutes) for minutes in SLOT_MINUTES_CHOICES]
+
+    department = forms.IntegerField(min_value=0, max_value=1000)
+    month = forms.IntegerField(min_value=1, max_value=12)
+    year = forms.IntegerField(min_value=1900, max_value=9999)
+    slot_minutes = forms.TypedChoiceField(choices=SLOT_CHOICES, coerce=int, required=False,
+                                          empty_value=DEFAULT_SLOT_MINUTES)
+    target = forms.IntegerField(min_value=1, max_value=1000, required=False)
+    target_start = forms.TimeField(required=False)
+    target_end = forms.TimeField(required=False)
+
+
+class StaffingRuleForm(forms.Form):
+    """Form for adding a minimum headcount rule of a department."""
+    department = forms.IntegerField(min_value=0, max_value=1000)
+    weekdays = forms.TypedMultipleChoiceField(choices=WEEKDAY_CHOICES, coerce=int)
+    start_time = forms.TimeField(required=False)
+    end_time = forms.TimeField(required=False)
+    headcount = forms.IntegerField(min_value=1, max_value=1000)
+
+
+class StaffingRulePkForm(forms.Form):
+    """Form for removing a staffing rule."""
+    staffing_rule_pk = forms.IntegerField(label='staffing rule id')
+
+
 class LiveCalendarForm(forms.Form):
     """Form for user to select a calendar given year, month, & department.
 
@@ -240,6 +402,12 @@ class ProtoScheduleForm(forms.Form):
                                input_formats=TIME_FORMATS)
 
 
+class DayAvailabilityForm(forms.Form):
+    """Form for getting the availability of a department's employees for a day."""
+    department = forms.IntegerField(min_value=0, max_value=1000)
+    date = forms.DateField()
+
+
 class AddScheduleForm(forms.Form):
     """Form for user to create a new schedule."""
 
@@ -461,6 +629,10 @@ class BusinessDataForm(forms.ModelForm):
     workweek_time_start =  forms.TimeField(label='Workweek Start Time',
                                            input_formats=TIME_FORMATS,
                                            widget=forms.TimeInput(format='%I:%M %p'))
+    min_rest_hours = forms.FloatField(label='Minimum Rest Between Shifts In Hours',
+                                      min_value=0, max_value=48)
+    max_consecutive_days = forms.IntegerField(label='Maximum Consecutive Days Worked',
+                                              min_value=0, max_value=31)
     right_to_submit_availability = forms.BooleanField(label="", required=False,
                                                       widget=forms.CheckboxInput())
 
@@ -468,7 +640,8 @@ class BusinessDataForm(forms.ModelForm):
     class Meta:
         model = BusinessData
         fields = ['overtime', 'overtime_multiplier', 'workweek_weekday_start',
-                  'workweek_time_start', 'company_name', 'right_to_submit_availability']
+                  'workweek_time_start', 'min_rest_hours', 'max_consecutive_days',
+                  'company_name', 'right_to_submit_availability']
 
 
 class MonthlyRevenueForm(forms.ModelForm):
@@ -514,6 +687,48 @@ class ScheduleNoteForm(forms.Form):
     schedule_text = forms.CharField(label='Note', required=False, max_length=280)
 
 
+class BatchEditSchedulesForm(forms.Form):
+    """Form for user to make a list of calendar edits at once.
+    
+    Operations are a json list of objects, each with an op naming the edit
+    and the fields of the form of the view making that edit by itself. The
+    calendar date of the batch is used for every operation.
+    """
+    OPERATION_FORMS = {'add': AddScheduleForm,
+                       'add_employee': AddEmployeeToScheduleForm,
+                       'edit': EditScheduleForm,
+                       'remove': RemoveScheduleForm,
+                       'edit_note': ScheduleNoteForm}
+    MAX_OPERATIONS = 200
+    
+    operations = forms.CharField()
+    cal_date = forms.DateField()
+    
+    
+    def clean_operations(self):
+        """Return list of (op, cleaned data) tuples of the operations."""
+        try:
+            operations = json.loads(self.cleaned_data['operations'])
+        except ValueError:
+            raise forms.ValidationError('Operations are not valid json')
+        if not isinstance(operations, list) or not operations:
+            raise forms.ValidationError('Operations must be a non empty list')
+        if len(operations) > self.MAX_OPERATIONS:
+            raise forms.ValidationError('At most %d operations can be made at once' % 
+                                        self.MAX_OPERATIONS)
+            
+        cleaned_operations = []
+        for i, operation in enumerate(operations):
+            if not isinstance(operation, dict) or operation.get('op') not in self.OPERATION_FORMS:
+                raise forms.ValidationError('Operation %d has no valid op' % i)
+            data = dict(operation, cal_date=self.data.get('cal_date'))
+            form = self.OPERATION_FORMS[operation['op']](data)
+            if not form.is_valid():
+                raise forms.ValidationError('Operation %d has invalid data' % i)
+            cleaned_operations.append((operation['op'], form.cleaned_data))
+        return cleaned_operations
+
+
 class ScheduleSwapPetitionForm(forms.Form):
     """Form for creating schedule swao petitions."""
     live_schedule_pk = forms.IntegerField(label='live_schedule id')
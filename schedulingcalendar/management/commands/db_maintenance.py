@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+
+class Command(BaseCommand):
+    """Reclaim free space and refresh query planner statistics of the database.
+
+    Deleting schedules and superseded live schedules leaves free pages behind
+    that VACUUM returns to the file system, while ANALYZE keeps the planner's
+    statistics in step with how the tables have grown. On SQLite databases
+    in WAL mode the write-ahead log is also checkpointed and truncated.
+
+    Meant to be run periodically, for example nightly from cron.
+    """
+
+    help = 'Run VACUUM and ANALYZE on the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-vacuum', action='store_true', dest='skip_vacuum',
+                            help='Do not VACUUM the database.')
+        parser.add_argument('--skip-analyze', action='store_true', dest='skip_analyze',
+                            help='Do not ANALYZE the database.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to run maintenance on.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        statements = []
+        if not options['skip_vacuum']:
+            statements.append('VACUUM')
+        if not options['skip_analyze']:
+            statements.append('ANALYZE')
+            if connection.vendor == 'sqlite':
+                statements.append('PRAGMA optimize')
+        if connection.vendor == 'sqlite':
+            statements.append('PRAGMA wal_checkpoint(TRUNCATE)')
+
+        # VACUUM cannot run inside a transaction, so every statement runs
+        # with the connection in its default autocommit mode.
+        with connection.cursor() as cursor:
+            for statement in statements:
+                self.stdout.write('Running %s' % statement)
+                cursor.execute(statement)
+
+        self.stdout.write('Database maintenance finished.')
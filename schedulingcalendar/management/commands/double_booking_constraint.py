@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS, IntegrityError, transaction
+
+
+CONSTRAINT_NAME = 'schedulingcalendar_schedule_no_double_booking'
+
+
+
+class Command(BaseCommand):
+    """Add or drop the PostgreSQL constraint preventing double booked schedules.
+    
+    The constraint excludes any two schedules assigned to the same employee
+    whose time ranges overlap, using the GiST indexed time_range column of the
+    schedule table. It is optional because the calendar otherwise allows a
+    manager to knowingly assign an employee with a conflicting schedule.
+    """
+    
+    help = 'Enable or disable the database constraint against double booking employees.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['enable', 'disable'])
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to add the constraint to.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'postgresql':
+            raise CommandError('The double booking constraint requires PostgreSQL.')
+            
+        with transaction.atomic(using=options['database']), connection.cursor() as cursor:
+            if options['action'] == 'enable':
+                # btree_gist provides the = operator on integers for GiST
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+                try:
+                    cursor.execute(
+                        "ALTER TABLE schedulingcalendar_schedule ADD CONSTRAINT %s "
+                        "EXCLUDE USING gist (employee_id WITH =, time_range WITH &&) "
+                        "WHERE (employee_id IS NOT NULL)" % CONSTRAINT_NAME)
+                except IntegrityError:
+                    raise CommandError('Existing schedules double book employees, '
+                                       'resolve the conflicts before enabling.')
+                self.stdout.write('Double booking constraint enabled.')
+            else:
+                cursor.execute("ALTER TABLE schedulingcalendar_schedule "
+                               "DROP CONSTRAINT IF EXISTS %s" % CONSTRAINT_NAME)
+                self.stdout.write('Double booking constraint disabled.')
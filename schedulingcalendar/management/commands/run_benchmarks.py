@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...benchmarks import BENCHMARKS
+from ...benchmarks.harness import (BenchmarkFailed, benchmark_database, close_thread_connections,
+                                  format_results)
+
+
+
+class Command(BaseCommand):
+    """Run registered benchmarks against a throwaway copy of the database.
+
+    Results are printed and, with --output, also written to a file. SQLite
+    deployments should run this with the profile they deploy with, for example
+    SCHEDULER_DB_PROFILE=production. The command fails after running all
+    benchmarks if any of them missed its target.
+    """
+
+    help = 'Run performance benchmarks of the scheduling calendar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', metavar='benchmark',
+                            help='Benchmarks to run, all of them if none given.')
+        parser.add_argument('--output', dest='output', default=None,
+                            help='File to write the results to, e.g. bench_output.txt')
+        parser.add_argument('--list', action='store_true', dest='list',
+                            help='List the available benchmarks and exit.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name in BENCHMARKS:
+                self.stdout.write(name)
+            return
+
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError('Unknown benchmarks: %s' % ', '.join(unknown))
+
+        reports = []
+        failures = []
+        for name in names:
+            # Every benchmark gets a fresh database so runs are independent
+            with benchmark_database():
+                try:
+                    rows = BENCHMARKS[name]()
+                except BenchmarkFailed as e:
+                    rows = e.rows
+                    failures.append('%s: %s' % (name, e))
+                close_thread_connections()
+            report = format_results(name, rows)
+            self.stdout.write(report)
+            reports.append(report)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write('\n'.join(reports))
+        if failures:
+            raise CommandError('Benchmarks missed their targets:\n' + '\n'.join(failures))
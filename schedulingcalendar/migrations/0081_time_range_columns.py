@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# Tables that get an indexed tstzrange column mirroring their start and end
+# datetimes. Overlap queries against these tables use the && operator, see
+# business_logic/overlap_logic.py. The bounds are ordered with LEAST/GREATEST
+# so that a malformed row cannot make the generated column fail to compute.
+TIME_RANGE_TABLES = ['schedulingcalendar_schedule',
+                     'schedulingcalendar_vacation',
+                     'schedulingcalendar_absence']
+
+
+def add_time_range_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TIME_RANGE_TABLES:
+        schema_editor.execute(
+            "ALTER TABLE %s ADD COLUMN time_range tstzrange "
+            "GENERATED ALWAYS AS (tstzrange(LEAST(start_datetime, end_datetime), "
+            "GREATEST(start_datetime, end_datetime), '[)')) STORED" % table)
+        schema_editor.execute(
+            "CREATE INDEX %s_time_range_gist ON %s USING gist (time_range)"
+            % (table, table))
+
+
+def remove_time_range_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TIME_RANGE_TABLES:
+        schema_editor.execute("DROP INDEX IF EXISTS %s_time_range_gist" % table)
+        schema_editor.execute("ALTER TABLE %s DROP COLUMN IF EXISTS time_range" % table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedulingcalendar', '0080_auto_20180731_1358'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_time_range_columns, remove_time_range_columns),
+    ]
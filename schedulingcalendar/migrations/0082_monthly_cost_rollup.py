@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-19 02:46
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedulingcalendar', '0081_time_range_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCostRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_year', models.DateField(db_index=True, verbose_name='month and year')),
+                ('hours', models.FloatField(default=0, verbose_name='regular hours')),
+                ('overtime_hours', models.FloatField(default=0, verbose_name='overtime hours')),
+                ('cost', models.FloatField(default=0, verbose_name='cost')),
+                ('is_dirty', models.BooleanField(default=False)),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='schedulingcalendar.Department')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
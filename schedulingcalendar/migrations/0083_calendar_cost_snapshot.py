@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-19 02:50
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedulingcalendar', '0082_monthly_cost_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarCostSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_year', models.DateField(db_index=True, verbose_name='month and year')),
+                ('hours_and_costs', models.TextField(default='{}', verbose_name='hours and costs json')),
+                ('version', models.IntegerField(default=0, verbose_name='version')),
+                ('is_stale', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='calendarcostsnapshot',
+            unique_together=set([('user', 'month_year')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-19 03:08
+from __future__ import unicode_literals
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedulingcalendar', '0083_calendar_cost_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffingRule',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.CharField(default='0,1,2,3,4,5,6', max_length=13, verbose_name='weekdays')),
+                ('start_time', models.TimeField(default=datetime.time(0, 0), verbose_name='start time')),
+                ('end_time', models.TimeField(default=datetime.time(0, 0), verbose_name='end time')),
+                ('headcount', models.IntegerField(default=1, verbose_name='minimum headcount')),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedulingcalendar.Department')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
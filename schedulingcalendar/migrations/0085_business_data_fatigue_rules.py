@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-19 03:11
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedulingcalendar', '0084_staffing_rule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessdata',
+            name='max_consecutive_days',
+            field=models.IntegerField(default=0, verbose_name='Maximum Consecutive Days Worked'),
+        ),
+        migrations.AddField(
+            model_name='businessdata',
+            name='min_rest_hours',
+            field=models.FloatField(default=0, verbose_name='Minimum Rest Between Shifts In Hours'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.5 on 2026-10-19 03:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedulingcalendar', '0086_calendar_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlycostrollup',
+            name='version',
+            field=models.IntegerField(default=0, verbose_name='version'),
+        ),
+    ]
@@ -385,6 +385,102 @@ class MonthlyRevenue(models.Model):
         return "Monthly revenue for: " + date_str + ". Amount: " + self.monthly_total
 
 
+class MonthlyCostRollup(models.Model):
+    """Cached hours and costs of a department, or all departments, for a month.
+
+    Rows with a null department hold the total of all departments. Rows are
+    marked dirty when schedules, employees or business settings that the
+    month's costs depend on change, and recomputed when next requested. The
+    version changes every time a row is marked, so rows marked while their
+    month was computed are not overwritten with the outdated result.
+    """
+    user = models.ForeignKey(User, db_index=True, on_delete=models.CASCADE)
+    department = models.ForeignKey(Department, db_index=True, null=True, on_delete=models.CASCADE)
+
+    month_year = models.DateField('month and year', db_index=True)
+    hours = models.FloatField('regular hours', default=0)
+    overtime_hours = models.FloatField('overtime hours', default=0)
+    cost = models.FloatField('cost', default=0)
+    version = models.IntegerField('version', default=0)
+    is_dirty = models.BooleanField(default=False)
+
+
+    def __str__(self):
+        date_str = self.month_year.strftime("%Y, %B")
+        return "Cost rollup for: " + date_str + ". Cost: " + str(self.cost)
+
+
+class CalendarCostSnapshot(models.Model):
+    """Hours and costs of every department for a calendar month as json.
+
+    Kept up to date by the schedule editing views applying the cost deltas
+    they calculate, so calendars can be loaded without recalculating the
+    month. Stale snapshots are recalculated in full when next loaded.
+    """
+    user = models.ForeignKey(User, db_index=True, on_delete=models.CASCADE)
+
+    month_year = models.DateField('month and year', db_index=True)
+    hours_and_costs = models.TextField('hours and costs json', default="{}")
+    version = models.IntegerField('version', default=0)
+    is_stale = models.BooleanField(default=False)
+
+
+    class Meta:
+        unique_together = ('user', 'month_year')
+
+
+    def __str__(self):
+        date_str = self.month_year.strftime("%Y, %B")
+        return "Calendar cost snapshot for: " + date_str + ". Version: " + str(self.version)
+
+
+class StaffingRule(models.Model):
+    """Minimum number of people a department needs between two times.
+
+    Rules apply to every day of the given weekdays. An end time not after
+    the start time means the rule applies until the end of the day.
+    """
+    user = models.ForeignKey(User, db_index=True, on_delete=models.CASCADE)
+    department = models.ForeignKey(Department, db_index=True, on_delete=models.CASCADE)
+
+    # Comma separated weekdays, Monday = 0, Tuesday = 1, etc.
+    weekdays = models.CharField('weekdays', default="0,1,2,3,4,5,6", max_length=13)
+    start_time = models.TimeField('start time', default=time(0, 0, 0))
+    end_time = models.TimeField('end time', default=time(0, 0, 0))
+    headcount = models.IntegerField('minimum headcount', default=1)
+
+
+    def get_weekdays(self):
+        """Return list of integer weekdays the rule applies to."""
+        return [int(weekday) for weekday in self.weekdays.split(',') if weekday]
+
+
+    def __str__(self):
+        return "At least %s people on weekdays: %s, from %s until %s" % (self.headcount,
+                                                                         self.weekdays,
+                                                                         self.start_time,
+                                                                         self.end_time)
+
+
+class CalendarEvent(models.Model):
+    """Change to a user's calendars, streamed to clients showing them.
+
+    The id of the event orders the events and lets clients resume the stream
+    after the last event they received.
+    """
+    user = models.ForeignKey(User, db_index=True, on_delete=models.CASCADE)
+
+    kind = models.CharField('kind', max_length=32)
+    data = models.TextField('data json', default="{}")
+    # Id of the browser tab that made the change, it already applied it
+    client_id = models.CharField('client id', default="", blank=True, max_length=40)
+    timestamp = models.DateTimeField('timestamp', db_index=True, default=timezone.now)
+
+
+    def __str__(self):
+        return "Calendar event %s: %s at %s" % (self.id, self.kind, self.timestamp)
+
+
 class DayNoteHeader(models.Model):
     """Note for a given date that is rendered in a day's header near day number."""
     user = models.ForeignKey(User, db_index=True, on_delete=models.CASCADE)
@@ -452,6 +548,10 @@ class BusinessData(models.Model):
     workweek_weekday_start = models.IntegerField('weekday', default=6)
     workweek_time_start = models.TimeField('start time', default=time(0, 0, 0))
 
+    # Fatigue rules, 0 means no rule
+    min_rest_hours = models.FloatField('Minimum Rest Between Shifts In Hours', default=0)
+    max_consecutive_days = models.IntegerField('Maximum Consecutive Days Worked', default=0)
+
     # Calendar Display Settings
     display_am_pm = models.BooleanField(default=False)
     display_minutes = models.BooleanField(default=True)
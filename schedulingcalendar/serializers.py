@@ -1,5 +1,6 @@
 from django.forms.models import model_to_dict
 from django.http import HttpResponse
+import json
 
 
 
@@ -64,7 +65,7 @@ def _availability_to_dict(availability):
         Availability formatted into dicts to be serialized by json.
     """
     
-    MODEL_AVAILABILITIES = ('(S)', '(V)', '(A)', '(U)', 'Desired Times')
+    MODEL_AVAILABILITIES = ('(S)', '(V)', '(A)', '(U)', '(R)', 'Desired Times')
     avail_serialized = {}
     
     for key in MODEL_AVAILABILITIES:
@@ -75,6 +76,7 @@ def _availability_to_dict(availability):
             
         avail_serialized[key] = serialized_conflicts
             
+    avail_serialized['(C)'] = availability['(C)']
     avail_serialized['(O)'] = availability['(O)']
     avail_serialized['Hours Scheduled'] = availability['Hours Scheduled']
     avail_serialized['curr_hours'] =availability['curr_hours']
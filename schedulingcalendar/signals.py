@@ -0,0 +1,169 @@
+"""
+Signal receivers that keep caches of computed scheduling data consistent.
+
+Connected when the app is ready (See apps.py).
+"""
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from .models import (Schedule, Vacation, Absence, RepeatUnavailability, DesiredTime,
+                     Department, DepartmentMembership, Employee, BusinessData,
+                     VacationApplication, AbsenceApplication, RepeatUnavailabilityApplication)
+from .business_logic import (bump_data_version, mark_cost_rollups_dirty,
+                             get_rollup_months, mark_cost_snapshots_stale,
+                             invalidate_pending_application_counts, get_burden_components)
+
+
+# Models whose changes affect availability or costs of employees
+VERSIONED_MODELS = (Schedule, Vacation, Absence, RepeatUnavailability, DesiredTime,
+                    DepartmentMembership, Employee, BusinessData)
+
+# Models whose changes affect the counts of pending applications of managers
+PENDING_COUNT_MODELS = (VacationApplication, AbsenceApplication,
+                        RepeatUnavailabilityApplication, BusinessData)
+
+# Fields whose changes affect the hours and costs of every month, fields of
+# employees holding cost burden components are added (See get_cost_fields)
+COST_FIELDS = {
+    Employee: ('wage', 'min_time_for_break', 'break_time_in_min'),
+    BusinessData: ('overtime', 'overtime_multiplier', 'workweek_weekday_start',
+                   'workweek_time_start'),
+}
+
+# Fields whose changes only affect availability of employees
+AVAILABILITY_FIELDS = {
+    BusinessData: ('min_rest_hours', 'max_consecutive_days'),
+}
+
+
+
+def get_cost_fields(model):
+    """Return names of the fields of model whose changes affect costs.
+
+    Cost burden components can hold their amounts in any field of Employee,
+    so its fields are read from the components in settings each time.
+    """
+    fields = COST_FIELDS[model]
+    if model is Employee:
+        fields += tuple(component['field'] for component in get_burden_components()
+                        if 'field' in component and component['field'] not in fields)
+    return fields
+
+
+def bump_user_data_version(sender, instance, **kwargs):
+    """Invalidate cached data computed for the managing user of instance."""
+    if instance.user_id is None:
+        return
+    # Business data is saved whenever a calendar is loaded, only its
+    # scheduling settings affect availability
+    if sender is BusinessData and not (getattr(instance, '_cost_fields_changed', True) or
+                                       getattr(instance, '_availability_fields_changed', True)):
+        return
+    bump_data_version(instance.user_id)
+
+
+def track_cost_field_changes(sender, instance, raw=False, **kwargs):
+    """Remember if the save of instance changes any of its cost fields, or
+    of its fields only affecting availability."""
+    fields = get_cost_fields(sender)
+    availability_fields = AVAILABILITY_FIELDS.get(sender, ())
+    if raw or instance.pk is None:
+        instance._cost_fields_changed = True
+        instance._availability_fields_changed = True
+        return
+    old_values = (sender.objects.filter(pk=instance.pk)
+                                .values_list(*(fields + availability_fields)).first())
+    new_values = tuple(getattr(instance, f) for f in fields + availability_fields)
+    if old_values is None:
+        old_values = (None,) * len(new_values)
+    instance._cost_fields_changed = old_values[:len(fields)] != new_values[:len(fields)]
+    instance._availability_fields_changed = old_values[len(fields):] != new_values[len(fields):]
+
+
+def invalidate_all_costs(sender, instance, **kwargs):
+    """Mark every cost rollup and snapshot of the user stale if cost fields
+    changed."""
+    if instance.user_id is not None and getattr(instance, '_cost_fields_changed', True):
+        mark_cost_rollups_dirty(instance.user_id)
+        mark_cost_snapshots_stale(instance.user_id)
+
+
+def invalidate_department_costs(sender, instance, **kwargs):
+    """Mark every cost snapshot of the user stale, since they contain the
+    names of all departments."""
+    mark_cost_snapshots_stale(instance.user_id)
+
+
+def invalidate_pending_counts(sender, instance, **kwargs):
+    """Remove cached counts of pending applications of the managing user of
+    instance."""
+    if instance.user_id is not None:
+        invalidate_pending_application_counts(instance.user_id)
+
+
+def track_schedule_times(sender, instance, raw=False, **kwargs):
+    """Remember the times and employee of an existing schedule before it is
+    saved."""
+    if not raw and instance.pk is not None:
+        instance._old_values = (sender.objects.filter(pk=instance.pk)
+                                              .values_list('start_datetime', 'end_datetime',
+                                                           'employee')
+                                              .first())
+
+
+def invalidate_schedule_costs(sender, instance, **kwargs):
+    """Mark cost rollups and snapshots of months a schedule's costs belong to
+    stale.
+    
+    Schedules without employees have no cost, so changes only matter if the
+    schedule has an employee before or after. Views that apply the schedule's
+    cost delta to the snapshot of a month set _cost_delta_month on the
+    schedule, that snapshot is left as is (See apply_cost_delta). Saves of
+    other fields only, like the schedule's note, change no costs.
+    """
+    old_values = getattr(instance, '_old_values', None)
+    if instance.user_id is None:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not update_fields & set(['start_datetime', 'end_datetime', 'employee']):
+        return
+    if instance.employee_id is None and (not old_values or old_values[2] is None):
+        return
+    months = get_rollup_months(instance.start_datetime, instance.end_datetime)
+    if old_values:
+        months |= get_rollup_months(old_values[0], old_values[1])
+    mark_cost_rollups_dirty(instance.user_id, months)
+    months.discard(getattr(instance, '_cost_delta_month', None))
+    mark_cost_snapshots_stale(instance.user_id, months)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_user_data_version, sender=model,
+                      dispatch_uid='bump_data_version_%s' % model.__name__)
+    post_delete.connect(bump_user_data_version, sender=model,
+                        dispatch_uid='bump_data_version_delete_%s' % model.__name__)
+                        
+for model in COST_FIELDS:
+    pre_save.connect(track_cost_field_changes, sender=model,
+                     dispatch_uid='track_cost_fields_%s' % model.__name__)
+    post_save.connect(invalidate_all_costs, sender=model,
+                      dispatch_uid='invalidate_costs_%s' % model.__name__)
+post_delete.connect(invalidate_all_costs, sender=Employee,
+                    dispatch_uid='invalidate_costs_delete_Employee')
+
+pre_save.connect(track_schedule_times, sender=Schedule,
+                 dispatch_uid='track_schedule_times')
+post_save.connect(invalidate_schedule_costs, sender=Schedule,
+                  dispatch_uid='invalidate_costs_Schedule')
+post_delete.connect(invalidate_schedule_costs, sender=Schedule,
+                    dispatch_uid='invalidate_costs_delete_Schedule')
+
+post_save.connect(invalidate_department_costs, sender=Department,
+                  dispatch_uid='invalidate_costs_Department')
+post_delete.connect(invalidate_department_costs, sender=Department,
+                    dispatch_uid='invalidate_costs_delete_Department')
+
+for model in PENDING_COUNT_MODELS:
+    post_save.connect(invalidate_pending_counts, sender=model,
+                      dispatch_uid='invalidate_pending_counts_%s' % model.__name__)
+    post_delete.connect(invalidate_pending_counts, sender=model,
+                        dispatch_uid='invalidate_pending_counts_delete_%s' % model.__name__)
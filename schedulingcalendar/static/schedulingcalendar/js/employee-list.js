@@ -1,5 +1,25 @@
 $(document).ready(function() {
-    $('#employee-table').DataTable({
+    var table = $('#employee-table').DataTable({
       "lengthMenu": [ [25, 50, -1], [25, 50, "All"] ]
     });
-} );
\ No newline at end of file
+    $("#load-more-employees").click(loadMoreEmployees);
+    
+    
+    /** Add the next page of employees to the table. */
+    function loadMoreEmployees(event) {
+      var $btn = $(this);
+      $btn.prop("disabled", true);
+      $.get($btn.data("url"),
+            {cursor: $btn.data("cursor")},
+            function(data) {
+              var info = JSON.parse(data);
+              table.rows.add($(info["html"]).filter("tr")).draw(false);
+              if (info["cursor"]) {
+                $btn.data("cursor", info["cursor"]);
+                $btn.prop("disabled", false);
+              } else {
+                $btn.remove();
+              }
+            });
+    }
+} );
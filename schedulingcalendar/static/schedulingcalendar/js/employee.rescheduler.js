@@ -13,6 +13,7 @@ $(document).ready(function() {
                   "Friday", "Saturday", "Sunday"];
   var DATE_FORMAT = "YYYY-MM-DD";
   var EMPLOYEELESS_EVENT_ROW = 1000;
+  var CALENDAR_EVENTS_POLL_DELAY = 3000; // Milliseconds between requests for changes
 
   // General state variables
   var displaySettings = {};
@@ -131,6 +132,37 @@ $(document).ready(function() {
                  error: calendarNotFoundError}
   $("#load-calendar-form").ajaxForm(options);
 
+  // Reload the calendar when the manager publishes a new version of it
+  getPublishedCalendars(null);
+
+
+  /**
+   * Ask for calendars published after lastEventId, then ask again after
+   * CALENDAR_EVENTS_POLL_DELAY milliseconds.
+   */
+  function getPublishedCalendars(lastEventId) {
+    var params = lastEventId === null ? {} : {last_event_id: lastEventId};
+    $.get($calendarLoaderForm.data("events-url"), params, function(json_data) {
+      var info = JSON.parse(json_data);
+      for (var i=0; i < info["events"].length; i++) {
+        reloadPublishedCalendar(info["events"][i]["data"]);
+      }
+      setTimeout(function() { getPublishedCalendars(info["last_event_id"]); }, CALENDAR_EVENTS_POLL_DELAY);
+    }).fail(function() {
+      setTimeout(function() { getPublishedCalendars(lastEventId); }, CALENDAR_EVENTS_POLL_DELAY);
+    });
+  }
+
+
+  /** Reload the selected calendar if it is the one that was published. */
+  function reloadPublishedCalendar(published) {
+    var date = moment(published["date"]);
+    if (published["department"] == $("#id_department").val() &&
+        date.month() + 1 == $("#id_month").val() && date.year() == $("#id_year").val()) {
+      $("#get-calendar-button").trigger("click");
+    }
+  }
+
 
   /**
    * Callback for load-calendar-form which is a html get form that asks for a
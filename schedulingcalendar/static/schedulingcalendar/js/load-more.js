@@ -0,0 +1,23 @@
+$(document).ready(function() {
+  $(".btn-load-more").click(loadMore);
+  
+  
+  /** Append the next page of a list after the button's cursor, hiding the
+      button once there are no more pages. */
+  function loadMore(event) {
+    var $btn = $(this);
+    $btn.prop("disabled", true);
+    $.get($btn.data("url"),
+          {kind: $btn.data("kind"), cursor: $btn.data("cursor")},
+          function(data) {
+            var info = JSON.parse(data);
+            $($btn.data("target")).append(info["html"]);
+            if (info["cursor"]) {
+              $btn.data("cursor", info["cursor"]);
+              $btn.prop("disabled", false);
+            } else {
+              $btn.remove();
+            }
+          });
+  }
+});
@@ -1,12 +1,15 @@
 
 
 $(document).ready(function() {
-  $(".btn-vacation-approve").click(approveVacationApplication);
-  $(".btn-vacation-disapprove").click(disapproveVacationApplication);
-  $(".btn-absence-approve").click(approveAbsenceApplication);
-  $(".btn-absence-disapprove").click(disapproveAbsenceApplication);
-  $(".btn-repeat-unav-approve").click(approveRepeatUnavApplication);
-  $(".btn-repeat-unav-disapprove").click(disapproveRepeatUnavApplication);
+  // Delegated, so applications loaded later with load more are handled too
+  $(document).on("click", ".btn-vacation-approve", approveVacationApplication);
+  $(document).on("click", ".btn-vacation-disapprove", disapproveVacationApplication);
+  $(document).on("click", ".btn-absence-approve", approveAbsenceApplication);
+  $(document).on("click", ".btn-absence-disapprove", disapproveAbsenceApplication);
+  $(document).on("click", ".btn-repeat-unav-approve", approveRepeatUnavApplication);
+  $(document).on("click", ".btn-repeat-unav-disapprove", disapproveRepeatUnavApplication);
+  $("#approve-selected-btn").click(function() { decideSelectedApplications($(this), true); });
+  $("#disapprove-selected-btn").click(function() { decideSelectedApplications($(this), false); });
    
    
   function approveVacationApplication(event) {
@@ -76,6 +79,40 @@ $(document).ready(function() {
     var pk = info['pk'];
     $(".repeat-unav-obj[data-pk='" + pk + "']").remove()
   }
+  
+  
+  /** Approve or disapprove all selected applications in one request. */
+  function decideSelectedApplications($btn, approved) {
+    var decisions = [];
+    $(".app-select:checked").each(function() {
+      decisions.push({kind: $(this).data("kind"), pk: $(this).data("pk"), approved: approved});
+    });
+    if (!decisions.length) {
+      return;
+    }
+    $.post($btn.data("url"),
+           {decisions: JSON.stringify(decisions)},
+           removeDecidedApps)
+     .fail(function(jqXHR) {
+       alert(JSON.parse(jqXHR.responseText)["err"]);
+     });
+  }
+  
+  
+  /** Remove decided applications and warn of schedules approved ones overlap. */
+  function removeDecidedApps(data) {
+    var info = JSON.parse(data);
+    var conflictCount = 0;
+    for (var i=0; i < info["decisions"].length; i++) {
+      var decision = info["decisions"][i];
+      var cssClass = decision["kind"].replace("_", "-") + "-obj";
+      $("." + cssClass + "[data-pk='" + decision["pk"] + "']").remove();
+      conflictCount += decision["conflicts"].length;
+    }
+    if (conflictCount) {
+      alert("Approved applications overlap " + conflictCount + " assigned schedules.");
+    }
+  }
    
    
    
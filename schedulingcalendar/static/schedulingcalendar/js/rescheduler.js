@@ -13,6 +13,8 @@ $(document).ready(function() {
                   "Friday", "Saturday", "Sunday"];
   var DATE_FORMAT = "YYYY-MM-DD";
   var EMPLOYEELESS_EVENT_ROW = 1000;
+  var PROTO_ELIGIBLES_DELAY = 250; // Milliseconds to wait for more form changes
+  var CALENDAR_EVENTS_POLL_DELAY = 3000; // Milliseconds between requests for changes
 
   // General state variables
   var calDate = null;
@@ -39,10 +41,17 @@ $(document).ready(function() {
   var preEditedSchedule = {'oldStartDatetime': null, oldEndDatetime: null,
                            'oldHideStart': null, 'oldHideEnd': null};
   var timePickerInterval = $("section.schedule-adder").data("time-interval");
+  var protoEligiblesTimer = null;
+  var protoEligiblesRequestNum = 0;
+  // Id sent with every request, changes this tab made are not applied again
+  // when they come back as calendar events
+  var calendarClientId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+  var listeningForCalendarEvents = false;
 
   // Jquery object variables
   var $fullCal = $("#calendar");
   var $scheduleInfo = $("#schedule-info");
+  var $scheduleCost = $("#schedule-cost");
   var $eligableList = $("#eligable-list");
   var $calendarLoaderForm = $("#load-calendar-form");
   var $conflictAssignBtn = $("#conflict-assign-btn");
@@ -53,6 +62,7 @@ $(document).ready(function() {
   var $editConflictBtn = $("#edit-undo-conflict-btn");
   var $costBtn = $("#cost-button");
   var $costList =  $("#cost-list");
+  var $costForecast = $("#cost-forecast");
   var $addScheduleDate = $("#add-date");
   var $addScheduleDep = $("#new-schedule-dep");
   var $viewLiveDate = $("#view-live-date");
@@ -60,6 +70,7 @@ $(document).ready(function() {
   var $pushLive = $("#push-live");
   var $pushLiveAfterWarning = $("#push-calendar-after-warning-btn");
   var $successfulLiveCalMsg = $("#successful-live-cal-change");
+  var $understaffedWindows = $("#understaffed-windows");
   var $setViewRights = $("#set-view-rights");
   var $viewLive = $("#view-live");
   var $eligibleLegendSelector = $("#legend-selector");
@@ -114,6 +125,7 @@ $(document).ready(function() {
   $setAllEmployeeViewCheckbox.change(showSetDepEmployeeViews);
   $("#publish-changes-btn").click(function() { $("#publish-changes").trigger("click"); });
   $("#update-view-rights-btn").click(function() { $("#update-view-rights").trigger("click"); });
+  $.ajaxSetup({headers: {"X-Calendar-Client": calendarClientId}});
 
   // Set up sticky functions for toolbar and calendar
   var toolbar = document.getElementById("toolbar-sticky");
@@ -364,6 +376,10 @@ $(document).ready(function() {
     hoursAndCosts = info["hours_and_costs"];
     avgMonthlyRev = info["avg_monthly_revenue"];
     renderMonthlyCosts();
+    var calDate = moment(info["date"]);
+    $costForecast.empty();
+    $.get("get_cost_forecast", {month: calDate.month() + 1, year: calDate.year()},
+          renderCostForecast);
 
     //Set activate/deactivate to state of live_calendar
     liveCalExists = info["live_cal_exists"];
@@ -405,6 +421,137 @@ $(document).ready(function() {
     $("#set_live_date").val(moment(info["date"]).format(DATE_FORMAT));
     $("#set_live_department").val(calDepartment);
     setViewRightState(info['view_rights']);
+
+    listenForCalendarEvents();
+  }
+
+
+  /**
+   * Poll for changes made to the calendars by other tabs or managers, so they
+   * are applied to the loaded calendar as they happen instead of reloading
+   * it. A request is sent every CALENDAR_EVENTS_POLL_DELAY milliseconds,
+   * resuming after the last event received.
+   */
+  function listenForCalendarEvents() {
+    if (listeningForCalendarEvents) { return; }
+    listeningForCalendarEvents = true;
+    _getCalendarEvents(null);
+  }
+
+
+  /** Apply changes after lastEventId, then ask for the ones after them. */
+  function _getCalendarEvents(lastEventId) {
+    var params = lastEventId === null ? {} : {last_event_id: lastEventId};
+    $.get("calendar_events", params, function(json_data) {
+      var info = JSON.parse(json_data);
+      for (var i=0; i < info["events"].length; i++) {
+        _applyCalendarEvent(info["events"][i]);
+      }
+      setTimeout(function() { _getCalendarEvents(info["last_event_id"]); }, CALENDAR_EVENTS_POLL_DELAY);
+    }).fail(function() {
+      setTimeout(function() { _getCalendarEvents(lastEventId); }, CALENDAR_EVENTS_POLL_DELAY);
+    });
+  }
+
+
+  /** Patch the loaded calendar with the data of an event this tab did not make. */
+  function _applyCalendarEvent(event) {
+    var patches = {"schedules_saved": _patchSavedSchedules,
+                   "schedules_removed": _patchRemovedSchedules,
+                   "day_note_header_saved": _patchDayNoteHeader,
+                   "day_note_body_saved": _patchDayNoteBody,
+                   "calendar_published": _patchPublishedCalendar};
+    if (event["client_id"] == calendarClientId || calDate === null || !patches[event["kind"]]) {
+      return;
+    }
+    patches[event["kind"]](event["data"]);
+  }
+
+
+  /** Add cost delta of a change from another tab if made to the loaded month. */
+  function _patchCosts(data) {
+    if (!data["cost_delta"] || !calDate.isSame(moment(data["cal_date"]), "month")) {
+      return;
+    }
+    updateHoursAndCost(data["cost_delta"]);
+    reRenderAllCostsHours();
+  }
+
+
+  /** Render added or changed schedules of the loaded department. */
+  function _patchSavedSchedules(data) {
+    var visibleDates = visibleFullCalDates();
+    var schedules = [];
+    for (var i=0; i < data["schedules"].length; i++) {
+      var schedule = data["schedules"][i];
+      var employeePk = schedule["employee"];
+      var date = moment(schedule["start_datetime"]).format(DATE_FORMAT);
+      if (schedule["department"] != calDepartment || !visibleDates.hasOwnProperty(date)) {
+        continue;
+      }
+      if (employeePk != null && employeeSortedIdList.indexOf(employeePk) == -1) {
+        // Employee created after the calendar was loaded
+        $("#get-calendar-button").trigger("click");
+        return;
+      }
+      _removeScheduleEvent(schedule["id"]);
+      if (schedule.hide_start_time || schedule.hide_end_time) {
+        schedulesWithHiddenTimes.push(schedule);
+      }
+      if (displaySettings["unique_row_per_employee"]) {
+        if (employeePk != null && !employeesAssigned.includes(employeePk)) {
+          employeesAssigned.push(employeePk);
+          _createBlankEventsForNewRow(employeeSortedIdList.indexOf(employeePk), employeePk, date);
+        } else if (employeePk == null && !_checkIfAnyEventsOnDate(date)) {
+          var blankEvents = [];
+          for (var j=0; j < employeesAssigned.length; j++) {
+            var blankEventRow = employeeSortedIdList.indexOf(employeesAssigned[j]);
+            blankEvents.push(_createBlankEvent(date, employeesAssigned[j], blankEventRow));
+          }
+          $fullCal.fullCalendar("renderEvents", blankEvents);
+        }
+        _copySchedulesToUniqueRowEvents([schedule]);
+      } else {
+        schedules.push(schedule);
+      }
+    }
+    $fullCal.fullCalendar("renderEvents", _schedulesToEvents(schedules));
+    renderHiddenTimeTooltips();
+    _patchCosts(data);
+  }
+
+
+  /** Remove events of removed schedules. */
+  function _patchRemovedSchedules(data) {
+    for (var i=0; i < data["schedule_pks"].length; i++) {
+      _removeScheduleEvent(data["schedule_pks"][i]);
+    }
+    _patchCosts(data);
+  }
+
+
+  /** Render day note header saved for the loaded department. */
+  function _patchDayNoteHeader(dayNoteHeader) {
+    if (dayNoteHeader["department"] == calDepartment) {
+      _updateDayNoteHeader(JSON.stringify(dayNoteHeader));
+    }
+  }
+
+
+  /** Render day note body saved for the loaded department. */
+  function _patchDayNoteBody(dayNoteBody) {
+    if (dayNoteBody["department"] == calDepartment) {
+      _updateDayNoteBody(JSON.stringify(dayNoteBody));
+    }
+  }
+
+
+  /** Update live calendar buttons if the loaded calendar was published. */
+  function _patchPublishedCalendar(data) {
+    if (data["department"] == calDepartment && calDate.isSame(moment(data["date"]), "month")) {
+      liveCalExists = true;
+      setCalLiveButtonStyles();
+    }
   }
 
 
@@ -666,15 +813,31 @@ $(document).ready(function() {
     var msg = info["message"];
     var viewRights = info["view_rights"];
     successfulLiveCalStateChange(msg);
+    renderUnderstaffedWindows(info["understaffed"]);
     setViewRightState(viewRights);
     showDepEmployeeViews();
     showSetDepEmployeeViews();
   }
 
 
+  /** List windows where the pushed calendar breaks the staffing rules. */
+  function renderUnderstaffedWindows(windows) {
+    if (!windows || !windows.length) { return; }
+    var html = "<p>Fewer people than required by staffing rules:</p><ul>";
+    for (var i=0; i < windows.length; i++) {
+      var w = windows[i];
+      var day = moment(w["date"]).format("ddd, MMM D");
+      html += "<li>" + day + " " + w["start"] + " - " + w["end"] + ": " +
+              w["min_headcount"] + " of " + w["target"] + "</li>";
+    }
+    $understaffedWindows.html(html + "</ul>");
+  }
+
+
   /** Show user modal to indicate successful change to live calendar */
   function successfulLiveCalStateChange(msg) {
     $successfulLiveCalMsg.text(msg);
+    $understaffedWindows.empty();
     $successfulPushModal = $("#successfulPushModal");
     $successfulPushModal.css("margin-top", Math.max(0, ($(window).height() - $successfulPushModal.height()) / 2));
     $successfulPushModal.modal('show');
@@ -951,6 +1114,7 @@ $(document).ready(function() {
 
     // If employee assigned to schedule add highlight class to appropriate li
     _highlightAssignedEmployee(currAssignedEmployeeID);
+    renderScheduleCost(schedulePk);
   }
 
 
@@ -1005,18 +1169,31 @@ $(document).ready(function() {
   }
 
 
-  /** Get eligible list for potential schedule to be added. */
+  /** Get eligible list for potential schedule to be added.
+   *
+   * Requests are debounced so that scrubbing through times only asks for the
+   * eligible list of the last selected times, and responses to superseded
+   * requests are ignored in case they arrive out of order.
+   */
   function getProtoEligibles(event) {
     var date = event.data.date;
-    var $scheduleClicked = $(".fc-event-clicked");
-    // Ensure a day has been clicked and no schedule currently clicked
-    if (date && !$scheduleClicked.length) {
-      var startTime = $("#start-timepicker").val();
-      var endTime = $("#end-timepicker").val();
-      $.get("get_proto_schedule_info",
-            {add_date: date, department: calDepartment, start_time: startTime, end_time: endTime},
-             displayProtoEligables);
-    }
+    clearTimeout(protoEligiblesTimer);
+    protoEligiblesTimer = setTimeout(function() {
+      var $scheduleClicked = $(".fc-event-clicked");
+      // Ensure a day has been clicked and no schedule currently clicked
+      if (date && !$scheduleClicked.length) {
+        var startTime = $("#start-timepicker").val();
+        var endTime = $("#end-timepicker").val();
+        var requestNum = ++protoEligiblesRequestNum;
+        $.get("get_proto_schedule_info",
+              {add_date: date, department: calDepartment, start_time: startTime, end_time: endTime},
+              function(data) {
+                if (requestNum === protoEligiblesRequestNum) {
+                  displayProtoEligables(data);
+                }
+              });
+      }
+    }, PROTO_ELIGIBLES_DELAY);
   }
 
 
@@ -1045,6 +1222,12 @@ $(document).ready(function() {
     if (availability['(U)'].length > 0) {
       warningFlagList.push("U-Re");
     }
+    if (availability['(R)'].length > 0) {
+      warningFlagList.push("R");
+    }
+    if (availability['(C)']) {
+      warningFlagList.push("C");
+    }
     if (availability['(O)']) {
       warningFlagList.push("O");
     }
@@ -1094,6 +1277,19 @@ $(document).ready(function() {
         warningStr += "<p>" + str + "</p>";
       }
     }
+    if (availability['(R)'].length > 0) {
+      warningStr += "<h5>Schedules Too Close For Minimum Rest:</h5>";
+      for (schedule of availability['(R)']) {
+        var str = _scheduleConflictToStr(schedule);
+        warningStr += "<p>" + str + "</p>";
+      }
+    }
+    if (availability['(C)']) {
+      warningStr += "<h5>Assignment Exceeds Maximum Consecutive Days:</h5>";
+      warningStr += "<p>" + "Employee Will Be Working "
+      warningStr += availability['(C)']
+      warningStr += " Days In A Row If Assigned." + "</p>";
+    }
     if (availability['(O)']) {
       warningStr += "<h5>Assignment Will Put Employee In Overtime:</h5>";
       warningStr += "<p>" + "Employee Will Be Working "
@@ -1112,7 +1308,8 @@ $(document).ready(function() {
     if ((availability['(S)'].length > 0) || (availability['(V)'].length > 0) ||
         (availability['(A)'].length > 0) || (availability['(U)'].length > 0)) {
       classes += "red-bg-eligible";
-    } else if (availability['(O)'] || (availability['Hours Scheduled'] >
+    } else if (availability['(O)'] || (availability['(R)'].length > 0) ||
+               availability['(C)'] || (availability['Hours Scheduled'] >
                                        employee['desired_hours'] + displaySettings["desired_hours_overshoot_alert"])) {
       classes += "orange-bg-eligible";
     } else if (availability['Desired Times'].length > 0) {
@@ -1319,6 +1516,7 @@ $(document).ready(function() {
     // Update cost display to reflect any cost changes
     updateHoursAndCost(info["cost_delta"]);
     reRenderAllCostsHours();
+    renderScheduleCost($event[0].id);
   }
 
 
@@ -1454,14 +1652,30 @@ $(document).ready(function() {
     var info = JSON.parse(data);
     $removeScheduleBtn.css("display", "block");
     $removeBtnConfirmContainer.css("display", "none");
-    var schedulePk = info["schedule_pk"];
+    _removeScheduleEvent(info["schedule_pk"]);
+    // Update cost display to reflect any cost changes
+    if (info["cost_delta"]) {
+      updateHoursAndCost(info["cost_delta"]);
+      reRenderAllCostsHours();
+    }
+    // Disable schedule note
+    $scheduleNoteText.val("Please Select A Schedule First");
+    $scheduleNoteBtn.prop('disabled', true);
+    // Inactivate schedule buttons and get proto eligibles
+    $removeScheduleBtn.addClass("inactive-btn");
+    $editScheduleBtn.addClass("inactive-btn");
+    getProtoEligibles({data: {date: $addScheduleDate.val()}});
+  }
+
+
+  /** Helper function that removes event of schedule, if rendered */
+  function _removeScheduleEvent(schedulePk) {
     // Remove from hidden events if in hidden schedule times list
     schIndex = findWithAttr(schedulesWithHiddenTimes, "id", schedulePk);
     if (schIndex !== -1) { schedulesWithHiddenTimes.splice(schIndex, 1); }
 
-
-    // Update title string to reflect changes to schedule & rehighlight
     $event = $fullCal.fullCalendar("clientEvents", schedulePk);
+    if (!$event.length) { return; }
     if (!displaySettings["unique_row_per_employee"] || $event[0].eventRowSort == EMPLOYEELESS_EVENT_ROW) {
       $fullCal.fullCalendar("removeEvents", schedulePk);
     } else {
@@ -1477,18 +1691,6 @@ $(document).ready(function() {
       }
       $fullCal.fullCalendar("removeEvents", schedulePk)
     }
-    // Update cost display to reflect any cost changes
-    if (info["cost_delta"]) {
-      updateHoursAndCost(info["cost_delta"]);
-      reRenderAllCostsHours();
-    }
-    // Disable schedule note
-    $scheduleNoteText.val("Please Select A Schedule First");
-    $scheduleNoteBtn.prop('disabled', true);
-    // Inactivate schedule buttons and get proto eligibles
-    $removeScheduleBtn.addClass("inactive-btn");
-    $editScheduleBtn.addClass("inactive-btn");
-    getProtoEligibles({data: {date: $addScheduleDate.val()}});
   }
 
 
@@ -2079,6 +2281,19 @@ $(document).ready(function() {
 
   /** Add changes in hours and cost to the hoursAndCosts state variable. */
   function updateHoursAndCost(hoursAndCostsDelta) {
+    // Update schedule hours & costs
+    var scheduleCosts = hoursAndCosts['schedule_hours_costs'];
+    var scheduleCostDelta = hoursAndCostsDelta['schedule_hours_costs'];
+    for (var schedulePk in scheduleCostDelta) {
+      if (!scheduleCostDelta.hasOwnProperty(schedulePk)) { continue; }
+      if (!scheduleCosts.hasOwnProperty(schedulePk)) {
+        scheduleCosts[schedulePk] = scheduleCostDelta[schedulePk];
+      } else {
+        for (var key in scheduleCostDelta[schedulePk]) {
+          scheduleCosts[schedulePk][key] += scheduleCostDelta[schedulePk][key];
+        }
+      }
+    }
     // Update day hours & costs
     var dayCosts = hoursAndCosts['day_hours_costs'];
     var dayCostDelta = hoursAndCostsDelta['day_hours_costs'];
@@ -2101,10 +2316,12 @@ $(document).ready(function() {
       }
     }
 
-    // Find workweek to update
+    // Find workweeks to update, deltas of batch edits can have several
     var allWorkweekCosts = hoursAndCosts['workweek_hours_costs'];
-    var weekCosts = {};
-    var weekCostDelta = hoursAndCostsDelta['workweek_hours_costs'][0];
+    var weekCostDeltas = hoursAndCostsDelta['workweek_hours_costs'];
+    for (var j=0; j < weekCostDeltas.length; j++) {
+      var weekCosts = {};
+      var weekCostDelta = weekCostDeltas[j];
       for (var i=0; i < allWorkweekCosts.length; i++) {
         var weekStart = allWorkweekCosts[i]['date_range']['start'];
         var weekDeltaStart = weekCostDelta['date_range']['start'];
@@ -2113,17 +2330,18 @@ $(document).ready(function() {
           break;
         }
       }
-    // Update week hours & costs
-    var hoursAndCostDelta = weekCostDelta['hours_cost'];
-    for (var department in hoursAndCostDelta) {
-      if (!hoursAndCostDelta.hasOwnProperty(department)) { continue; }
-      var hourDelta = hoursAndCostDelta[department]['hours'];
-      var overtimeDelta = hoursAndCostDelta[department]['overtime_hours'];
-      var costDelta = hoursAndCostDelta[department]['cost'];
-
-      weekCosts[department]['hours'] += hourDelta;
-      weekCosts[department]['overtime_hours'] += overtimeDelta;
-      weekCosts[department]['cost'] += costDelta;
+      // Update week hours & costs
+      var hoursAndCostDelta = weekCostDelta['hours_cost'];
+      for (var department in hoursAndCostDelta) {
+        if (!hoursAndCostDelta.hasOwnProperty(department)) { continue; }
+        var hourDelta = hoursAndCostDelta[department]['hours'];
+        var overtimeDelta = hoursAndCostDelta[department]['overtime_hours'];
+        var costDelta = hoursAndCostDelta[department]['cost'];
+
+        weekCosts[department]['hours'] += hourDelta;
+        weekCosts[department]['overtime_hours'] += overtimeDelta;
+        weekCosts[department]['cost'] += costDelta;
+      }
     }
     // Update month hours & costs
     var monthCosts = hoursAndCosts['month_costs'];
@@ -2145,6 +2363,39 @@ $(document).ready(function() {
   }
 
 
+  /** Display hours and cost of schedule, if it has an employee assigned. */
+  function renderScheduleCost(schedulePk) {
+    var scheduleCosts = hoursAndCosts['schedule_hours_costs'];
+    if (!scheduleCosts.hasOwnProperty(schedulePk)) {
+      $scheduleCost.text("");
+      return;
+    }
+    var scheduleCost = scheduleCosts[schedulePk];
+    var costWithCommas = numberWithCommas(Math.round(scheduleCost['cost']));
+    var hours = Math.round(scheduleCost['hours'] * 100) / 100;
+    var overtime = Math.round(scheduleCost['overtime_hours'] * 100) / 100;
+    $scheduleCost.text("Shift Cost: $" + costWithCommas + " (" + hours + " hours, " +
+                       overtime + " overtime)");
+  }
+
+
+  /** Display forecasted range of total cost as a target band for the month. */
+  function renderCostForecast(data) {
+    var forecast = JSON.parse(data);
+    if (!forecast["history_months"]) { return; }
+    var totalCost = forecast["departments"]["total"]["cost"];
+    var low = numberWithCommas(Math.round(totalCost["low"]));
+    var high = numberWithCommas(Math.round(totalCost["high"]));
+    var html = "<span class='cost-dep-name'>Forecast: $" + low + " - $" + high + "</span>";
+    var percentage = forecast["cost_percentage"];
+    if (percentage) {
+      html += "<span class='cost-percentage'> " + Math.round(percentage["low"]) + "% - " +
+              Math.round(percentage["high"]) + "%</span>";
+    }
+    $costForecast.html(html);
+  }
+
+
   /** Display calendar cost li elements. */
   function renderMonthlyCosts() {
     $costList.empty();
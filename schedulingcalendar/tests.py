@@ -1,14 +1,30 @@
-from django.test import TestCase
-from django.contrib.auth.models import User
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth.models import User, Group
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.cache import cache
 from django.utils import timezone
 from .models import (Schedule, Department, DepartmentMembership, MonthlyRevenue,
                      Employee, Vacation, RepeatUnavailability, BusinessData,
-                     Absence, DesiredTime, LiveSchedule, LiveCalendar)
-from .business_logic import get_availability, get_eligibles
+                     Absence, DesiredTime, LiveSchedule, LiveCalendar, MonthlyCostRollup,
+                     CalendarCostSnapshot, VacationApplication, RepeatUnavailabilityApplication)
+from .business_logic import (get_availability, get_eligibles, filter_overlapping,
+                             get_day_availability_snapshot, get_eligibles_from_snapshot,
+                             get_day_availability_matrix, get_cost_rollups,
+                             all_calendar_hours_and_costs, get_month_cost_schedules,
+                             get_avg_monthly_revenue, employee_hours_detailed,
+                             time_dur_in_hours, get_start_end_of_workweek,
+                             get_labor_forecast, create_live_schedules, run_concurrently,
+                             get_keyset_page, decode_cursor, get_pending_application_counts,
+                             get_application_impacts)
+from .business_logic import (forecast_logic, event_logic, concurrency_logic,
+                             cost_rollup_logic, cost_snapshot_logic)
 from datetime import datetime, date, time, timedelta
 import pytz
 import math
+import json
+import threading
 
 
 def create_tzaware_datetime(datetime):
@@ -431,5 +447,1102 @@ class GetEligiblesTest(TestCase):
         self.assertEqual(len(eligibles), 256)   
         for i in range(1, 257): 
             self.assertEqual(int(eligibles[i]['employee'].first_name), i)
-
-
+            
+            
+class FilterOverlappingTest(TestCase):
+    """Test class for the filter_overlapping function.
+    
+    The same assertions hold on every database backend. On PostgreSQL they 
+    exercise the && operator on the generated time_range columns, so the suite
+    should also be run with SCHEDULER_DB_BACKEND=postgres.
+    """
+    
+    def setUp(self):
+        user = User.objects.create(username='testuser')
+        department = create_department(user)
+        employee = create_employee(user)
+        for hour in [8, 12, 16]:
+            start_dt = create_tzaware_datetime(datetime(2017, 1, 2, hour))
+            end_dt = create_tzaware_datetime(datetime(2017, 1, 2, hour + 4))
+            create_schedule(user, start_dt, end_dt, department, employee=employee)
+            create_vacation(user, employee, start_dt, end_dt)
+            
+            
+    def test_overlapping_range(self):
+        """Objects partially overlapping the range are returned."""
+        start_dt = create_tzaware_datetime(datetime(2017, 1, 2, 11))
+        end_dt = create_tzaware_datetime(datetime(2017, 1, 2, 13))
+        schedules = filter_overlapping(Schedule.objects.all(), start_dt, end_dt)
+        vacations = filter_overlapping(Vacation.objects.all(), start_dt, end_dt)
+        
+        self.assertEqual(sorted(timezone.localtime(s.start_datetime).hour for s in schedules), [8, 12])
+        self.assertEqual(vacations.count(), 2)
+        
+        
+    def test_adjacent_range(self):
+        """Objects that only touch the end points of the range are excluded."""
+        start_dt = create_tzaware_datetime(datetime(2017, 1, 2, 12))
+        end_dt = create_tzaware_datetime(datetime(2017, 1, 2, 16))
+        schedules = filter_overlapping(Schedule.objects.all(), start_dt, end_dt)
+        
+        self.assertEqual([s.start_datetime for s in schedules], [start_dt])
+        
+        
+class DayAvailabilitySnapshotTest(TestCase):
+    """Test class for ranking eligible employees from a day availability snapshot.
+    
+    get_eligibles_from_snapshot must rank employees exactly as get_eligibles 
+    does, so both are run for the same proto schedules and compared.
+    """
+    
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        create_business_data(self.user)
+        self.department = create_department(self.user)
+        other_department = create_department(self.user, 'Other')
+        for i in range(4):
+            employee = create_employee(self.user, first_name=str(i))
+            create_dep_membership(self.user, employee, self.department, i % 2, 0)
+        e0, e1, e2, e3 = Employee.objects.order_by('id')
+        
+        # Conflicts on Monday January 2nd 2017, and hours earlier that week
+        day = datetime(2017, 1, 2)
+        create_schedule(self.user, create_tzaware_datetime(day.replace(hour=9)),
+                        create_tzaware_datetime(day.replace(hour=13)),
+                        other_department, employee=e0)
+        create_vacation(self.user, e1, create_tzaware_datetime(datetime(2016, 12, 30)),
+                        create_tzaware_datetime(datetime(2017, 1, 4)))
+        create_absence(self.user, e2, create_tzaware_datetime(day.replace(hour=15)),
+                       create_tzaware_datetime(day.replace(hour=18)))
+        create_unav_repeat(self.user, e3, create_tzaware_datetime(day.replace(hour=7)),
+                           create_tzaware_datetime(day.replace(hour=10)), 0)
+        create_desired_time(self.user, e2, create_tzaware_datetime(day.replace(hour=8)),
+                            create_tzaware_datetime(day.replace(hour=12)), 0)
+        for i in range(1, 5):
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 1, 1, 8)),
+                            create_tzaware_datetime(datetime(2017, 1, 1, 18)),
+                            self.department, employee=e3)
+        
+        
+    def _proto_schedule(self, start_hour, end_hour):
+        return Schedule(user=self.user, department=self.department,
+                        start_datetime=create_tzaware_datetime(datetime(2017, 1, 2, start_hour)),
+                        end_datetime=create_tzaware_datetime(datetime(2017, 1, 2, end_hour)))
+        
+        
+    def _summarize(self, eligables):
+        """Reduce eligible list to comparable values."""
+        summary = []
+        for e in eligables['eligables']:
+            availability = e['availability']
+            summary.append((e['employee'].id, e['sorting_score'],
+                            [[obj.id for obj in availability[key]] 
+                             for key in ('(S)', '(V)', '(A)', '(U)', '(R)', 'Desired Times')],
+                            availability['Hours Scheduled'], availability['curr_hours'],
+                            availability['(C)'], availability['(O)']))
+        return summary
+        
+        
+    def test_same_as_get_eligibles(self):
+        """Snapshot ranking matches get_eligibles for schedules across the day."""
+        snapshot = get_day_availability_snapshot(self.user, self.department, date(2017, 1, 2))
+        for start_hour, end_hour in [(6, 9), (8, 12), (12, 16), (16, 20), (17, 23)]:
+            schedule = self._proto_schedule(start_hour, end_hour)
+            self.assertEqual(self._summarize(get_eligibles_from_snapshot(snapshot, schedule)),
+                             self._summarize(get_eligibles(self.user, schedule)))
+                             
+                             
+    def test_fatigue_rules_same_as_get_eligibles(self):
+        """Snapshot finds the same rest and consecutive day conflicts."""
+        BusinessData.objects.filter(user=self.user).update(min_rest_hours=14,
+                                                           max_consecutive_days=1)
+        e0, e1, e2, e3 = Employee.objects.order_by('id')
+        snapshot = get_day_availability_snapshot(self.user, self.department, date(2017, 1, 2))
+        for start_hour, end_hour in [(6, 9), (8, 12), (12, 16), (16, 20), (17, 23)]:
+            schedule = self._proto_schedule(start_hour, end_hour)
+            self.assertEqual(self._summarize(get_eligibles_from_snapshot(snapshot, schedule)),
+                             self._summarize(get_eligibles(self.user, schedule)))
+            
+        availability = get_availability(self.user, e3, self._proto_schedule(6, 9))
+        self.assertEqual(len(availability['(R)']), 4)
+        self.assertEqual(availability['(C)'], 2)
+        availability = get_availability(self.user, e0, self._proto_schedule(16, 20))
+        self.assertEqual(len(availability['(R)']), 1)
+        self.assertEqual(availability['(C)'], 0)
+        
+        employees = dict((e['id'], e) for e in get_day_availability_matrix(snapshot)['employees'])
+        self.assertEqual([interval[:2] for interval in employees[e3.id]['(R)']], [[0, 480]] * 4)
+        self.assertEqual(employees[e3.id]['consecutive_days'], [1, 0])
+        
+        
+    def test_rescoring_makes_no_queries(self):
+        """Changing the times of a schedule reuses the snapshot without queries."""
+        snapshot = get_day_availability_snapshot(self.user, self.department, date(2017, 1, 2))
+        with self.assertNumQueries(0):
+            for end_hour in range(10, 20):
+                get_eligibles_from_snapshot(snapshot, self._proto_schedule(9, end_hour))
+                
+                
+    def test_day_availability_matrix(self):
+        """Matrix has conflicts in minutes of the day and hours of the workweek."""
+        snapshot = get_day_availability_snapshot(self.user, self.department, date(2017, 1, 2))
+        matrix = get_day_availability_matrix(snapshot)
+        e0, e1, e2, e3 = Employee.objects.order_by('id')
+        employees = dict((e['id'], e) for e in matrix['employees'])
+        
+        self.assertEqual(matrix['day_length'], 1440)
+        self.assertEqual(employees[e0.id]['(S)'], 
+                         [[540, 780, Schedule.objects.get(employee=e0).id]])
+        self.assertEqual(employees[e1.id]['(V)'], [[0, 1440, Vacation.objects.get().id]])
+        self.assertEqual(employees[e2.id]['(A)'], [[900, 1080, Absence.objects.get().id]])
+        self.assertEqual(len(employees[e3.id]['(U)']), 1)
+        self.assertEqual(len(employees[e2.id]['Desired Times']), 1)
+        
+        schedule = self._proto_schedule(9, 17)
+        for employee in (e0, e1, e2, e3):
+            availability = get_availability(self.user, employee, schedule)
+            workweek = matrix['workweeks'].index(0)
+            hours = employees[employee.id]['workweek_hours'][workweek]
+            self.assertEqual(hours, availability['curr_hours'])
+            self.assertEqual(employees[employee.id]['remaining_hours'][workweek],
+                             matrix['overtime'] - hours)
+            
+            
+class CostRollupTest(TestCase):
+    """Test class for cached hours and costs of ranges of months."""
+    
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        create_business_data(self.user)
+        self.departments = [create_department(self.user, 'A'), create_department(self.user, 'B')]
+        self.employee = create_employee(self.user, wage=10, monthly_medical=100)
+        # 42.5 hours, after breaks, in a workweek spanning January and February
+        for day in range(29, 32) + [1, 2]:
+            month = 1 if day > 2 else 2
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, month, day, 8)),
+                            create_tzaware_datetime(datetime(2017, month, day, 17)),
+                            self.departments[day % 2], employee=self.employee)
+        MonthlyRevenue.objects.create(user=self.user, monthly_total=1000,
+                                      month_year=date(2016, 1, 1))
+        MonthlyRevenue.objects.create(user=self.user, monthly_total=2001,
+                                      month_year=date(2017, 1, 1))
+                                      
+                                      
+    def _calendar_month_costs(self, year, month):
+        """Month costs as calculated by the calendar of the month."""
+        business_data = BusinessData.objects.get(user=self.user)
+        schedules = get_month_cost_schedules(self.user, year, month, business_data)
+        return all_calendar_hours_and_costs(self.user, self.departments, schedules,
+                                            Employee.objects.filter(user=self.user),
+                                            month, year, business_data)['month_costs']
+                                            
+                                            
+    def test_same_as_calendar_costs(self):
+        """Rollups of each month have the costs of that month's calendar."""
+        rollups = get_cost_rollups(self.user, date(2017, 1, 1), date(2017, 2, 1))
+        for month in rollups['months']:
+            month_costs = self._calendar_month_costs(2017, month['month_year'].month)
+            self.assertEqual(set(month['month_costs']), set(month_costs))
+            for dep_id in month_costs:
+                for key in ('hours', 'overtime_hours', 'cost'):
+                    self.assertAlmostEqual(month['month_costs'][dep_id][key], 
+                                           month_costs[dep_id][key])
+                                           
+        total_costs = rollups['total_costs']['total']
+        self.assertAlmostEqual(total_costs['hours'], 40)
+        self.assertAlmostEqual(total_costs['overtime_hours'], 2.5)
+        self.assertEqual(rollups['months'][0]['avg_monthly_revenue'], 1500)
+        self.assertEqual(rollups['months'][1]['avg_monthly_revenue'], -1)
+        self.assertEqual(rollups['total_avg_revenue'], 1500)
+        self.assertEqual(get_avg_monthly_revenue(self.user, 1), 1500)
+        
+        
+    def test_only_dirty_months_computed(self):
+        """Cached months are summed without schedule queries until invalidated."""
+        get_cost_rollups(self.user, date(2016, 12, 1), date(2017, 12, 1))
+        with self.assertNumQueries(3):
+            get_cost_rollups(self.user, date(2016, 12, 1), date(2017, 12, 1))
+            
+        create_schedule(self.user, create_tzaware_datetime(datetime(2017, 6, 14, 8)),
+                        create_tzaware_datetime(datetime(2017, 6, 14, 17)),
+                        self.departments[0], employee=self.employee)
+        dirty_months = set(MonthlyCostRollup.objects.filter(is_dirty=True)
+                                                    .values_list('month_year', flat=True))
+        self.assertEqual(dirty_months, set([date(2017, 6, 1)]))
+        
+        rollups = get_cost_rollups(self.user, date(2017, 6, 1), date(2017, 6, 1))
+        self.assertAlmostEqual(rollups['total_costs']['total']['hours'], 8.5)
+        
+        
+    def test_wage_change_invalidates_all_months(self):
+        """Only changing the cost fields of employees invalidates rollups."""
+        get_cost_rollups(self.user, date(2017, 1, 1), date(2017, 3, 1))
+        self.employee.first_name = 'B'
+        self.employee.save()
+        self.assertFalse(MonthlyCostRollup.objects.filter(is_dirty=True).exists())
+        
+        self.employee.wage = 20
+        self.employee.save()
+        self.assertFalse(MonthlyCostRollup.objects.filter(is_dirty=False).exists())
+        rollups = get_cost_rollups(self.user, date(2017, 3, 1), date(2017, 3, 1))
+        self.assertAlmostEqual(rollups['total_costs']['total']['cost'], 100)
+        
+        
+    @override_settings(COST_BURDEN_COMPONENTS=[
+        {'name': 'Training', 'type': 'rate_per_hour', 'field': 'desired_hours'}])
+    def test_burden_field_change_invalidates_all_months(self):
+        """Changing an employee field of a cost burden component invalidates
+        rollups."""
+        get_cost_rollups(self.user, date(2017, 1, 1), date(2017, 3, 1))
+        self.employee.desired_hours = 35
+        self.employee.save()
+        self.assertFalse(MonthlyCostRollup.objects.filter(is_dirty=False).exists())
+        
+        
+    def test_schedule_saved_while_computing_stays_dirty(self):
+        """Months computed from schedules changed meanwhile are not saved clean."""
+        compute_month_rollups = cost_rollup_logic._compute_month_rollups
+        def compute_then_save_schedule(*args):
+            computed = compute_month_rollups(*args)
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 6, 14, 8)),
+                            create_tzaware_datetime(datetime(2017, 6, 14, 17)),
+                            self.departments[0], employee=self.employee)
+            return computed
+        cost_rollup_logic._compute_month_rollups = compute_then_save_schedule
+        try:
+            get_cost_rollups(self.user, date(2017, 5, 1), date(2017, 7, 1))
+        finally:
+            cost_rollup_logic._compute_month_rollups = compute_month_rollups
+            
+        dirty_months = set(MonthlyCostRollup.objects.filter(is_dirty=True)
+                                                    .values_list('month_year', flat=True))
+        self.assertEqual(dirty_months, set([date(2017, 6, 1)]))
+        rollups = get_cost_rollups(self.user, date(2017, 6, 1), date(2017, 6, 1))
+        self.assertAlmostEqual(rollups['total_costs']['total']['hours'], 8.5)
+        self.assertFalse(MonthlyCostRollup.objects.filter(month_year=date(2017, 6, 1),
+                                                          is_dirty=True).exists())
+        
+        
+class CalendarCostSnapshotTest(TestCase):
+    """Test class for keeping calendar costs up to date with cost deltas."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(self.user)
+        self.department = create_department(self.user)
+        create_department(self.user, 'Other')
+        self.employees = [create_employee(self.user, wage=10 + i) for i in range(2)]
+        # Enough hours for overtime, spanning January and February 2017
+        for day in range(26, 32) + [1, 2]:
+            month = 1 if day > 2 else 2
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, month, day, 8)),
+                            create_tzaware_datetime(datetime(2017, month, day, 17)),
+                            self.department, employee=self.employees[0])
+        self.schedule = create_schedule(self.user, 
+                                        create_tzaware_datetime(datetime(2017, 1, 31, 18)),
+                                        create_tzaware_datetime(datetime(2017, 1, 31, 23)),
+                                        self.department)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                    'month': 1, 'year': 2017})
+        
+        
+    def _assert_snapshot_is_fresh(self):
+        """Snapshot has the same hours and costs as calculating them anew."""
+        snapshot = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+        self.assertFalse(snapshot.is_stale)
+        business_data = BusinessData.objects.get(user=self.user)
+        schedules = get_month_cost_schedules(self.user, 2017, 1, business_data)
+        expected = all_calendar_hours_and_costs(self.user, Department.objects.filter(user=self.user),
+                                                schedules, Employee.objects.filter(user=self.user),
+                                                1, 2017, business_data)
+        expected = json.loads(json.dumps(expected))
+        actual = json.loads(snapshot.hours_and_costs)
+        self.assertEqual(len(actual['workweek_hours_costs']), len(expected['workweek_hours_costs']))
+        for actual_week, expected_week in zip(actual['workweek_hours_costs'], 
+                                              expected['workweek_hours_costs']):
+            self._assert_hours_costs_equal(actual_week['hours_cost'], expected_week['hours_cost'])
+        self._assert_hours_costs_equal(actual['month_costs'], expected['month_costs'])
+        for day in expected['day_hours_costs']:
+            self._assert_hours_costs_equal(actual['day_hours_costs'][day], 
+                                           expected['day_hours_costs'][day])
+            
+            
+    def _assert_hours_costs_equal(self, actual, expected):
+        self.assertEqual(set(actual), set(expected))
+        for dep in expected:
+            for key in ('hours', 'overtime_hours', 'cost'):
+                self.assertAlmostEqual(actual[dep][key], expected[dep][key])
+                
+                
+    def test_edits_update_snapshot(self):
+        """Adding employees to, editing and removing schedules applies deltas."""
+        self._assert_snapshot_is_fresh()
+        version = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1)).version
+        
+        self.client.post('/calendar/add_employee_to_schedule', 
+                         {'schedule_pk': self.schedule.id, 'employee_pk': self.employees[0].id,
+                          'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        self.client.post('/calendar/add_employee_to_schedule', 
+                         {'schedule_pk': self.schedule.id, 'employee_pk': self.employees[1].id,
+                          'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        self.client.post('/calendar/edit_schedule', 
+                         {'schedule_pk': self.schedule.id, 'start_time': '04:00 PM',
+                          'end_time': '11:30 PM', 'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        self.client.post('/calendar/remove_schedule', 
+                         {'schedule_pk': self.schedule.id, 'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        
+        snapshot = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+        self.assertEqual(snapshot.version, version + 4)
+        
+        
+    def test_edits_across_workweek_start_update_snapshot(self):
+        """Schedules crossing, or moved across, the start of a workweek change
+        the costs of both workweeks."""
+        business_data = BusinessData.objects.get(user=self.user)
+        business_data.workweek_time_start = time(12)
+        business_data.save()
+        self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                    'month': 1, 'year': 2017})
+        self._assert_snapshot_is_fresh()
+        # Workweek starts on sunday the 29th at noon
+        schedule = create_schedule(self.user, create_tzaware_datetime(datetime(2017, 1, 29, 9)),
+                                   create_tzaware_datetime(datetime(2017, 1, 29, 15)),
+                                   self.department)
+        
+        response = self.client.post('/calendar/add_employee_to_schedule', 
+                                    {'schedule_pk': schedule.id, 
+                                     'employee_pk': self.employees[1].id,
+                                     'cal_date': '2017-01-01'})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(len(info['cost_delta']['workweek_hours_costs']), 2)
+        self._assert_snapshot_is_fresh()
+        self.client.post('/calendar/add_employee_to_schedule', 
+                         {'schedule_pk': schedule.id, 'employee_pk': self.employees[0].id,
+                          'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        for start_time, end_time in [('01:00 PM', '05:00 PM'), ('08:00 AM', '11:00 AM')]:
+            self.client.post('/calendar/edit_schedule', 
+                             {'schedule_pk': schedule.id, 'start_time': start_time,
+                              'end_time': end_time, 'cal_date': '2017-01-01'})
+            self._assert_snapshot_is_fresh()
+        self.client.post('/calendar/edit_schedule', 
+                         {'schedule_pk': schedule.id, 'start_time': '10:00 AM',
+                          'end_time': '02:00 PM', 'cal_date': '2017-01-01'})
+        self.client.post('/calendar/remove_schedule', 
+                         {'schedule_pk': schedule.id, 'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        
+        
+    def test_edits_move_fixed_monthly_costs(self):
+        """Fixed monthly costs move to departments whose hours change."""
+        self.employees[1].monthly_medical = 300
+        self.employees[1].save()
+        create_schedule(self.user, create_tzaware_datetime(datetime(2017, 1, 10, 8)),
+                        create_tzaware_datetime(datetime(2017, 1, 10, 17)),
+                        self.department, employee=self.employees[1])
+        self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                    'month': 1, 'year': 2017})
+        self._assert_snapshot_is_fresh()
+        other_department = Department.objects.get(user=self.user, name='Other')
+        self.schedule.department = other_department
+        self.schedule.save()
+        
+        self.client.post('/calendar/add_employee_to_schedule', 
+                         {'schedule_pk': self.schedule.id, 'employee_pk': self.employees[1].id,
+                          'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        month_costs = json.loads(CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+                                                             .hours_and_costs)['month_costs']
+        self.assertGreater(month_costs[str(other_department.id)]['cost'], 100)
+        self.client.post('/calendar/remove_schedule', 
+                         {'schedule_pk': self.schedule.id, 'cal_date': '2017-01-01'})
+        self._assert_snapshot_is_fresh()
+        
+        
+    def test_batch_edits_update_snapshot(self):
+        """A batch of edits in different workweeks applies one delta."""
+        other_schedule = create_schedule(self.user, 
+                                         create_tzaware_datetime(datetime(2017, 1, 10, 8)),
+                                         create_tzaware_datetime(datetime(2017, 1, 10, 17)),
+                                         self.department)
+        version = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1)).version
+        operations = [{'op': 'add_employee', 'schedule_pk': self.schedule.id, 
+                       'employee_pk': self.employees[1].id},
+                      {'op': 'add_employee', 'schedule_pk': other_schedule.id, 
+                       'employee_pk': self.employees[1].id},
+                      {'op': 'edit', 'schedule_pk': other_schedule.id, 
+                       'start_time': '07:00 AM', 'end_time': '05:00 PM'},
+                      {'op': 'edit_note', 'schedule_pk': self.schedule.id, 
+                       'schedule_text': 'Close up'}]
+        response = self.client.post('/calendar/batch_edit_schedules', 
+                                    {'operations': json.dumps(operations), 
+                                     'cal_date': '2017-01-01'})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(len(info['results']), 4)
+        self.assertEqual(len(info['cost_delta']['workweek_hours_costs']), 2)
+        self._assert_snapshot_is_fresh()
+        snapshot = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+        self.assertEqual(snapshot.version, version + 1)
+        
+        # A failing operation leaves every edit of its batch unsaved
+        operations = [{'op': 'remove', 'schedule_pk': self.schedule.id},
+                      {'op': 'remove', 'schedule_pk': self.schedule.id}]
+        response = self.client.post('/calendar/batch_edit_schedules', 
+                                    {'operations': json.dumps(operations), 
+                                     'cal_date': '2017-01-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Operation 1', json.loads(response.content)['err'])
+        self.assertTrue(Schedule.objects.filter(pk=self.schedule.id).exists())
+        self._assert_snapshot_is_fresh()
+        
+        
+    def test_week_range_costs_match_month(self):
+        """A workweek of the calendar costs the same as in its month."""
+        response = self.client.get('/calendar/get_schedules_range', 
+                                   {'department': self.department.id, 'range': 'week',
+                                    'date': '2017-01-31'})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(len(info['schedules']), 6) # Workweek from sunday the 29th
+        week_costs = info['hours_and_costs']
+        self.assertEqual(len(week_costs['workweek_hours_costs']), 1)
+        self.assertNotIn('month_costs', week_costs)
+        
+        month_costs = json.loads(CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+                                                             .hours_and_costs)
+        month_week = [w for w in month_costs['workweek_hours_costs'] 
+                      if w['date_range'] == week_costs['workweek_hours_costs'][0]['date_range']]
+        self._assert_hours_costs_equal(week_costs['workweek_hours_costs'][0]['hours_cost'],
+                                       month_week[0]['hours_cost'])
+        self.assertEqual(len(week_costs['day_hours_costs']), 7)
+        for day, day_costs in week_costs['day_hours_costs'].items():
+            self._assert_hours_costs_equal(day_costs, month_costs['day_hours_costs'][day])
+        
+        
+    def test_other_changes_mark_snapshot_stale(self):
+        """Changes made without applying cost deltas leave the snapshot stale."""
+        create_schedule(self.user, create_tzaware_datetime(datetime(2017, 1, 10, 8)),
+                        create_tzaware_datetime(datetime(2017, 1, 10, 17)),
+                        self.department, employee=self.employees[1])
+        snapshot = CalendarCostSnapshot.objects.get(month_year=date(2017, 1, 1))
+        self.assertTrue(snapshot.is_stale)
+        
+        self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                    'month': 1, 'year': 2017})
+        self._assert_snapshot_is_fresh()
+        
+        
+    def test_edits_while_recalculating_leave_snapshot_stale(self):
+        """Snapshots recalculated from schedules edited meanwhile are not 
+        stored as fresh, whether they were stale or missing."""
+        calculate = cost_snapshot_logic.all_calendar_hours_and_costs
+        def calculate_then_edit(*args):
+            hours_and_costs = calculate(*args)
+            self.client.post('/calendar/add_employee_to_schedule', 
+                             {'schedule_pk': self.schedule.id, 'employee_pk': employee.id,
+                              'cal_date': '2017-01-01'})
+            return hours_and_costs
+        snapshots = CalendarCostSnapshot.objects.filter(month_year=date(2017, 1, 1))
+        
+        for employee, make_outdated in [(self.employees[0], lambda: snapshots.update(is_stale=True)),
+                                        (self.employees[1], lambda: snapshots.delete())]:
+            make_outdated()
+            cost_snapshot_logic.all_calendar_hours_and_costs = calculate_then_edit
+            try:
+                self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                            'month': 1, 'year': 2017})
+            finally:
+                cost_snapshot_logic.all_calendar_hours_and_costs = calculate
+            self.assertEqual(Schedule.objects.get(pk=self.schedule.id).employee_id, employee.id)
+            self.assertTrue(snapshots.get().is_stale)
+            
+            self.client.get('/calendar/get_schedules', {'department': self.department.id,
+                                                        'month': 1, 'year': 2017})
+            self._assert_snapshot_is_fresh()
+        
+        
+    def test_edits_are_returned_as_events(self):
+        """Edits are returned as events with the cost delta of the response."""
+        response = self.client.post('/calendar/add_employee_to_schedule', 
+                                    {'schedule_pk': self.schedule.id, 
+                                     'employee_pk': self.employees[0].id,
+                                     'cal_date': '2017-01-01'},
+                                    HTTP_X_CALENDAR_CLIENT='tab-1')
+        cost_delta = json.loads(json.loads(response.content))['cost_delta']
+        self.client.post('/calendar/remove_schedule', 
+                         {'schedule_pk': self.schedule.id, 'cal_date': '2017-01-01'})
+        
+        response = self.client.get('/calendar/calendar_events', {'last_event_id': 0})
+        info = json.loads(json.loads(response.content))
+        events = info['events']
+        self.assertEqual([e['kind'] for e in events], ['schedules_saved', 'schedules_removed'])
+        self.assertEqual(events[0]['client_id'], 'tab-1')
+        self.assertEqual(events[0]['data']['schedules'][0]['employee'], self.employees[0].id)
+        self.assertEqual(events[0]['data']['cost_delta'], cost_delta)
+        self.assertEqual(events[1]['data']['schedule_pks'], [self.schedule.id])
+        self.assertEqual(info['last_event_id'], events[1]['id'])
+        
+        # Resuming after the last event returns nothing new, without a query
+        with self.assertNumQueries(0):
+            self.assertEqual(event_logic.poll_calendar_events(self.user, info['last_event_id']),
+                             ([], events[1]['id']))
+        response = self.client.get('/calendar/calendar_events', 
+                                   {'last_event_id': info['last_event_id']})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(info['events'], [])
+        self.assertEqual(info['last_event_id'], events[1]['id'])
+        
+        
+class BoundaryHoursTest(TestCase):
+    """Test class for hours of schedules crossing days, months and workweeks."""
+    
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.business_data = create_business_data(self.user)
+        self.departments = [create_department(self.user, 'A'), create_department(self.user, 'B')]
+        self.employee = create_employee(self.user)
+        self.employee.break_time_in_min = 0
+        self.employee.save()
+        # 30 hours in department A, workweeks start on sunday at midnight
+        for day in (29, 30, 31):
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 1, day, 8)),
+                            create_tzaware_datetime(datetime(2017, 1, day, 18)),
+                            self.departments[0], employee=self.employee)
+        # 12 hour night shift in department B crossing into February
+        self.night_shift = create_schedule(self.user, 
+                                           create_tzaware_datetime(datetime(2017, 1, 31, 20)),
+                                           create_tzaware_datetime(datetime(2017, 2, 1, 8)),
+                                           self.departments[1], employee=self.employee)
+                                           
+                                           
+    def _month_costs(self, month):
+        """Month costs as calculated by the calendar of the month."""
+        schedules = get_month_cost_schedules(self.user, 2017, month, self.business_data)
+        return all_calendar_hours_and_costs(self.user, self.departments, schedules,
+                                            [self.employee], month, 2017,
+                                            self.business_data)['month_costs']
+                                            
+                                            
+    def test_time_dur_longer_than_a_day(self):
+        """Duration of a schedule counts every day of it."""
+        start = create_tzaware_datetime(datetime(2017, 1, 1, 8))
+        hours = time_dur_in_hours(start, start + timedelta(hours=30), None, None, 5, 30)
+        self.assertEqual(hours, 29.5)
+        
+        
+    def test_workweek_of_utc_datetime(self):
+        """Workweek of a datetime in UTC is the one of its local time."""
+        saturday_evening = create_tzaware_datetime(datetime(2017, 2, 4, 20)).astimezone(pytz.utc)
+        workweek = get_start_end_of_workweek(saturday_evening, self.business_data)
+        self.assertEqual(workweek['start'], create_tzaware_datetime(datetime(2017, 1, 29)))
+        
+        
+    def test_overtime_split_at_midnight(self):
+        """Hours of a schedule crossing midnight belong to the day they occur
+        in, with overtime starting when the threshold is reached."""
+        workweek = get_start_end_of_workweek(self.night_shift.start_datetime, self.business_data)
+        schedules = Schedule.objects.filter(user=self.user).order_by('start_datetime')
+        hours = employee_hours_detailed(workweek['start'], workweek['end'], self.employee,
+                                        self.departments, self.business_data, schedules, 1, 2017)
+        dep_b = self.departments[1].id
+        self.assertEqual(hours['day_hours'][date(2017, 1, 31)][dep_b], 
+                         {'hours': 4, 'overtime_hours': 0})
+        self.assertEqual(hours['day_hours'][date(2017, 2, 1)][dep_b], 
+                         {'hours': 6, 'overtime_hours': 2})
+        night_shift_hours = hours['schedule_hours'][self.night_shift.id]
+        # 10 regular and 2 overtime hours at a wage of 1 plus 7.5% social
+        # security and 7.5% workmans comp
+        self.assertAlmostEqual(night_shift_hours.pop('cost'), (10 + 2 * 1.5) * 1.15)
+        self.assertEqual(night_shift_hours, {'hours': 10, 'overtime_hours': 2, 'duration': 12})
+        self.assertEqual(hours['week_hours'][dep_b]['hours_in_month'], 4)
+        self.assertEqual(hours['week_hours'][dep_b]['ovr_t_in_month'], 0)
+        
+        
+    def test_month_costs_split_at_month_end(self):
+        """Each month gets the hours and overtime that occur in it."""
+        dep_b = self.departments[1].id
+        january = self._month_costs(1)
+        february = self._month_costs(2)
+        self.assertEqual((january[dep_b]['hours'], january[dep_b]['overtime_hours']), (4, 0))
+        self.assertEqual((february[dep_b]['hours'], february[dep_b]['overtime_hours']), (6, 2))
+        self.assertEqual(january['total']['hours'] + february['total']['hours'], 40)
+        
+        
+    @override_settings(COST_BURDEN_COMPONENTS=[
+        {'name': 'Uniforms', 'type': 'rate_per_hour', 'value': 0.5},
+        {'name': 'Medical', 'type': 'fixed_monthly', 'field': 'monthly_medical'}])
+    def test_burden_components(self):
+        """Hourly burden is added to every hour, fixed monthly burden is 
+        allocated to departments by hours worked in month."""
+        self.employee.monthly_medical = 68
+        self.employee.save()
+        january = self._month_costs(1)
+        dep_a, dep_b = self.departments[0].id, self.departments[1].id
+        # 30 hours in A and 4 hours in B in January, wage of 1
+        self.assertAlmostEqual(january[dep_a]['cost'], 30 * 1.5 + 68 * 30 / 34.0)
+        self.assertAlmostEqual(january[dep_b]['cost'], 4 * 1.5 + 68 * 4 / 34.0)
+        self.assertAlmostEqual(january['total']['cost'], 34 * 1.5 + 68)
+        
+        
+class LaborForecastTest(TestCase):
+    """Test class for forecasting hours and costs from past schedules."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='testuser')
+        create_business_data(self.user)
+        self.department = create_department(self.user)
+        self.employee = create_employee(self.user, wage=10)
+        # Every monday of January to March 2017 from 9 to 5, 7.5 hours after break
+        day = date(2017, 1, 2)
+        while day < date(2017, 4, 1):
+            create_schedule(self.user, create_tzaware_datetime(datetime.combine(day, time(9))),
+                            create_tzaware_datetime(datetime.combine(day, time(17))),
+                            self.department, employee=self.employee)
+            day += timedelta(7)
+        MonthlyRevenue.objects.create(user=self.user, monthly_total=1000,
+                                      month_year=date(2016, 4, 1))
+        
+        
+    def test_forecast_from_weekday_demand(self):
+        """Forecast of a month has the hours of its weekdays in the past."""
+        forecast = get_labor_forecast(self.user, date(2017, 4, 1))
+        dep_forecast = forecast['departments'][self.department.id]
+        self.assertEqual(forecast['history_months'], 3)
+        self.assertAlmostEqual(dep_forecast['demand_curve'][0][9], 7.5 / 8)
+        self.assertEqual(dep_forecast['demand_curve'][1][9], 0)
+        # April 2017 has 4 mondays, at 10 dollars plus 15% burden per hour
+        self.assertAlmostEqual(dep_forecast['hours']['expected'], 4 * 7.5)
+        self.assertAlmostEqual(dep_forecast['cost']['expected'], 4 * 7.5 * 11.5)
+        self.assertTrue(dep_forecast['hours']['low'] < 30 < dep_forecast['hours']['high'])
+        self.assertAlmostEqual(forecast['cost_percentage']['expected'], 4 * 7.5 * 11.5 / 10)
+        
+        
+    def test_demand_of_department_with_shorter_history(self):
+        """Departments with less history than others are forecast from the
+        weekdays of their own months."""
+        new_department = create_department(self.user, 'New')
+        # Every tuesday of March 2017 only from 9 to 5
+        for day in range(7, 32, 7):
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 3, day, 9)),
+                            create_tzaware_datetime(datetime(2017, 3, day, 17)),
+                            new_department, employee=self.employee)
+        
+        forecast = get_labor_forecast(self.user, date(2017, 4, 1))
+        self.assertEqual(forecast['history_months'], 3)
+        dep_forecast = forecast['departments'][new_department.id]
+        self.assertAlmostEqual(dep_forecast['demand_curve'][1][9], 7.5 / 8)
+        # April 2017 has 4 tuesdays, like March
+        self.assertAlmostEqual(dep_forecast['hours']['expected'], 4 * 7.5)
+        dep_forecast = forecast['departments'][self.department.id]
+        self.assertAlmostEqual(dep_forecast['hours']['expected'], 4 * 7.5)
+        
+        
+    def test_history_is_streamed_in_chunks(self):
+        """Aggregating the history in chunks gives the same forecast."""
+        expected = get_labor_forecast(self.user, date(2017, 4, 1))
+        cache.clear()
+        chunk_size = forecast_logic.FORECAST_CHUNK_SIZE
+        forecast_logic.FORECAST_CHUNK_SIZE = 2
+        try:
+            self.assertEqual(get_labor_forecast(self.user, date(2017, 4, 1)), expected)
+        finally:
+            forecast_logic.FORECAST_CHUNK_SIZE = chunk_size
+            
+            
+class CoverageTest(TestCase):
+    """Test class for headcount of departments per time slot."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(self.user)
+        self.department = create_department(self.user)
+        employees = [create_employee(self.user) for i in range(2)]
+        for start, end, employee in ((datetime(2017, 3, 1, 9), datetime(2017, 3, 1, 17), 0),
+                                     (datetime(2017, 3, 1, 12), datetime(2017, 3, 1, 20), 1),
+                                     (datetime(2017, 3, 1, 22), datetime(2017, 3, 2, 2), 0),
+                                     (datetime(2017, 3, 12, 9), datetime(2017, 3, 12, 17), 1)):
+            create_schedule(self.user, create_tzaware_datetime(start),
+                            create_tzaware_datetime(end), self.department,
+                            employee=employees[employee])
+        # Schedules without employees are not staffed
+        create_schedule(self.user, create_tzaware_datetime(datetime(2017, 3, 1, 9)),
+                        create_tzaware_datetime(datetime(2017, 3, 1, 17)), self.department)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def test_coverage_heatmap(self):
+        """Headcount is counted per slot and day, understaffed windows are 
+        where headcount is below target."""
+        response = self.client.get('/calendar/get_coverage',
+                                   {'department': self.department.id, 'month': 3,
+                                    'year': 2017, 'slot_minutes': 60, 'target': 2,
+                                    'target_start': '09:00', 'target_end': '17:00'})
+        coverage = json.loads(json.loads(response.content))
+        headcount = coverage['headcount']
+        self.assertEqual(len(headcount), 24)
+        self.assertEqual(len(headcount[0]), 31)
+        self.assertEqual([headcount[hour][0] for hour in (8, 9, 12, 19, 20, 23)], 
+                         [0, 1, 2, 1, 0, 1])
+        self.assertEqual([headcount[hour][1] for hour in (1, 2)], [1, 0])
+        # Daylight saving time starts on March 12th
+        self.assertEqual([headcount[hour][11] for hour in (8, 9, 16, 17)], [0, 1, 1, 0])
+        
+        understaffed = coverage['understaffed']
+        self.assertEqual(understaffed[0], {'date': '2017-03-01', 'start': '09:00', 'end': '12:00',
+                                           'min_headcount': 1, 'target': 2})
+        self.assertEqual(len(understaffed), 31)
+        
+        
+    def test_staffing_rules_on_publish(self):
+        """Publishing a calendar lists the windows breaking staffing rules."""
+        response = self.client.post('/calendar/add_staffing_rule',
+                                    {'department': self.department.id, 'weekdays': [2],
+                                     'start_time': '11:00', 'end_time': '14:00',
+                                     'headcount': 2})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/calendar/push_changes_live',
+                                    {'date': '2017-03-01', 'department': self.department.id,
+                                     'all_employee_view': True})
+        understaffed = json.loads(json.loads(response.content))['understaffed']
+        self.assertEqual(understaffed[0], {'date': '2017-03-01', 'start': '11:00', 'end': '12:00',
+                                           'min_headcount': 1, 'target': 2})
+        self.assertEqual([w['date'] for w in understaffed[1:]],
+                         ['2017-03-08', '2017-03-15', '2017-03-22', '2017-03-29'])
+        self.assertEqual(understaffed[1]['end'], '14:00')
+        
+        
+class FatigueReportTest(TestCase):
+    """Test class for month reports of minimum rest and consecutive days rules."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        BusinessData.objects.create(user=self.user, min_rest_hours=10, max_consecutive_days=3)
+        department = create_department(self.user)
+        self.employee = create_employee(self.user, first_name='Tired')
+        rested_employee = create_employee(self.user)
+        # Closing on the 2nd and opening on the 3rd, 5 days in a row to the 6th
+        for day, start_hour, end_hour in ((2, 14, 22), (3, 6, 14), (4, 9, 17),
+                                          (5, 9, 17), (6, 9, 17)):
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 3, day, start_hour)),
+                            create_tzaware_datetime(datetime(2017, 3, day, end_hour)),
+                            department, employee=self.employee)
+        for day in (2, 3, 4, 7):
+            create_schedule(self.user, create_tzaware_datetime(datetime(2017, 3, day, 9)),
+                            create_tzaware_datetime(datetime(2017, 3, day, 17)),
+                            department, employee=rested_employee)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def test_fatigue_report(self):
+        """Report lists only the employee breaking the rules, once per break."""
+        response = self.client.get('/calendar/get_fatigue_violations', 
+                                   {'month': 3, 'year': 2017})
+        report = json.loads(json.loads(response.content))
+        self.assertEqual(len(report['employees']), 1)
+        employee = report['employees'][0]
+        self.assertEqual(employee['id'], self.employee.id)
+        self.assertEqual(len(employee['rest']), 1)
+        self.assertEqual(employee['rest'][0]['rest_hours'], 8)
+        self.assertEqual(employee['consecutive_days'], 
+                         [{'start': '2017-03-02', 'end': '2017-03-06', 'days': 5}])
+            
+            
+class LiveCalendarTest(TestCase):
+    """Test class for live calendars employees see."""
+    
+    def setUp(self):
+        manager = User.objects.create_user('testuser', password='password')
+        manager.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(manager)
+        self.department = create_department(manager)
+        employee_user = User.objects.create_user('employee', password='password')
+        employees = [create_employee(manager, first_name=name) for name in ('A', 'A', 'B')]
+        employees[0].employee_user = employee_user
+        employees[0].save()
+        for employee in employees[:2]:
+            DepartmentMembership.objects.create(user=manager, employee=employee,
+                                                department=self.department, priority=0)
+        for day, employee in ((3, employees[0]), (4, employees[1])):
+            create_schedule(manager, create_tzaware_datetime(datetime(2017, 5, day, 8)),
+                            create_tzaware_datetime(datetime(2017, 5, day, 17)),
+                            self.department, employee=employee)
+        live_calendar = LiveCalendar.objects.create(user=manager, date=date(2017, 5, 1),
+                                                    department=self.department)
+        create_live_schedules(manager, live_calendar)
+        self.client = Client()
+        self.client.login(username='employee', password='password')
+        
+        
+    def test_employee_live_calendar(self):
+        """Employee sees live schedules and employees of the department."""
+        response = self.client.get('/calendar/employee_get_live_schedules', 
+                                   {'department': self.department.id, 'month': 5, 'year': 2017})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(len(info['schedules']), 2)
+        self.assertEqual(len(info['employees']), 2)
+        self.assertNotIn('wage', info['employees'][0])
+        self.assertEqual(len(info['employees_with_same_first_name']), 2)
+        
+        
+    def test_manager_month_load(self):
+        """Manager's month has the department's schedules and view rights."""
+        self.client.login(username='testuser', password='password')
+        response = self.client.get('/calendar/get_schedules', 
+                                   {'department': self.department.id, 'month': 5, 'year': 2017})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(len(info['schedules']), 2)
+        self.assertEqual(len(info['employees']), 2)
+        self.assertTrue(info['live_cal_exists'])
+        self.assertEqual(info['view_rights'], {'all_employee_view': True, 
+                                               'department_view': [], 'employee_view': []})
+        
+        
+    def test_reads_do_not_write(self):
+        """Calendar pages and reads keep preferences in a cookie, not the database."""
+        manager = Client()
+        manager.login(username='testuser', password='password')
+        params = {'department': self.department.id, 'month': 5, 'year': 2017}
+        manager.get('/calendar/get_schedules', params) # Creates the cost snapshot
+        with CaptureQueriesContext(connection) as queries:
+            manager.get('/calendar/get_schedules', params)
+            response = manager.get('/calendar/')
+            self.client.get('/calendar/employee_get_live_schedules', 
+                            dict(params, employee_only=True))
+            employee_response = self.client.get('/live_calendar/')
+        writes = [q['sql'] for q in queries.captured_queries 
+                  if q['sql'].split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+        self.assertEqual(response.context['date'], date(2017, 5, 1))
+        self.assertEqual(response.context['department'], self.department.id)
+        self.assertTrue(employee_response.context['employee_only'])
+        
+        
+class ConsolidatedCalendarTest(TestCase):
+    """Test class for calendars of several departments in one request."""
+    
+    def setUp(self):
+        user = User.objects.create_user('testuser', password='password')
+        user.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(user)
+        self.departments = [create_department(user, name) for name in ('A', 'B', 'C')]
+        employees = [create_employee(user, first_name=name) for name in ('X', 'Y')]
+        for department, employee in zip(self.departments, employees):
+            DepartmentMembership.objects.create(user=user, employee=employee,
+                                                department=department, priority=0)
+            for day in (3, 4):
+                create_schedule(user, create_tzaware_datetime(datetime(2017, 5, day, 8)),
+                                create_tzaware_datetime(datetime(2017, 5, day, 17)),
+                                department, employee=employee)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def test_calendars_grouped_by_department(self):
+        """Selected departments, or all of them, are returned in one response."""
+        response = self.client.get('/calendar/get_consolidated_schedules', 
+                                   {'month': 5, 'year': 2017})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual([c['name'] for c in info['calendars']], ['A', 'B', 'C'])
+        self.assertEqual([len(c['schedules']) for c in info['calendars']], [2, 2, 0])
+        self.assertEqual(len(info['employees']), 2)
+        
+        response = self.client.get('/calendar/get_consolidated_schedules', 
+                                   {'month': 5, 'year': 2017, 
+                                    'departments[]': [self.departments[1].id]})
+        info = json.loads(json.loads(response.content))
+        self.assertEqual([c['department'] for c in info['calendars']], [self.departments[1].id])
+        self.assertEqual(len(info['employees']), 1)
+        
+        
+class KeysetPaginationTest(TestCase):
+    """Test class for lists loaded a page at a time."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(self.user)
+        # Equal names, so only the id keeps the ordering stable
+        for first_name in ('B', 'A', 'B', 'C', 'B'):
+            create_employee(self.user, first_name=first_name)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def test_pages_cover_every_item_once(self):
+        """Pages follow each other in order without repeating items."""
+        employees = Employee.objects.filter(user=self.user)
+        expected = list(employees.order_by('last_name', 'first_name', 'id'))
+        items, cursor = get_keyset_page(employees, ['last_name', 'first_name'], page_size=2)
+        while cursor is not None:
+            page, cursor = get_keyset_page(employees, ['last_name', 'first_name'],
+                                           decode_cursor(cursor), page_size=2)
+            items.extend(page)
+        self.assertEqual(items, expected)
+        
+        response = self.client.get('/employees/')
+        self.assertEqual(list(response.context['employee_list']), expected)
+        self.assertIsNone(response.context['employee_list_cursor'])
+        
+        
+    def test_past_history_newest_first(self):
+        """Past vacations are loaded newest first after the default page."""
+        employee = Employee.objects.filter(user=self.user).first()
+        for day in range(1, 13):
+            Vacation.objects.create(user=self.user, employee=employee,
+                                    start_datetime=create_tzaware_datetime(datetime(2017, 1, day, 8)),
+                                    end_datetime=create_tzaware_datetime(datetime(2017, 1, day, 17)))
+        response = self.client.get('/employees/%s/info/' % employee.id)
+        past_vacations = response.context['past_vacation_list']
+        self.assertEqual([v.start_datetime.day for v in past_vacations], list(range(12, 2, -1)))
+        
+        info = json.loads(json.loads(self.client.get('/employees/%s/get_history_page' % employee.id,
+                                                     {'kind': 'vacation',
+                                                      'cursor': response.context['past_vacation_cursor']}).content))
+        self.assertEqual(info['html'].count('data-vacation-id'), 2)
+        self.assertIsNone(info['cursor'])
+        
+        response = self.client.get('/employees/%s/get_history_page' % employee.id,
+                                   {'kind': 'vacation', 'cursor': 'tampered'})
+        self.assertEqual(response.status_code, 400)
+        
+        
+class PendingApplicationCountsTest(TestCase):
+    """Test class for the cached counts of the pending approvals badge."""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        BusinessData.objects.create(user=self.user, right_to_submit_availability=True)
+        self.employee = create_employee(self.user)
+        VacationApplication.objects.create(user=self.user, employee=self.employee)
+        for weekday in (0, 1):
+            RepeatUnavailabilityApplication.objects.create(user=self.user, employee=self.employee,
+                                                           weekday=weekday)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def test_counts_cached_until_applications_change(self):
+        """Counts are read from the cache until an application is decided."""
+        response = self.client.get('/check_pending_approvals/')
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(info['counts'], {'vacation': 1, 'absence': 0, 'repeat_unav': 2})
+        self.assertEqual(info['total'], 3)
+        with self.assertNumQueries(0):
+            get_pending_application_counts(self.user.id)
+            
+        vacation_app = VacationApplication.objects.get(user=self.user)
+        vacation_app.approved = True
+        vacation_app.save()
+        self.assertEqual(get_pending_application_counts(self.user.id)['vacation'], 0)
+        
+        
+class BulkApplicationDecisionTest(TestCase):
+    """Test class for deciding many pending applications at once."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', password='password')
+        self.user.groups.add(Group.objects.create(name='Managers'))
+        create_business_data(self.user)
+        self.employee = create_employee(self.user)
+        department = create_department(self.user, 'A')
+        self.schedule = create_schedule(self.user, create_tzaware_datetime(datetime(2017, 5, 3, 8)),
+                                        create_tzaware_datetime(datetime(2017, 5, 3, 17)),
+                                        department, employee=self.employee)
+        self.vacation_app = VacationApplication.objects.create(
+            user=self.user, employee=self.employee,
+            start_datetime=create_tzaware_datetime(datetime(2017, 5, 2)),
+            end_datetime=create_tzaware_datetime(datetime(2017, 5, 5)))
+        self.repeat_unav_app = RepeatUnavailabilityApplication.objects.create(
+            user=self.user, employee=self.employee, weekday=0)
+        self.client = Client()
+        self.client.login(username='testuser', password='password')
+        
+        
+    def _decide(self, decisions):
+        return self.client.post('/pending_approvals/decide_applications_in_bulk',
+                                {'decisions': json.dumps(decisions)})
+        
+        
+    def test_decisions_saved_with_conflicts(self):
+        """Approved vacations are created and report overlapped schedules."""
+        response = self._decide([{'kind': 'vacation', 'pk': self.vacation_app.id, 'approved': True},
+                                 {'kind': 'repeat_unav', 'pk': self.repeat_unav_app.id, 
+                                  'approved': False}])
+        info = json.loads(json.loads(response.content))
+        self.assertEqual(info['decisions'][1]['conflicts'], [])
+        self.assertEqual([c['id'] for c in info['decisions'][0]['conflicts']], [self.schedule.id])
+        self.assertEqual(Vacation.objects.filter(user=self.user, employee=self.employee).count(), 1)
+        self.assertFalse(RepeatUnavailabilityApplication.objects.get().approved)
+        self.assertEqual(RepeatUnavailability.objects.count(), 0)
+        
+        # Decided applications cannot be decided again, nothing is saved
+        response = self._decide([{'kind': 'repeat_unav', 'pk': self.repeat_unav_app.id, 
+                                  'approved': True}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RepeatUnavailability.objects.count(), 0)
+        
+        
+    def test_pending_page_shows_impact(self):
+        """Pending applications show overlapped schedules and their cost."""
+        response = self.client.get('/pending_approvals/')
+        impact = response.context['vacation_apps_list'][0].impact
+        self.assertEqual(impact['schedules'], [self.schedule])
+        self.assertTrue(impact['hours'] < 0 and impact['cost'] < 0)
+        self.assertIsNone(response.context['repeat_unav_apps_list'][0].impact)
+        self.assertContains(response, 'Overlaps 1 assigned schedule:')
+        
+        
+    def test_impact_of_schedule_crossing_workweek_start(self):
+        """Conflicts crossing the start of a workweek count in both workweeks."""
+        business_data = BusinessData.objects.get(user=self.user)
+        business_data.workweek_time_start = time(12)
+        business_data.save()
+        # Workweek starts on sunday the 7th at noon
+        schedule = create_schedule(self.user, create_tzaware_datetime(datetime(2017, 5, 7, 9)),
+                                   create_tzaware_datetime(datetime(2017, 5, 7, 15)),
+                                   self.schedule.department, employee=self.employee)
+        vacation_app = VacationApplication.objects.create(
+            user=self.user, employee=self.employee,
+            start_datetime=create_tzaware_datetime(datetime(2017, 5, 7)),
+            end_datetime=create_tzaware_datetime(datetime(2017, 5, 8)))
+        
+        impacts = get_application_impacts(self.user, [('vacation', vacation_app)],
+                                          list(Department.objects.filter(user=self.user)),
+                                          business_data)
+        impact = impacts[('vacation', vacation_app.id)]
+        self.assertEqual(impact['schedules'], [schedule])
+        # 6 hours less the break of the employee
+        self.assertEqual(impact['hours'], -5.5)
+        
+        
+class RunConcurrentlyTest(SimpleTestCase):
+    """Test class for running independent reads on threads."""
+    
+    @override_settings(QUERY_WORKERS=2)
+    def test_calls_run_on_worker_threads(self):
+        """Results keep the order of the calls and exceptions are raised."""
+        calls = [lambda i=i: (i, threading.current_thread()) for i in range(3)]
+        # Threads cannot share the in-memory test database, calls here need none
+        is_shared_database = concurrency_logic._is_shared_database
+        concurrency_logic._is_shared_database = lambda: True
+        try:
+            results = run_concurrently(calls)
+            with self.assertRaises(ZeroDivisionError):
+                run_concurrently([lambda: 1, lambda: 1 / 0])
+        finally:
+            concurrency_logic._is_shared_database = is_shared_database
+        self.assertEqual([i for i, thread in results], [0, 1, 2])
+        self.assertNotIn(threading.current_thread(), [thread for i, thread in results])
@@ -0,0 +1,49 @@
+"""
+Calendar UI preferences kept in a signed cookie.
+
+Preferences like the last calendar loaded or the times of the last schedule
+added change with almost every request, storing them in the database turns
+reads into writes. They are kept in a cookie signed by Django instead, which
+is only set when a preference changes. The same fields of BusinessData and
+Employee are the defaults for browsers without the cookie.
+"""
+
+import json
+from django.core import signing
+
+
+COOKIE_NAME = 'calendar_preferences'
+COOKIE_SALT = 'schedulingcalendar.ui_preferences'
+COOKIE_MAX_AGE = 365 * 24 * 60 * 60 # Seconds
+
+
+
+def get_ui_preferences(request):
+    """Return dict of the UI preferences of the logged in user.
+
+    Preferences are named like the model fields they replace, the cookie of
+    another user of the same browser is ignored.
+    """
+    try:
+        preferences = json.loads(request.get_signed_cookie(COOKIE_NAME, salt=COOKIE_SALT,
+                                                           max_age=COOKIE_MAX_AGE))
+    except (KeyError, signing.BadSignature, ValueError):
+        return {}
+    if not isinstance(preferences, dict) or preferences.get('user') != request.user.id:
+        return {}
+    return preferences
+
+
+def set_ui_preferences(request, response, **preferences):
+    """Set UI preferences of the logged in user on response, if they changed.
+
+    Args:
+        request: Request the response is for.
+        response: Django HttpResponse.
+        preferences: Json serializable values of preferences by name.
+    """
+    old_preferences = get_ui_preferences(request)
+    new_preferences = dict(old_preferences, user=request.user.id, **preferences)
+    if new_preferences != old_preferences:
+        response.set_signed_cookie(COOKIE_NAME, json.dumps(new_preferences),
+                                   salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE, httponly=True)
@@ -29,14 +29,24 @@ urlpatterns = [
     url(r'^calendar/$', calendar_page, name='calendar_page'),
     url(r'^calendar/add_schedule$', add_schedule, name='add_schedule'),
     url(r'^calendar/get_schedules$', get_schedules, name='get_schedules'),
+    url(r'^calendar/get_consolidated_schedules$', get_consolidated_schedules, name='get_consolidated_schedules'),
+    url(r'^calendar/get_schedules_range$', get_schedules_range, name='get_schedules_range'),
+    url(r'^calendar/get_cost_rollup$', get_cost_rollup, name='get_cost_rollup'),
+    url(r'^calendar/get_cost_forecast$', get_cost_forecast, name='get_cost_forecast'),
+    url(r'^calendar/get_coverage$', get_coverage, name='get_coverage'),
+    url(r'^calendar/get_fatigue_violations$', get_fatigue_violations, name='get_fatigue_violations'),
+    url(r'^calendar/calendar_events$', calendar_events, name='calendar_events'),
     url(r'^calendar/get_schedule_info$', get_schedule_info, name='get_schedule_info'),
     url(r'^calendar/get_proto_schedule_info$', get_proto_schedule_info, name='get_proto_schedule_info'),
+    url(r'^calendar/get_day_availability$', get_day_availability, name='get_day_availability'),
     url(r'^calendar/add_employee_to_schedule$', add_employee_to_schedule, name='add_employee_to_schedule'),
     url(r'^calendar/remove_schedule$', remove_schedule, name='remove_schedule'),
     url(r'^calendar/edit_schedule$', edit_schedule, name='edit_schedule'),
     url(r'^calendar/copy_schedules$', copy_schedules, name='copy_schedules'),
     url(r'^calendar/remove_conflict_copy_schedules$', remove_conflict_copy_schedules, name='remove_conflict_copy_schedules'),
     url(r'^calendar/push_changes_live$', push_changes_live, name='push_changes_live'),
+    url(r'^calendar/add_staffing_rule$', add_staffing_rule, name='add_staffing_rule'),
+    url(r'^calendar/remove_staffing_rule$', remove_staffing_rule, name='remove_staffing_rule'),
     url(r'^calendar/update_view_rights$', update_view_rights, name='update_view_rights'),
     url(r'^calendar/view_live_schedules$', view_live_schedules, name='view_live_schedules'),
     url(r'^calendar/get_live_schedules$', get_live_schedules, name='get_live_schedules'),
@@ -44,7 +54,10 @@ urlpatterns = [
     url(r'^calendar/add_edit_day_note_header$', add_edit_day_note_header, name='add_edit_day_note_header'),
     url(r'^calendar/add_edit_day_note_body$', add_edit_day_note_body, name='add_edit_day_note_body'),
     url(r'^calendar/edit_schedule_note$', edit_schedule_note, name='edit_schedule_note'),
+    url(r'^calendar/batch_edit_schedules$', batch_edit_schedules, name='batch_edit_schedules'),
     url(r'^employees/$', EmployeeListView.as_view(), name='employee_list'),
+    url(r'^employees/get_employee_list_page$', get_employee_list_page, name='get_employee_list_page'),
+    url(r'^employees/(?P<employee_pk>[0-9]+)/get_history_page$', get_employee_history_page, name='get_employee_history_page'),
     url(r'^employees/(?P<employee_pk>[0-9]+)/info/$', EmployeeUpdateView.as_view(), name='employee_info'),
     url(r'^employees/employee_create$', EmployeeCreateView.as_view(), name='employee_create'),
     url(r'^employees/(?P<pk>[0-9]+)/employee_delete$', EmployeeDeleteView.as_view(), name='employee_delete'),
@@ -88,6 +101,8 @@ urlpatterns = [
     url(r'^live_calendar/$', employee_calendar_page, name='employee_calendar_page'),
     url(r'^live_calendar/create_schedule_swap_petition$', create_schedule_swap_petition, name='create_schedule_swap_petition'),
     url(r'^pending_approvals/$', pending_approvals_page, name='pending_approvals'),
+    url(r'^pending_approvals/get_pending_apps_page$', get_pending_apps_page, name='get_pending_apps_page'),
+    url(r'^pending_approvals/decide_applications_in_bulk$', decide_applications_in_bulk, name='decide_applications_in_bulk'),
     url(r'^pending_approvals/approve_vacation_app$', approve_vacation_app, name='approve_vacation_app'),
     url(r'^pending_approvals/disapprove_vacation_app$', disapprove_vacation_app, name='disapprove_vacation_app'),
     url(r'^pending_approvals/approve_absence_app$', approve_absence_app, name='approve_absence_app'),
@@ -10,6 +10,7 @@ from ..forms import (CalendarForm, LiveCalendarForm, LiveCalendarManagerForm,
                      ViewLiveCalendarForm, SetStateLiveCalForm, AddScheduleForm,
                      DayNoteHeaderForm, DayNoteBodyForm, ScheduleNoteForm,
                      SignUpForm, UserSetupForm)
+from ..ui_preferences import get_ui_preferences
 from datetime import datetime, date
 
 
@@ -84,13 +85,19 @@ def calendar_page(request):
     # If user has previously loaded a calendar, load that calendar. Otherwise,
     # load the current date and first department found in query
     business_data = BusinessData.objects.get(user=logged_in_user)
-    if business_data.last_cal_date_loaded:
+    preferences = get_ui_preferences(request)
+    if 'last_cal_date_loaded' in preferences:
+        date = datetime.strptime(preferences['last_cal_date_loaded'], '%Y-%m-%d').date()
+    elif business_data.last_cal_date_loaded:
         date = business_data.last_cal_date_loaded
     else:
         date = datetime.now()
 
-    if business_data.last_cal_department_loaded:
-        department = business_data.last_cal_department_loaded
+    department_id = preferences.get('last_cal_department_loaded', 
+                                    business_data.last_cal_department_loaded_id)
+    department = [d for d in departments if d.id == department_id]
+    if department:
+        department = department[0]
     else:
         department = departments.first()
 
@@ -118,7 +125,8 @@ def employee_calendar_page(request):
     # Get manager corresponding to employee
     employee = (Employee.objects.select_related('user')
                                 .get(employee_user=logged_in_user))
-    employee_only = employee.see_only_my_schedules
+    employee_only = get_ui_preferences(request).get('see_only_my_schedules',
+                                                   employee.see_only_my_schedules)
     manager_user = employee.user
 
     live_calendar_form = LiveCalendarForm(manager_user, employee)
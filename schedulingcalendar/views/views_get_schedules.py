@@ -6,6 +6,7 @@ from django.contrib.auth import login
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.forms.models import model_to_dict
+from django.utils import timezone
 from ..models import (Schedule, Department, DepartmentMembership, Employee, 
                      Vacation, RepeatUnavailability, DesiredTime, MonthlyRevenue,
                      Absence, BusinessData, LiveSchedule, LiveCalendar, 
@@ -14,12 +15,21 @@ from ..models import (Schedule, Department, DepartmentMembership, Employee,
                      LiveCalendarEmployeeViewRights, LiveCalendarVersionTimestamp)
 from ..business_logic import (get_eligibles, all_calendar_hours_and_costs, 
                               get_avg_monthly_revenue, get_tro_dates, 
-                              get_start_end_of_calendar, get_employees_with_same_first_name) 
-from ..forms import (CalendarForm, LiveCalendarForm, LiveCalendarManagerForm)
+                              get_start_end_of_calendar, get_employees_with_same_first_name,
+                              get_cost_rollups, get_calendar_hours_and_costs,
+                              get_labor_forecast, get_department_coverage,
+                              get_staffing_requirements, get_fatigue_report,
+                              poll_calendar_events, CALENDAR_PUBLISHED, run_concurrently,
+                              range_hours_and_costs, get_start_end_of_workweek, filter_overlapping)
+from ..forms import (CalendarForm, LiveCalendarForm, LiveCalendarManagerForm, CostRollupForm,
+                     LaborForecastForm, CoverageForm, FatigueReportForm, ConsolidatedCalendarForm,
+                     CalendarRangeForm)
 from ..serializers import (date_handler, get_json_err_response, eligable_list_to_dict,
                           get_tro_dates_to_dict, _availability_to_dict)
+from ..ui_preferences import get_ui_preferences, set_ui_preferences
 from .views_basic_pages import manager_check
-from datetime import datetime, date, time
+from collections import OrderedDict
+from datetime import datetime, date, time, timedelta
 import json
 
 
@@ -38,77 +48,58 @@ def get_schedules(request):
             cal_date = datetime(year, month, 1)
             lower_bound_dt, upper_bound_dt = get_start_end_of_calendar(year, month)
             
-            # Get live_calendar to find out if calendar exists and view rights
-            try:
-              live_calendar = LiveCalendar.objects.get(user=logged_in_user, 
-                                                       date=cal_date.date(), 
-                                                       department=department_id)
-              live_cal_exists = True
-              view_rights = {'all_employee_view': live_calendar.all_employee_view, 
-                             'department_view': [],
-                             'employee_view': []}        
-              
-              department_view_rights = LiveCalendarDepartmentViewRights.objects.filter(user=logged_in_user, live_calendar=live_calendar)
-              employee_view_rights = LiveCalendarEmployeeViewRights.objects.filter(user=logged_in_user, live_calendar=live_calendar)
-              
-              for dep_view_right in department_view_rights:
-                  view_rights['department_view'].append(dep_view_right.department_view_rights.id)
-              for emp_view_right in employee_view_rights:
-                  view_rights['employee_view'].append(emp_view_right.employee_view_rights.id)
-              
-            except LiveCalendar.DoesNotExist:
-                live_cal_exists = False
-                view_rights = {}
-            
-            # Get schedule and employee models from database
-            schedules = (Schedule.objects.select_related('employee')
-                                         .filter(user=logged_in_user,
-                                                 start_datetime__gte=lower_bound_dt,
-                                                 end_datetime__lte=upper_bound_dt)
-                                         .order_by('start_datetime', 'end_datetime'))
-
-            employees = Employee.objects.filter(user=logged_in_user).order_by('first_name', 'last_name')
-            dep_memberships = (DepartmentMembership.objects.filter(user=logged_in_user, department=department_id))
-            employees_in_dep = []
-            employee_ids = []
-            for dep_mem in dep_memberships:
-                employee_ids.append(dep_mem.employee.id)
-            for e in employees:
-                if e.id in employee_ids:
-                    employees_in_dep.append(e)
+            # Independent queries run concurrently, the slowest one sets how
+            # long the month takes to load (See run_concurrently)
+            data = run_concurrently({
+                'view_rights': lambda: _get_view_rights(logged_in_user, cal_date.date(), 
+                                                        department_id),
+                'schedules': lambda: list(Schedule.objects.filter(user=logged_in_user,
+                                                                  department=department_id,
+                                                                  start_datetime__gte=lower_bound_dt,
+                                                                  end_datetime__lte=upper_bound_dt)
+                                                          .order_by('start_datetime', 'end_datetime')),
+                'employees': lambda: list(Employee.objects.filter(user=logged_in_user)
+                                                          .order_by('first_name', 'last_name')),
+                'dep_employee_ids': lambda: set(DepartmentMembership.objects.filter(user=logged_in_user, 
+                                                                                    department=department_id)
+                                                                            .values_list('employee_id', flat=True)),
+                'departments': lambda: list(Department.objects.filter(user=logged_in_user).order_by('name')),
+                'day_note_header': lambda: list(DayNoteHeader.objects.filter(user=logged_in_user,
+                                                                             date__lte=upper_bound_dt,
+                                                                             date__gte=lower_bound_dt,
+                                                                             department=department_id)),
+                'day_note_body': lambda: list(DayNoteBody.objects.filter(user=logged_in_user,
+                                                                         date__lte=upper_bound_dt,
+                                                                         date__gte=lower_bound_dt,
+                                                                         department=department_id)),
+                'tro_dict': lambda: get_tro_dates_to_dict(get_tro_dates(logged_in_user, department_id,
+                                                                        lower_bound_dt, upper_bound_dt)),
+                'business_data': lambda: BusinessData.objects.get(user=logged_in_user),
+                'avg_monthly_revenue': lambda: get_avg_monthly_revenue(logged_in_user, month)})
+            live_cal_exists, view_rights = data['view_rights']
+            schedules = data['schedules']
+            employees = data['employees']
+            employees_in_dep = [e for e in employees if e.id in data['dep_employee_ids']]
+            departments = data['departments']
+            day_note_header = data['day_note_header']
+            day_note_body = data['day_note_body']
+            tro_dict = data['tro_dict']
+            business_data = data['business_data']
+            avg_monthly_revenue = data['avg_monthly_revenue']
                                                  
             # Check if any employees for this user exist to alert them if no employees exist
             # Or alert them if employees exist, but none are members of this department
             no_employees_exist = False
             no_employees_exist_for_department = False
             if not employees: 
-                all_employees = Employee.objects.filter(user=logged_in_user)
-                if not all_employees:
-                    no_employees_exist = True
-                else: # Employees exist, but none for this department
-                    all_dep_employees = DepartmentMembership.objects.filter(department=department_id)
-                    if not all_dep_employees:
-                        no_employees_exist_for_department = True
-                    
-            # Get departments of user for manipulating parts of calendar view
-            departments = Department.objects.filter(user=logged_in_user).order_by('name')
-                    
-            # Get day notes to display for dates within range of month
-            day_note_header = DayNoteHeader.objects.filter(user=logged_in_user,
-                                                           date__lte=upper_bound_dt,
-                                                           date__gte=lower_bound_dt,
-                                                           department=department_id)
-            day_note_body = DayNoteBody.objects.filter(user=logged_in_user,
-                                                       date__lte=upper_bound_dt,
-                                                       date__gte=lower_bound_dt,
-                                                       department=department_id)    
+                no_employees_exist = True
+            elif not employees_in_dep:
+                all_dep_employees = DepartmentMembership.objects.filter(department=department_id)
+                if not all_dep_employees:
+                    no_employees_exist_for_department = True
                                                        
             # Get employee ids of employees who have non-unique first names
             employees_with_same_first_name = get_employees_with_same_first_name(employees)
-                                                       
-            # Get time requested off instances
-            tro_dates = get_tro_dates(logged_in_user, department_id, lower_bound_dt, upper_bound_dt)
-            tro_dict = get_tro_dates_to_dict(tro_dates)
                                                             
             # Convert schedules, employees and notes to dicts for json dump
             schedules_as_dicts = []
@@ -118,9 +109,8 @@ def get_schedules(request):
             day_note_body_as_dicts = []
             
             for s in schedules:
-                if s.department.id == department_id:
-                    schedule_dict = model_to_dict(s)
-                    schedules_as_dicts.append(schedule_dict)
+                schedule_dict = model_to_dict(s)
+                schedules_as_dicts.append(schedule_dict)
             for e in employees_in_dep:
                 employee_dict = model_to_dict(e)
                 employees_as_dicts.append(employee_dict) 
@@ -133,19 +123,11 @@ def get_schedules(request):
                 day_body_dict = model_to_dict(day_body)
                 day_note_body_as_dicts.append(day_body_dict)
             
-            # Get business data for display settings on calendar
-            business_data = BusinessData.objects.get(user=logged_in_user)
-            business_dict = model_to_dict(business_data)
-            
-            # Use business data to remember last calendar loaded by user
-            business_data.last_cal_date_loaded = cal_date
-            department = Department.objects.get(pk=department_id)
-            business_data.last_cal_department_loaded = department
-            business_data.save()
+            # Business data for display settings on calendar
+            business_dict = _get_display_settings(request, business_data)
             
             # Get calendar costs to display to user
-            hours_and_costs = all_calendar_hours_and_costs(logged_in_user, departments, schedules, employees, month, year, business_data)
-            avg_monthly_revenue = get_avg_monthly_revenue(logged_in_user, month)
+            hours_and_costs = get_calendar_hours_and_costs(logged_in_user, departments, employees, month, year, business_data)
               
             # Combine all appropriate data into dict for serialization
             combined_dict = {'date': cal_date.isoformat(),
@@ -166,6 +148,189 @@ def get_schedules(request):
                              'view_rights': view_rights}
             combined_json = json.dumps(combined_dict, default=date_handler)
             
+            # Remember last calendar loaded by user
+            response = JsonResponse(combined_json, safe=False)
+            set_ui_preferences(request, response, 
+                               last_cal_date_loaded=cal_date.date().isoformat(),
+                               last_cal_department_loaded=department_id)
+            return response
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+      msg = 'HTTP request needs to be GET. Got: ' + request.method
+      return get_json_err_response(msg)
+
+  
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_consolidated_schedules(request):
+    """Get a month of the calendars of several departments at once.
+    
+    Same data as get_schedules returns for one department, grouped by the
+    selected departments, or all of them if none are selected. Employees and
+    time requested off are shared between the departments, and the hours and
+    costs are of every department, like for a single department.
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = ConsolidatedCalendarForm(request.GET)
+        if form.is_valid():
+            year = form.cleaned_data['year']
+            month = form.cleaned_data['month']
+            department_ids = form.cleaned_data['departments'] or None
+            cal_date = datetime(year, month, 1)
+            lower_bound_dt, upper_bound_dt = get_start_end_of_calendar(year, month)
+            
+            def of_departments(queryset):
+                if department_ids is None:
+                    return queryset
+                return queryset.filter(department__in=department_ids)
+                
+            data = run_concurrently({
+                'schedules': lambda: list(of_departments(Schedule.objects.filter(user=logged_in_user,
+                                                                                 start_datetime__gte=lower_bound_dt,
+                                                                                 end_datetime__lte=upper_bound_dt))
+                                          .order_by('start_datetime', 'end_datetime')),
+                'employees': lambda: list(Employee.objects.filter(user=logged_in_user)
+                                                          .order_by('first_name', 'last_name')),
+                'memberships': lambda: list(of_departments(DepartmentMembership.objects.filter(user=logged_in_user))
+                                            .values_list('department_id', 'employee_id')),
+                'departments': lambda: list(Department.objects.filter(user=logged_in_user).order_by('name')),
+                'live_calendars': lambda: set(of_departments(LiveCalendar.objects.filter(user=logged_in_user, 
+                                                                                         date=cal_date.date()))
+                                              .values_list('department_id', flat=True)),
+                'day_note_header': lambda: list(of_departments(DayNoteHeader.objects.filter(user=logged_in_user,
+                                                                                            date__lte=upper_bound_dt,
+                                                                                            date__gte=lower_bound_dt))),
+                'day_note_body': lambda: list(of_departments(DayNoteBody.objects.filter(user=logged_in_user,
+                                                                                        date__lte=upper_bound_dt,
+                                                                                        date__gte=lower_bound_dt))),
+                'tro_dict': lambda: get_tro_dates_to_dict(get_tro_dates(logged_in_user, department_ids,
+                                                                        lower_bound_dt, upper_bound_dt)),
+                'business_data': lambda: BusinessData.objects.get(user=logged_in_user),
+                'avg_monthly_revenue': lambda: get_avg_monthly_revenue(logged_in_user, month)})
+            departments = data['departments']
+            employees = data['employees']
+            business_data = data['business_data']
+            
+            # Group calendars by department, in order of the departments' names
+            calendars = OrderedDict()
+            for d in departments:
+                if department_ids is None or d.id in department_ids:
+                    calendars[d.id] = {'department': d.id, 'name': d.name, 
+                                       'schedules': [], 'employees': [], 
+                                       'day_note_header': [], 'day_note_body': [],
+                                       'live_cal_exists': d.id in data['live_calendars']}
+            for s in data['schedules']:
+                calendars[s.department_id]['schedules'].append(model_to_dict(s))
+            dep_employee_ids = set()
+            for department_id, employee_id in data['memberships']:
+                calendars[department_id]['employees'].append(employee_id)
+                dep_employee_ids.add(employee_id)
+            for day_hdr in data['day_note_header']:
+                calendars[day_hdr.department_id]['day_note_header'].append(model_to_dict(day_hdr))
+            for day_body in data['day_note_body']:
+                calendars[day_body.department_id]['day_note_body'].append(model_to_dict(day_body))
+            employees_as_dicts = [model_to_dict(e) for e in employees if e.id in dep_employee_ids]
+            
+            hours_and_costs = get_calendar_hours_and_costs(logged_in_user, departments, employees, 
+                                                           month, year, business_data)
+            combined_dict = {'date': cal_date.isoformat(),
+                             'calendars': list(calendars.values()),
+                             'departments': dict((d.id, d.name) for d in departments),
+                             'employees': employees_as_dicts,
+                             'employees_with_same_first_name': get_employees_with_same_first_name(employees),
+                             'tro_dates': data['tro_dict'],
+                             'hours_and_costs': hours_and_costs,
+                             'avg_monthly_revenue': data['avg_monthly_revenue'],
+                             'display_settings': _get_display_settings(request, business_data)}
+            combined_json = json.dumps(combined_dict, default=date_handler)
+            
+            return JsonResponse(combined_json, safe=False)
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+      msg = 'HTTP request needs to be GET. Got: ' + request.method
+      return get_json_err_response(msg)
+      
+      
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_schedules_range(request):
+    """Get a day, a workweek or a window of days of a department's calendar.
+    
+    Same data as get_schedules returns for a month, for views showing less
+    than a month. Only the workweeks overlapping the range are costed (See
+    range_hours_and_costs), and there are no month costs.
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = CalendarRangeForm(request.GET)
+        if form.is_valid():
+            department_id = form.cleaned_data['department']
+            first_date = form.cleaned_data['date']
+            business_data = BusinessData.objects.get(user=logged_in_user)
+            
+            if form.cleaned_data['range'] == 'week':
+                # Noon is inside the workweek of the date whatever time it starts
+                noon = timezone.make_aware(datetime.combine(first_date, time(12)))
+                workweek = get_start_end_of_workweek(noon, business_data)
+                start_dt = workweek['start']
+                end_dt = workweek['end'] + timedelta(seconds=1)
+            else:
+                last_date = first_date
+                if form.cleaned_data['range'] == 'window':
+                    last_date = form.cleaned_data['end_date']
+                start_dt = timezone.make_aware(datetime.combine(first_date, time.min))
+                end_dt = timezone.make_aware(datetime.combine(last_date + timedelta(1), time.min))
+            first_date = timezone.localtime(start_dt).date()
+            last_date = timezone.localtime(end_dt - timedelta(seconds=1)).date()
+            
+            data = run_concurrently({
+                'schedules': lambda: list(filter_overlapping(Schedule.objects.filter(user=logged_in_user,
+                                                                                     department=department_id),
+                                                             start_dt, end_dt)
+                                          .order_by('start_datetime', 'end_datetime')),
+                'employees': lambda: list(Employee.objects.filter(user=logged_in_user)
+                                                          .order_by('first_name', 'last_name')),
+                'dep_employee_ids': lambda: set(DepartmentMembership.objects.filter(user=logged_in_user, 
+                                                                                    department=department_id)
+                                                                            .values_list('employee_id', flat=True)),
+                'departments': lambda: list(Department.objects.filter(user=logged_in_user).order_by('name')),
+                'day_note_header': lambda: list(DayNoteHeader.objects.filter(user=logged_in_user,
+                                                                             date__lte=last_date,
+                                                                             date__gte=first_date,
+                                                                             department=department_id)),
+                'day_note_body': lambda: list(DayNoteBody.objects.filter(user=logged_in_user,
+                                                                         date__lte=last_date,
+                                                                         date__gte=first_date,
+                                                                         department=department_id)),
+                'tro_dict': lambda: get_tro_dates_to_dict(get_tro_dates(logged_in_user, department_id,
+                                                                        start_dt, end_dt))})
+            employees = data['employees']
+            departments = data['departments']
+            hours_and_costs = range_hours_and_costs(logged_in_user, departments, employees,
+                                                    start_dt, end_dt, business_data)
+            
+            combined_dict = {'start': start_dt.isoformat(),
+                             'end': end_dt.isoformat(),
+                             'department': department_id,
+                             'departments': dict((d.id, d.name) for d in departments),
+                             'schedules': [model_to_dict(s) for s in data['schedules']],
+                             'employees': [model_to_dict(e) for e in employees 
+                                           if e.id in data['dep_employee_ids']],
+                             'employees_with_same_first_name': get_employees_with_same_first_name(employees),
+                             'day_note_header': [model_to_dict(n) for n in data['day_note_header']],
+                             'day_note_body': [model_to_dict(n) for n in data['day_note_body']],
+                             'tro_dates': data['tro_dict'],
+                             'hours_and_costs': hours_and_costs,
+                             'display_settings': _get_display_settings(request, business_data)}
+            combined_json = json.dumps(combined_dict, default=date_handler)
+            
             return JsonResponse(combined_json, safe=False)
             
         else:
@@ -174,8 +339,199 @@ def get_schedules(request):
     else:
       msg = 'HTTP request needs to be GET. Got: ' + request.method
       return get_json_err_response(msg)
+      
+      
+def _get_display_settings(request, business_data):
+    """Return dict of business data for display settings on calendar, with
+    the times of the last schedule added (See _set_schedule_preferences)."""
+    business_dict = model_to_dict(business_data)
+    preferences = get_ui_preferences(request)
+    for field in ('schedule_start', 'schedule_end', 'hide_start', 'hide_end'):
+        if field in preferences:
+            business_dict[field] = preferences[field]
+    return business_dict
+    
+  
+def _get_view_rights(user, date, department_id):
+    """Return if the calendar of date and department is live and who can see it.
+    
+    Returns:
+        A tuple of True and the dict of view rights of the live calendar, or
+        of False and an empty dict if the calendar is not live.
+    """
+    try:
+        live_calendar = LiveCalendar.objects.get(user=user, date=date, department=department_id)
+    except LiveCalendar.DoesNotExist:
+        return False, {}
+        
+    department_view = (LiveCalendarDepartmentViewRights.objects.filter(user=user, 
+                                                                       live_calendar=live_calendar)
+                                                               .values_list('department_view_rights_id', 
+                                                                            flat=True))
+    employee_view = (LiveCalendarEmployeeViewRights.objects.filter(user=user, 
+                                                                   live_calendar=live_calendar)
+                                                           .values_list('employee_view_rights_id', 
+                                                                        flat=True))
+    return True, {'all_employee_view': live_calendar.all_employee_view, 
+                  'department_view': list(department_view),
+                  'employee_view': list(employee_view)}
+    
+  
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_cost_rollup(request):
+    """Get hours and costs of every department for a range of months.
+    
+    Used for projecting costs against average monthly revenues over a
+    quarter or year (See get_cost_rollups).
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = CostRollupForm(request.GET)
+        if form.is_valid():
+            start_month = date(form.cleaned_data['start_year'], form.cleaned_data['start_month'], 1)
+            end_month = date(form.cleaned_data['end_year'], form.cleaned_data['end_month'], 1)
+            
+            cost_rollups = get_cost_rollups(logged_in_user, start_month, end_month)
+            cost_json = json.dumps(cost_rollups, default=date_handler)
+            
+            return JsonResponse(cost_json, safe=False)
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
 
   
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_cost_forecast(request):
+    """Get forecast of hours and costs of a month from past schedules.
+    
+    Shown by the calendar as a target band next to the average monthly
+    revenue (See get_labor_forecast).
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = LaborForecastForm(request.GET)
+        if form.is_valid():
+            month_year = date(form.cleaned_data['year'], form.cleaned_data['month'], 1)
+            forecast = get_labor_forecast(logged_in_user, month_year)
+            forecast_json = json.dumps(forecast, default=date_handler)
+            
+            return JsonResponse(forecast_json, safe=False)
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_fatigue_violations(request):
+    """Get every minimum rest and consecutive days rule broken in a month.
+    
+    Rules are set in the business settings (See get_fatigue_report).
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = FatigueReportForm(request.GET)
+        if form.is_valid():
+            month_year = date(form.cleaned_data['year'], form.cleaned_data['month'], 1)
+            report = get_fatigue_report(logged_in_user, month_year)
+            report_json = json.dumps(report, default=date_handler)
+            
+            return JsonResponse(report_json, safe=False)
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_coverage(request):
+    """Get headcount of a department for every time slot of a month.
+    
+    The calendar renders the headcounts as a heatmap. Slots with fewer people
+    than the department's staffing rules require are returned as understaffed
+    windows (See get_department_coverage), as are slots with fewer people
+    than a given target headcount between the target's start and end times,
+    or all slots without times.
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = CoverageForm(request.GET)
+        if form.is_valid():
+            department_id = form.cleaned_data['department']
+            month_year = date(form.cleaned_data['year'], form.cleaned_data['month'], 1)
+            if not Department.objects.filter(user=logged_in_user, pk=department_id).exists():
+                msg = 'Invalid form data'
+                return get_json_err_response(msg)
+                
+            requirements = get_staffing_requirements(logged_in_user, department_id)
+            if form.cleaned_data['target']:
+                requirements.append({'weekdays': range(7),
+                                     'start': form.cleaned_data['target_start'] or time(0),
+                                     'end': form.cleaned_data['target_end'] or time(0),
+                                     'headcount': form.cleaned_data['target']})
+            coverage = get_department_coverage(logged_in_user, department_id, month_year,
+                                               form.cleaned_data['slot_minutes'], requirements)
+            coverage_json = json.dumps(coverage, default=date_handler)
+            
+            return JsonResponse(coverage_json, safe=False)
+            
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
+@login_required
+def calendar_events(request):
+    """Return changes to calendars after the last one the client received.
+    
+    Managers get every change to their calendars, employees only get when
+    their manager publishes calendars. Clients poll every few seconds,
+    sending the last event id of the response with their next request (See
+    poll_calendar_events).
+    """
+    logged_in_user = request.user
+    if request.method == 'GET':
+        last_event_id = request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            msg = 'Invalid last event id'
+            return get_json_err_response(msg)
+            
+        if manager_check(logged_in_user):
+            events, last_event_id = poll_calendar_events(logged_in_user, last_event_id)
+        else:
+            employee = (Employee.objects.select_related('user')
+                                        .get(employee_user=logged_in_user))
+            events, last_event_id = poll_calendar_events(employee.user, last_event_id,
+                                                         kinds=[CALENDAR_PUBLISHED])
+            
+        events = [{'id': event.id, 'kind': event.kind, 'client_id': event.client_id,
+                   'data': json.loads(event.data)} for event in events]
+        json_data = json.dumps({'events': events, 'last_event_id': last_event_id})
+        return JsonResponse(json_data, safe=False)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
 @login_required  
 @user_passes_test(manager_check, login_url="/live_calendar/")
 def get_live_schedules(request):
@@ -204,38 +560,13 @@ def get_live_schedules(request):
                 except:
                     timestamp_str = ""
                     
-                live_schedules = (LiveSchedule.objects.select_related('employee')
-                                                      .filter(user=logged_in_user,
-                                                              calendar=live_calendar,
-                                                              version=version))
-                                                          
-                # Get employees
-                employees = Employee.objects.filter(user=logged_in_user).order_by('first_name', 'last_name')
-                dep_memberships = (DepartmentMembership.objects.filter(user=logged_in_user, department=department_id))
-                employees_in_dep = []
-                employee_ids = []
-                for dep_mem in dep_memberships:
-                    employee_ids.append(dep_mem.employee.id)
-                for e in employees:
-                    if e.id in employee_ids:
-                        employees_in_dep.append(e) 
+                (live_schedules, employees, employees_in_dep, tro_dict,
+                 day_note_header, day_note_body, business_data) = _get_live_calendar_data(
+                    logged_in_user, live_calendar, version, department_id,
+                    lower_bound_dt, upper_bound_dt)
                             
                 # Get employee ids of employees who have non-unique first names
                 employees_with_same_first_name = get_employees_with_same_first_name(employees)                        
-                                             
-                # Get time requested off instances
-                tro_dates = get_tro_dates(logged_in_user, department_id, lower_bound_dt, upper_bound_dt)
-                tro_dict = get_tro_dates_to_dict(tro_dates)
-                        
-                # Get day notes to display for dates within range of month
-                day_note_header = DayNoteHeader.objects.filter(user=logged_in_user,
-                                                               date__lte=upper_bound_dt,
-                                                               date__gte=lower_bound_dt,
-                                                               department=department_id)
-                day_note_body = DayNoteBody.objects.filter(user=logged_in_user,
-                                                           date__lte=upper_bound_dt,
-                                                           date__gte=lower_bound_dt,
-                                                           department=department_id)  
                 
                 # Convert live_schedules and employees to dicts for json dump
                 schedules_as_dicts = []
@@ -256,8 +587,7 @@ def get_live_schedules(request):
                     day_body_dict = model_to_dict(day_body)
                     day_note_body_as_dicts.append(day_body_dict)
                 
-                # Get business data for display settings on calendar
-                business_data = (BusinessData.objects.get(user=logged_in_user))
+                # Business data for display settings on calendar
                 business_dict = model_to_dict(business_data)
                   
                 # Combine all appropriate data into dict for serialization
@@ -338,50 +668,16 @@ def employee_get_live_schedules(request):
                                                          
                 # Check if employee wishes to see only their schedules
                 employee_only = form.cleaned_data['employee_only']
-                employee.see_only_my_schedules = employee_only
-                employee.save()
                 version = live_calendar.version
                     
                 # Get schedule and employee models from database appropriate for calendar
-                if employee_only:
-                    live_schedules = (LiveSchedule.objects.select_related('employee')
-                                                  .filter(user=manager_user,
-                                                          employee=employee,
-                                                          calendar=live_calendar,
-                                                          version=version))
-                else: 
-                    live_schedules = (LiveSchedule.objects.select_related('employee')
-                                                  .filter(user=manager_user,
-                                                          calendar=live_calendar,
-                                                          version=version))
-                                                          
-                # Get employees
-                employees = Employee.objects.filter(user=manager_user).order_by('first_name', 'last_name')
-                dep_memberships = (DepartmentMembership.objects.filter(user=manager_user, department=department_id))
-                employees_in_dep = []
-                employee_ids = []
-                for dep_mem in dep_memberships:
-                    employee_ids.append(dep_mem.employee.id)
-                for e in employees:
-                    if e.id in employee_ids:
-                        employees_in_dep.append(e)      
+                (live_schedules, employees, employees_in_dep, tro_dict,
+                 day_note_header, day_note_body, business_data) = _get_live_calendar_data(
+                    manager_user, live_calendar, version, department_id,
+                    lower_bound_dt, upper_bound_dt, employee if employee_only else None)
                                                            
                 # Get employee ids of employees who have non-unique first names
                 employees_with_same_first_name = get_employees_with_same_first_name(employees)
-                         
-                # Get time requested off instances
-                tro_dates = get_tro_dates(manager_user, department_id, lower_bound_dt, upper_bound_dt)
-                tro_dict = get_tro_dates_to_dict(tro_dates)
-                        
-                # Get day notes to display for dates within range of month
-                day_note_header = DayNoteHeader.objects.filter(user=manager_user,
-                                                               date__lte=upper_bound_dt,
-                                                               date__gte=lower_bound_dt,
-                                                               department=department_id)
-                day_note_body = DayNoteBody.objects.filter(user=manager_user,
-                                                           date__lte=upper_bound_dt,
-                                                           date__gte=lower_bound_dt,
-                                                           department=department_id)  
                 
                 # Convert live_schedules and employees to dicts for json dump
                 schedules_as_dicts = []
@@ -411,8 +707,7 @@ def employee_get_live_schedules(request):
                     day_body_dict = model_to_dict(day_body)
                     day_note_body_as_dicts.append(day_body_dict)
                 
-                # Get business data for display settings on calendar
-                business_data = (BusinessData.objects.get(user=manager_user))
+                # Business data for display settings on calendar
                 business_dict = model_to_dict(business_data)
                   
                 # Combine all appropriate data into dict for serialization
@@ -432,7 +727,9 @@ def employee_get_live_schedules(request):
                                  'upper_bound_dt': upper_bound_dt.isoformat()}
                 combined_json = json.dumps(combined_dict, default=date_handler)
                 
-                return JsonResponse(combined_json, safe=False)
+                response = JsonResponse(combined_json, safe=False)
+                set_ui_preferences(request, response, see_only_my_schedules=employee_only)
+                return response
                 
             except (LiveCalendar.DoesNotExist, ValueError) as error:
                 department_name = Department.objects.get(pk=department_id).name
@@ -445,4 +742,56 @@ def employee_get_live_schedules(request):
             return get_json_err_response(msg)
     else:
       msg = 'HTTP request needs to be GET. Got: ' + request.method
-      return get_json_err_response(msg)
\ No newline at end of file
+      return get_json_err_response(msg)
+
+
+def _get_live_calendar_data(manager_user, live_calendar, version, department_id,
+                            lower_bound_dt, upper_bound_dt, employee=None):
+    """Fetch what a live calendar displays, running the queries concurrently.
+    
+    Args:
+        manager_user: Django user managing the live calendar.
+        live_calendar: LiveCalendar model object.
+        version: Integer version of the live calendar.
+        department_id: Integer id of department of the live calendar.
+        lower_bound_dt: Datetime of start of first day the calendar displays.
+        upper_bound_dt: Datetime of end of last day the calendar displays.
+        employee: Optional Employee, only their live schedules are fetched.
+    Returns:
+        A tuple of the lists of live schedules, all employees of the manager,
+        employees of the department, the dict of time requested off (See
+        get_tro_dates_to_dict), the lists of day note headers and bodies,
+        and the manager's business data.
+    """
+    
+    live_schedules = LiveSchedule.objects.filter(user=manager_user, calendar=live_calendar,
+                                                 version=version)
+    if employee:
+        live_schedules = live_schedules.filter(employee=employee)
+    employees = Employee.objects.filter(user=manager_user).order_by('first_name', 'last_name')
+    dep_employee_ids = (DepartmentMembership.objects.filter(user=manager_user,
+                                                            department=department_id)
+                                                    .values_list('employee_id', flat=True))
+    day_note_header = DayNoteHeader.objects.filter(user=manager_user,
+                                                   date__lte=upper_bound_dt,
+                                                   date__gte=lower_bound_dt,
+                                                   department=department_id)
+    day_note_body = DayNoteBody.objects.filter(user=manager_user,
+                                               date__lte=upper_bound_dt,
+                                               date__gte=lower_bound_dt,
+                                               department=department_id)
+    
+    def tro_dates():
+        tro_dates = get_tro_dates(manager_user, department_id, lower_bound_dt, upper_bound_dt)
+        return get_tro_dates_to_dict(tro_dates)
+    
+    (live_schedules, employees, dep_employee_ids, tro_dict,
+     day_note_header, day_note_body, business_data) = run_concurrently(
+        [lambda: list(live_schedules), lambda: list(employees),
+         lambda: set(dep_employee_ids), tro_dates,
+         lambda: list(day_note_header), lambda: list(day_note_body),
+         lambda: BusinessData.objects.get(user=manager_user)])
+    employees_in_dep = [e for e in employees if e.id in dep_employee_ids]
+    
+    return (live_schedules, employees, employees_in_dep, tro_dict,
+            day_note_header, day_note_body, business_data)
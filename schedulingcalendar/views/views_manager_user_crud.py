@@ -29,7 +29,9 @@ from ..forms import (CalendarForm, AddScheduleForm, ProtoScheduleForm,
                     DayNoteBodyForm, ScheduleNoteForm, ScheduleSwapPetitionForm,
                     ScheduleSwapDecisionForm, EditScheduleForm, CopySchedulesForm,
                     SetStateLiveCalForm, CalendarDisplaySettingsForm,
-                     SchedulePkForm, AddEmployeeToScheduleForm, RemoveScheduleForm)
+                     SchedulePkForm, AddEmployeeToScheduleForm, RemoveScheduleForm,
+                     KeysetPageForm, EmployeeHistoryPageForm)
+from ..business_logic import (get_keyset_page, EMPLOYEE_PAGE_SIZE, HISTORY_PAGE_SIZE)
 from ..serializers import get_json_err_response
 from ..custom_mixins import UserIsManagerMixin
 from .views_basic_pages import manager_check
@@ -37,6 +39,11 @@ from datetime import datetime, date, time
 import json
 
 
+EMPLOYEE_ORDERING = ['last_name', 'first_name']
+# Past vacations and absences are listed newest first
+HISTORY_ORDERING = ['-start_datetime', '-end_datetime']
+HISTORY_MODELS = {'vacation': Vacation, 'absence': Absence}
+
 
 def manager_is_obj_owner_test(user, obj):
     """Checks that the request user is the owner of the object they are requesting."""
@@ -51,14 +58,22 @@ def get_manager_user_of_employee_user(employee_user):
 
 @method_decorator(login_required, name='dispatch')
 class EmployeeListView(UserIsManagerMixin, ListView):
-    """Display an alphabetical list of all employees for a managing user."""
+    """Display an alphabetical list of the first EMPLOYEE_PAGE_SIZE employees
+    for a managing user, the rest are loaded by get_employee_list_page."""
     model = Employee
     template_name = 'schedulingcalendar/employeeList.html'
     context_object_name = 'employee_list'
 
     def get_queryset(self):
-        return (Employee.objects.filter(user=self.request.user)
-                                .order_by('last_name', 'first_name'))
+        employees, self.cursor = get_keyset_page(Employee.objects.filter(user=self.request.user),
+                                                 EMPLOYEE_ORDERING)
+        return employees
+
+
+    def get_context_data(self, **kwargs):
+        context = super(EmployeeListView, self).get_context_data(**kwargs)
+        context['employee_list_cursor'] = self.cursor
+        return context
 
 
 @method_decorator(login_required, name='dispatch')
@@ -116,20 +131,22 @@ class EmployeeUpdateView(UserIsManagerMixin, SuccessMessageMixin, UpdateView):
                                                                    end_datetime__gte=now)
                                                            .order_by('start_datetime', 'end_datetime'))
 
-        context['past_vacation_list'] = (Vacation.objects.filter(employee=self.kwargs['employee_pk'],
-                                                                 user=self.request.user,
-                                                                 end_datetime__lt=now)
-                                                         .order_by('start_datetime', 'end_datetime'))
+        past_vacations, past_vacation_cursor = _get_past_history_page(self.request.user,
+                                                                      self.kwargs['employee_pk'],
+                                                                      'vacation', now)
+        context['past_vacation_list'] = past_vacations
+        context['past_vacation_cursor'] = past_vacation_cursor
 
         context['future_absence_list'] = (Absence.objects.filter(employee=self.kwargs['employee_pk'],
                                                                 user=self.request.user,
                                                                 end_datetime__gte=now)
                                                         .order_by('start_datetime', 'end_datetime'))
 
-        context['past_absence_list'] = (Absence.objects.filter(employee=self.kwargs['employee_pk'],
-                                                              user=self.request.user,
-                                                              end_datetime__lt=now)
-                                                      .order_by('start_datetime', 'end_datetime'))
+        past_absences, past_absence_cursor = _get_past_history_page(self.request.user,
+                                                                    self.kwargs['employee_pk'],
+                                                                    'absence', now)
+        context['past_absence_list'] = past_absences
+        context['past_absence_cursor'] = past_absence_cursor
 
         context['repeating_unavailable_list'] = (RepeatUnavailability.objects.filter(employee=self.kwargs['employee_pk'],
                                                                                      user=self.request.user)
@@ -148,6 +165,73 @@ class EmployeeUpdateView(UserIsManagerMixin, SuccessMessageMixin, UpdateView):
                             kwargs={'employee_pk': self.kwargs['employee_pk']})
 
 
+def _get_past_history_page(user, employee_pk, kind, now, cursor=None):
+    """Return page of past vacations or absences of an employee, newest first.
+
+    Args:
+        user: Django authenticated manager user.
+        employee_pk: Integer id of the employee.
+        kind: String 'vacation' or 'absence'.
+        now: Datetime before which items end to be in the past.
+        cursor: Cursor of the page before, or None for the first page.
+    Returns:
+        A tuple of the list of at most HISTORY_PAGE_SIZE items and the cursor
+        of the next page (See get_keyset_page).
+    """
+    past_items = HISTORY_MODELS[kind].objects.filter(employee=employee_pk, user=user,
+                                                     end_datetime__lt=now)
+    return get_keyset_page(past_items, HISTORY_ORDERING, cursor, HISTORY_PAGE_SIZE)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_employee_list_page(request):
+    """Get html of the rows of the next page of the employee list."""
+    if request.method == 'GET':
+        form = KeysetPageForm(request.GET)
+        if form.is_valid():
+            employees, cursor = get_keyset_page(Employee.objects.filter(user=request.user),
+                                                EMPLOYEE_ORDERING, form.cleaned_data['cursor'])
+            html = loader.render_to_string('schedulingcalendar/_employeeListRows.html',
+                                           {'employee_list': employees}, request)
+            json_info = json.dumps({'html': html, 'cursor': cursor})
+            return JsonResponse(json_info, safe=False)
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_employee_history_page(request, employee_pk):
+    """Get html of the next page of past vacations or absences of employee."""
+    if request.method == 'GET':
+        form = EmployeeHistoryPageForm(request.GET)
+        if form.is_valid():
+            try:
+                employee = Employee.objects.get(pk=employee_pk, user=request.user)
+            except Employee.DoesNotExist:
+                msg = 'Employee not found'
+                return get_json_err_response(msg)
+            kind = form.cleaned_data['kind']
+            past_items, cursor = _get_past_history_page(request.user, employee.id, kind,
+                                                        datetime.now(), form.cleaned_data['cursor'])
+            template = 'schedulingcalendar/_past%ss.html' % kind.capitalize()
+            context = {'employee': employee, 'past_%s_list' % kind: past_items}
+            html = loader.render_to_string(template, context, request)
+            json_info = json.dumps({'html': html, 'cursor': cursor})
+            return JsonResponse(json_info, safe=False)
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
 @method_decorator(login_required, name='dispatch')
 class EmployeeCreateView(UserIsManagerMixin, SuccessMessageMixin, CreateView):
     """Display an employee form to create a new employee."""
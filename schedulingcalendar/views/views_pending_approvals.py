@@ -12,11 +12,16 @@ from ..business_logic import (get_eligibles, all_calendar_hours_and_costs,
                              get_tro_dates, time_dur_in_hours, get_start_end_of_calendar,
                              edit_schedule_cost_change, calculate_cost_delta,
                              get_start_end_of_weekday, get_availability, get_dates_in_week,
-                             notify_employee_with_msg)            
-from ..forms import ScheduleSwapPetitionForm, ScheduleSwapDecisionForm, PkForm
+                             notify_employee_with_msg, get_keyset_page,
+                             PENDING_APPS_PAGE_SIZE, get_pending_application_counts,
+                             decide_applications, get_application_conflicts,
+                             get_application_impacts,
+                             enqueue_employee_notifications)
+from ..forms import (ScheduleSwapPetitionForm, ScheduleSwapDecisionForm, PkForm,
+                     PendingApplicationsPageForm, BulkApplicationDecisionForm)
 from ..models import (VacationApplication, AbsenceApplication, RepeatUnavailabilityApplication,
                       Vacation, Absence, RepeatUnavailability, BusinessData)
-from ..serializers import get_json_err_response
+from ..serializers import get_json_err_response, date_handler
 from .views_basic_pages import manager_check
 from datetime import datetime, date, time, timedelta
 import json
@@ -25,53 +30,110 @@ import json
 
 WEEKDAY = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 3: 'Thursday', 
            4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
+# Model, ordering and list template of each kind of pending application
+PENDING_APPS = {'vacation': (VacationApplication, ['start_datetime', 'end_datetime'],
+                             'schedulingcalendar/_pendingVacationApps.html'),
+                'absence': (AbsenceApplication, ['start_datetime', 'end_datetime'],
+                            'schedulingcalendar/_pendingAbsenceApps.html'),
+                'repeat_unav': (RepeatUnavailabilityApplication, ['weekday', 'start_time', 'end_time'],
+                                'schedulingcalendar/_pendingRepeatUnavApps.html')}
 
 
 @login_required
 @user_passes_test(manager_check, login_url="/live_calendar/")  
 def pending_approvals_page(request):
-    """Display the pending approvals page for a managing user."""
+    """Display the pending approvals page for a managing user.
+    
+    Only the first PENDING_APPS_PAGE_SIZE applications of each kind are
+    listed, the rest are loaded by get_pending_apps_page. Every application
+    listed shows the assigned schedules it conflicts with and the cost change
+    of unassigning them (See _set_application_impacts).
+    """
     logged_in_user = request.user
     
     template = loader.get_template('schedulingcalendar/pendingApprovals.html')
     context = {}
     
-    vacation_apps = (VacationApplication.objects.select_related('employee')
-                                                .filter(user=logged_in_user, approved=None))
-    absence_apps = (AbsenceApplication.objects.select_related('employee')
-                                              .filter(user=logged_in_user, approved=None))
-    repeat_unav_apps = (RepeatUnavailabilityApplication.objects.select_related('employee')
-                                                               .filter(user=logged_in_user, approved=None))
-    
-    context['vacation_apps_list'] = vacation_apps
-    context['absence_apps_list'] = absence_apps
-    context['repeat_unav_apps_list'] = repeat_unav_apps
+    listed_apps = []
+    for kind in PENDING_APPS:
+        apps, cursor = _get_pending_apps_page(logged_in_user, kind)
+        context[kind + '_apps_list'] = apps
+        context[kind + '_apps_cursor'] = cursor
+        listed_apps.extend((kind, app) for app in apps)
+    _set_application_impacts(logged_in_user, listed_apps)
 
     return HttpResponse(template.render(context, request))
     
     
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_pending_apps_page(request):
+    """Get html of the next page of pending applications of a kind."""
+    if request.method == 'GET':
+        form = PendingApplicationsPageForm(request.GET)
+        if form.is_valid():
+            kind = form.cleaned_data['kind']
+            apps, cursor = _get_pending_apps_page(request.user, kind, form.cleaned_data['cursor'])
+            _set_application_impacts(request.user, [(kind, app) for app in apps])
+            html = loader.render_to_string(PENDING_APPS[kind][2],
+                                           {kind + '_apps_list': apps}, request)
+            json_info = json.dumps({'html': html, 'cursor': cursor})
+            return JsonResponse(json_info, safe=False)
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
+def _get_pending_apps_page(user, kind, cursor=None):
+    """Return page of pending applications of a kind for a manager user.
+    
+    Args:
+        user: Django authenticated manager user.
+        kind: String kind of application, a key of PENDING_APPS.
+        cursor: Cursor of the page before, or None for the first page.
+    Returns:
+        A tuple of the list of at most PENDING_APPS_PAGE_SIZE applications and
+        the cursor of the next page (See get_keyset_page).
+    """
+    model, ordering, template = PENDING_APPS[kind]
+    apps = model.objects.select_related('employee').filter(user=user, approved=None)
+    return get_keyset_page(apps, ordering, cursor, PENDING_APPS_PAGE_SIZE)
+    
+    
+def _set_application_impacts(user, applications):
+    """Set impact of approving each application on it, or None if it has no
+    conflicts with assigned schedules (See get_application_impacts)."""
+    if not applications:
+        return
+    departments = list(Department.objects.filter(user=user))
+    business_data = BusinessData.objects.get(user=user)
+    impacts = get_application_impacts(user, applications, departments, business_data)
+    for kind, app in applications:
+        app.impact = impacts.get((kind, app.id))
+    
+    
 @login_required
 @user_passes_test(manager_check, login_url="/live_calendar/")
 def check_pending_approvals(request):
-    """Check if manager has pending approvals from employees."""
+    """Check if manager has pending approvals from employees.
+    
+    The navigation bar of every page requests this, so the counts of pending
+    applications of each kind are cached (See get_pending_application_counts).
+    """
     logged_in_user = request.user
     if request.method == 'GET':
-        pending_applications = False
-        business_data = BusinessData.objects.get(user=logged_in_user)
-        if business_data.right_to_submit_availability:
-            vacation_apps = VacationApplication.objects.filter(user=logged_in_user, approved=None)
-            if vacation_apps.exists():
-                pending_applications = True
-            else:
-                absence_apps = AbsenceApplication.objects.filter(user=logged_in_user, approved=None)
-                if absence_apps.exists():
-                    pending_applications = True
-                else:
-                    repeat_unav_apps = RepeatUnavailabilityApplication.objects.filter(user=logged_in_user, approved=None)
-                    if repeat_unav_apps.exists():
-                        pending_applications = True
+        counts = get_pending_application_counts(logged_in_user.id)
+        if not counts['right_to_submit_availability']:
+            counts = dict.fromkeys(PENDING_APPS, 0)
+        else:
+            counts = dict((kind, counts.get(kind, 0)) for kind in PENDING_APPS)
+        total = sum(counts.values())
         
-        json_info = json.dumps({'pending_applications': pending_applications})
+        json_info = json.dumps({'pending_applications': total > 0, 
+                                'counts': counts, 'total': total})
         return JsonResponse(json_info, safe=False)
     else:
         msg = 'HTTP request needs to be POST. Got: ' + request.method
@@ -101,10 +163,8 @@ def approve_vacation_app(request):
             
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            start = vacation_app.start_datetime.strftime("%A, %B %d")
-            end = vacation_app.end_datetime.strftime("%A, %B %d")
-            msg_title = "Your vacation application at %s has been approved." % (business_data.company_name)
-            msg = "Your vacation application at %s for %s to %s has been approved." % (business_data.company_name, start, end)
+            msg_title, msg = _get_decision_message('vacation', vacation_app, True,
+                                                   business_data.company_name)
             notify_employee_with_msg(vacation_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -135,10 +195,8 @@ def disapprove_vacation_app(request):
             
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            start = vacation_app.start_datetime.strftime("%A, %B %d")
-            end = vacation_app.end_datetime.strftime("%A, %B %d")
-            msg_title = "Your vacation application at %s has not been approved." % (business_data.company_name)
-            msg = "Your vacation application at %s for %s to %s has not been approved." % (business_data.company_name, start, end)
+            msg_title, msg = _get_decision_message('vacation', vacation_app, False,
+                                                   business_data.company_name)
             notify_employee_with_msg(vacation_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -175,10 +233,8 @@ def approve_absence_app(request):
             
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            start = absence_app.start_datetime.strftime("%A, %B %d")
-            end = absence_app.end_datetime.strftime("%A, %B %d")
-            msg = "Your absence application for %s to %s has been approved." % (start, end)
-            msg = "Your absence application at %s for %s to %s has been approved." % (business_data.company_name, start, end)
+            msg_title, msg = _get_decision_message('absence', absence_app, True,
+                                                   business_data.company_name)
             notify_employee_with_msg(absence_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -209,10 +265,8 @@ def disapprove_absence_app(request):
             
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            start = absence_app.start_datetime.strftime("%A, %B %d")
-            end = absence_app.end_datetime.strftime("%A, %B %d")
-            msg_title = "Your absence application at %s has not been approved." % (business_data.company_name)
-            msg = "Your absence application at %s for %s to %s has not been approved." % (business_data.company_name, start, end)
+            msg_title, msg = _get_decision_message('absence', absence_app, False,
+                                                   business_data.company_name)
             notify_employee_with_msg(absence_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -250,11 +304,8 @@ def approve_repeat_unav_app(request):
             
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            weekday = WEEKDAY[repeat_unav_app.weekday]
-            start = repeat_unav_app.start_time.strftime("%I:%M %p")
-            end = repeat_unav_app.end_time.strftime("%I:%M %p")
-            msg_title = "Your repeating unavailability application at %s has been approved." % (business_data.company_name)
-            msg = "Your repeating unavailability application at %s for %ss between %s and %s has been approved." % (business_data.company_name, weekday, start, end)
+            msg_title, msg = _get_decision_message('repeat_unav', repeat_unav_app, True,
+                                                   business_data.company_name)
             notify_employee_with_msg(repeat_unav_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -285,11 +336,8 @@ def disapprove_repeat_unav_app(request):
 
             # Inform employee via email and text
             business_data = BusinessData.objects.get(user=logged_in_user)
-            weekday = WEEKDAY[repeat_unav_app.weekday]
-            start = repeat_unav_app.start_time.strftime("%I:%M %p")
-            end = repeat_unav_app.end_time.strftime("%I:%M %p")
-            msg_title = "Your repeating unavailability application at %s has not been approved." % (business_data.company_name)
-            msg = "Your repeating unavailability application at %s for %ss between %s and %s has not been approved." % (business_data.company_name, weekday, start, end)
+            msg_title, msg = _get_decision_message('repeat_unav', repeat_unav_app, False,
+                                                   business_data.company_name)
             notify_employee_with_msg(repeat_unav_app.employee, msg_title, msg)
             
             data = {'pk': pk}
@@ -303,6 +351,72 @@ def disapprove_repeat_unav_app(request):
         return get_json_err_response(msg)
     
 
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")  
+def decide_applications_in_bulk(request):  
+    """Approve or disapprove many pending applications at once.
+    
+    Decisions are saved in one transaction (See decide_applications) and
+    employees are notified in the background after it commits. The response
+    has, for every approved application, the schedules already assigned to
+    its employee that it overlaps, found for all applications at once (See
+    get_application_conflicts).
+    """
+    logged_in_user = request.user
+    if request.method == 'POST':
+        form = BulkApplicationDecisionForm(request.POST)
+        if form.is_valid():
+            try:
+                decided = decide_applications(logged_in_user, form.cleaned_data['decisions'])
+            except ValueError as e:
+                return get_json_err_response(str(e))
+            
+            approved_apps = [(kind, app) for kind, app, approved in decided if approved]
+            conflicts = get_application_conflicts(logged_in_user, approved_apps)
+            company_name = (BusinessData.objects.filter(user=logged_in_user)
+                                                .values_list('company_name', flat=True).get())
+            
+            results = []
+            notifications = []
+            for kind, app, approved in decided:
+                results.append({'kind': kind, 'pk': app.id, 'approved': approved,
+                                'conflicts': [{'id': s.id, 'department': s.department_id,
+                                               'start_datetime': s.start_datetime,
+                                               'end_datetime': s.end_datetime}
+                                              for s in conflicts.get((kind, app.id), [])]})
+                msg_title, msg = _get_decision_message(kind, app, approved, company_name)
+                notifications.append((app.employee, msg_title, msg))
+            enqueue_employee_notifications(notifications)
+            
+            json_data = json.dumps({'decisions': results}, default=date_handler)
+            return JsonResponse(json_data, safe=False)
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be POST. Got: ' + request.method
+        return get_json_err_response(msg)
+        
+        
+def _get_decision_message(kind, application, approved, company_name):
+    """Return title and body of the message informing an employee of the
+    decision on their application."""
+    decision = 'has been approved' if approved else 'has not been approved'
+    if kind == 'repeat_unav':
+        weekday = WEEKDAY[application.weekday]
+        start = application.start_time.strftime("%I:%M %p")
+        end = application.end_time.strftime("%I:%M %p")
+        msg_title = "Your repeating unavailability application at %s %s." % (company_name, decision)
+        msg = ("Your repeating unavailability application at %s for %ss between %s and %s %s." % 
+               (company_name, weekday, start, end, decision))
+    else:
+        start = application.start_datetime.strftime("%A, %B %d")
+        end = application.end_datetime.strftime("%A, %B %d")
+        msg_title = "Your %s application at %s %s." % (kind, company_name, decision)
+        msg = "Your %s application at %s for %s to %s %s." % (kind, company_name, start, end, decision)
+    return msg_title, msg
+    
+
 @login_required
 def create_schedule_swap_petition(request):
     """Create schedule petition swap for logged in employee"""
@@ -1,4 +1,5 @@
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 from django.shortcuts import render, redirect
 from django.http import HttpResponse, JsonResponse
 from django.urls import reverse
@@ -11,21 +12,29 @@ from django.forms.models import model_to_dict
 from ..models import (Schedule, Department, DepartmentMembership, Employee,
                      Vacation, RepeatUnavailability, DesiredTime, MonthlyRevenue,
                      Absence, BusinessData, LiveSchedule, LiveCalendar,
-                     DayNoteHeader, DayNoteBody)
+                     DayNoteHeader, DayNoteBody, StaffingRule)
 from ..business_logic import (get_eligibles, all_calendar_hours_and_costs,
                               add_employee_cost_change, remove_schedule_cost_change,
                               create_live_schedules, create_live_cal_timestamp,
                               time_dur_in_hours, edit_schedule_cost_change, calculate_cost_delta,
                               get_start_end_of_weekday, get_availability, get_dates_in_week,
                               set_view_rights, send_employee_notifications,
-                              view_right_send_employee_notifications)
-from ..forms import (CalendarForm, AddScheduleForm, ProtoScheduleForm,
+                              view_right_send_employee_notifications, LRUCache,
+                              get_data_version, get_cached_day_availability_snapshot,
+                              get_eligibles_from_snapshot, get_day_availability_matrix,
+                              begin_cost_delta, apply_cost_delta, merge_cost_deltas,
+                              get_staffing_violations,
+                              record_calendar_event, SCHEDULES_SAVED, SCHEDULES_REMOVED,
+                              DAY_NOTE_HEADER_SAVED, DAY_NOTE_BODY_SAVED, CALENDAR_PUBLISHED)
+from ..forms import (CalendarForm, AddScheduleForm, ProtoScheduleForm, DayAvailabilityForm,
                     LiveCalendarForm, LiveCalendarManagerForm, ViewLiveCalendarForm,
                     DayNoteHeaderForm, DayNoteBodyForm, ScheduleNoteForm,
                     EditScheduleForm, CopySchedulesForm, SetStateLiveCalForm,
-                    SchedulePkForm, AddEmployeeToScheduleForm, RemoveScheduleForm)
+                    SchedulePkForm, AddEmployeeToScheduleForm, RemoveScheduleForm,
+                    StaffingRuleForm, StaffingRulePkForm, BatchEditSchedulesForm)
 from ..serializers import (date_handler, get_json_err_response, _availability_to_dict,
                            eligable_list_to_dict, get_tro_dates_to_dict, _availability_to_dict)
+from ..ui_preferences import set_ui_preferences
 from .views_basic_pages import manager_check
 from datetime import datetime, date, time, timedelta
 import bisect
@@ -34,6 +43,11 @@ import json
 import copy
 
 
+# Serialized eligible lists of proto schedules, keyed by user, department,
+# date, times and the user's data version, see get_proto_schedule_info.
+proto_eligibles_cache = LRUCache(max_size=512, ttl=30)
+
+
 
 @login_required
 @user_passes_test(manager_check, login_url="/live_calendar/")
@@ -43,40 +57,17 @@ def add_schedule(request):
     if request.method == 'POST':
         form = AddScheduleForm(request.POST)
         if form.is_valid():
-            department = form.cleaned_data['department']
-            date = form.cleaned_data['add_date']
-            start_time = form.cleaned_data['start_time']
-            end_time = form.cleaned_data['end_time']
-            hide_start = form.cleaned_data['hide_start']
-            hide_end = form.cleaned_data['hide_end']
-
-            # Save time and hide choices to business settings
-            business_data = BusinessData.objects.get(user=logged_in_user)
-            business_data.schedule_start = start_time
-            business_data.schedule_end = end_time
-            business_data.hide_start = hide_start
-            business_data.hide_end = hide_end
-            business_data.save()
-
-            # Construct start and end datetimes for schedule
-            time_zone = timezone.get_default_timezone_name()
-            start_dt = datetime.combine(date, start_time)
-            start_dt = pytz.timezone(time_zone).localize(start_dt)
-            end_dt = datetime.combine(date, end_time)
-            end_dt = pytz.timezone(time_zone).localize(end_dt)
-
             # TODO: Assert department belongs to user after form cleaning?
-            dep = Department.objects.get(user=logged_in_user, pk=department)
-            schedule = Schedule(user=logged_in_user,
-                                start_datetime=start_dt, end_datetime=end_dt,
-                                hide_start_time=hide_start,
-                                hide_end_time=hide_end,
-                                department=dep)
-            schedule.save()
+            dep = Department.objects.get(user=logged_in_user, pk=form.cleaned_data['department'])
+            schedule = _add_schedule(logged_in_user, form.cleaned_data, dep)
+            
             schedule_dict = model_to_dict(schedule)
             schedule_json = json.dumps(schedule_dict, default=date_handler)
+            _record_schedules_event(request, [schedule_dict], None, None)
 
-            return JsonResponse(schedule_json, safe=False)
+            response = JsonResponse(schedule_json, safe=False)
+            _set_schedule_preferences(request, response, form.cleaned_data)
+            return response
 
         else:
             msg = 'Invalid form data'
@@ -120,6 +111,12 @@ def get_proto_schedule_info(request):
     This function is used to create a mock schedule to see what the eligible
     list would be IF a user created a schedule with said parameters. It informs
     the user what employee options they would have if they created the schedule.
+    
+    As the user scrubs through times this is called for many schedules on the
+    same day, so the eligible list is computed from a cached availability
+    snapshot of the whole day and the resulting json is cached as well. Both
+    caches are keyed by the user's data version so any change of schedules,
+    time off, employees, etc. makes them recompute.
     """
 
     logged_in_user = request.user
@@ -130,6 +127,12 @@ def get_proto_schedule_info(request):
             date = form.cleaned_data['add_date']
             start_time = form.cleaned_data['start_time']
             end_time = form.cleaned_data['end_time']
+            
+            data_version = get_data_version(logged_in_user.id)
+            cache_key = (logged_in_user.id, department, date, start_time, end_time, data_version)
+            json_data = proto_eligibles_cache.get(cache_key)
+            if json_data is not None:
+                return JsonResponse(json_data, safe=False)
 
             # Construct start and end datetimes for schedule
             time_zone = timezone.get_default_timezone_name()
@@ -144,9 +147,51 @@ def get_proto_schedule_info(request):
                                 start_datetime=start_dt, end_datetime=end_dt,
                                 department=dep)
 
-            eligable_list = get_eligibles(logged_in_user, schedule)
+            snapshot = get_cached_day_availability_snapshot(logged_in_user, dep, date,
+                                                            data_version)
+            eligable_list = get_eligibles_from_snapshot(snapshot, schedule)
             eligable_dict_list = eligable_list_to_dict(eligable_list)
             json_data = json.dumps(eligable_dict_list, default=date_handler)
+            proto_eligibles_cache.set(cache_key, json_data)
+
+            return JsonResponse(json_data, safe=False)
+
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be GET. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def get_day_availability(request):
+    """Get availability matrix of a department's employees for a whole day.
+    
+    Lets the calendar rank employees for every schedule of the day it shows,
+    including ones being created, instead of asking for each schedule's
+    eligible list (See get_day_availability_matrix).
+    """
+
+    logged_in_user = request.user
+    if request.method == 'GET':
+        form = DayAvailabilityForm(request.GET)
+        if form.is_valid():
+            department = form.cleaned_data['department']
+            date = form.cleaned_data['date']
+            
+            try:
+                dep = Department.objects.get(user=logged_in_user, pk=department)
+            except Department.DoesNotExist:
+                msg = 'Invalid form data'
+                return get_json_err_response(msg)
+                
+            data_version = get_data_version(logged_in_user.id)
+            snapshot = get_cached_day_availability_snapshot(logged_in_user, dep, date,
+                                                            data_version)
+            matrix = get_day_availability_matrix(snapshot)
+            json_data = json.dumps(matrix, default=date_handler)
 
             return JsonResponse(json_data, safe=False)
 
@@ -166,43 +211,19 @@ def add_employee_to_schedule(request):
     if request.method == 'POST':
         form = AddEmployeeToScheduleForm(request.POST)
         if form.is_valid():
-            schedule_pk = form.cleaned_data['schedule_pk']
-            employee_pk = form.cleaned_data['employee_pk']
             cal_date = form.cleaned_data['cal_date']
-            # Get schedule and its cost with old employee
-            schedule = (Schedule.objects.select_related('department', 'employee')
-                                        .get(user=logged_in_user, pk=schedule_pk))
-
-            new_employee = Employee.objects.get(user=logged_in_user, pk=employee_pk)
-
-            # Get cost of assigning new employee to schedule
             departments = Department.objects.filter(user=logged_in_user)
             business_data = BusinessData.objects.get(user=logged_in_user)
-            cost_delta = add_employee_cost_change(logged_in_user, schedule, new_employee,
-                                                  departments, business_data, cal_date)
-
-            # Get length of schedule for new employee, and old employee if exists
-            new_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
-                                                 None, None, min_time_for_break=new_employee.min_time_for_break,
-                                                 break_time_in_min=new_employee.break_time_in_min)
-            old_sch_duration = 0
-            if schedule.employee:
-                prev_employee = schedule.employee
-                old_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
-                                                     None, None, min_time_for_break=prev_employee.min_time_for_break,
-                                                     break_time_in_min=prev_employee.break_time_in_min)
-
-            # Assign new employee to schedule
-            schedule.employee = new_employee
-            schedule.save(update_fields=['employee'])
-
-            # Process information for json dump
-            schedule_dict = model_to_dict(schedule)
-            employee_dict = model_to_dict(new_employee)
-            data = {'schedule': schedule_dict, 'employee': employee_dict,
-                    'cost_delta': cost_delta, 'new_sch_duration': new_sch_duration,
-                    'old_sch_duration': old_sch_duration}
+            try:
+                data, cost_version = _add_employee_to_schedule(logged_in_user, form.cleaned_data,
+                                                               departments, business_data)
+            except IntegrityError:
+                msg = 'Employee is already scheduled during this time'
+                return get_json_err_response(msg)
+            apply_cost_delta(logged_in_user, cal_date, cost_version, data['cost_delta'])
+
             json_data = json.dumps(data, default=date_handler)
+            _record_schedules_event(request, [data['schedule']], data['cost_delta'], cal_date)
 
             return JsonResponse(json_data, safe=False)
 
@@ -224,20 +245,17 @@ def remove_schedule(request):
         if form.is_valid():
             schedule_pk = form.cleaned_data['schedule_pk']
             cal_date = form.cleaned_data['cal_date']
-            schedule = (Schedule.objects.select_related('department', 'employee')
-                                        .get(user=logged_in_user, pk=schedule_pk))
-
-            cost_delta = 0
-            if schedule.employee: # Get change of cost if employee was assigned
-              departments = Department.objects.filter(user=logged_in_user)
-              business_data = BusinessData.objects.get(user=logged_in_user)
-              cost_delta = remove_schedule_cost_change(logged_in_user, schedule,
-                                                       departments, business_data,
-                                                       cal_date)
-
-            schedule.delete()
-            json_info = json.dumps({'schedule_pk': schedule_pk, 'cost_delta': cost_delta},
-                                    default=date_handler)
+            departments = Department.objects.filter(user=logged_in_user)
+            business_data = BusinessData.objects.get(user=logged_in_user)
+            data, cost_version = _remove_schedule(logged_in_user, form.cleaned_data,
+                                                  departments, business_data)
+            cost_delta = data['cost_delta']
+            if cost_delta:
+                apply_cost_delta(logged_in_user, cal_date, cost_version, cost_delta)
+            json_info = json.dumps(data, default=date_handler)
+            _record_calendar_event(request, SCHEDULES_REMOVED,
+                                   {'schedule_pks': [schedule_pk], 'cost_delta': cost_delta or None,
+                                    'cal_date': cal_date})
 
             return JsonResponse(json_info, safe=False)
 
@@ -249,7 +267,6 @@ def remove_schedule(request):
         return get_json_err_response(msg)
 
 
-
 @login_required
 @user_passes_test(manager_check, login_url="/live_calendar/")
 def edit_schedule(request):
@@ -258,91 +275,23 @@ def edit_schedule(request):
     if request.method == 'POST':
         form = EditScheduleForm(request.POST)
         if form.is_valid():
-            schedule_pk = form.cleaned_data['schedule_pk']
-            start_time = form.cleaned_data['start_time']
-            end_time = form.cleaned_data['end_time']
-            hide_start = form.cleaned_data['hide_start']
-            hide_end = form.cleaned_data['hide_end']
             cal_date = form.cleaned_data['cal_date']
-            # User is undoing previous edit to this schedule, in case schedule had conflict
-            # before edit, don't send any conflict to avoid infinite loop of warnings
-            undo_edit = form.cleaned_data['undo_edit']
-            schedule = (Schedule.objects.select_related('department', 'employee')
-                                        .get(user=logged_in_user, pk=schedule_pk))
-
-            old_start_dt = schedule.start_datetime.isoformat()
-            old_end_dt = schedule.end_datetime.isoformat()
-            oldHideStart = schedule.hide_start_time
-            oldHideEnd = schedule.hide_start_time
-
-            # Construct start and end datetimes for schedule
-            date = schedule.start_datetime.date()
-            time_zone = timezone.get_default_timezone_name()
-            start_dt = datetime.combine(date, start_time)
-            start_dt = pytz.timezone(time_zone).localize(start_dt)
-            end_dt = datetime.combine(date, end_time)
-            end_dt = pytz.timezone(time_zone).localize(end_dt)
-
-            # Get cost difference of changing schedule time if employee assigned
-            cost_delta = 0
-            old_sch_duration = 0
-            new_sch_duration = 0
-            if schedule.employee:
-                # Calculate cost difference from editing times:
-                departments = Department.objects.filter(user=logged_in_user)
-                business_data = BusinessData.objects.get(user=logged_in_user)
-                cost_delta = edit_schedule_cost_change(logged_in_user, schedule,
-                                                       start_dt, end_dt,
-                                                       departments, business_data,
-                                                       cal_date)
-
-                # Get length of schedule for new employee, and old employee if exists
-                old_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
-                                                     None, None, min_time_for_break=schedule.employee.min_time_for_break,
-                                                     break_time_in_min=schedule.employee.break_time_in_min)
-                new_sch_duration = time_dur_in_hours(start_dt, end_dt,
-                                                     None, None, min_time_for_break=schedule.employee.min_time_for_break,
-                                                     break_time_in_min=schedule.employee.break_time_in_min)
-
-            # Save time and hide choices to business settings
+            departments = Department.objects.filter(user=logged_in_user)
             business_data = BusinessData.objects.get(user=logged_in_user)
-            business_data.schedule_start = start_time
-            business_data.schedule_end = end_time
-            business_data.hide_start = hide_start
-            business_data.hide_end = hide_end
-            business_data.save()
-
-            #Set schedule fields to form data
-            schedule.start_datetime = start_dt
-            schedule.end_datetime = end_dt
-            schedule.hide_start_time = hide_start
-            schedule.hide_end_time = hide_end
-            schedule.save()
-
-            # Check for any conflicts with new schedule times if employee assigned
-            availability = {}
-            if schedule.employee and not undo_edit:
-                new_availability = get_availability(logged_in_user, schedule.employee, schedule)
-                other_sch = new_availability['(S)']
-                vacation = new_availability['(V)']
-                unavail = new_availability['(A)']
-                repeat_unavail = new_availability['(U)']
-                overtime = new_availability['(O)']
-                if other_sch or vacation or unavail or repeat_unavail or overtime:
-                    availability = _availability_to_dict(new_availability)
-
-            schedule_dict = model_to_dict(schedule)
-            json_info = json.dumps({'schedule': schedule_dict,
-                                    'cost_delta': cost_delta,
-                                    'new_sch_duration': new_sch_duration,
-                                    'old_sch_duration': old_sch_duration,
-                                    'availability': availability,
-                                    'oldStartDatetime': old_start_dt,
-                                    'oldEndDatetime': old_end_dt,
-                                    'oldHideStart': oldHideStart,
-                                    'oldHideEnd': oldHideEnd},
-                                    default=date_handler)
-            return JsonResponse(json_info, safe=False)
+            try:
+                data, cost_version = _edit_schedule(logged_in_user, form.cleaned_data,
+                                                    departments, business_data)
+            except IntegrityError:
+                msg = 'Employee is already scheduled during this time'
+                return get_json_err_response(msg)
+            if data['cost_delta']:
+                apply_cost_delta(logged_in_user, cal_date, cost_version, data['cost_delta'])
+
+            json_info = json.dumps(data, default=date_handler)
+            _record_schedules_event(request, [data['schedule']], data['cost_delta'], cal_date)
+            response = JsonResponse(json_info, safe=False)
+            _set_schedule_preferences(request, response, form.cleaned_data)
+            return response
 
         else:
             msg = 'Invalid form data'
@@ -426,8 +375,9 @@ def copy_schedules(request):
                     unavail = availability['(A)']
                     repeat_unavail = availability['(U)']
                     overtime = availability['(O)']
+                    fatigue = availability['(R)'] or availability['(C)']
 
-                    if other_sch or vacation or unavail or repeat_unavail or overtime:
+                    if other_sch or vacation or unavail or repeat_unavail or overtime or fatigue:
                         schedule_availabilities[copy_schedule.id] = availability
 
             # Calculate cost of workweek with new copied schedules
@@ -457,6 +407,7 @@ def copy_schedules(request):
             json_info = json.dumps({'schedules': schedules_as_dicts, 'cost_delta': cost_delta,
                                     'availability': availability_as_dicts},
                                     default=date_handler)
+            _record_schedules_event(request, schedules_as_dicts, cost_delta, cal_date)
             return JsonResponse(json_info, safe=False)
 
         else:
@@ -484,21 +435,27 @@ def remove_conflict_copy_schedules(request):
             # Get cost delta from removing each schedule then delete schedule
             departments = Department.objects.filter(user=logged_in_user)
             business_data = BusinessData.objects.get(user=logged_in_user)
-            total_cost_delta = {}
+            cost_deltas = []
+            removed_pks = []
             for sch in schedules:
                 if sch.employee:
+                    removed_pks.append(sch.id)
                     cost_delta = remove_schedule_cost_change(logged_in_user, sch,
                                                              departments, business_data,
                                                              cal_date)
-                    if not total_cost_delta:
-                        total_cost_delta = cost_delta
-                    else:
-                        total_cost_delta = calculate_cost_delta(total_cost_delta, cost_delta, 'add')
-
+                    cost_version = begin_cost_delta(logged_in_user, cal_date, [sch])
                     sch.delete()
+                    apply_cost_delta(logged_in_user, cal_date, cost_version, cost_delta)
+                    cost_deltas.append(cost_delta)
+            # Deltas of schedules in different workweeks have different days
+            total_cost_delta = merge_cost_deltas(cost_deltas) if cost_deltas else {}
 
             # Return cost delta to front end to be rendered
-            json_info = json.dumps({'cost_delta': cost_delta}, default=date_handler)
+            json_info = json.dumps({'cost_delta': total_cost_delta}, default=date_handler)
+            _record_calendar_event(request, SCHEDULES_REMOVED,
+                                   {'schedule_pks': removed_pks,
+                                    'cost_delta': total_cost_delta or None,
+                                    'cal_date': cal_date})
             return JsonResponse(json_info, safe=False)
 
         else:
@@ -512,7 +469,11 @@ def remove_conflict_copy_schedules(request):
 @login_required
 @user_passes_test(manager_check, login_url="/live_calendar/")
 def push_changes_live(request):
-    """Create a live version of schedules for employee users to query."""
+    """Create a live version of schedules for employee users to query.
+
+    The response lists the windows of the month where the department has
+    fewer people than its staffing rules require (See get_staffing_violations).
+    """
     logged_in_user = request.user
     if request.method == 'POST':
         form = SetStateLiveCalForm(logged_in_user, None, request.POST)
@@ -555,9 +516,76 @@ def push_changes_live(request):
                 send_employee_notifications(logged_in_user, department, date, business_data,
                                             live_calendar, view_rights, notify_all,
                                             notify_by_sms, notify_by_email)
-            
 
-            json_info = json.dumps({'message': 'Successfully pushed calendar live!', 'view_rights': view_rights})
+            understaffed = get_staffing_violations(logged_in_user, department.id,
+                                                   date.replace(day=1))
+            _record_calendar_event(request, CALENDAR_PUBLISHED,
+                                   {'date': date, 'department': department.id,
+                                    'version': live_calendar.version})
+
+            json_info = json.dumps({'message': 'Successfully pushed calendar live!',
+                                    'view_rights': view_rights,
+                                    'understaffed': understaffed},
+                                   default=date_handler)
+            return JsonResponse(json_info, safe=False)
+
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be POST. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def add_staffing_rule(request):
+    """Add a minimum headcount rule to a department.
+
+    An empty start time means the start of the day, an empty end time the
+    end of the day.
+    """
+    logged_in_user = request.user
+    if request.method == 'POST':
+        form = StaffingRuleForm(request.POST)
+        if form.is_valid():
+            department_id = form.cleaned_data['department']
+            if not Department.objects.filter(user=logged_in_user, pk=department_id).exists():
+                msg = 'Invalid form data'
+                return get_json_err_response(msg)
+
+            weekdays = sorted(set(form.cleaned_data['weekdays']))
+            staffing_rule = StaffingRule.objects.create(user=logged_in_user,
+                                                        department_id=department_id,
+                                                        weekdays=','.join(str(w) for w in weekdays),
+                                                        start_time=form.cleaned_data['start_time'] or time(0),
+                                                        end_time=form.cleaned_data['end_time'] or time(0),
+                                                        headcount=form.cleaned_data['headcount'])
+            staffing_rule_dict = model_to_dict(staffing_rule)
+            staffing_rule_json = json.dumps(staffing_rule_dict, default=date_handler)
+
+            return JsonResponse(staffing_rule_json, safe=False)
+
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be POST. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def remove_staffing_rule(request):
+    """Remove a staffing rule from the database."""
+    logged_in_user = request.user
+    if request.method == 'POST':
+        form = StaffingRulePkForm(request.POST)
+        if form.is_valid():
+            staffing_rule_pk = form.cleaned_data['staffing_rule_pk']
+            StaffingRule.objects.filter(user=logged_in_user, pk=staffing_rule_pk).delete()
+            json_info = json.dumps({'staffing_rule_pk': staffing_rule_pk})
+
             return JsonResponse(json_info, safe=False)
 
         else:
@@ -671,6 +699,7 @@ def add_edit_day_note_header(request):
             day_note_header.save(update_fields=['header_text'])
             day_note_header_dict = model_to_dict(day_note_header)
             day_note_header_json = json.dumps(day_note_header_dict, default=date_handler)
+            _record_calendar_event(request, DAY_NOTE_HEADER_SAVED, day_note_header_dict)
 
             return JsonResponse(day_note_header_json, safe=False)
 
@@ -700,6 +729,7 @@ def add_edit_day_note_body(request):
             day_note_body.save(update_fields=['body_text'])
             day_note_body_dict = model_to_dict(day_note_body)
             day_note_body_json = json.dumps(day_note_body_dict, default=date_handler)
+            _record_calendar_event(request, DAY_NOTE_BODY_SAVED, day_note_body_dict)
 
             return JsonResponse(day_note_body_json, safe=False)
 
@@ -719,14 +749,11 @@ def edit_schedule_note(request):
     if request.method == 'POST':
         form = ScheduleNoteForm(request.POST)
         if form.is_valid():
-            id = form.cleaned_data['schedule_pk']
-            text = form.cleaned_data['schedule_text']
-            schedule = Schedule.objects.get(user=logged_in_user, pk=id)
-            schedule.schedule_note = text
-            schedule.save(update_fields=['schedule_note'])
+            schedule = _edit_schedule_note(logged_in_user, form.cleaned_data)
 
             schedule_dict = model_to_dict(schedule)
             schedule_json = json.dumps(schedule_dict, default=date_handler)
+            _record_schedules_event(request, [schedule_dict], None, None)
 
             return JsonResponse(schedule_json, safe=False)
 
@@ -736,3 +763,303 @@ def edit_schedule_note(request):
     else:
         msg = 'HTTP request needs to be POST. Got: ' + request.method
         return get_json_err_response(msg)
+
+
+@login_required
+@user_passes_test(manager_check, login_url="/live_calendar/")
+def batch_edit_schedules(request):
+    """Make a list of calendar edits in one transaction.
+    
+    Operations are applied in order the same way the views making each edit
+    by itself apply them (See BatchEditSchedulesForm), sharing the lookups of
+    departments and business data, so the calendar can send many edits in
+    one request. If an operation fails, none are saved. The response has the
+    result of each operation, as its view would have returned it, and the
+    cost delta of all operations combined (See merge_cost_deltas), which is
+    also applied to the snapshot of the calendar month once.
+    """
+    logged_in_user = request.user
+    if request.method == 'POST':
+        form = BatchEditSchedulesForm(request.POST)
+        if form.is_valid():
+            operations = form.cleaned_data['operations']
+            cal_date = form.cleaned_data['cal_date']
+            results = []
+            cost_deltas = []
+            saved_schedules = []
+            removed_pks = []
+            i = 0
+            try:
+                with transaction.atomic():
+                    departments = list(Department.objects.filter(user=logged_in_user))
+                    business_data = BusinessData.objects.get(user=logged_in_user)
+                    cost_version = begin_cost_delta(logged_in_user, cal_date, [])
+                    for i, (op, data) in enumerate(operations):
+                        if op == 'add':
+                            dep = [d for d in departments if d.id == data['department']]
+                            if not dep:
+                                raise Department.DoesNotExist
+                            schedule = _add_schedule(logged_in_user, data, dep[0])
+                            result = model_to_dict(schedule)
+                            saved_schedules.append(result)
+                        elif op == 'add_employee':
+                            result, version = _add_employee_to_schedule(logged_in_user, data, 
+                                                                        departments, business_data)
+                            saved_schedules.append(result['schedule'])
+                        elif op == 'edit':
+                            result, version = _edit_schedule(logged_in_user, data, 
+                                                             departments, business_data)
+                            saved_schedules.append(result['schedule'])
+                        elif op == 'remove':
+                            result, version = _remove_schedule(logged_in_user, data, 
+                                                               departments, business_data)
+                            removed_pks.append(result['schedule_pk'])
+                        else:
+                            schedule = _edit_schedule_note(logged_in_user, data)
+                            result = model_to_dict(schedule)
+                            saved_schedules.append(result)
+                        if result.get('cost_delta'):
+                            cost_deltas.append(result['cost_delta'])
+                        results.append(result)
+                        
+                    cost_delta = merge_cost_deltas(cost_deltas) if cost_deltas else 0
+                    if cost_delta:
+                        apply_cost_delta(logged_in_user, cal_date, cost_version, cost_delta)
+            except IntegrityError:
+                msg = 'Operation %d: Employee is already scheduled during this time' % i
+                return get_json_err_response(msg)
+            except ObjectDoesNotExist:
+                msg = 'Operation %d: Schedule, department or employee does not exist' % i
+                return get_json_err_response(msg)
+                
+            # Other clients get the cost delta with the first event
+            if saved_schedules:
+                _record_schedules_event(request, saved_schedules, cost_delta, cal_date)
+                cost_delta_event = None
+            else:
+                cost_delta_event = cost_delta
+            if removed_pks:
+                _record_calendar_event(request, SCHEDULES_REMOVED,
+                                       {'schedule_pks': removed_pks, 
+                                        'cost_delta': cost_delta_event or None,
+                                        'cal_date': cal_date})
+
+            json_info = json.dumps({'results': results, 'cost_delta': cost_delta},
+                                   default=date_handler)
+            response = JsonResponse(json_info, safe=False)
+            times = [data for op, data in operations if op in ('add', 'edit')]
+            if times:
+                _set_schedule_preferences(request, response, times[-1])
+            return response
+
+        else:
+            msg = 'Invalid form data'
+            return get_json_err_response(msg)
+    else:
+        msg = 'HTTP request needs to be POST. Got: ' + request.method
+        return get_json_err_response(msg)
+
+
+def _localize(date, time):
+    """Return timezone aware datetime of date and time in default timezone."""
+    time_zone = timezone.get_default_timezone_name()
+    return pytz.timezone(time_zone).localize(datetime.combine(date, time))
+
+
+def _add_schedule(user, data, department):
+    """Create schedule of AddScheduleForm data in department."""
+    schedule = Schedule(user=user,
+                        start_datetime=_localize(data['add_date'], data['start_time']), 
+                        end_datetime=_localize(data['add_date'], data['end_time']),
+                        hide_start_time=data['hide_start'],
+                        hide_end_time=data['hide_end'],
+                        department=department)
+    schedule.save()
+    return schedule
+
+
+def _add_employee_to_schedule(user, data, departments, business_data):
+    """Assign employee to schedule of AddEmployeeToScheduleForm data.
+    
+    Raises IntegrityError if the optional double booking constraint is
+    enabled and violated, after rolling back the assignment.
+    
+    Returns:
+        A tuple of the dict of the assignment for json dump, and the version
+        of the snapshot to pass on to apply_cost_delta with its cost delta.
+    """
+    cal_date = data['cal_date']
+    # Get schedule and its cost with old employee
+    schedule = (Schedule.objects.select_related('department', 'employee')
+                                .get(user=user, pk=data['schedule_pk']))
+    new_employee = Employee.objects.get(user=user, pk=data['employee_pk'])
+
+    # Get cost of assigning new employee to schedule
+    cost_delta = add_employee_cost_change(user, schedule, new_employee,
+                                          departments, business_data, cal_date)
+
+    # Get length of schedule for new employee, and old employee if exists
+    new_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
+                                         None, None, min_time_for_break=new_employee.min_time_for_break,
+                                         break_time_in_min=new_employee.break_time_in_min)
+    old_sch_duration = 0
+    if schedule.employee:
+        prev_employee = schedule.employee
+        old_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
+                                             None, None, min_time_for_break=prev_employee.min_time_for_break,
+                                             break_time_in_min=prev_employee.break_time_in_min)
+
+    # Assign new employee to schedule, the database rejects this if
+    # the optional double booking constraint is enabled and violated.
+    cost_version = begin_cost_delta(user, cal_date, [schedule])
+    schedule.employee = new_employee
+    with transaction.atomic():
+        schedule.save(update_fields=['employee'])
+
+    data = {'schedule': model_to_dict(schedule), 'employee': model_to_dict(new_employee),
+            'cost_delta': cost_delta, 'new_sch_duration': new_sch_duration,
+            'old_sch_duration': old_sch_duration}
+    return data, cost_version
+
+
+def _remove_schedule(user, data, departments, business_data):
+    """Delete schedule of RemoveScheduleForm data.
+    
+    Returns:
+        A tuple of the dict of the removal for json dump, and the version of
+        the snapshot to pass on to apply_cost_delta with its cost delta.
+    """
+    schedule_pk = data['schedule_pk']
+    schedule = (Schedule.objects.select_related('department', 'employee')
+                                .get(user=user, pk=schedule_pk))
+
+    cost_delta = 0
+    cost_version = None
+    if schedule.employee: # Get change of cost if employee was assigned
+        cost_delta = remove_schedule_cost_change(user, schedule, departments, 
+                                                 business_data, data['cal_date'])
+        cost_version = begin_cost_delta(user, data['cal_date'], [schedule])
+
+    schedule.delete()
+    return {'schedule_pk': schedule_pk, 'cost_delta': cost_delta}, cost_version
+
+
+def _edit_schedule(user, data, departments, business_data):
+    """Edit schedule with EditScheduleForm data.
+    
+    Raises IntegrityError if the optional double booking constraint is
+    enabled and violated, after rolling back the edit.
+    
+    Returns:
+        A tuple of the dict of the edit for json dump, and the version of the
+        snapshot to pass on to apply_cost_delta with its cost delta.
+    """
+    start_time = data['start_time']
+    end_time = data['end_time']
+    hide_start = data['hide_start']
+    hide_end = data['hide_end']
+    cal_date = data['cal_date']
+    # User is undoing previous edit to this schedule, in case schedule had conflict
+    # before edit, don't send any conflict to avoid infinite loop of warnings
+    undo_edit = data['undo_edit']
+    schedule = (Schedule.objects.select_related('department', 'employee')
+                                .get(user=user, pk=data['schedule_pk']))
+
+    old_start_dt = schedule.start_datetime.isoformat()
+    old_end_dt = schedule.end_datetime.isoformat()
+    oldHideStart = schedule.hide_start_time
+    oldHideEnd = schedule.hide_start_time
+
+    # Construct start and end datetimes for schedule
+    date = schedule.start_datetime.date()
+    start_dt = _localize(date, start_time)
+    end_dt = _localize(date, end_time)
+
+    # Get cost difference of changing schedule time if employee assigned
+    cost_delta = 0
+    cost_version = None
+    old_sch_duration = 0
+    new_sch_duration = 0
+    if schedule.employee:
+        # Calculate cost difference from editing times:
+        cost_delta = edit_schedule_cost_change(user, schedule,
+                                               start_dt, end_dt,
+                                               departments, business_data,
+                                               cal_date)
+        cost_version = begin_cost_delta(user, cal_date, [schedule])
+
+        # Get length of schedule for new employee, and old employee if exists
+        old_sch_duration = time_dur_in_hours(schedule.start_datetime, schedule.end_datetime,
+                                             None, None, min_time_for_break=schedule.employee.min_time_for_break,
+                                             break_time_in_min=schedule.employee.break_time_in_min)
+        new_sch_duration = time_dur_in_hours(start_dt, end_dt,
+                                             None, None, min_time_for_break=schedule.employee.min_time_for_break,
+                                             break_time_in_min=schedule.employee.break_time_in_min)
+
+    # Set schedule fields to form data, the database rejects new times if
+    # the optional double booking constraint is enabled and violated.
+    schedule.start_datetime = start_dt
+    schedule.end_datetime = end_dt
+    schedule.hide_start_time = hide_start
+    schedule.hide_end_time = hide_end
+    with transaction.atomic():
+        schedule.save()
+
+    # Check for any conflicts with new schedule times if employee assigned
+    availability = {}
+    if schedule.employee and not undo_edit:
+        new_availability = get_availability(user, schedule.employee, schedule)
+        other_sch = new_availability['(S)']
+        vacation = new_availability['(V)']
+        unavail = new_availability['(A)']
+        repeat_unavail = new_availability['(U)']
+        overtime = new_availability['(O)']
+        fatigue = new_availability['(R)'] or new_availability['(C)']
+        if other_sch or vacation or unavail or repeat_unavail or overtime or fatigue:
+            availability = _availability_to_dict(new_availability)
+
+    data = {'schedule': model_to_dict(schedule),
+            'cost_delta': cost_delta,
+            'new_sch_duration': new_sch_duration,
+            'old_sch_duration': old_sch_duration,
+            'availability': availability,
+            'oldStartDatetime': old_start_dt,
+            'oldEndDatetime': old_end_dt,
+            'oldHideStart': oldHideStart,
+            'oldHideEnd': oldHideEnd}
+    return data, cost_version
+
+
+def _edit_schedule_note(user, data):
+    """Set note of schedule of ScheduleNoteForm data."""
+    schedule = Schedule.objects.get(user=user, pk=data['schedule_pk'])
+    schedule.schedule_note = data['schedule_text']
+    schedule.save(update_fields=['schedule_note'])
+    return schedule
+
+
+def _set_schedule_preferences(request, response, data):
+    """Remember times and hide choices of AddScheduleForm or EditScheduleForm
+    data for the next schedule added (See ui_preferences)."""
+    set_ui_preferences(request, response, 
+                       schedule_start=data['start_time'].isoformat(),
+                       schedule_end=data['end_time'].isoformat(),
+                       hide_start=data['hide_start'], hide_end=data['hide_end'])
+
+
+def _record_calendar_event(request, kind, data):
+    """Record change made by request for other clients showing the calendars.
+
+    The client that made the request sends its id in the X-Calendar-Client
+    header, so it can skip the change it already applied.
+    """
+    record_calendar_event(request.user, kind, data,
+                          request.META.get('HTTP_X_CALENDAR_CLIENT', ''))
+
+
+def _record_schedules_event(request, schedule_dicts, cost_delta, cal_date):
+    """Record added or changed schedules, with the cost delta of the change
+    calculated for the calendar month of cal_date, if any."""
+    _record_calendar_event(request, SCHEDULES_SAVED,
+                           {'schedules': schedule_dicts, 'cost_delta': cost_delta or None,
+                            'cal_date': cal_date})
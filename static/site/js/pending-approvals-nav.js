@@ -9,14 +9,19 @@ $(function(){
   }
   
   
-  /** Render a navigation button to pending approvals if any exist. */
+  /** Render a navigation button to pending approvals if any exist, with a
+      badge of the number of pending applications. */
   function renderPendingApprovalsNavBtn(data) {
     var info = JSON.parse(data);
     var hostName = getRootHostName();
     
     if (info["pending_applications"]) {
+      var counts = info["counts"];
+      var title = counts["vacation"] + " vacation, " + counts["absence"] + " unavailability, "
+      title += counts["repeat_unav"] + " repeating unavailability"
       var html = "<li class='nav-item custom-nav-item active pending-btn'><a class='nav-link' href='"
-      html += hostName + "/pending_approvals/'>Pending Approvals</a></li>"
+      html += hostName + "/pending_approvals/' title='" + title + "'>Pending Approvals "
+      html += "<span class='badge badge-light'>" + info["total"] + "</span></a></li>"
       
       $("#header-nav").prepend(html);
     }